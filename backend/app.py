@@ -92,6 +92,17 @@ def create_app(config_name=None):
     init_cache(app)
     logger.info(f"Cache backend: {app.config.get('CACHE_BACKEND', 'unknown')}")
 
+    # Mirror the price store to Redis so every worker reads the same tick,
+    # and broadcast L1 cache invalidations to the other workers
+    if app.config.get('CACHE_BACKEND') == 'redis':
+        from services.cache_service import get_redis_client, invalidation_bus
+        from services.market.price_store import price_store
+        with app.app_context():
+            redis_client = get_redis_client()
+        if redis_client is not None:
+            price_store.attach_redis(redis_client)
+            invalidation_bus.attach_redis(redis_client)
+
     # Initialize Rate Limiter with Redis backend
     try:
         init_rate_limiter(app)
@@ -295,11 +306,61 @@ import sys
 if 'pytest' not in sys.modules:
     app = create_app()
 
-    # Start the yfinance price updater for live prices (every 15s)
-    # This runs for both gunicorn (production) and flask dev server
-    from services.yfinance_service import start_price_updater
-    start_price_updater()
-    print("Live price updater started (15s interval)")
+    # Batch audit log inserts off the request path
+    from services.audit_writer import audit_writer
+    audit_writer.start(app)
+
+    # Trigger SL/TP on price ticks instead of waiting for the 10s scan
+    from services.sltp_engine import sltp_engine
+    sltp_engine.start(app)
+
+    # Execute trailing stop / OCO / bracket orders on price ticks
+    from services.order_engine import order_engine
+    order_engine.start(app)
+
+    # Check loss limits against floating equity on every tick
+    from services.equity_monitor import equity_monitor
+    equity_monitor.start(app)
+
+    # Send coalesced, changed-only price frames to WebSocket clients
+    from services.price_fanout import price_fanout
+    price_fanout.start(socketio)
+
+    # Extend the forming bar of stored candle series from the tick stream
+    from services.market.candle_store import candle_store
+    candle_store.start()
+
+    # Keep streaming indicator state per signalled symbol; push signal flips
+    from services.signals.streaming import indicator_stream
+    from routes.signals import get_price_history
+    indicator_stream.start(socketio, loader=get_price_history)
+
+    # Ingest news in the background so news reads never wait on upstream sites
+    from services.news import get_news_service
+    get_news_service().start()
+
+    # Only the elected node runs the price producers (yfinance ingestion and
+    # polling of watched symbols); the others receive its ticks over Redis
+    from services.yfinance_service import start_price_updater, stop_price_updater
+    from services.cluster import cluster_node
+    from services.cache_service import get_redis_client
+    from services.websocket_service import connected_sids
+
+    def _start_producers():
+        start_price_updater()
+        price_updater.start(app)
+        print("Live price producer started on this node")
+
+    def _stop_producers():
+        stop_price_updater()
+        price_updater.stop()
+
+    redis_client = None
+    if app.config.get('CACHE_BACKEND') == 'redis':
+        with app.app_context():
+            redis_client = get_redis_client()
+    cluster_node.start(redis_client, on_elected=_start_producers, on_demoted=_stop_producers,
+                       connections=lambda: len(connected_sids))
 else:
     app = None
 
@@ -88,11 +88,21 @@ celery_app.conf.update(
             'task': 'tasks.notification_tasks.cleanup_old_notifications',
             'schedule': crontab(day_of_week=0, hour=3, minute=0),  # Sunday 3 AM
         },
+        # Reconcile leaderboard sorted sets hourly
+        'sync-leaderboard': {
+            'task': 'tasks.sync_tasks.sync_leaderboard',
+            'schedule': crontab(minute=15),
+        },
         # Check challenge statuses every 30 minutes
         'check-challenge-statuses': {
             'task': 'tasks.sync_tasks.check_challenge_statuses',
             'schedule': crontab(minute='*/30'),
         },
+        # Refresh admin analytics rollups every 15 minutes
+        'update-analytics-rollups': {
+            'task': 'tasks.sync_tasks.update_analytics_rollups',
+            'schedule': crontab(minute='*/15'),
+        },
     },
 
     # Task routes (optional - for task prioritization)
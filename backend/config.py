@@ -124,6 +124,9 @@ class Config:
     CACHE_DEFAULT_TIMEOUT = 300  # 5 minutes default
     CACHE_KEY_PREFIX = 'tradesense_'
 
+    # SocketIO message queue shared by all nodes (defaults to REDIS_URL when Redis is up)
+    SOCKETIO_MESSAGE_QUEUE = os.getenv('SOCKETIO_MESSAGE_QUEUE')
+
     # Rate Limiting Configuration
     RATELIMIT_ENABLED = os.getenv('RATELIMIT_ENABLED', 'true').lower() != 'false'
     RATELIMIT_STORAGE_URL = os.getenv('REDIS_URL', 'memory://')
@@ -0,0 +1,59 @@
+"""Add analytics rollup tables (daily_rollups, cohort_rollups)
+
+Revision ID: f6g7h8i9j0k1
+Revises: e5f6g7h8i9j0
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+
+# revision identifiers, used by Alembic.
+revision = 'f6g7h8i9j0k1'
+down_revision = 'e5f6g7h8i9j0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = inspect(bind)
+    existing_tables = inspector.get_table_names()
+
+    if 'daily_rollups' not in existing_tables:
+        op.create_table('daily_rollups',
+            sa.Column('day', sa.Date(), nullable=False),
+            sa.Column('signups', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('payments', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('revenue', sa.Numeric(precision=14, scale=2), nullable=False, server_default='0'),
+            sa.Column('challenges_started', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('challenges_passed', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('challenges_failed', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('trades_opened', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('trades_closed', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('updated_at', sa.DateTime(), nullable=False),
+            sa.PrimaryKeyConstraint('day')
+        )
+
+    if 'cohort_rollups' not in existing_tables:
+        op.create_table('cohort_rollups',
+            sa.Column('cohort_month', sa.Date(), nullable=False),
+            sa.Column('activity_month', sa.Date(), nullable=False),
+            sa.Column('active_users', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('updated_at', sa.DateTime(), nullable=False),
+            sa.PrimaryKeyConstraint('cohort_month', 'activity_month')
+        )
+
+
+def downgrade():
+    bind = op.get_bind()
+    inspector = inspect(bind)
+    existing_tables = inspector.get_table_names()
+
+    if 'cohort_rollups' in existing_tables:
+        op.drop_table('cohort_rollups')
+
+    if 'daily_rollups' in existing_tables:
+        op.drop_table('daily_rollups')
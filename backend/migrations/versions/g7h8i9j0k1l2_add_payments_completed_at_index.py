@@ -0,0 +1,37 @@
+"""Add payments.completed_at index (revenue rollups by completion day)
+
+Revision ID: g7h8i9j0k1l2
+Revises: f6g7h8i9j0k1
+Create Date: 2026-10-17 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+
+# revision identifiers, used by Alembic.
+revision = 'g7h8i9j0k1l2'
+down_revision = 'f6g7h8i9j0k1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = inspect(bind)
+    existing_indexes = {index['name'] for index in inspector.get_indexes('payments')}
+
+    if 'idx_payments_completed_at' not in existing_indexes:
+        with op.batch_alter_table('payments', schema=None) as batch_op:
+            batch_op.create_index('idx_payments_completed_at', ['completed_at'], unique=False)
+
+
+def downgrade():
+    bind = op.get_bind()
+    inspector = inspect(bind)
+    existing_indexes = {index['name'] for index in inspector.get_indexes('payments')}
+
+    if 'idx_payments_completed_at' in existing_indexes:
+        with op.batch_alter_table('payments', schema=None) as batch_op:
+            batch_op.drop_index('idx_payments_completed_at')
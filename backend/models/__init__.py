@@ -115,3 +115,6 @@ from .admin_permission import (
 
 # Signal tracking
 from .signal_history import SignalHistory
+
+# Admin analytics rollups
+from .analytics_rollup import DailyRollup, CohortRollup
@@ -0,0 +1,63 @@
+"""
+Analytics Rollup Models
+Pre-aggregated daily facts and cohort activity for admin analytics charts
+"""
+
+from datetime import datetime
+from . import db
+
+
+class DailyRollup(db.Model):
+    """
+    Platform activity for one UTC day.
+    Maintained by services.analytics_rollups; charts read a range of these
+    rows instead of aggregating users, payments, challenges and trades.
+    """
+    __tablename__ = 'daily_rollups'
+
+    day = db.Column(db.Date, primary_key=True)
+
+    signups = db.Column(db.Integer, nullable=False, default=0)
+    payments = db.Column(db.Integer, nullable=False, default=0)  # Completed payments
+    revenue = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    challenges_started = db.Column(db.Integer, nullable=False, default=0)
+    challenges_passed = db.Column(db.Integer, nullable=False, default=0)
+    challenges_failed = db.Column(db.Integer, nullable=False, default=0)
+    trades_opened = db.Column(db.Integer, nullable=False, default=0)
+    trades_closed = db.Column(db.Integer, nullable=False, default=0)
+
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f'<DailyRollup {self.day}>'
+
+    def to_dict(self):
+        return {
+            'date': self.day.isoformat(),
+            'signups': self.signups,
+            'payments': self.payments,
+            'revenue': float(self.revenue or 0),
+            'challenges_started': self.challenges_started,
+            'challenges_passed': self.challenges_passed,
+            'challenges_failed': self.challenges_failed,
+            'trades_opened': self.trades_opened,
+            'trades_closed': self.trades_closed
+        }
+
+
+class CohortRollup(db.Model):
+    """
+    Users of a signup-month cohort who traded in a given month.
+    Retention is active_users over the cohort's signups (from DailyRollup).
+    """
+    __tablename__ = 'cohort_rollups'
+
+    cohort_month = db.Column(db.Date, primary_key=True)    # First day of the signup month
+    activity_month = db.Column(db.Date, primary_key=True)  # First day of the trading month
+
+    active_users = db.Column(db.Integer, nullable=False, default=0)
+
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f'<CohortRollup {self.cohort_month} -> {self.activity_month}>'
@@ -105,9 +105,13 @@ class AuditLog(db.Model):
             target_type=None, target_id=None, target_name=None,
             ip_address=None, user_agent=None, description=None,
             old_value=None, new_value=None, extra_data=None,
-            status='success', error_message=None):
+            status='success', error_message=None, sync=False):
         """
-        Create a new audit log entry.
+        Record a new audit log entry.
+
+        The row is handed to the audit writer, which inserts it in a batch
+        shortly after (security-critical actions and sync=True are written
+        before returning). The caller's session is never committed.
 
         Args:
             action_type: Category of action (AUTH, TRADE, etc.)
@@ -125,34 +129,35 @@ class AuditLog(db.Model):
             extra_data: Additional data (dict, will be JSON-encoded)
             status: Result status (success, failure, warning)
             error_message: Error message if status is failure
+            sync: Write the entry before returning
 
         Returns:
-            AuditLog: The created audit log entry
+            AuditLog: The entry (not attached to the session)
         """
         import json
+        from services.audit_writer import audit_writer
+
+        row = {
+            'user_id': user_id,
+            'username': username,
+            'action_type': action_type,
+            'action': action,
+            'target_type': target_type,
+            'target_id': target_id,
+            'target_name': target_name,
+            'ip_address': ip_address,
+            'user_agent': user_agent,
+            'description': description,
+            'old_value': json.dumps(old_value) if old_value else None,
+            'new_value': json.dumps(new_value) if new_value else None,
+            'extra_data': json.dumps(extra_data) if extra_data else None,
+            'status': status,
+            'error_message': error_message,
+            'created_at': datetime.utcnow()
+        }
+        audit_writer.submit(row, sync=sync)
 
-        log_entry = cls(
-            user_id=user_id,
-            username=username,
-            action_type=action_type,
-            action=action,
-            target_type=target_type,
-            target_id=target_id,
-            target_name=target_name,
-            ip_address=ip_address,
-            user_agent=user_agent,
-            description=description,
-            old_value=json.dumps(old_value) if old_value else None,
-            new_value=json.dumps(new_value) if new_value else None,
-            extra_data=json.dumps(extra_data) if extra_data else None,
-            status=status,
-            error_message=error_message
-        )
-
-        db.session.add(log_entry)
-        db.session.commit()
-
-        return log_entry
+        return cls(**row)
 
     @classmethod
     def get_logs(cls, user_id=None, action_type=None, action=None,
@@ -165,7 +170,23 @@ class AuditLog(db.Model):
         Returns:
             tuple: (logs, total_count)
         """
-        query = cls.query
+        query = cls.filtered(user_id=user_id, action_type=action_type, action=action,
+                             target_type=target_type, target_id=target_id, status=status,
+                             start_date=start_date, end_date=end_date, search=search)
+
+        total = query.count()
+        logs = query.order_by(cls.created_at.desc()).paginate(
+            page=page, per_page=per_page, error_out=False
+        )
+
+        return logs.items, total
+
+    @classmethod
+    def filtered(cls, user_id=None, action_type=None, action=None,
+                 target_type=None, target_id=None, status=None,
+                 start_date=None, end_date=None, search=None, query=None):
+        """Apply the audit log filters to query (default: all logs)"""
+        query = cls.query if query is None else query
 
         if user_id:
             query = query.filter(cls.user_id == user_id)
@@ -194,13 +215,7 @@ class AuditLog(db.Model):
                     cls.ip_address.ilike(search_term)
                 )
             )
-
-        total = query.count()
-        logs = query.order_by(cls.created_at.desc()).paginate(
-            page=page, per_page=per_page, error_out=False
-        )
-
-        return logs.items, total
+        return query
 
     @classmethod
     def get_user_activity(cls, user_id, limit=50):
@@ -7,6 +7,7 @@ class Payment(db.Model):
     __table_args__ = (
         db.Index('idx_payments_user_status', 'user_id', 'status'),
         db.Index('idx_payments_created_at', 'created_at'),
+        db.Index('idx_payments_completed_at', 'completed_at'),
     )
 
     id = db.Column(db.Integer, primary_key=True)
@@ -375,6 +375,7 @@ def generate_test_trades(challenge_id):
     """Generate test trades for a challenge (superadmin only)"""
     import random
     from decimal import Decimal
+    from services.challenge_engine import invalidate_challenge_state
 
     challenge = UserChallenge.query.get(challenge_id)
     if not challenge:
@@ -474,6 +475,7 @@ def generate_test_trades(challenge_id):
     # Update challenge balance
     challenge.current_balance = Decimal(str(round(balance, 2)))
     db.session.commit()
+    invalidate_challenge_state(challenge.id)
 
     # Calculate stats
     total_pnl = sum(t['pnl'] for t in trades_created)
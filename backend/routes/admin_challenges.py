@@ -11,6 +11,7 @@ from sqlalchemy import func, or_, and_
 from models import db, User, UserChallenge, Trade, ChallengeModel, AccountSize
 from utils.decorators import permission_required, any_permission_required, superadmin_required
 from services.audit_service import AuditService
+from services.challenge_engine import invalidate_challenge_state
 import logging
 
 logger = logging.getLogger(__name__)
@@ -292,6 +293,7 @@ def reset_challenge(challenge_id):
         challenge.current_balance = challenge.initial_balance
         challenge.status = 'active'
         challenge.trading_days = 0
+        invalidate_challenge_state(challenge.id)
         challenge.start_date = datetime.utcnow()
         challenge.end_date = None
         challenge.failed_at = None
@@ -455,6 +457,7 @@ def edit_challenge(challenge_id):
             challenge.current_balance = data['current_balance']
             if data['current_balance'] > float(challenge.highest_balance or 0):
                 challenge.highest_balance = data['current_balance']
+            invalidate_challenge_state(challenge.id)
             updated_fields.append('current_balance')
 
         if 'initial_balance' in data:
@@ -596,6 +599,7 @@ def adjust_challenge_balance(challenge_id):
 
         # Update balance
         challenge.current_balance = new_balance
+        invalidate_challenge_state(challenge.id)
 
         # Update highest balance if needed
         if new_balance > float(challenge.highest_balance or 0):
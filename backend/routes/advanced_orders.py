@@ -13,6 +13,8 @@ from models import (
     TrailingStopOrder, OCOOrder, BracketOrder,
     OrderStatus, OrderSide, get_active_orders
 )
+from services.order_engine import order_engine
+from services.sltp_engine import book_key
 
 advanced_orders_bp = Blueprint('advanced_orders', __name__)
 
@@ -38,6 +40,24 @@ def get_user_and_challenge(user_id, challenge_id=None):
     return user, challenge, None, None
 
 
+def get_position(position_id, challenge, symbol):
+    """
+    Resolve the position an order closes: an open trade of the challenge on
+    the order's symbol. Returns (position_id, error).
+    """
+    if position_id is None:
+        return None, None
+    try:
+        position_id = int(position_id)
+    except (TypeError, ValueError):
+        return None, {'error': 'Invalid position_id'}
+
+    trade = Trade.query.filter_by(id=position_id, challenge_id=challenge.id, status='open').first()
+    if not trade or book_key(trade.symbol) != book_key(symbol):
+        return None, {'error': 'Position not found or does not match the order symbol'}
+    return trade.id, None
+
+
 # ==================== TRAILING STOP ORDERS ====================
 
 @advanced_orders_bp.route('/trailing-stop', methods=['POST'])
@@ -67,6 +87,10 @@ def create_trailing_stop():
     if not challenge:
         return jsonify({'error': 'No active challenge found'}), 400
 
+    position_id, error = get_position(data.get('position_id'), challenge, data['symbol'])
+    if error:
+        return jsonify(error), 400
+
     try:
         # Determine trail type
         trail_type = 'percent' if data.get('trail_percent') else 'amount'
@@ -81,7 +105,7 @@ def create_trailing_stop():
             trail_amount=Decimal(str(data['trail_amount'])) if data.get('trail_amount') else None,
             trail_percent=Decimal(str(data['trail_percent'])) if data.get('trail_percent') else None,
             activation_price=Decimal(str(data['activation_price'])) if data.get('activation_price') else None,
-            position_id=data.get('position_id'),
+            position_id=position_id,
             status=OrderStatus.PENDING.value if data.get('activation_price') else OrderStatus.ACTIVE.value
         )
 
@@ -91,6 +115,7 @@ def create_trailing_stop():
 
         db.session.add(order)
         db.session.commit()
+        order_engine.add_order('trailing_stop', order)
 
         return jsonify({
             'message': 'Trailing stop order created successfully',
@@ -183,6 +208,7 @@ def update_trailing_stop(order_id):
             order.quantity = Decimal(str(data['quantity']))
 
         db.session.commit()
+        order_engine.add_order('trailing_stop', order)
 
         return jsonify({
             'message': 'Order updated successfully',
@@ -213,6 +239,7 @@ def cancel_trailing_stop(order_id):
 
     order.status = OrderStatus.CANCELLED.value
     db.session.commit()
+    order_engine.remove_order('trailing_stop', order.id)
 
     return jsonify({'message': 'Order cancelled successfully'})
 
@@ -242,6 +269,10 @@ def create_oco_order():
     if not challenge:
         return jsonify({'error': 'No active challenge found'}), 400
 
+    position_id, error = get_position(data.get('position_id'), challenge, data['symbol'])
+    if error:
+        return jsonify(error), 400
+
     try:
         # Determine sides based on position or explicit input
         # For a long position: Order1 = Sell TP (limit), Order2 = Sell SL (stop)
@@ -267,7 +298,7 @@ def create_oco_order():
             order2_type=data.get('order2_type', 'stop'),
             order2_price=Decimal(str(data['order2_price'])),
             order2_stop_limit_price=Decimal(str(data['order2_stop_limit_price'])) if data.get('order2_stop_limit_price') else None,
-            position_id=data.get('position_id'),
+            position_id=position_id,
             status=OrderStatus.ACTIVE.value
         )
 
@@ -277,6 +308,7 @@ def create_oco_order():
 
         db.session.add(order)
         db.session.commit()
+        order_engine.add_order('oco', order)
 
         return jsonify({
             'message': 'OCO order created successfully',
@@ -358,6 +390,7 @@ def update_oco_order(order_id):
             order.quantity = Decimal(str(data['quantity']))
 
         db.session.commit()
+        order_engine.add_order('oco', order)
 
         return jsonify({
             'message': 'Order updated successfully',
@@ -390,6 +423,7 @@ def cancel_oco_order(order_id):
     order.order1_status = OrderStatus.CANCELLED.value
     order.order2_status = OrderStatus.CANCELLED.value
     db.session.commit()
+    order_engine.remove_order('oco', order.id)
 
     return jsonify({'message': 'OCO order cancelled successfully'})
 
@@ -445,6 +479,7 @@ def create_bracket_order():
 
         db.session.add(order)
         db.session.commit()
+        order_engine.add_order('bracket', order)
 
         return jsonify({
             'message': 'Bracket order created successfully',
@@ -547,6 +582,7 @@ def update_bracket_order(order_id):
         order.calculate_risk_reward()
 
         db.session.commit()
+        order_engine.add_order('bracket', order)
 
         return jsonify({
             'message': 'Order updated successfully',
@@ -580,6 +616,7 @@ def cancel_bracket_order(order_id):
     order.take_profit_status = OrderStatus.CANCELLED.value
     order.stop_loss_status = OrderStatus.CANCELLED.value
     db.session.commit()
+    order_engine.remove_order('bracket', order.id)
 
     return jsonify({'message': 'Bracket order cancelled successfully'})
 
@@ -667,6 +704,7 @@ def cancel_all_orders():
     symbol = data.get('symbol')
 
     cancelled_count = 0
+    cancelled = []
 
     try:
         # Cancel trailing stops
@@ -680,6 +718,7 @@ def cancel_all_orders():
         )
         for order in query.all():
             order.status = OrderStatus.CANCELLED.value
+            cancelled.append(('trailing_stop', order.id))
             cancelled_count += 1
 
         # Cancel OCO orders
@@ -693,6 +732,7 @@ def cancel_all_orders():
             order.status = OrderStatus.CANCELLED.value
             order.order1_status = OrderStatus.CANCELLED.value
             order.order2_status = OrderStatus.CANCELLED.value
+            cancelled.append(('oco', order.id))
             cancelled_count += 1
 
         # Cancel bracket orders
@@ -709,9 +749,12 @@ def cancel_all_orders():
             order.entry_status = OrderStatus.CANCELLED.value
             order.take_profit_status = OrderStatus.CANCELLED.value
             order.stop_loss_status = OrderStatus.CANCELLED.value
+            cancelled.append(('bracket', order.id))
             cancelled_count += 1
 
         db.session.commit()
+        for kind, order_id in cancelled:
+            order_engine.remove_order(kind, order_id)
 
         return jsonify({
             'message': f'Cancelled {cancelled_count} orders',
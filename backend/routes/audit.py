@@ -4,15 +4,28 @@ Audit Log Routes for TradeSense Admin
 Provides endpoints for viewing and exporting audit logs.
 """
 
-import csv
-import io
 from datetime import datetime, timedelta
-from flask import Blueprint, request, jsonify, Response
+from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from models import db, AuditLog, User
+from utils.export import iter_keyset, stream_export
 
 audit_bp = Blueprint('audit', __name__, url_prefix='/api/admin/audit')
 
+AUDIT_EXPORT_COLUMNS = (
+    AuditLog.id, AuditLog.created_at, AuditLog.user_id, AuditLog.username,
+    AuditLog.action_type, AuditLog.action, AuditLog.target_type, AuditLog.target_id,
+    AuditLog.target_name, AuditLog.ip_address, AuditLog.description,
+    AuditLog.status, AuditLog.error_message
+)
+
+AUDIT_EXPORT_FIELDS = [
+    ('id', 'ID'), ('created_at', 'Timestamp'), ('user_id', 'User ID'), ('username', 'Username'),
+    ('action_type', 'Action Type'), ('action', 'Action'), ('target_type', 'Target Type'),
+    ('target_id', 'Target ID'), ('target_name', 'Target Name'), ('ip_address', 'IP Address'),
+    ('description', 'Description'), ('status', 'Status'), ('error_message', 'Error Message')
+]
+
 
 def admin_required(f):
     """Decorator to require admin or superadmin role"""
@@ -180,10 +193,11 @@ def get_user_audit_logs(user_id):
 @admin_required
 def export_audit_logs():
     """
-    Export audit logs to CSV.
+    Export audit logs, streamed page by page (no row limit).
 
     Query params same as get_audit_logs, plus:
-    - format: Export format (csv only for now)
+    - format: Export format ('csv' or 'ndjson', default 'csv')
+    - gzip: 'true' to download gzip-compressed
     """
     # Get filters
     user_id = request.args.get('user_id', type=int)
@@ -207,33 +221,23 @@ def export_audit_logs():
         except ValueError:
             pass
 
-    # Get all matching logs (up to 10000)
-    logs, _ = AuditLog.get_logs(
+    # Plain column rows: nothing accumulates in the session's identity map
+    query = AuditLog.filtered(
         user_id=user_id,
         action_type=action_type,
         action=action,
         status=status,
         start_date=start_date,
         end_date=end_date,
-        page=1,
-        per_page=10000,
-        search=search
+        search=search,
+        query=db.session.query(*AUDIT_EXPORT_COLUMNS)
     )
+    pages = iter_keyset(query, [AuditLog.created_at, AuditLog.id])
 
-    # Create CSV
-    output = io.StringIO()
-    writer = csv.writer(output)
-
-    # Header
-    writer.writerow([
-        'ID', 'Timestamp', 'User ID', 'Username', 'Action Type', 'Action',
-        'Target Type', 'Target ID', 'Target Name', 'IP Address',
-        'Description', 'Status', 'Error Message'
-    ])
-
-    # Data
-    for log in logs:
-        writer.writerow([
+    return stream_export(
+        pages,
+        AUDIT_EXPORT_FIELDS,
+        lambda log: [
             log.id,
             log.created_at.isoformat() if log.created_at else '',
             log.user_id or '',
@@ -247,20 +251,10 @@ def export_audit_logs():
             log.description or '',
             log.status,
             log.error_message or ''
-        ])
-
-    output.seek(0)
-
-    # Generate filename with timestamp
-    filename = f"audit_logs_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.csv"
-
-    return Response(
-        output.getvalue(),
-        mimetype='text/csv',
-        headers={
-            'Content-Disposition': f'attachment; filename={filename}',
-            'Content-Type': 'text/csv; charset=utf-8'
-        }
+        ],
+        'audit_logs',
+        export_format=request.args.get('format', 'csv'),
+        gzip=request.args.get('gzip', '').lower() == 'true'
     )
 
 
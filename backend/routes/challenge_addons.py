@@ -15,6 +15,7 @@ from models import (
 )
 from models.challenge_model import AccountSize
 from services.audit_service import log_audit
+from services.challenge_engine import invalidate_challenge_state
 
 challenge_addons_bp = Blueprint('challenge_addons', __name__, url_prefix='/api/challenges')
 
@@ -233,6 +234,7 @@ def reset_challenge(challenge_id):
         challenge.current_phase_number = 1
         challenge.trading_days = 0
         challenge.last_trading_day = None
+        invalidate_challenge_state(challenge.id)
         challenge.failure_reason = None
         challenge.end_date = None
         challenge.profit_target = float(challenge.challenge_model.phase1_profit_target) / 100 if challenge.challenge_model else 0.10
@@ -473,6 +475,7 @@ def upgrade_challenge(challenge_id):
         challenge.initial_balance = Decimal(str(new_initial))
         challenge.current_balance = Decimal(str(new_current))
         challenge.highest_balance = Decimal(str(max(new_current, new_initial)))
+        invalidate_challenge_state(challenge.id)
 
         # Complete addon
         addon.complete()
@@ -3,19 +3,29 @@ Trade Journal API Routes
 CRUD operations for managing trade journal entries and analytics
 """
 
-from flask import Blueprint, request, jsonify, send_file
+from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from datetime import datetime, date, timedelta
 from decimal import Decimal
-import csv
-import io
 
 from models import (
     db, JournalEntry, JournalTemplate, Trade, JOURNAL_TAGS, get_journal_analytics
 )
+from utils.export import iter_keyset, stream_export
 
 journal_bp = Blueprint('journal', __name__, url_prefix='/api/journal')
 
+JOURNAL_EXPORT_FIELDS = [
+    ('trade_date', 'Date'), ('symbol', 'Symbol'), ('trade_type', 'Type'), ('lot_size', 'Lot Size'),
+    ('entry_price', 'Entry Price'), ('exit_price', 'Exit Price'), ('stop_loss', 'Stop Loss'),
+    ('take_profit', 'Take Profit'), ('profit_loss', 'P/L ($)'), ('profit_pips', 'P/L (pips)'),
+    ('risk_reward', 'R:R'), ('setup_quality', 'Setup Quality'), ('execution_rating', 'Execution'),
+    ('session', 'Session'), ('timeframe', 'Timeframe'), ('strategy', 'Strategy'), ('tags', 'Tags'),
+    ('emotion_before', 'Emotion Before'), ('emotion_after', 'Emotion After'),
+    ('followed_plan', 'Followed Plan'), ('is_mistake', 'Is Mistake'),
+    ('lessons_learned', 'Lessons Learned'), ('notes', 'Notes')
+]
+
 
 # ==================== JOURNAL ENTRIES ====================
 
@@ -450,10 +460,18 @@ def get_calendar_data():
 
 # ==================== EXPORT ====================
 
+@journal_bp.route('/export', methods=['GET'])
 @journal_bp.route('/export/csv', methods=['GET'])
 @jwt_required()
 def export_csv():
-    """Export journal entries to CSV"""
+    """
+    Export journal entries, streamed page by page.
+
+    Query params:
+    - start_date, end_date: YYYY-MM-DD
+    - format: 'csv' or 'ndjson' (default 'csv')
+    - gzip: 'true' to download gzip-compressed
+    """
     user_id = get_jwt_identity()
 
     start_date = request.args.get('start_date')
@@ -466,24 +484,12 @@ def export_csv():
     if end_date:
         query = query.filter(JournalEntry.trade_date <= datetime.strptime(end_date, '%Y-%m-%d').date())
 
-    entries = query.order_by(JournalEntry.trade_date.desc()).all()
-
-    # Create CSV
-    output = io.StringIO()
-    writer = csv.writer(output)
-
-    # Header
-    writer.writerow([
-        'Date', 'Symbol', 'Type', 'Lot Size', 'Entry Price', 'Exit Price',
-        'Stop Loss', 'Take Profit', 'P/L ($)', 'P/L (pips)', 'R:R',
-        'Setup Quality', 'Execution', 'Session', 'Timeframe',
-        'Strategy', 'Tags', 'Emotion Before', 'Emotion After',
-        'Followed Plan', 'Is Mistake', 'Lessons Learned', 'Notes'
-    ])
+    pages = iter_keyset(query, [JournalEntry.trade_date, JournalEntry.id])
 
-    # Data rows
-    for e in entries:
-        writer.writerow([
+    return stream_export(
+        pages,
+        JOURNAL_EXPORT_FIELDS,
+        lambda e: [
             e.trade_date.isoformat() if e.trade_date else '',
             e.symbol,
             e.trade_type,
@@ -507,15 +513,10 @@ def export_csv():
             'Yes' if e.is_mistake else 'No',
             e.lessons_learned or '',
             e.notes or ''
-        ])
-
-    output.seek(0)
-
-    return send_file(
-        io.BytesIO(output.getvalue().encode('utf-8')),
-        mimetype='text/csv',
-        as_attachment=True,
-        download_name=f'trade_journal_{datetime.utcnow().strftime("%Y%m%d")}.csv'
+        ],
+        'trade_journal',
+        export_format=request.args.get('format', 'csv'),
+        gzip=request.args.get('gzip', '').lower() == 'true'
     )
 
 
@@ -1,8 +1,8 @@
 from flask import request, jsonify
 from flask_jwt_extended import jwt_required
-from sqlalchemy import desc
 from . import leaderboard_bp
 from models import db, UserChallenge, User
+from services.leaderboard_service import leaderboards
 
 
 @leaderboard_bp.route('', methods=['GET'])
@@ -11,53 +11,8 @@ def get_leaderboard():
     limit = request.args.get('limit', 10, type=int)
     period = request.args.get('period', 'all')  # all, month, week
 
-    # Build query for top traders by profit percentage
-    query = db.session.query(
-        User.id,
-        User.username,
-        User.avatar,
-        UserChallenge.initial_balance,
-        UserChallenge.current_balance,
-        UserChallenge.plan_type,
-        UserChallenge.status,
-        UserChallenge.start_date,
-        (
-            (UserChallenge.current_balance - UserChallenge.initial_balance) /
-            UserChallenge.initial_balance * 100
-        ).label('profit_pct')
-    ).join(
-        UserChallenge, User.id == UserChallenge.user_id
-    ).filter(
-        UserChallenge.status.in_(['active', 'passed'])
-    )
-
-    # Filter by period
-    if period == 'month':
-        from datetime import datetime, timedelta
-        month_ago = datetime.utcnow() - timedelta(days=30)
-        query = query.filter(UserChallenge.start_date >= month_ago)
-    elif period == 'week':
-        from datetime import datetime, timedelta
-        week_ago = datetime.utcnow() - timedelta(days=7)
-        query = query.filter(UserChallenge.start_date >= week_ago)
-
-    # Order by profit percentage descending
-    results = query.order_by(desc('profit_pct')).limit(limit).all()
-
-    leaderboard = []
-    for i, row in enumerate(results):
-        leaderboard.append({
-            'rank': i + 1,
-            'user_id': row.id,
-            'username': row.username,
-            'avatar': row.avatar,
-            'initial_balance': float(row.initial_balance),
-            'current_balance': float(row.current_balance),
-            'profit_percentage': round(float(row.profit_pct), 2),
-            'plan_type': row.plan_type,
-            'status': row.status,
-            'start_date': row.start_date.isoformat() if row.start_date else None
-        })
+    # Ranked incrementally in sorted sets; only the top rows are loaded
+    leaderboard = leaderboards.get_trading_leaderboard(period, limit)
 
     return jsonify({
         'leaderboard': leaderboard,
@@ -135,16 +90,8 @@ def get_user_rank(user_id):
     user = User.query.get(user_id)
     profit_pct = best_challenge.profit_percentage
 
-    # Count users with higher profit percentage
-    higher_ranked = db.session.query(
-        db.func.count(UserChallenge.id)
-    ).filter(
-        UserChallenge.status.in_(['active', 'passed']),
-        ((UserChallenge.current_balance - UserChallenge.initial_balance) /
-         UserChallenge.initial_balance * 100) > profit_pct
-    ).scalar()
-
-    rank = higher_ranked + 1
+    # Challenges with a higher profit percentage, counted in the sorted set
+    rank = leaderboards.get_challenge_rank(best_challenge)
 
     return jsonify({
         'user_id': user_id,
@@ -2,12 +2,13 @@ from flask import request, jsonify
 from flask_jwt_extended import jwt_required
 from datetime import datetime
 import pytz
+import time
 import logging
 from . import market_data_bp
 from services.yfinance_service import (
     get_current_price,
     get_stock_info,
-    get_historical_data,
+    get_historical_columns,
     get_multiple_prices,
     get_live_price_data
 )
@@ -15,6 +16,8 @@ from services.market_scraper import get_moroccan_stocks  # Legacy import for bac
 from services.market.moroccan_provider import get_moroccan_provider, MOROCCAN_STOCKS
 from services.gemini_signals import get_ai_signal
 from services.cache_service import CacheService, cache
+from services.market.price_store import price_store
+from services.market.candle_store import candle_store
 
 logger = logging.getLogger(__name__)
 
@@ -153,24 +156,32 @@ def _fetch_crypto_price_direct(symbol: str) -> float | None:
     return None
 
 
+def _is_fresh_price(live_data: dict) -> bool:
+    """Live updater ticks are always served; on-demand fetches only while recent"""
+    from services.yfinance_service import PRICE_SOURCE_SCHEDULE, CACHE_DURATION
+    if live_data.get('source') in PRICE_SOURCE_SCHEDULE:
+        return True
+    timestamp = live_data.get('timestamp')
+    return bool(timestamp) and (time.time() - timestamp) < CACHE_DURATION
+
+
 @market_data_bp.route('/price/<symbol>', methods=['GET'])
 def get_price(symbol):
-    """Get current price for a symbol (cached for 30 seconds)"""
+    """Get current price for a symbol (served from the shared price store)"""
     symbol = symbol.upper()
-    cache_key = CacheService.market_key(symbol)
 
-    # Short cache (5 seconds) for real-time feel
-    cached_data = CacheService.get(cache_key)
-    if cached_data:
-        logger.debug(f"Cache hit for price: {symbol}")
-        return jsonify(cached_data), 200
+    # Latest tick from the price store (live updater + recent fetches)
+    live_data = get_live_price_data(symbol)
+    if live_data and not _is_fresh_price(live_data):
+        live_data = None
 
-    # For crypto, try direct Kraken/Coinbase fetch FIRST (most reliable)
+    # For crypto without a fresh tick, fetch directly from Kraken/Coinbase
     crypto_symbols = ['BTC-USD', 'BTCUSD', 'ETH-USD', 'ETHUSD', 'SOL-USD', 'SOLUSD',
                       'XRP-USD', 'XRPUSD', 'ADA-USD', 'ADAUSD', 'DOGE-USD', 'DOGEUSD']
-    if symbol in crypto_symbols or symbol.replace('-', '') in [s.replace('-', '') for s in crypto_symbols]:
+    if not live_data and symbol.replace('-', '') in [s.replace('-', '') for s in crypto_symbols]:
         direct_price = _fetch_crypto_price_direct(symbol)
         if direct_price:
+            price_store.update(symbol, direct_price, source='kraken_coinbase')
             result = {
                 'symbol': symbol,
                 'price': direct_price,
@@ -180,17 +191,8 @@ def get_price(symbol):
                 'source': 'kraken_coinbase',
                 'timestamp': datetime.now().isoformat()
             }
-            CacheService.set(cache_key, result, timeout=5)  # Short cache for crypto
             return jsonify(result), 200
 
-    # Try live prices from background updater (includes Moroccan from Casablanca Bourse)
-    live_data = get_live_price_data(symbol)
-    if not live_data and '-' in symbol:
-        live_data = get_live_price_data(symbol.replace('-', ''))
-    if not live_data and '-' not in symbol:
-        # Try adding -USD suffix for crypto
-        if symbol in ['BTCUSD', 'ETHUSD', 'SOLUSD', 'XRPUSD', 'ADAUSD', 'DOGEUSD', 'BNBUSD']:
-            live_data = get_live_price_data(symbol[:-3] + '-USD')
     if live_data:
         result = {
             'symbol': symbol,
@@ -202,10 +204,9 @@ def get_price(symbol):
             'currency': 'MAD' if symbol in SUPPORTED_MOROCCAN else 'USD',
             'market': 'MOROCCO' if symbol in SUPPORTED_MOROCCAN else 'US',
             'source': 'casablanca_bourse' if symbol in SUPPORTED_MOROCCAN else 'live',
-            'timestamp': datetime.now().isoformat()
+            'timestamp': datetime.fromtimestamp(live_data['timestamp']).isoformat()
+            if live_data.get('timestamp') else datetime.now().isoformat()
         }
-        CacheService.set(cache_key, result, timeout=15)
-        logger.info(f"Live price for {symbol}: {result['price']}")
         return jsonify(result), 200
 
     # Fallback: Check if Moroccan stock - use enhanced provider (mock data)
@@ -233,8 +234,11 @@ def get_price(symbol):
             return jsonify(result), 200
         return jsonify({'error': f'Moroccan stock {symbol} not found'}), 404
 
-    # International stock/crypto/forex
-    price = get_current_price(symbol)
+    # International stock/crypto/forex - one batched quote gives price and change
+    quote = get_multiple_prices([symbol]).get(symbol, {})
+    price = quote.get('price')
+    if price is None:
+        price = get_current_price(symbol)
 
     # Static fallback prices for when APIs are unavailable
     if price is None:
@@ -260,8 +264,6 @@ def get_price(symbol):
     if price is None:
         return jsonify({'error': f'Could not get price for {symbol}'}), 404
 
-    info = get_stock_info(symbol)
-
     # Determine market type
     if symbol.endswith('-USD') or symbol.endswith('USD') and symbol not in ['EURUSD', 'GBPUSD', 'AUDUSD']:
         market = 'CRYPTO'
@@ -273,11 +275,10 @@ def get_price(symbol):
     result = {
         'symbol': symbol,
         'price': price,
-        'change': info.get('change', 0),
-        'change_percent': info.get('change_percent', 0),
+        'change': quote.get('change', 0),
+        'change_percent': quote.get('change_percent', 0),
         'market': market
     }
-    CacheService.set(cache_key, result, timeout=CacheService.TTL['market_prices'])
     return jsonify(result), 200
 
 
@@ -353,7 +354,11 @@ def get_moroccan_info(symbol):
 @market_data_bp.route('/history/<symbol>', methods=['GET'])
 @jwt_required()
 def get_history(symbol):
-    """Get historical data for a symbol"""
+    """
+    Get historical data for a symbol.
+    format=columns returns {'time': [...], 'open': [...], ...} arrays
+    instead of one object per bar.
+    """
     symbol = symbol.upper()
     period = request.args.get('period', '1mo')  # 1d, 5d, 1mo, 3mo, 6mo, 1y
     interval = request.args.get('interval', '1d')  # 1m, 5m, 15m, 1h, 1d
@@ -363,11 +368,16 @@ def get_history(symbol):
             'error': 'Historical data not available for Moroccan stocks'
         }), 400
 
-    data = get_historical_data(symbol, period, interval)
+    columns = get_historical_columns(symbol, period, interval)
 
-    if not data:
+    if not len(columns['time']):
         return jsonify({'error': f'Could not get history for {symbol}'}), 404
 
+    if request.args.get('format') == 'columns':
+        data = candle_store.to_columns(columns)
+    else:
+        data = candle_store.to_rows(columns)
+
     return jsonify({
         'symbol': symbol,
         'period': period,
@@ -386,13 +396,15 @@ def market_status():
 def debug_prices():
     """Debug endpoint to test all price sources"""
     import requests
-    from services.yfinance_service import _live_prices, _price_updater_running
+    from services.yfinance_service import _price_updater_running, get_ingestion_stats
 
     results = {
         'background_updater': {
             'running': _price_updater_running,
-            'cached_symbols': list(_live_prices.keys())[:20],
-            'total_cached': len(_live_prices)
+            'cached_symbols': price_store.symbols()[:20],
+            'total_cached': len(price_store),
+            'sources': get_ingestion_stats()['sources'],
+            'store': price_store.get_stats()
         },
         'api_tests': {}
     }
@@ -211,6 +211,43 @@ def get_cache_metrics():
     })
 
 
+@monitoring_bp.route('/cluster', methods=['GET'])
+@admin_required
+def get_cluster_status():
+    """Get SocketIO nodes, their connections and tick latency (admin only)"""
+    from services.cluster import cluster_node
+
+    return jsonify({
+        'timestamp': datetime.utcnow().isoformat(),
+        'node': cluster_node.get_stats(),
+        'nodes': cluster_node.get_nodes()
+    })
+
+
+@monitoring_bp.route('/metrics/audit', methods=['GET'])
+@admin_required
+def get_audit_metrics():
+    """Get audit writer queue, batch and spill counters"""
+    from services.audit_writer import audit_writer
+
+    return jsonify({
+        'timestamp': datetime.utcnow().isoformat(),
+        'audit_writer': audit_writer.get_stats()
+    })
+
+
+@monitoring_bp.route('/metrics/news', methods=['GET'])
+@admin_required
+def get_news_metrics():
+    """Get news ingestion counters"""
+    from services.news import get_news_service
+
+    return jsonify({
+        'timestamp': datetime.utcnow().isoformat(),
+        'news_ingestion': get_news_service().get_stats()
+    })
+
+
 @monitoring_bp.route('/metrics/circuit-breakers', methods=['GET'])
 @admin_required
 def get_circuit_breaker_metrics():
@@ -394,19 +431,13 @@ def user_growth_analytics():
     """Get user growth data for charts"""
     days = request.args.get('days', 30, type=int)
 
-    growth_data = []
-    for i in range(days, -1, -1):
-        date = datetime.utcnow().date() - timedelta(days=i)
-        next_date = date + timedelta(days=1)
-
-        count = User.query.filter(
-            db.func.date(User.created_at) == date
-        ).count()
+    from services.analytics_rollups import analytics_rollups
 
-        growth_data.append({
-            'date': date.isoformat(),
-            'new_users': count
-        })
+    today = datetime.utcnow().date()
+    growth_data = [
+        {'date': day['date'], 'new_users': day['signups']}
+        for day in analytics_rollups.get_daily(today - timedelta(days=days), today)
+    ]
 
     return jsonify({
         'period_days': days,
@@ -421,23 +452,13 @@ def daily_revenue_analytics():
     days = request.args.get('days', 30, type=int)
 
     try:
-        from models import Payment
+        from services.analytics_rollups import analytics_rollups
 
-        revenue_data = []
-        for i in range(days, -1, -1):
-            date = datetime.utcnow().date() - timedelta(days=i)
-
-            daily_revenue = db.session.query(
-                db.func.sum(Payment.amount)
-            ).filter(
-                Payment.status == 'completed',
-                db.func.date(Payment.created_at) == date
-            ).scalar() or 0
-
-            revenue_data.append({
-                'date': date.isoformat(),
-                'revenue': float(daily_revenue)
-            })
+        today = datetime.utcnow().date()
+        revenue_data = [
+            {'date': day['date'], 'revenue': day['revenue']}
+            for day in analytics_rollups.get_daily(today - timedelta(days=days), today)
+        ]
 
         return jsonify({
             'period_days': days,
@@ -1,11 +1,12 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from datetime import datetime, timedelta
+from datetime import datetime
 from models import (
     db, User, PointsBalance, PointsTransaction, POINT_VALUES, POINT_LEVELS,
     PointsRedemption, REWARDS_CATALOG, RewardCategory, RedemptionStatus,
     LEVEL_HIERARCHY, can_redeem_reward
 )
+from services.leaderboard_service import leaderboards
 
 points_bp = Blueprint('points', __name__, url_prefix='/api/points')
 
@@ -165,78 +166,11 @@ def get_leaderboard():
     """Get points leaderboard"""
     # Get time period
     period = request.args.get('period', 'all')  # all, month, week
+    if period not in ('month', 'week'):
+        period = 'all'
 
-    query = db.session.query(
-        PointsBalance.user_id,
-        PointsBalance.lifetime_earned,
-        PointsBalance.level,
-        User.username
-    ).join(User, PointsBalance.user_id == User.id)
-
-    if period == 'month':
-        # For monthly, we need to sum transactions from this month
-        start_of_month = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        monthly_query = db.session.query(
-            PointsTransaction.user_id,
-            db.func.sum(PointsTransaction.points).label('points')
-        ).filter(
-            PointsTransaction.created_at >= start_of_month,
-            PointsTransaction.points > 0
-        ).group_by(PointsTransaction.user_id)\
-         .order_by(db.desc('points'))\
-         .limit(20).all()
-
-        leaderboard = []
-        for i, (user_id, points) in enumerate(monthly_query, 1):
-            user = User.query.get(user_id)
-            if user:
-                leaderboard.append({
-                    'rank': i,
-                    'user_id': user_id,
-                    'username': user.username,
-                    'points': int(points) if points else 0
-                })
-        return jsonify({'leaderboard': leaderboard, 'period': 'month'}), 200
-
-    elif period == 'week':
-        start_of_week = datetime.utcnow() - timedelta(days=datetime.utcnow().weekday())
-        start_of_week = start_of_week.replace(hour=0, minute=0, second=0, microsecond=0)
-        weekly_query = db.session.query(
-            PointsTransaction.user_id,
-            db.func.sum(PointsTransaction.points).label('points')
-        ).filter(
-            PointsTransaction.created_at >= start_of_week,
-            PointsTransaction.points > 0
-        ).group_by(PointsTransaction.user_id)\
-         .order_by(db.desc('points'))\
-         .limit(20).all()
-
-        leaderboard = []
-        for i, (user_id, points) in enumerate(weekly_query, 1):
-            user = User.query.get(user_id)
-            if user:
-                leaderboard.append({
-                    'rank': i,
-                    'user_id': user_id,
-                    'username': user.username,
-                    'points': int(points) if points else 0
-                })
-        return jsonify({'leaderboard': leaderboard, 'period': 'week'}), 200
-
-    # All time
-    results = query.order_by(PointsBalance.lifetime_earned.desc()).limit(20).all()
-
-    leaderboard = []
-    for i, (user_id, lifetime_earned, level, username) in enumerate(results, 1):
-        leaderboard.append({
-            'rank': i,
-            'user_id': user_id,
-            'username': username,
-            'points': lifetime_earned,
-            'level': level
-        })
-
-    return jsonify({'leaderboard': leaderboard, 'period': 'all'}), 200
+    leaderboard = leaderboards.get_points_leaderboard(period)
+    return jsonify({'leaderboard': leaderboard, 'period': period}), 200
 
 
 @points_bp.route('/award', methods=['POST'])
@@ -294,6 +228,8 @@ def award_points():
 
     # Get updated balance
     balance = PointsBalance.query.filter_by(user_id=target_user_id).first()
+    if balance:
+        leaderboards.record_points(target_user_id, transaction.points, balance.lifetime_earned)
 
     return jsonify({
         'message': f'Awarded {POINT_VALUES[transaction_type]} points',
@@ -329,6 +265,8 @@ def claim_daily_login():
     )
 
     balance = PointsBalance.query.filter_by(user_id=current_user_id).first()
+    if transaction and balance:
+        leaderboards.record_points(current_user_id, transaction.points, balance.lifetime_earned)
 
     return jsonify({
         'message': f'Claimed {POINT_VALUES["daily_login"]} points for daily login!',
@@ -780,6 +718,8 @@ def admin_cancel_redemption(redemption_id):
         db.session.add(transaction)
 
     db.session.commit()
+    if balance and points_to_refund > 0:
+        leaderboards.record_points(redemption.user_id, points_to_refund, balance.lifetime_earned)
 
     return jsonify({
         'message': f'Redemption cancelled. {points_to_refund} points refunded.',
@@ -13,6 +13,8 @@ from models import (
     db, User, UserChallenge, Trade,
     TradingSettings, QuickOrderHistory
 )
+from services.sltp_engine import sltp_engine
+from services.equity_monitor import equity_monitor
 
 quick_trading_bp = Blueprint('quick_trading', __name__)
 
@@ -251,6 +253,11 @@ def execute_quick_order():
 
         db.session.add(quick_order)
         db.session.commit()
+        sltp_engine.add_trade(trade)
+        equity_monitor.invalidate()
+
+        from services.challenge_engine import invalidate_trade_stats
+        invalidate_trade_stats(challenge.id)
 
         return jsonify({
             'message': 'Order executed successfully',
@@ -334,12 +341,15 @@ def close_all_positions():
             except Exception as e:
                 errors.append(f"Failed to close {trade.symbol}: {str(e)}")
 
-        # Update challenge balance
-        challenge.current_balance = challenge.current_balance + total_profit
-        if challenge.current_balance > challenge.highest_balance:
-            challenge.highest_balance = challenge.current_balance
+        # Update challenge balance, peak equity and trading days
+        from services.challenge_engine import ChallengeEngine
+        ChallengeEngine().apply_closed_trade(challenge, total_profit)
 
         db.session.commit()
+        for trade in open_trades:
+            if trade.status == 'closed':
+                sltp_engine.remove(trade.id)
+        equity_monitor.invalidate()
 
         return jsonify({
             'message': f'Closed {closed_count} positions',
@@ -437,6 +447,12 @@ def reverse_position():
 
         db.session.add(new_trade)
         db.session.commit()
+        sltp_engine.remove(existing_trade.id)
+        sltp_engine.add_trade(new_trade)
+        equity_monitor.invalidate()
+
+        from services.challenge_engine import invalidate_trade_stats
+        invalidate_trade_stats(challenge.id)
 
         return jsonify({
             'message': 'Position reversed successfully',
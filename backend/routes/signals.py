@@ -5,6 +5,8 @@ Technical analysis, sentiment signals, and signal tracking
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 
+from services.signals.streaming import indicator_stream
+
 signals_bp = Blueprint('signals', __name__, url_prefix='/api/signals')
 
 
@@ -22,36 +24,15 @@ def get_services():
     }
 
 
-def get_price_history(symbol, limit=100):
-    """Get historical prices for a symbol"""
-    try:
-        # Try to get from market data service
-        from services.market_data import get_historical_prices
-        prices = get_historical_prices(symbol, period='1mo')
-        if prices:
-            return [p['close'] for p in prices[-limit:]]
-    except Exception:
-        pass
-
-    # Mock data for demo
-    import random
-    base_price = {
-        'AAPL': 178.50, 'TSLA': 248.30, 'GOOGL': 142.80,
-        'NVDA': 485.20, 'MSFT': 378.90, 'AMZN': 178.25,
-        'META': 365.40, 'BTC-USD': 43500.00, 'ETH-USD': 2280.00,
-        'SOL-USD': 98.50, 'IAM': 118.50, 'ATW': 485.00,
-        'BCP': 265.00, 'CIH': 350.00
-    }.get(symbol.upper(), 100.0)
-
-    # Generate mock historical data
-    prices = []
-    current = base_price * 0.85
-    for _ in range(limit):
-        change = random.uniform(-0.02, 0.025)
-        current = current * (1 + change)
-        prices.append(round(current, 4))
-
-    return prices
+def get_price_history(symbol, limit=250):
+    """
+    Daily closes for a symbol, oldest first, from the candle store (the last
+    one is the forming bar). Empty when no real history is available.
+    """
+    from services.yfinance_service import get_historical_columns
+
+    closes = get_historical_columns(symbol.upper(), period='1y', interval='1d')['close']
+    return closes[-limit:].tolist()
 
 
 @signals_bp.route('/technical/<symbol>', methods=['GET'])
@@ -64,16 +45,15 @@ def get_technical_signal(symbol):
         period: Data period ('1w', '1mo', '3mo') - default '1mo'
     """
     services = get_services()
-    prices = get_price_history(symbol.upper())
+    state = indicator_stream.get(symbol, get_price_history)
 
-    if not prices or len(prices) < 26:
+    if state.bars + 1 < 26:
         return jsonify({
             'error': 'Insufficient price data',
             'symbol': symbol.upper()
         }), 400
 
-    current_price = prices[-1]
-    signal = services['technical'].get_signal_for_symbol(symbol.upper(), prices, current_price)
+    signal = services['technical'].get_signal_from_state(symbol.upper(), state)
 
     return jsonify(signal), 200
 
@@ -124,24 +104,25 @@ def get_indicators(symbol):
     Returns RSI, MACD, Bollinger Bands, Moving Averages, Support/Resistance.
     """
     services = get_services()
-    prices = get_price_history(symbol.upper())
+    state = indicator_stream.get(symbol, get_price_history)
 
-    if not prices or len(prices) < 26:
+    if state.bars + 1 < 26:
         return jsonify({
             'error': 'Insufficient price data',
             'symbol': symbol.upper()
         }), 400
 
     tech = services['technical']
+    results = tech.get_indicators_from_state(state)
 
     indicators = {
         'symbol': symbol.upper(),
-        'current_price': prices[-1],
-        'rsi': tech.calculate_rsi(prices),
-        'macd': tech.calculate_macd(prices),
-        'bollinger': tech.calculate_bollinger_bands(prices),
-        'moving_averages': tech.calculate_moving_averages(prices),
-        'support_resistance': tech.calculate_support_resistance(prices)
+        'current_price': state.price,
+        'rsi': results['rsi'],
+        'macd': results['macd'],
+        'bollinger': results['bollinger'],
+        'moving_averages': results['moving_averages'],
+        'support_resistance': results['support_resistance']
     }
 
     return jsonify(indicators), 200
@@ -165,20 +146,17 @@ def get_batch_signals():
         }), 400
 
     services = get_services()
-    results = []
-
-    for symbol in symbols:
-        prices = get_price_history(symbol.upper())
-        if prices and len(prices) >= 26:
-            signal = services['technical'].get_signal_for_symbol(
-                symbol.upper(), prices, prices[-1]
-            )
-            results.append(signal)
-        else:
-            results.append({
-                'symbol': symbol.upper(),
-                'error': 'Insufficient data'
-            })
+    symbols = [symbol.upper() for symbol in symbols]
+    histories = {symbol: get_price_history(symbol) for symbol in symbols}
+
+    # Symbols with enough history are scored together, one matrix per history length
+    ready = [symbol for symbol in symbols if histories[symbol] and len(histories[symbol]) >= 26]
+    analyzed = dict(zip(ready, services['technical'].analyze_many(ready, [histories[s] for s in ready])))
+
+    results = [
+        analyzed.get(symbol) or {'symbol': symbol, 'error': 'Insufficient data'}
+        for symbol in symbols
+    ]
 
     return jsonify({
         'signals': results,
@@ -360,17 +338,15 @@ def update_signal(signal_id):
 def demo_technical_signal(symbol):
     """Demo endpoint for technical signals (no auth)."""
     services = get_services()
-    prices = get_price_history(symbol.upper())
+    state = indicator_stream.get(symbol, get_price_history)
 
-    if not prices or len(prices) < 26:
+    if state.bars + 1 < 26:
         return jsonify({
             'error': 'Insufficient price data',
             'symbol': symbol.upper()
         }), 400
 
-    signal = services['technical'].get_signal_for_symbol(
-        symbol.upper(), prices, prices[-1]
-    )
+    signal = services['technical'].get_signal_from_state(symbol.upper(), state)
     signal['demo'] = True
 
     return jsonify(signal), 200
@@ -380,23 +356,24 @@ def demo_technical_signal(symbol):
 def demo_indicators(symbol):
     """Demo endpoint for indicators (no auth)."""
     services = get_services()
-    prices = get_price_history(symbol.upper())
+    state = indicator_stream.get(symbol, get_price_history)
 
-    if not prices or len(prices) < 26:
+    if state.bars + 1 < 26:
         return jsonify({
             'error': 'Insufficient price data',
             'symbol': symbol.upper()
         }), 400
 
     tech = services['technical']
+    results = tech.get_indicators_from_state(state)
 
     indicators = {
         'symbol': symbol.upper(),
-        'current_price': prices[-1],
-        'rsi': tech.calculate_rsi(prices),
-        'macd': tech.calculate_macd(prices),
-        'bollinger': tech.calculate_bollinger_bands(prices),
-        'moving_averages': tech.calculate_moving_averages(prices),
+        'current_price': state.price,
+        'rsi': results['rsi'],
+        'macd': results['macd'],
+        'bollinger': results['bollinger'],
+        'moving_averages': results['moving_averages'],
         'demo': True
     }
 
@@ -7,6 +7,7 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from functools import wraps
 from models import db, User, UserChallenge, Payment
+from services.analytics_rollups import analytics_rollups, add_months
 from datetime import datetime, timedelta
 from sqlalchemy import func, and_
 import logging
@@ -49,19 +50,14 @@ def get_revenue_analytics():
         else:
             start_date = datetime.utcnow() - timedelta(days=365)
 
-        # Get total revenue
-        total_revenue = db.session.query(func.sum(Payment.amount)).filter(
-            Payment.created_at >= start_date,
-            Payment.status == 'completed'
-        ).scalar() or 0
+        # One range scan over the daily rollups covers this and the previous period
+        today = datetime.utcnow().date()
+        start_day = start_date.date()
+        prev_start = start_day - (today - start_day)
+        days = analytics_rollups.get_daily(prev_start, today)
 
-        # Get previous period revenue for growth calculation
-        prev_start = start_date - (datetime.utcnow() - start_date)
-        prev_revenue = db.session.query(func.sum(Payment.amount)).filter(
-            Payment.created_at >= prev_start,
-            Payment.created_at < start_date,
-            Payment.status == 'completed'
-        ).scalar() or 1
+        total_revenue = sum(d['revenue'] for d in days if d['date'] >= start_day.isoformat())
+        prev_revenue = sum(d['revenue'] for d in days if d['date'] < start_day.isoformat())
 
         growth = ((total_revenue - prev_revenue) / prev_revenue * 100) if prev_revenue > 0 else 0
 
@@ -77,13 +73,9 @@ def get_revenue_analytics():
         weeks = 4 if range_param in ['7d', '30d'] else 12
         by_period = []
         for i in range(weeks):
-            week_start = start_date + timedelta(weeks=i)
-            week_end = week_start + timedelta(weeks=1)
-            week_revenue = db.session.query(func.sum(Payment.amount)).filter(
-                Payment.created_at >= week_start,
-                Payment.created_at < week_end,
-                Payment.status == 'completed'
-            ).scalar() or 0
+            week_start = (start_day + timedelta(weeks=i)).isoformat()
+            week_end = (start_day + timedelta(weeks=i + 1)).isoformat()
+            week_revenue = sum(d['revenue'] for d in days if week_start <= d['date'] < week_end)
             by_period.append({
                 'period': f'Week {i + 1}',
                 'amount': float(week_revenue)
@@ -141,32 +133,31 @@ def get_cohort_analysis():
                 'behaviorPatterns': behavior_patterns
             })
 
-        # Get cohort data
-        cohorts = []
+        # Cohort sizes and monthly activity come from the rollups in two range scans
         months = 6
+        current_month = datetime.utcnow().date().replace(day=1)
+        first_month = add_months(current_month, -(months - 1))
+        cohort_data = analytics_rollups.get_cohorts(first_month, current_month)
 
+        cohorts = []
         for i in range(months):
-            month_start = datetime.utcnow().replace(day=1) - timedelta(days=30 * i)
-            month_name = month_start.strftime('%b %Y')
-
-            # Count users in cohort
-            cohort_users = User.query.filter(
-                User.created_at >= month_start,
-                User.created_at < month_start + timedelta(days=30)
-            ).count() or random.randint(400, 550)
+            month = add_months(current_month, -i)
+            cohort = cohort_data[month]
+            cohort_users = cohort['users']
 
-            # Calculate retention for each month
+            # monthN: share of the cohort trading N months after signing up
             retention = []
-            for m in range(6):
-                if m > (months - 1 - i):
+            for m in range(1, 7):
+                activity_month = add_months(month, m)
+                if activity_month > current_month:
                     retention.append(None)
+                elif cohort_users:
+                    retention.append(round(cohort['active'].get(activity_month, 0) / cohort_users * 100, 1))
                 else:
-                    # Simulated retention decay
-                    base = 80 - (m * 10) + random.randint(-5, 5)
-                    retention.append(max(25, min(90, base)))
+                    retention.append(0)
 
             cohorts.append({
-                'period': month_name,
+                'period': month.strftime('%b %Y'),
                 'users': cohort_users,
                 'month1': retention[0],
                 'month2': retention[1],
@@ -178,13 +169,15 @@ def get_cohort_analysis():
             })
 
         # Calculate averages
-        avg_retention = sum([c['month1'] for c in cohorts if c['month1']]) / len([c for c in cohorts if c['month1']])
+        measured = [c for c in cohorts if c['month1'] is not None]
+        avg_retention = sum(c['month1'] for c in measured) / len(measured) if measured else 0
+        best_cohort = max(measured, key=lambda c: c['month1']) if measured else cohorts[0]
 
         return jsonify({
             'summary': {
                 'totalCohorts': len(cohorts),
                 'avgRetention': round(avg_retention, 1),
-                'bestCohort': cohorts[0]['period'],
+                'bestCohort': best_cohort['period'],
                 'avgLTV': 850
             },
             'cohorts': cohorts
@@ -6,8 +6,11 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 from decimal import Decimal
 from . import trades_bp
 from models import db, Trade, UserChallenge, User
-from services.challenge_engine import ChallengeEngine
-from services.yfinance_service import get_current_price, get_live_price_data
+from services.challenge_engine import ChallengeEngine, invalidate_trade_stats
+from services.yfinance_service import get_current_price, get_usable_record
+from services.market.price_store import price_store
+from services.sltp_engine import sltp_engine
+from services.equity_monitor import equity_monitor
 from middleware.rate_limiter import limiter
 from services.audit_service import AuditService
 
@@ -107,22 +110,55 @@ def _fetch_crypto_price_direct(symbol: str) -> float | None:
     return None
 
 
-def _get_price_with_fallbacks(symbol: str) -> float | None:
-    """Get price using all available fallbacks (convenience function)"""
-    # Try live price data first (background updater)
-    live_data = get_live_price_data(symbol)
-    if live_data:
-        price = live_data.get('price')
-        if price:
-            return price
+# Reference prices used only when every live source is unavailable
+STATIC_REFERENCE_PRICES = {
+    'BTC-USD': 95000.0, 'BTCUSD': 95000.0,
+    'ETH-USD': 3400.0, 'ETHUSD': 3400.0,
+    'SOL-USD': 190.0, 'SOLUSD': 190.0,
+    'XRP-USD': 2.30, 'XRPUSD': 2.30,
+    'ADA-USD': 1.0, 'ADAUSD': 1.0,
+    'DOGE-USD': 0.35, 'DOGEUSD': 0.35,
+    'AAPL': 230.0, 'TSLA': 400.0, 'GOOGL': 190.0, 'MSFT': 420.0, 'NVDA': 140.0,
+}
+
+
+def _resolve_price(symbol: str, allow_static: bool = False) -> tuple:
+    """
+    Resolve a tradable price for a symbol.
+
+    The shared price store is an O(1) in-memory lookup and answers almost
+    every call; upstream fetches only run when it has no fresh live tick and
+    no record younger than CACHE_DURATION. Stored prices past those ages are
+    never traded on.
 
-    # Fallback to yfinance
-    price = get_current_price(symbol)
+    Returns:
+        (price, source) or (None, None)
+    """
+    record = get_usable_record(symbol)
+    if record and record.last:
+        return record.last, record.source
+
+    price = get_current_price(symbol, allow_fallback=False)
+    if price:
+        return price, 'yfinance'
+
+    price = _fetch_crypto_price_direct(symbol)
     if price:
-        return price
+        price_store.update(symbol, price, source='direct_api')
+        return price, 'direct_api'
+
+    if allow_static:
+        price = STATIC_REFERENCE_PRICES.get(symbol.upper())
+        if price:
+            logger.warning(f"Using static reference price for {symbol}: {price} (APIs unavailable)")
+            return price, 'static_fallback'
 
-    # Last resort: Direct Binance/CoinGecko
-    return _fetch_crypto_price_direct(symbol)
+    return None, None
+
+
+def _get_price_with_fallbacks(symbol: str) -> float | None:
+    """Get price using all available fallbacks (convenience function)"""
+    return _resolve_price(symbol)[0]
 
 
 @trades_bp.route('', methods=['GET'])
@@ -179,94 +215,16 @@ def open_trade():
     if not challenge:
         return jsonify({'error': 'No active challenge. Please purchase a plan first.'}), 404
 
-    # Get current price - try multiple sources
     symbol = data['symbol']
-    logger.info(f"=== PRICE FETCH START for {symbol} ===")
-
-    current_price = None
-    price_source = None
-    debug_info = {'symbol': symbol, 'attempts': []}
+    current_price, price_source = _resolve_price(symbol, allow_static=True)
 
-    # Try live price data first (Binance/background updater - fastest)
-    logger.info(f"[1/4] Trying live price data for {symbol}...")
-    try:
-        live_data = get_live_price_data(symbol)
-        if live_data:
-            current_price = live_data.get('price')
-            if current_price:
-                price_source = "live_updater"
-                debug_info['attempts'].append({'source': 'live_updater', 'success': True, 'price': current_price})
-                logger.info(f"[1/4] SUCCESS - Live price for {symbol}: {current_price}")
-            else:
-                debug_info['attempts'].append({'source': 'live_updater', 'success': False, 'reason': 'no price in data'})
-                logger.warning(f"[1/4] Live data exists but no price for {symbol}")
-        else:
-            debug_info['attempts'].append({'source': 'live_updater', 'success': False, 'reason': 'no live data'})
-            logger.warning(f"[1/4] FAILED - No live data for {symbol}")
-    except Exception as e:
-        debug_info['attempts'].append({'source': 'live_updater', 'success': False, 'reason': str(e)})
-        logger.error(f"[1/4] ERROR - Live data exception: {e}")
-
-    # Fallback to yfinance if no live price
     if current_price is None:
-        logger.info(f"[2/4] Trying yfinance/get_current_price for {symbol}...")
-        try:
-            current_price = get_current_price(symbol)
-            if current_price:
-                price_source = "yfinance"
-                debug_info['attempts'].append({'source': 'yfinance', 'success': True, 'price': current_price})
-                logger.info(f"[2/4] SUCCESS - YFinance price for {symbol}: {current_price}")
-            else:
-                debug_info['attempts'].append({'source': 'yfinance', 'success': False, 'reason': 'returned None'})
-                logger.warning(f"[2/4] FAILED - YFinance returned None for {symbol}")
-        except Exception as e:
-            debug_info['attempts'].append({'source': 'yfinance', 'success': False, 'reason': str(e)})
-            logger.error(f"[2/4] ERROR - YFinance exception: {e}")
-
-    # Fallback: Direct Binance/CoinGecko fetch for crypto
-    if current_price is None:
-        logger.info(f"[3/4] Trying direct API (Binance/CoinGecko) for {symbol}...")
-        try:
-            current_price = _fetch_crypto_price_direct(symbol)
-            if current_price:
-                price_source = "direct_api"
-                debug_info['attempts'].append({'source': 'direct_api', 'success': True, 'price': current_price})
-                logger.info(f"[3/4] SUCCESS - Direct API price for {symbol}: {current_price}")
-            else:
-                debug_info['attempts'].append({'source': 'direct_api', 'success': False, 'reason': 'returned None'})
-                logger.error(f"[3/4] FAILED - Direct API returned None for {symbol}")
-        except Exception as e:
-            debug_info['attempts'].append({'source': 'direct_api', 'success': False, 'reason': str(e)})
-            logger.error(f"[3/4] ERROR - Direct API exception: {e}")
-
-    # LAST RESORT: Use static reference prices for major crypto (for testing)
-    if current_price is None:
-        logger.info(f"[4/4] Using static reference price as last resort for {symbol}...")
-        static_prices = {
-            'BTC-USD': 95000.0, 'BTCUSD': 95000.0,
-            'ETH-USD': 3400.0, 'ETHUSD': 3400.0,
-            'SOL-USD': 190.0, 'SOLUSD': 190.0,
-            'XRP-USD': 2.30, 'XRPUSD': 2.30,
-            'ADA-USD': 1.0, 'ADAUSD': 1.0,
-            'DOGE-USD': 0.35, 'DOGEUSD': 0.35,
-            'AAPL': 230.0, 'TSLA': 400.0, 'GOOGL': 190.0, 'MSFT': 420.0, 'NVDA': 140.0,
-        }
-        current_price = static_prices.get(symbol.upper())
-        if current_price:
-            price_source = "static_fallback"
-            debug_info['attempts'].append({'source': 'static_fallback', 'success': True, 'price': current_price})
-            logger.warning(f"[4/4] Using STATIC price for {symbol}: {current_price} (APIs unavailable)")
-        else:
-            debug_info['attempts'].append({'source': 'static_fallback', 'success': False, 'reason': 'symbol not in static list'})
-
-    if current_price is None:
-        logger.error(f"=== PRICE FETCH FAILED for {symbol} - ALL 4 SOURCES FAILED ===")
+        logger.error(f"Price unavailable for {symbol} - trade not opened")
         return jsonify({
-            'error': f'Could not get price for {symbol}. The market may be closed or the symbol is invalid.',
-            'debug': debug_info
+            'error': f'Could not get price for {symbol}. The market may be closed or the symbol is invalid.'
         }), 400
 
-    logger.info(f"=== PRICE FETCH SUCCESS for {symbol}: ${current_price} (source: {price_source}) ===")
+    logger.debug(f"Opening {symbol} at {current_price} (source: {price_source})")
 
     quantity = Decimal(str(data['quantity']))
     trade_value = quantity * Decimal(str(current_price))
@@ -293,6 +251,9 @@ def open_trade():
 
     db.session.add(trade)
     db.session.commit()
+    sltp_engine.add_trade(trade)
+    invalidate_trade_stats(challenge.id)
+    equity_monitor.invalidate()
 
     # Log trade open
     try:
@@ -334,22 +295,8 @@ def close_trade(trade_id):
     if trade.status != 'open':
         return jsonify({'error': 'Trade is already closed'}), 400
 
-    # Get current price - try multiple sources (same as open_trade)
     symbol = trade.symbol
-    current_price = None
-
-    # Try live price data first
-    live_data = get_live_price_data(symbol)
-    if live_data:
-        current_price = live_data.get('price')
-
-    # Fallback to yfinance
-    if current_price is None:
-        current_price = get_current_price(symbol)
-
-    # Last resort: Direct Binance/CoinGecko
-    if current_price is None:
-        current_price = _fetch_crypto_price_direct(symbol)
+    current_price, _ = _resolve_price(symbol)
 
     if current_price is None:
         logger.error(f"Failed to get price for {symbol} to close trade")
@@ -358,14 +305,13 @@ def close_trade(trade_id):
     # Close trade and calculate PnL
     pnl = trade.close_trade(current_price)
 
-    # Update challenge balance (preserve decimal precision)
-    challenge.current_balance = challenge.current_balance + Decimal(str(pnl))
-
-    # Update highest balance if applicable
-    if challenge.current_balance > challenge.highest_balance:
-        challenge.highest_balance = challenge.current_balance
+    # Update challenge balance, peak equity and trading days
+    engine = ChallengeEngine()
+    engine.apply_closed_trade(challenge, pnl)
 
     db.session.commit()
+    sltp_engine.remove(trade.id)
+    equity_monitor.invalidate()
 
     # Log trade close
     try:
@@ -381,7 +327,6 @@ def close_trade(trade_id):
         logger.warning(f"Failed to log trade close audit: {e}")
 
     # Evaluate challenge rules
-    engine = ChallengeEngine()
     evaluation_result = engine.evaluate_challenge(challenge)
 
     return jsonify({
@@ -0,0 +1,115 @@
+"""
+Load-test the SocketIO price feed across nodes
+
+Connects CLIENTS socket clients to each node URL, adding one node per stage,
+and reports connections per node and price frame latency (server flush time
+to client receipt) as nodes are added. With an admin token the producer ->
+node tick latency from /api/monitoring/cluster is reported too. Run the
+nodes on one host (or with synced clocks) for meaningful latencies.
+
+Usage:
+    python scripts/socket_load_test.py http://localhost:5000 http://localhost:5001 \
+        --clients 200 --duration 30 --symbols BTC-USD,ETH-USD,AAPL --token <admin jwt>
+"""
+import argparse
+import threading
+import time
+
+import numpy as np
+import requests
+import socketio
+
+
+class FeedClient:
+    """One socket connection recording the latency of every price frame"""
+
+    def __init__(self, url, symbols, encoding):
+        self.url = url
+        self.latencies = []
+        self.frames = 0
+        self.client = socketio.Client(reconnection=False)
+        self.client.on('connect', lambda: self.client.emit(
+            'subscribe_prices', {'symbols': symbols, 'encoding': encoding}))
+        self.client.on('prices_batch', lambda data: self._record(data.get('timestamp')))
+        self.client.on('prices_delta', lambda data: self._record(data.get('t')))
+
+    def _record(self, sent):
+        self.frames += 1
+        if sent:
+            self.latencies.append(time.time() - sent)
+
+    def connect(self):
+        try:
+            self.client.connect(self.url, wait_timeout=10)
+            return True
+        except Exception as e:
+            print(f"  connect to {self.url} failed: {e}")
+            return False
+
+    def close(self):
+        try:
+            self.client.disconnect()
+        except Exception:
+            pass
+
+
+def cluster_nodes(url, token):
+    """Server-side view of every node (connections, producer -> node latency)"""
+    if not token:
+        return []
+    try:
+        response = requests.get(f"{url}/api/monitoring/cluster",
+                                headers={'Authorization': f'Bearer {token}'}, timeout=5)
+        return response.json().get('nodes', [])
+    except Exception as e:
+        print(f"  cluster stats unavailable: {e}")
+        return []
+
+
+def run_stage(urls, clients_per_node, duration, symbols, encoding, token):
+    clients = []
+    for url in urls:
+        for _ in range(clients_per_node):
+            client = FeedClient(url, symbols, encoding)
+            if client.connect():
+                clients.append(client)
+
+    time.sleep(duration)
+
+    print(f"\n=== {len(urls)} node(s), {len(clients)} connections, {duration}s ===")
+    print(f"{'node':<32} {'conns':>6} {'frames':>8} {'p50 ms':>8} {'p99 ms':>8}")
+    for url in urls:
+        mine = [client for client in clients if client.url == url]
+        latencies = np.array([value for client in mine for value in client.latencies]) * 1000
+        p50, p99 = (np.percentile(latencies, [50, 99]) if len(latencies) else (0.0, 0.0))
+        print(f"{url:<32} {len(mine):>6} {sum(c.frames for c in mine):>8} {p50:>8.1f} {p99:>8.1f}")
+
+    for node in cluster_nodes(urls[0], token):
+        role = 'producer' if node['leader'] else 'follower'
+        print(f"  {node['node']:<40} {role:<9} conns={node['connections']:<6} "
+              f"tick p50={node['latency_p50_ms']}ms p99={node['latency_p99_ms']}ms")
+
+    threads = [threading.Thread(target=client.close) for client in clients]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SocketIO price feed load test')
+    parser.add_argument('nodes', nargs='+', help='Node base URLs, added one per stage')
+    parser.add_argument('--clients', type=int, default=100, help='Connections per node')
+    parser.add_argument('--duration', type=int, default=20, help='Seconds per stage')
+    parser.add_argument('--symbols', default='BTC-USD,ETH-USD,AAPL,EURUSD=X')
+    parser.add_argument('--encoding', default='compact', choices=['json', 'compact'])
+    parser.add_argument('--token', help='Admin JWT for /api/monitoring/cluster')
+    args = parser.parse_args()
+
+    symbols = [symbol.strip() for symbol in args.symbols.split(',') if symbol.strip()]
+    for stage in range(1, len(args.nodes) + 1):
+        run_stage(args.nodes[:stage], args.clients, args.duration, symbols, args.encoding, args.token)
+
+
+if __name__ == '__main__':
+    main()
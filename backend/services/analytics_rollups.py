@@ -0,0 +1,211 @@
+"""
+Analytics Rollups - Daily facts and cohort activity for admin charts
+Each refresh recomputes a range of days with GROUP BYs over the source
+tables (users, payments, challenges, trades), using range predicates that
+can use their date indexes, and replaces those days' DailyRollup rows.
+Revenue counts on the day a payment completed. Cohort activity (distinct
+traders per signup month and trading month) is one grouped query. The
+scheduler keeps the rollups current; charts only read contiguous ranges of
+rollup rows.
+"""
+
+import logging
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List, Optional, Tuple, Any
+
+from sqlalchemy import distinct, func
+
+from models import db, User, UserChallenge, Trade, Payment, DailyRollup, CohortRollup
+
+logger = logging.getLogger(__name__)
+
+# Days recomputed by each incremental update; every fact is dated by the
+# event itself (signup, payment completion, challenge end, trade open/close),
+# so later writes only ever land on recent days
+LOOKBACK_DAYS = 3
+
+# Days refreshed per transaction while backfilling
+BACKFILL_CHUNK_DAYS = 92
+
+DAILY_FIELDS = ('signups', 'payments', 'revenue', 'challenges_started', 'challenges_passed',
+                'challenges_failed', 'trades_opened', 'trades_closed')
+
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _as_date(value) -> date:
+    """Grouping keys come back as dates, datetimes or ISO strings depending on the database"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def _month(column):
+    """First day of column's month, as a grouping expression"""
+    if db.engine.dialect.name == 'postgresql':
+        return func.date_trunc('month', column)
+    return func.strftime('%Y-%m-01', column)
+
+
+class AnalyticsRollups:
+    """
+    Maintains and reads the admin analytics rollups (requires an app context).
+
+    Usage:
+        analytics_rollups.refresh()                     # scheduler, every 15 minutes
+        analytics_rollups.backfill()                    # to rebuild
+        analytics_rollups.get_daily(start_day, end_day)
+    """
+
+    # ==================== REFRESH ====================
+
+    def _grouped_by_day(self, column, start: datetime, end: datetime, *filters,
+                        values: Tuple = (func.count(),)) -> List[Tuple]:
+        day = func.date(column)
+        return db.session.query(day, *values).filter(
+            column >= start, column < end, *filters
+        ).group_by(day).all()
+
+    def refresh_days(self, start_day: date, end_day: date) -> int:
+        """Recompute the rollup rows of start_day..end_day (inclusive)"""
+        start = datetime.combine(start_day, time.min)
+        end = datetime.combine(end_day + timedelta(days=1), time.min)
+        facts: Dict[date, Dict[str, Any]] = defaultdict(lambda: dict.fromkeys(DAILY_FIELDS, 0))
+
+        for day, count in self._grouped_by_day(User.created_at, start, end):
+            facts[_as_date(day)]['signups'] = count
+        # Payments completed without a completed_at completed when created
+        for column, filters in ((Payment.completed_at, ()), (Payment.created_at, (Payment.completed_at.is_(None),))):
+            for day, count, amount in self._grouped_by_day(
+                    column, start, end, Payment.status == 'completed', *filters,
+                    values=(func.count(), func.sum(Payment.amount))):
+                fact = facts[_as_date(day)]
+                fact['payments'] += count
+                fact['revenue'] += amount or 0
+        for day, count in self._grouped_by_day(UserChallenge.start_date, start, end):
+            facts[_as_date(day)]['challenges_started'] = count
+        for day, count in self._grouped_by_day(UserChallenge.end_date, start, end, UserChallenge.status == 'passed'):
+            facts[_as_date(day)]['challenges_passed'] = count
+        for day, count in self._grouped_by_day(UserChallenge.end_date, start, end, UserChallenge.status == 'failed'):
+            facts[_as_date(day)]['challenges_failed'] = count
+        for day, count in self._grouped_by_day(Trade.opened_at, start, end):
+            facts[_as_date(day)]['trades_opened'] = count
+        for day, count in self._grouped_by_day(Trade.closed_at, start, end, Trade.status == 'closed'):
+            facts[_as_date(day)]['trades_closed'] = count
+
+        now = datetime.utcnow()
+        days = (end_day - start_day).days + 1
+        rows = [
+            {'day': day, **facts[day], 'updated_at': now}
+            for day in (start_day + timedelta(days=i) for i in range(days))
+        ]
+        DailyRollup.query.filter(DailyRollup.day >= start_day, DailyRollup.day <= end_day).delete(
+            synchronize_session=False)
+        db.session.execute(DailyRollup.__table__.insert(), rows)
+        db.session.commit()
+        return len(rows)
+
+    def refresh_cohorts(self, since_month: date) -> int:
+        """Recompute cohort activity for trading months from since_month on"""
+        since = datetime.combine(since_month, time.min)
+        cohort, activity = _month(User.created_at), _month(Trade.opened_at)
+        grouped = db.session.query(
+            cohort, activity, func.count(distinct(User.id))
+        ).join(
+            UserChallenge, UserChallenge.user_id == User.id
+        ).join(
+            Trade, Trade.challenge_id == UserChallenge.id
+        ).filter(
+            Trade.opened_at >= since
+        ).group_by(cohort, activity).all()
+
+        now = datetime.utcnow()
+        rows = [
+            {'cohort_month': _as_date(c), 'activity_month': _as_date(a), 'active_users': n, 'updated_at': now}
+            for c, a, n in grouped if c is not None
+        ]
+        CohortRollup.query.filter(CohortRollup.activity_month >= since_month).delete(synchronize_session=False)
+        if rows:
+            db.session.execute(CohortRollup.__table__.insert(), rows)
+        db.session.commit()
+        return len(rows)
+
+    def update(self, today: Optional[date] = None) -> Dict[str, int]:
+        """Incremental pass: the last LOOKBACK_DAYS days and this and last month's activity"""
+        today = today or datetime.utcnow().date()
+        return {
+            'days': self.refresh_days(today - timedelta(days=LOOKBACK_DAYS - 1), today),
+            'cohort_rows': self.refresh_cohorts(add_months(month_start(today), -1)),
+        }
+
+    def backfill(self, start_day: Optional[date] = None, today: Optional[date] = None) -> Dict[str, int]:
+        """Rebuild every rollup from start_day (default: the first signup) to today"""
+        today = today or datetime.utcnow().date()
+        if start_day is None:
+            first = db.session.query(func.min(User.created_at)).scalar()
+            start_day = _as_date(first) if first else today
+
+        days = 0
+        chunk_start = start_day
+        while chunk_start <= today:
+            chunk_end = min(chunk_start + timedelta(days=BACKFILL_CHUNK_DAYS - 1), today)
+            days += self.refresh_days(chunk_start, chunk_end)
+            chunk_start = chunk_end + timedelta(days=1)
+
+        cohort_rows = self.refresh_cohorts(month_start(start_day))
+        logger.info(f"Analytics Rollups: Backfilled {days} day(s), {cohort_rows} cohort row(s) from {start_day}")
+        return {'days': days, 'cohort_rows': cohort_rows}
+
+    def refresh(self) -> Dict[str, int]:
+        """Backfill an empty rollup table, otherwise run an incremental update"""
+        if db.session.query(DailyRollup.day).first() is None:
+            return self.backfill()
+        return self.update()
+
+    # ==================== READS ====================
+
+    def get_daily(self, start_day: date, end_day: date) -> List[Dict[str, Any]]:
+        """One dict per day of start_day..end_day (days without a row are zeros)"""
+        stored = {
+            row.day: row for row in DailyRollup.query.filter(
+                DailyRollup.day >= start_day, DailyRollup.day <= end_day
+            ).order_by(DailyRollup.day).all()
+        }
+        result = []
+        for i in range((end_day - start_day).days + 1):
+            day = start_day + timedelta(days=i)
+            row = stored.get(day)
+            result.append(row.to_dict() if row else {'date': day.isoformat(), **dict.fromkeys(DAILY_FIELDS, 0),
+                                                      'revenue': 0.0})
+        return result
+
+    def get_cohorts(self, first_month: date, last_month: date) -> Dict[date, Dict[str, Any]]:
+        """
+        Signup cohorts of first_month..last_month:
+        {cohort month: {'users': signups, 'active': {activity month: traders}}}
+        """
+        end_day = add_months(last_month, 1) - timedelta(days=1)
+        cohorts = {add_months(first_month, i): {'users': 0, 'active': {}}
+                   for i in range((last_month.year - first_month.year) * 12 + last_month.month - first_month.month + 1)}
+
+        for day, signups in db.session.query(DailyRollup.day, DailyRollup.signups).filter(
+                DailyRollup.day >= first_month, DailyRollup.day <= end_day):
+            cohorts[month_start(day)]['users'] += signups
+        for row in CohortRollup.query.filter(
+                CohortRollup.cohort_month >= first_month, CohortRollup.cohort_month <= last_month):
+            cohorts[row.cohort_month]['active'][row.activity_month] = row.active_users
+        return cohorts
+
+
+# Global analytics rollups instance
+analytics_rollups = AnalyticsRollups()
@@ -0,0 +1,228 @@
+"""
+Audit Writer - Write-behind sink for audit log entries
+AuditLog.log() enqueues a row instead of committing the request's session;
+a background writer inserts queued rows in batches (multi-row INSERTs, on
+its own connection) every FLUSH_INTERVAL or MAX_BATCH rows. Rows that can't
+be written are appended to an on-disk spill file and replayed once the
+database is back. Security-critical actions are still written synchronously.
+"""
+
+import os
+import json
+import time
+import queue
+import atexit
+import threading
+import logging
+from datetime import datetime
+from typing import Dict, List, Any
+
+logger = logging.getLogger(__name__)
+
+# Seconds a queued row may wait for its batch
+FLUSH_INTERVAL = 0.5
+
+# Rows per INSERT batch
+MAX_BATCH = 500
+
+# Actions written before the request returns
+SYNC_ACTIONS = frozenset({
+    'password_reset', '2fa_disable', 'session_revoke', 'suspicious_login',
+    'admin_promote', 'admin_demote', 'user_ban', 'payout_approve', 'payout_process',
+})
+
+SPILL_FILE = os.getenv(
+    'AUDIT_SPILL_FILE',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'instance', 'audit_spill.ndjson')
+)
+
+
+def _encode(row: Dict[str, Any]) -> str:
+    return json.dumps({**row, 'created_at': row['created_at'].isoformat()})
+
+
+def _decode(line: str) -> Dict[str, Any]:
+    row = json.loads(line)
+    row['created_at'] = datetime.fromisoformat(row['created_at'])
+    return row
+
+
+class AuditWriter:
+    """
+    Buffers audit rows and writes them in batches.
+
+    Usage:
+        audit_writer.start(app)
+        audit_writer.submit(row)            # queued
+        audit_writer.submit(row, sync=True) # written now
+    """
+
+    def __init__(self, spill_file: str = SPILL_FILE):
+        self.spill_file = spill_file
+        self._app = None
+        self._pending: 'queue.Queue[Dict[str, Any]]' = queue.Queue()
+        self._running = False
+        self._spill_lock = threading.Lock()
+        self._stats = {'queued': 0, 'written': 0, 'batches': 0, 'sync_writes': 0,
+                       'spilled': 0, 'replayed': 0, 'failed_batches': 0}
+
+    # ==================== WRITES ====================
+
+    def _insert(self, rows: List[Dict[str, Any]]) -> None:
+        """Insert rows in one transaction on a connection of their own"""
+        from models import db, AuditLog
+
+        with db.engine.begin() as conn:
+            for start in range(0, len(rows), MAX_BATCH):
+                conn.execute(AuditLog.__table__.insert(), rows[start:start + MAX_BATCH])
+
+    def _spill(self, rows: List[Dict[str, Any]]) -> None:
+        """Append rows to the spill file, durably"""
+        with self._spill_lock:
+            os.makedirs(os.path.dirname(self.spill_file) or '.', exist_ok=True)
+            with open(self.spill_file, 'a') as f:
+                f.write(''.join(_encode(row) + '\n' for row in rows))
+                f.flush()
+                os.fsync(f.fileno())
+        self._stats['spilled'] += len(rows)
+
+    def write(self, rows: List[Dict[str, Any]]) -> bool:
+        """Insert rows now, spilling them to disk if the database refuses (requires an app context)"""
+        try:
+            self._insert(rows)
+        except Exception as e:
+            logger.error(f"Audit Writer: Insert of {len(rows)} row(s) failed, spilling to disk: {e}")
+            self._stats['failed_batches'] += 1
+            try:
+                self._spill(rows)
+            except OSError as spill_error:
+                logger.critical(f"Audit Writer: Lost {len(rows)} audit row(s): {spill_error}")
+            return False
+        self._stats['written'] += len(rows)
+        self._stats['batches'] += 1
+        return True
+
+    def has_spill(self) -> bool:
+        return os.path.exists(self.spill_file) or os.path.exists(self.spill_file + '.replaying')
+
+    def replay_spill(self) -> int:
+        """Insert rows spilled while the database was unavailable (requires an app context)"""
+        replaying = self.spill_file + '.replaying'
+        with self._spill_lock:
+            # A replay that failed earlier is retried before newer spills
+            if not os.path.exists(replaying):
+                if not os.path.exists(self.spill_file):
+                    return 0
+                os.replace(self.spill_file, replaying)
+
+        with open(replaying) as f:
+            rows = [_decode(line) for line in f if line.strip()]
+        try:
+            if rows:
+                self._insert(rows)
+        except Exception as e:
+            logger.warning(f"Audit Writer: Spill replay failed, will retry: {e}")
+            return 0
+        os.remove(replaying)
+        self._stats['replayed'] += len(rows)
+        logger.info(f"Audit Writer: Replayed {len(rows)} spilled audit row(s)")
+        return len(rows)
+
+    def submit(self, row: Dict[str, Any], sync: bool = False) -> None:
+        """Queue an audit row; sync rows (or any row while the writer is stopped) are written now"""
+        if sync or row.get('action') in SYNC_ACTIONS or not self._running:
+            self._stats['sync_writes'] += 1
+            self.write([row])
+            return
+        self._pending.put(row)
+        self._stats['queued'] += 1
+
+    # ==================== BACKGROUND FLUSH ====================
+
+    def _collect(self, first: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Gather rows until the batch is full or the first row has waited FLUSH_INTERVAL"""
+        batch = [first]
+        deadline = time.time() + FLUSH_INTERVAL
+        while len(batch) < MAX_BATCH:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._pending.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def flush(self) -> int:
+        """Write everything queued so far (requires an app context)"""
+        rows = []
+        while True:
+            try:
+                rows.append(self._pending.get_nowait())
+            except queue.Empty:
+                break
+        if rows:
+            self.write(rows)
+        return len(rows)
+
+    def _writer_loop(self) -> None:
+        while self._running:
+            try:
+                first = self._pending.get(timeout=1)
+            except queue.Empty:
+                continue
+
+            batch = self._collect(first)
+            try:
+                with self._app.app_context():
+                    if self.write(batch) and self.has_spill():
+                        self.replay_spill()
+            except Exception as e:
+                logger.error(f"Audit Writer: Writer error: {e}")
+
+    # ==================== LIFECYCLE ====================
+
+    def start(self, app) -> None:
+        """Replay any spill file and start the background writer"""
+        if self._running:
+            return
+        self._app = app
+
+        with app.app_context():
+            try:
+                self.replay_spill()
+            except Exception as e:
+                logger.warning(f"Audit Writer: Initial spill replay failed: {e}")
+
+        self._running = True
+        atexit.register(self.stop)
+
+        # Use eventlet.spawn_n for green thread compatibility
+        try:
+            import eventlet
+            eventlet.spawn_n(self._writer_loop)
+        except ImportError:
+            threading.Thread(target=self._writer_loop, daemon=True).start()
+
+    def stop(self) -> None:
+        """Stop queueing and write out what is left"""
+        if not self._running:
+            return
+        self._running = False
+        try:
+            with self._app.app_context():
+                self.flush()
+        except Exception as e:
+            logger.error(f"Audit Writer: Final flush failed: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'running': self._running,
+            'pending': self._pending.qsize(),
+            'spill_pending': self.has_spill(),
+            **self._stats
+        }
+
+
+# Global audit writer instance
+audit_writer = AuditWriter()
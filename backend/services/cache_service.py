@@ -4,14 +4,24 @@ Provides multi-layer caching:
   - Layer 1: In-memory LRU cache (fastest, per-worker)
   - Layer 2: Redis cache (shared across workers)
   - Layer 3: SimpleCache fallback for development
+
+Writes and deletes broadcast the touched keys on an invalidation channel
+(Redis pub/sub, or in-process when Redis is absent) so every worker drops
+its L1 copy, which keeps L1 coherent across workers.
 """
+import re
 import json
+import math
+import uuid
+import random
+import fnmatch
+import hashlib
 import logging
 import threading
 import time
 from collections import OrderedDict
 from functools import wraps
-from typing import Any, Optional, Callable, Dict, Tuple
+from typing import Any, Optional, Callable, Dict, Iterable, List, Tuple
 from flask import Flask
 from flask_caching import Cache
 
@@ -90,6 +100,19 @@ class LRUCache:
                 return True
             return False
 
+    def delete_many(self, keys: Iterable[str]) -> int:
+        """Delete several keys, returning how many were present"""
+        with self._lock:
+            return sum(1 for key in keys if self._cache.pop(key, None) is not None)
+
+    def delete_matching(self, pattern: str) -> int:
+        """Delete keys matching a glob pattern (e.g. 'user:42:*')"""
+        with self._lock:
+            keys = [key for key in self._cache if fnmatch.fnmatchcase(key, pattern)]
+            for key in keys:
+                del self._cache[key]
+            return len(keys)
+
     def clear(self) -> None:
         """Clear all cache entries"""
         with self._lock:
@@ -125,6 +148,145 @@ class LRUCache:
 # Global L1 cache instance (per-worker in-memory cache)
 l1_cache = LRUCache(max_size=2000, default_ttl=30)
 
+# Upper bound for L1 entry lifetimes; safe to be long because writes and
+# deletes invalidate every worker's copy
+L1_MAX_TTL = 300
+
+# Redis pub/sub channel carrying L1 invalidations between workers
+INVALIDATION_CHANNEL = 'tradesense_cache_invalidate'
+
+# Keys removed per pipelined UNLINK / SCAN step
+INVALIDATION_BATCH = 500
+
+# Minimum lifetime of a tag set in seconds (refreshed on every registration)
+TAG_TTL = 3600
+
+# Members a tag set may hold; past this, members whose entries expired are
+# dropped and, if that is not enough, live entries are evicted down to half
+TAG_MAX_MEMBERS = 10000
+
+# Key layouts that register an entry under a tag: user:<id>:..., challenge:<id>:..., market:<symbol>
+_TAGGED_KEY = re.compile(r'^(user|challenge):(\d+)(?::|$)|^(market):([^:]+)$')
+
+# Tag registry used when the L2 cache is not Redis: tag -> keys
+_local_tags: Dict[str, set] = {}
+_local_tags_lock = threading.Lock()
+
+
+class CacheInvalidationBus:
+    """
+    Broadcasts L1 invalidations to every worker.
+
+    Messages carry exact keys, glob patterns and namespace versions. With a
+    Redis client attached they are published on INVALIDATION_CHANNEL and a
+    subscriber applies messages from other workers; without one the bus is
+    a local stand-in that only applies them to this worker's L1.
+    """
+
+    def __init__(self, l1: LRUCache):
+        self._l1 = l1
+        self._redis = None
+        self._running = False
+        self.worker_id = uuid.uuid4().hex[:12]
+        self.versions: Dict[str, int] = {}
+        self._stats = {'published': 0, 'received': 0, 'publish_errors': 0}
+
+    @property
+    def is_distributed(self) -> bool:
+        return self._redis is not None
+
+    def publish(self, keys: Iterable[str] = (), patterns: Iterable[str] = (),
+                versions: Optional[Dict[str, int]] = None) -> None:
+        """Apply an invalidation locally and broadcast it to the other workers"""
+        message = {'origin': self.worker_id, 'keys': list(keys), 'patterns': list(patterns),
+                   'versions': versions or {}}
+        self.apply(message)
+
+        if self._redis is not None:
+            try:
+                self._redis.publish(INVALIDATION_CHANNEL, json.dumps(message))
+                self._stats['published'] += 1
+            except Exception as e:
+                self._stats['publish_errors'] += 1
+                logger.debug(f"Cache invalidation publish failed: {e}")
+
+    def apply(self, message: Dict[str, Any]) -> None:
+        """Drop the L1 entries named in an invalidation message"""
+        if message.get('keys'):
+            self._l1.delete_many(message['keys'])
+        for pattern in message.get('patterns') or ():
+            self._l1.delete_matching(pattern)
+        for namespace, version in (message.get('versions') or {}).items():
+            if version > self.versions.get(namespace, 0):
+                self.versions[namespace] = version
+
+    def _on_message(self, raw) -> None:
+        try:
+            message = json.loads(raw)
+        except (TypeError, ValueError):
+            return
+        if message.get('origin') == self.worker_id:
+            return
+        self._stats['received'] += 1
+        self.apply(message)
+
+    def attach_redis(self, client) -> None:
+        """Publish invalidations over Redis and start listening for other workers'"""
+        self._redis = client
+        if self._running:
+            return
+        self._running = True
+
+        def _listen():
+            while self._running:
+                try:
+                    pubsub = client.pubsub(ignore_subscribe_messages=True)
+                    pubsub.subscribe(INVALIDATION_CHANNEL)
+                    # Anything published while disconnected was missed
+                    self._l1.clear()
+                    self.versions.clear()
+                    for item in pubsub.listen():
+                        if not self._running:
+                            break
+                        if item.get('type') == 'message':
+                            self._on_message(item['data'])
+                except Exception as e:
+                    logger.warning(f"Cache invalidation subscriber error: {e}")
+                    time.sleep(1)
+
+        try:
+            import eventlet
+            eventlet.spawn_n(_listen)
+        except ImportError:
+            threading.Thread(target=_listen, daemon=True).start()
+
+    def stop(self) -> None:
+        self._running = False
+
+    def get_stats(self) -> Dict:
+        return {
+            'transport': 'redis' if self._redis is not None else 'local',
+            'worker_id': self.worker_id,
+            **self._stats
+        }
+
+
+# Global invalidation bus for the L1 cache
+invalidation_bus = CacheInvalidationBus(l1_cache)
+
+
+def get_redis_client():
+    """
+    Get the raw Redis client behind the L2 cache.
+
+    Returns:
+        redis.Redis instance, or None when the cache is not Redis-backed
+    """
+    try:
+        return getattr(cache.cache, '_write_client', None)
+    except Exception:
+        return None
+
 
 def init_cache(app: Flask) -> Cache:
     """
@@ -253,7 +415,8 @@ class CacheService:
             return None
 
     @classmethod
-    def set(cls, key: str, value: Any, timeout: Optional[int] = None, use_l1: bool = True) -> bool:
+    def set(cls, key: str, value: Any, timeout: Optional[int] = None, use_l1: bool = True,
+            tags: Optional[List[str]] = None) -> bool:
         """
         Set value in multi-layer cache.
 
@@ -262,6 +425,8 @@ class CacheService:
             value: Value to cache
             timeout: TTL in seconds (None uses default)
             use_l1: Whether to also set in L1 cache (default True)
+            tags: Extra tags to register the key under (user/challenge/market
+                  tags are derived from the key itself)
 
         Returns:
             True if successful, False otherwise
@@ -269,11 +434,14 @@ class CacheService:
         try:
             # Layer 2: Set in Redis/SimpleCache
             cache.set(key, value, timeout=timeout)
+            cls._register_tags([key], timeout, tags)
+
+            # Other workers drop their now-stale L1 copy
+            invalidation_bus.publish(keys=[key])
 
-            # Layer 1: Set in in-memory cache with shorter TTL
+            # Layer 1: Set in in-memory cache
             if use_l1 and cls._should_use_l1(key):
-                l1_ttl = min(timeout or 30, 60)  # L1 max TTL is 60 seconds
-                l1_cache.set(key, value, ttl=l1_ttl)
+                l1_cache.set(key, value, ttl=min(timeout or 30, L1_MAX_TTL))
 
             logger.debug(f"Cache SET: {key} (TTL: {timeout}s)")
             return True
@@ -281,6 +449,72 @@ class CacheService:
             logger.error(f"Cache set error for {key}: {e}")
             return False
 
+    @classmethod
+    def get_many(cls, keys: List[str], use_l1: bool = True) -> Dict[str, Any]:
+        """
+        Get several values, fetching every L1 miss from L2 in one round-trip (MGET).
+
+        Args:
+            keys: Cache keys
+            use_l1: Whether to check L1 cache first (default True)
+
+        Returns:
+            Dict of the keys that were found
+        """
+        found = {}
+        missing = []
+        for key in keys:
+            value = l1_cache.get(key) if use_l1 and cls._should_use_l1(key) else None
+            if value is not None:
+                found[key] = value
+            else:
+                missing.append(key)
+
+        if missing:
+            try:
+                for key, value in zip(missing, cache.get_many(*missing)):
+                    if value is None:
+                        continue
+                    found[key] = value
+                    if use_l1 and cls._should_use_l1(key):
+                        l1_cache.set(key, value, ttl=30)  # Short L1 TTL
+            except Exception as e:
+                logger.error(f"Cache get_many error for {len(missing)} keys: {e}")
+
+        return found
+
+    @classmethod
+    def set_many(cls, mapping: Dict[str, Any], timeout: Optional[int] = None, use_l1: bool = True,
+                 tags: Optional[List[str]] = None) -> bool:
+        """
+        Set several values with one L2 round-trip (pipelined on Redis).
+
+        Args:
+            mapping: {key: value}
+            timeout: TTL in seconds (None uses default)
+            use_l1: Whether to also set in L1 cache (default True)
+            tags: Extra tags to register every key under
+
+        Returns:
+            True if successful, False otherwise
+        """
+        if not mapping:
+            return True
+        try:
+            cache.set_many(mapping, timeout=timeout)
+            cls._register_tags(mapping.keys(), timeout, tags)
+            invalidation_bus.publish(keys=list(mapping.keys()))
+
+            if use_l1:
+                l1_ttl = min(timeout or 30, L1_MAX_TTL)
+                for key, value in mapping.items():
+                    if cls._should_use_l1(key):
+                        l1_cache.set(key, value, ttl=l1_ttl)
+            return True
+        except Exception as e:
+            logger.error(f"Cache set_many error for {len(mapping)} keys: {e}")
+            return False
+
     @classmethod
     def delete(cls, key: str) -> bool:
         """
@@ -293,21 +527,154 @@ class CacheService:
             True if successful, False otherwise
         """
         try:
-            # Delete from L1
-            l1_cache.delete(key)
             # Delete from L2
             cache.delete(key)
+            # Delete from every worker's L1
+            invalidation_bus.publish(keys=[key])
             logger.debug(f"Cache DELETE: {key}")
             return True
         except Exception as e:
             logger.error(f"Cache delete error for {key}: {e}")
             return False
 
+    # ==================== TAGS ====================
+
+    @staticmethod
+    def tags_for_key(key: str) -> List[str]:
+        """Tags a key is registered under, derived from its layout (e.g. 'user:42')"""
+        match = _TAGGED_KEY.match(key)
+        if not match:
+            return []
+        if match.group(1):
+            return [f"{match.group(1)}:{match.group(2)}"]
+        return [f"{match.group(3)}:{match.group(4)}"]
+
+    @staticmethod
+    def _key_prefix() -> str:
+        return getattr(cache.cache, 'key_prefix', '') or ''
+
+    @classmethod
+    def _register_tags(cls, keys: Iterable[str], timeout: Optional[int], tags: Optional[List[str]] = None) -> None:
+        """Add keys to their tag sets (explicit tags apply to every key)"""
+        tagged: Dict[str, List[str]] = {}
+        for key in keys:
+            for tag in (tags or []) + cls.tags_for_key(key):
+                tagged.setdefault(tag, []).append(key)
+        if not tagged:
+            return
+
+        client = get_redis_client()
+        if client is None:
+            evicted = []
+            with _local_tags_lock:
+                for tag, members in tagged.items():
+                    registered = _local_tags.setdefault(tag, set())
+                    registered.update(members)
+                    if len(registered) > TAG_MAX_MEMBERS:
+                        live = [key for key in registered if cache.has(key)]
+                        older = [key for key in live if key not in members]
+                        evict = older[:max(len(live) - TAG_MAX_MEMBERS // 2, 0)]
+                        _local_tags[tag] = set(live) - set(evict)
+                        evicted.extend(evict)
+            if evicted:
+                cache.delete_many(*evicted)
+                invalidation_bus.publish(keys=evicted)
+            return
+
+        # Every registration refreshes the set's TTL, so members of expired
+        # entries would pile up in hot sets; oversized sets are pruned
+        prefix = cls._key_prefix()
+        ttl = max(int(timeout or 300) + 60, TAG_TTL)
+        pipe = client.pipeline(transaction=False)
+        for tag, members in tagged.items():
+            tag_key = f"{prefix}tag:{tag}"
+            pipe.sadd(tag_key, *members)
+            pipe.expire(tag_key, ttl)
+            pipe.scard(tag_key)
+        sizes = pipe.execute()[2::3]
+        for (tag, members), size in zip(tagged.items(), sizes):
+            if size > TAG_MAX_MEMBERS:
+                cls._prune_tag(client, f"{prefix}tag:{tag}", prefix, keep=set(members))
+
+    @classmethod
+    def _prune_tag(cls, client, tag_key: str, prefix: str, keep: set) -> None:
+        """Drop members whose entries are gone, then evict live ones (not in keep) down to half the cap"""
+        members = [member.decode() if isinstance(member, bytes) else member
+                   for member in client.sscan_iter(tag_key, count=INVALIDATION_BATCH)]
+        pipe = client.pipeline(transaction=False)
+        for key in members:
+            pipe.exists(prefix + key)
+        exists = pipe.execute()
+        live = [key for key, found in zip(members, exists) if found]
+        older = [key for key in live if key not in keep]
+        evict = older[:max(len(live) - TAG_MAX_MEMBERS // 2, 0)]
+        drop = [key for key, found in zip(members, exists) if not found] + evict
+
+        pipe = client.pipeline(transaction=False)
+        for start in range(0, len(drop), INVALIDATION_BATCH):
+            pipe.srem(tag_key, *drop[start:start + INVALIDATION_BATCH])
+        pipe.execute()
+        cls._unlink(client, [prefix + key for key in evict])
+        if evict:
+            invalidation_bus.publish(keys=evict)
+        logger.debug(f"Cache PRUNE TAG: {tag_key} ({len(drop)} members, {len(evict)} evicted)")
+
+    @classmethod
+    def invalidate_tags(cls, *tags: str) -> int:
+        """
+        Delete every entry registered under the given tags.
+        Cost scales with the size of the tags, not the keyspace: members are
+        read with SSCAN and removed with pipelined UNLINK batches.
+
+        Returns:
+            Number of keys invalidated
+        """
+        removed: List[str] = []
+        try:
+            client = get_redis_client()
+            if client is None:
+                with _local_tags_lock:
+                    for tag in tags:
+                        removed.extend(_local_tags.pop(tag, ()))
+                for key in removed:
+                    cache.delete(key)
+            else:
+                prefix = cls._key_prefix()
+                for tag in tags:
+                    tag_key = f"{prefix}tag:{tag}"
+                    batch = []
+                    for member in client.sscan_iter(tag_key, count=INVALIDATION_BATCH):
+                        batch.append(member.decode() if isinstance(member, bytes) else member)
+                        if len(batch) >= INVALIDATION_BATCH:
+                            cls._unlink(client, [prefix + key for key in batch])
+                            removed.extend(batch)
+                            batch = []
+                    cls._unlink(client, [prefix + key for key in batch] + [tag_key])
+                    removed.extend(batch)
+        except Exception as e:
+            logger.error(f"Cache tag invalidation error for {tags}: {e}")
+
+        if removed:
+            invalidation_bus.publish(keys=removed)
+        logger.debug(f"Cache INVALIDATE TAGS: {tags} ({len(removed)} keys)")
+        return len(removed)
+
+    @staticmethod
+    def _unlink(client, full_keys: List[str]) -> None:
+        if not full_keys:
+            return
+        pipe = client.pipeline(transaction=False)
+        for start in range(0, len(full_keys), INVALIDATION_BATCH):
+            pipe.unlink(*full_keys[start:start + INVALIDATION_BATCH])
+        pipe.execute()
+
     @classmethod
     def delete_pattern(cls, pattern: str) -> int:
         """
-        Delete all keys matching pattern.
-        Only works with Redis backend.
+        Delete all keys matching pattern, including legacy keys that were
+        never registered under a tag. Walks the keyspace incrementally with
+        SCAN and UNLINKs in batches, so Redis is never blocked; prefer
+        invalidate_tags on hot paths.
 
         Args:
             pattern: Key pattern (e.g., 'user:*')
@@ -316,19 +683,62 @@ class CacheService:
             Number of keys deleted
         """
         try:
-            # This only works with Redis
-            if hasattr(cache.cache, '_read_client'):
-                client = cache.cache._read_client
-                keys = client.keys(f"tradesense_{pattern}")
-                if keys:
-                    count = client.delete(*keys)
-                    logger.debug(f"Cache DELETE PATTERN: {pattern} ({count} keys)")
-                    return count
-            return 0
+            invalidation_bus.publish(patterns=[pattern])
+
+            client = get_redis_client()
+            if client is None:
+                return 0
+
+            count = 0
+            batch = []
+            for key in client.scan_iter(match=f"{cls._key_prefix()}{pattern}", count=INVALIDATION_BATCH):
+                batch.append(key)
+                if len(batch) >= INVALIDATION_BATCH:
+                    cls._unlink(client, batch)
+                    count += len(batch)
+                    batch = []
+            cls._unlink(client, batch)
+            count += len(batch)
+            logger.debug(f"Cache DELETE PATTERN: {pattern} ({count} keys)")
+            return count
         except Exception as e:
             logger.error(f"Cache delete pattern error for {pattern}: {e}")
             return 0
 
+    @classmethod
+    def namespace_version(cls, namespace: str) -> int:
+        """Current version of a key namespace (shared through L2, cached per worker)"""
+        version = invalidation_bus.versions.get(namespace)
+        if version is None:
+            try:
+                version = int(cache.get(f"nsver:{namespace}") or 1)
+            except Exception:
+                version = 1
+            invalidation_bus.versions[namespace] = version
+        return version
+
+    @classmethod
+    def versioned_key(cls, namespace: str, suffix: str) -> str:
+        """
+        Key under the current version of a namespace. Bumping the namespace
+        makes every older key unreachable at once; they expire on their TTL.
+        """
+        return f"{namespace}:v{cls.namespace_version(namespace)}:{suffix}"
+
+    @classmethod
+    def bump_namespace(cls, namespace: str) -> int:
+        """Invalidate every versioned key of a namespace on all workers"""
+        try:
+            version = int(cache.cache.inc(f"nsver:{namespace}") or 1)
+        except Exception as e:
+            logger.error(f"Cache namespace bump error for {namespace}: {e}")
+            version = cls.namespace_version(namespace) + 1
+        if version <= 1:
+            # Counter was missing (read as version 1); move past it
+            version = int(cache.cache.inc(f"nsver:{namespace}") or 2)
+        invalidation_bus.publish(versions={namespace: version})
+        return version
+
     @classmethod
     def clear(cls) -> bool:
         """
@@ -338,10 +748,10 @@ class CacheService:
             True if successful, False otherwise
         """
         try:
-            # Clear L1
-            l1_cache.clear()
             # Clear L2
             cache.clear()
+            # Clear every worker's L1
+            invalidation_bus.publish(patterns=['*'])
             logger.info("Cache CLEARED (all layers)")
             return True
         except Exception as e:
@@ -376,6 +786,7 @@ class CacheService:
                 'type': l2_backend,
                 'backend': 'Redis' if l2_backend == 'redis' else 'SimpleCache'
             },
+            'invalidation': invalidation_bus.get_stats(),
             'prefixes': list(cls.PREFIXES.keys()),
             'ttl_config': cls.TTL
         }
@@ -454,13 +865,104 @@ class CacheService:
         return f"{cls.PREFIXES['session']}{session_id}"
 
 
-def cached_response(timeout: int = 300, key_prefix: str = ''):
+def _canonical(value: Any) -> Any:
+    """JSON-safe, process-independent form of a call argument"""
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    if isinstance(value, (set, frozenset)):
+        return sorted((_canonical(v) for v in value), key=repr)
+    if isinstance(value, dict):
+        return {str(k): _canonical(v) for k, v in sorted(value.items(), key=lambda item: str(item[0]))}
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    text = repr(value)
+    if text == object.__repr__(value):
+        # Default repr embeds a memory address (e.g. a bound method's self)
+        return type(value).__qualname__
+    return text
+
+
+def make_cache_key(key_prefix: str, func: Callable, args: tuple, kwargs: dict) -> str:
+    """Deterministic cache key for a call, identical across workers and restarts"""
+    payload = json.dumps([_canonical(args), _canonical(kwargs)], separators=(',', ':'), sort_keys=True)
+    digest = hashlib.sha1(payload.encode()).hexdigest()[:20]
+    return f"{key_prefix}:{func.__module__}.{func.__qualname__}:{digest}"
+
+
+class _SingleFlight:
+    """Per-process call coalescing: one caller computes a key, the rest wait for its result"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, list] = {}  # key -> [event, result, error]
+
+    def in_flight(self, key: str) -> bool:
+        return key in self._calls
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = [threading.Event(), None, None]
+
+        if not leader:
+            call[0].wait()
+            if call[2] is not None:
+                raise call[2]
+            return call[1]
+
+        try:
+            call[1] = fn()
+            return call[1]
+        except Exception as e:
+            call[2] = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call[0].set()
+
+
+_single_flight = _SingleFlight()
+
+# Seconds a cross-worker recompute lock is held before others give up waiting
+RECOMPUTE_LOCK_TTL = 10
+
+# Returned by a recompute that lost the cross-worker lock
+_LOCKED = object()
+
+
+def _spawn(fn: Callable[[], Any]) -> None:
+    try:
+        import eventlet
+        eventlet.spawn_n(fn)
+    except ImportError:
+        threading.Thread(target=fn, daemon=True).start()
+
+
+def cached_response(timeout: int = 300, key_prefix: str = '', stale_ttl: Optional[int] = None,
+                    beta: float = 1.0, tags: Optional[Callable[..., List[str]]] = None):
     """
     Decorator for caching function responses.
 
+    Keys are derived from a canonical serialization of the arguments, so
+    all workers share entries. Entries are stored with their expiry and
+    compute time: past expiry they are served stale for up to stale_ttl
+    while one background call refreshes them, and shortly before expiry a
+    caller may refresh early with probability rising as expiry nears
+    (XFetch, tuned by beta). Recomputes are single-flight per worker and
+    guarded by a short L2 lock across workers.
+
     Args:
-        timeout: Cache TTL in seconds
+        timeout: Seconds a value is fresh
         key_prefix: Optional prefix for cache key
+        stale_ttl: Seconds a value may be served stale after expiry (default: timeout)
+        beta: Early refresh eagerness (0 disables early refresh)
+        tags: Optional callable mapping the call's arguments to the tags its
+              entry is invalidated by (e.g. lambda user_id: [f"user:{user_id}"])
 
     Usage:
         @cached_response(timeout=30, key_prefix='market')
@@ -468,26 +970,102 @@ def cached_response(timeout: int = 300, key_prefix: str = ''):
             # expensive operation
             return prices
     """
+    grace = timeout if stale_ttl is None else stale_ttl
+
     def decorator(func: Callable) -> Callable:
+        def compute(cache_key, args, kwargs):
+            started = time.time()
+            result = func(*args, **kwargs)
+            if result is not None:
+                delta = time.time() - started
+                CacheService.set(cache_key, (result, time.time() + timeout, delta), timeout + grace,
+                                 tags=tags(*args, **kwargs) if tags else None)
+            return result
+
+        def recompute(cache_key, args, kwargs):
+            # Only one worker recomputes; the others keep serving what they have
+            lock_key = f"lock:{cache_key}"
+            try:
+                acquired = cache.add(lock_key, invalidation_bus.worker_id, timeout=RECOMPUTE_LOCK_TTL)
+            except Exception:
+                acquired = True
+            if not acquired:
+                return _LOCKED
+            try:
+                return compute(cache_key, args, kwargs)
+            finally:
+                try:
+                    cache.delete(lock_key)
+                except Exception:
+                    pass
+
+        def refresh_in_background(cache_key, args, kwargs):
+            if _single_flight.in_flight(cache_key):
+                return
+            try:
+                from flask import current_app
+                app = current_app._get_current_object()
+            except RuntimeError:
+                app = None
+
+            def run():
+                try:
+                    if app is not None:
+                        with app.app_context():
+                            _single_flight.do(cache_key, lambda: recompute(cache_key, args, kwargs))
+                    else:
+                        _single_flight.do(cache_key, lambda: recompute(cache_key, args, kwargs))
+                except Exception as e:
+                    logger.warning(f"Background refresh of {cache_key} failed: {e}")
+
+            _spawn(run)
+
+        def wait_for_value(cache_key):
+            deadline = time.time() + RECOMPUTE_LOCK_TTL
+            while time.time() < deadline:
+                time.sleep(0.05)
+                entry = CacheService.get(cache_key, use_l1=False)
+                if entry is not None:
+                    return entry
+            return None
+
         @wraps(func)
         def wrapper(*args, **kwargs):
-            # Generate cache key from function name and arguments
-            cache_key = f"{key_prefix}:{func.__name__}:{hash(str(args) + str(kwargs))}"
+            cache_key = make_cache_key(key_prefix, func, args, kwargs)
+
+            entry = CacheService.get(cache_key)
+            if entry is not None:
+                value, expires_at, delta = entry
+                now = time.time()
+                if now >= expires_at:
+                    refresh_in_background(cache_key, args, kwargs)
+                elif beta > 0 and now - delta * beta * math.log(1.0 - random.random()) >= expires_at:
+                    refresh_in_background(cache_key, args, kwargs)
+                return value
 
-            # Try to get from cache
-            cached_value = CacheService.get(cache_key)
-            if cached_value is not None:
-                return cached_value
+            def load():
+                result = recompute(cache_key, args, kwargs)
+                if result is not _LOCKED:
+                    return result
+                # Another worker holds the recompute lock: wait for its value
+                entry = wait_for_value(cache_key)
+                return entry[0] if entry is not None else compute(cache_key, args, kwargs)
 
-            # Execute function and cache result
-            result = func(*args, **kwargs)
-            CacheService.set(cache_key, result, timeout)
-            return result
+            return _single_flight.do(cache_key, load)
 
+        wrapper.cache_key = lambda *args, **kwargs: make_cache_key(key_prefix, func, args, kwargs)
         return wrapper
     return decorator
 
 
+def _first_arg_tag(kind: str) -> Callable[..., List[str]]:
+    """Tags of a call whose first argument is the id (e.g. user_id) of the tagged entity"""
+    def tags(*args, **kwargs) -> List[str]:
+        value = args[0] if args else kwargs.get(f"{kind}_id")
+        return [f"{kind}:{value}"] if isinstance(value, int) else []
+    return tags
+
+
 # Convenience decorators with preset TTLs
 def cache_market_data(func: Callable) -> Callable:
     """Cache market data for 5 seconds"""
@@ -500,20 +1078,27 @@ def cache_signals(func: Callable) -> Callable:
 
 
 def cache_user_data(func: Callable) -> Callable:
-    """Cache user data for 60 seconds"""
-    return cached_response(timeout=CacheService.TTL['user_profile'], key_prefix='user')(func)
+    """Cache user data for 60 seconds (first argument: user_id)"""
+    return cached_response(timeout=CacheService.TTL['user_profile'], key_prefix='user',
+                           tags=_first_arg_tag('user'))(func)
 
 
 def cache_challenge_data(func: Callable) -> Callable:
-    """Cache challenge data for 30 seconds"""
-    return cached_response(timeout=CacheService.TTL['challenge_data'], key_prefix='challenge')(func)
+    """Cache challenge data for 30 seconds (first argument: challenge_id)"""
+    return cached_response(timeout=CacheService.TTL['challenge_data'], key_prefix='challenge',
+                           tags=_first_arg_tag('challenge'))(func)
 
 
 def invalidate_user_cache(user_id: int):
     """Invalidate all cached data for a user"""
-    CacheService.delete_pattern(f"user:{user_id}:*")
+    CacheService.invalidate_tags(f"user:{user_id}")
 
 
 def invalidate_challenge_cache(challenge_id: int):
     """Invalidate all cached data for a challenge"""
-    CacheService.delete_pattern(f"challenge:{challenge_id}:*")
+    CacheService.invalidate_tags(f"challenge:{challenge_id}")
+
+
+def invalidate_symbol_cache(symbol: str):
+    """Invalidate cached market data for a symbol"""
+    CacheService.invalidate_tags(f"market:{symbol}")
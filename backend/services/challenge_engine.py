@@ -4,11 +4,97 @@ Evaluates user trading performance against prop firm rules
 Supports 2-phase system: Evaluation → Verification → Funded
 """
 
+import time
+import threading
+import logging
 from datetime import datetime, date
 from decimal import Decimal
-from sqlalchemy import func
+from typing import Dict, Iterable, Tuple
+from sqlalchemy import func, case, event
+from sqlalchemy.orm import Session
 from flask import current_app
 from models import db, UserChallenge, Trade
+from services.leaderboard_service import leaderboards
+
+logger = logging.getLogger(__name__)
+
+# Seconds a day-start balance is trusted before it is re-derived from the
+# database (backstop for invalidations lost while the pub/sub is down)
+DAY_STATE_TTL = 900
+
+# Cache namespace whose version is bumped on direct balance edits; every
+# worker re-derives its day-start balances when the version moves
+DAY_STATE_NAMESPACE = 'day_state'
+
+# challenge_id -> (day, day-start balance, seeded at, namespace version)
+_day_state: Dict[int, Tuple[date, Decimal, float, int]] = {}
+_day_state_lock = threading.Lock()
+
+# session.info keys of challenge ids invalidated again once the session commits
+_STATS_PENDING_KEY = 'trade_stats_pending'
+_STATE_PENDING_KEY = 'challenge_state_pending'
+
+
+def _day_state_version() -> int:
+    from services.cache_service import CacheService
+    return CacheService.namespace_version(DAY_STATE_NAMESPACE)
+
+
+def _drop_challenge_state(challenge_id: int) -> None:
+    from services.cache_service import CacheService
+    from services.trade_analytics import invalidate_trade_columns
+
+    with _day_state_lock:
+        _day_state.pop(challenge_id, None)
+    CacheService.bump_namespace(DAY_STATE_NAMESPACE)
+    invalidate_trade_stats(challenge_id)
+    invalidate_trade_columns(challenge_id)
+
+
+def invalidate_challenge_state(challenge_id: int) -> None:
+    """
+    Drop cached running aggregates after a balance is reset or edited directly.
+    The day-start balances are dropped on every worker. When the edit is not
+    committed yet this repeats after the commit, so a state re-derived from
+    the old balance in between does not survive it.
+    """
+    _drop_challenge_state(challenge_id)
+    session = db.session()
+    if session.in_transaction():
+        session.info.setdefault(_STATE_PENDING_KEY, set()).add(challenge_id)
+
+
+def _trade_stats_key(challenge_id: int) -> str:
+    from services.cache_service import CacheService
+    return CacheService.challenge_key(challenge_id, 'trade_stats')
+
+
+def invalidate_trade_stats(challenge_id: int) -> None:
+    """Drop the cached trade aggregates of a challenge (call when a trade opens or closes)"""
+    from services.cache_service import CacheService
+    CacheService.delete(_trade_stats_key(challenge_id))
+
+
+def invalidate_trade_stats_on_commit(challenge_id: int, session) -> None:
+    """
+    Drop the cached trade aggregates once the session commits. Dropping them
+    earlier lets a concurrent read re-cache the pre-commit stats.
+    """
+    session.info.setdefault(_STATS_PENDING_KEY, set()).add(challenge_id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_pending_stats(session) -> None:
+    for challenge_id in session.info.pop(_STATS_PENDING_KEY, ()):
+        invalidate_trade_stats(challenge_id)
+    for challenge_id in session.info.pop(_STATE_PENDING_KEY, ()):
+        _drop_challenge_state(challenge_id)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _drop_pending_stats(session) -> None:
+    session.info.pop(_STATS_PENDING_KEY, None)
+    session.info.pop(_STATE_PENDING_KEY, None)
 
 
 class ChallengeEngine:
@@ -43,9 +129,103 @@ class ChallengeEngine:
             }
             return defaults.get(phase, defaults['evaluation'])
 
-    def evaluate_challenge(self, challenge: UserChallenge) -> dict:
+    # ==================== RUNNING AGGREGATES ====================
+
+    def apply_closed_trade(self, challenge: UserChallenge, pnl) -> None:
+        """
+        Apply a closed trade to the challenge's running aggregates
+        (balance, peak equity, trading days). Does not commit.
+
+        Realized daily PnL is current_balance minus the cached day-start
+        balance, so it needs no update here.
+        """
+        challenge.current_balance = challenge.current_balance + Decimal(str(pnl))
+        if challenge.current_balance > challenge.highest_balance:
+            challenge.highest_balance = challenge.current_balance
+
+        today = date.today()
+        if challenge.last_trading_day != today:
+            challenge.trading_days = (challenge.trading_days or 0) + 1
+            challenge.last_trading_day = today
+
+        invalidate_trade_stats_on_commit(challenge.id, db.session)
+        leaderboards.update_challenge_on_commit(challenge, db.session)
+
+    def _seed_day_state(self, challenges: Iterable[UserChallenge]) -> None:
+        """Derive today's day-start balance for challenges with no fresh state, in one query"""
+        today = date.today()
+        now = time.time()
+        version = _day_state_version()
+        stale = []
+        for challenge in challenges:
+            state = _day_state.get(challenge.id)
+            if (state is None or state[0] != today or now - state[2] > DAY_STATE_TTL
+                    or state[3] != version):
+                stale.append(challenge)
+        if not stale:
+            return
+
+        rows = db.session.query(
+            Trade.challenge_id,
+            func.coalesce(func.sum(Trade.pnl), 0)
+        ).filter(
+            Trade.challenge_id.in_([c.id for c in stale]),
+            Trade.status == 'closed',
+            func.date(Trade.closed_at) == today
+        ).group_by(Trade.challenge_id).all()
+        realized = {challenge_id: Decimal(str(total or 0)) for challenge_id, total in rows}
+
+        with _day_state_lock:
+            for challenge in stale:
+                day_start = challenge.current_balance - realized.get(challenge.id, Decimal('0'))
+                _day_state[challenge.id] = (today, day_start, now, version)
+
+    def _day_start_balance(self, challenge: UserChallenge) -> Decimal:
+        self._seed_day_state([challenge])
+        return _day_state[challenge.id][1]
+
+    def day_start_balances(self, challenges: Iterable[UserChallenge]) -> Dict[int, Decimal]:
+        """Get today's day-start balance for each challenge (at most one query)"""
+        challenges = list(challenges)
+        self._seed_day_state(challenges)
+        return {challenge.id: _day_state[challenge.id][1] for challenge in challenges}
+
+    # ==================== EVALUATION ====================
+
+    def evaluate_many(self, challenges: Iterable[UserChallenge]) -> Dict[int, dict]:
+        """
+        Evaluate a batch of challenges with one aggregate query and one commit.
+        Each challenge is evaluated in its own savepoint: one that fails is
+        rolled back, logged and left out of the results.
+        Returns {challenge_id: evaluation result}.
+        """
+        challenges = list(challenges)
+        if not challenges:
+            return {}
+
+        results = {}
+        try:
+            self._seed_day_state([c for c in challenges if c.status in ['active', 'funded']])
+            for challenge in challenges:
+                challenge_id = challenge.id
+                try:
+                    with db.session.begin_nested():
+                        results[challenge_id] = self.evaluate_challenge(challenge, commit=False)
+                except Exception as e:
+                    logger.error(f"Evaluation of challenge {challenge_id} failed: {e}")
+            db.session.commit()
+        except Exception as e:
+            logger.error(f"Bulk challenge evaluation failed: {e}")
+            db.session.rollback()
+            raise
+        return results
+
+    def evaluate_challenge(self, challenge: UserChallenge, commit: bool = True) -> dict:
         """
-        Evaluate a challenge against phase-specific rules
+        Evaluate a challenge against phase-specific rules.
+        Rule checks use the running aggregates and do no SQL once today's
+        day-start balance is known. Commits once if anything changed,
+        unless commit is False.
         Returns: dict with status and details
         """
         if challenge.status not in ['active', 'funded']:
@@ -88,29 +268,49 @@ class ChallengeEngine:
         }
 
         # For funded accounts, track profits but don't check target
+        funded_updated = False
         if phase == 'funded':
             # Update profit tracking for funded accounts
             if total_pnl_pct > 0:
                 profit = current - initial
                 challenge.total_profit_earned = max(challenge.total_profit_earned or 0, profit)
                 challenge.withdrawable_profit = profit * Decimal('0.80')  # 80% to trader
-                db.session.commit()
+                funded_updated = True
 
         # Rule 1: Check Profit Target (if applicable)
         if profit_target and total_pnl_pct >= profit_target:
-            return self._handle_phase_completion(challenge, result, rules)
+            result = self._handle_phase_completion(challenge, result, rules)
 
         # Rule 2: Check Max Total Loss
-        total_loss_pct = (initial - current) / initial
-        if total_loss_pct >= max_loss:
-            return self._handle_failure(challenge, result, 'max_total_loss',
+        elif (initial - current) / initial >= max_loss:
+            result = self._handle_failure(challenge, result, 'max_total_loss',
                 f'Maximum total loss of {int(max_loss * 100)}% exceeded')
 
         # Rule 3: Check Max Daily Loss
-        if daily_pnl_pct <= -daily_loss:
-            return self._handle_failure(challenge, result, 'max_daily_loss',
+        elif daily_pnl_pct <= -daily_loss:
+            result = self._handle_failure(challenge, result, 'max_daily_loss',
                 f'Maximum daily loss of {int(daily_loss * 100)}% exceeded')
 
+        if result['changed']:
+            leaderboards.update_challenge_on_commit(challenge, db.session)
+
+        if commit and (result['changed'] or funded_updated):
+            db.session.commit()
+
+        return result
+
+    def fail_challenge(self, challenge: UserChallenge, failure_type: str, message: str) -> dict:
+        """Fail a challenge through the standard failure path (does not commit)"""
+        result = {
+            'status': challenge.status,
+            'phase': challenge.phase or 'evaluation',
+            'message': message,
+            'changed': False
+        }
+        if challenge.status not in ['active', 'funded']:
+            return result
+        result = self._handle_failure(challenge, result, failure_type, message)
+        leaderboards.update_challenge_on_commit(challenge, db.session)
         return result
 
     def _handle_phase_completion(self, challenge: UserChallenge, result: dict, rules: dict) -> dict:
@@ -121,7 +321,6 @@ class ChallengeEngine:
             # Trial passed - advance to Phase 1 (Evaluation)
             challenge.status = 'passed'
             challenge.end_date = datetime.utcnow()
-            db.session.commit()
 
             # Create new evaluation challenge
             new_challenge = self._create_next_phase_challenge(challenge, 'evaluation')
@@ -138,7 +337,6 @@ class ChallengeEngine:
             # Phase 1 passed - advance to Phase 2 (Verification)
             challenge.status = 'passed'
             challenge.end_date = datetime.utcnow()
-            db.session.commit()
 
             # Create verification challenge
             new_challenge = self._create_next_phase_challenge(challenge, 'verification')
@@ -155,7 +353,6 @@ class ChallengeEngine:
             # Phase 2 passed - User is now FUNDED!
             challenge.status = 'passed'
             challenge.end_date = datetime.utcnow()
-            db.session.commit()
 
             # Create funded account
             funded_challenge = self._create_funded_account(challenge)
@@ -181,7 +378,6 @@ class ChallengeEngine:
             challenge.failure_reason = message
             challenge.end_date = datetime.utcnow()
             challenge.is_funded = False
-            db.session.commit()
 
             result.update({
                 'status': 'failed',
@@ -194,7 +390,6 @@ class ChallengeEngine:
             challenge.status = 'failed'
             challenge.failure_reason = message
             challenge.end_date = datetime.utcnow()
-            db.session.commit()
 
             result.update({
                 'status': 'failed',
@@ -232,7 +427,8 @@ class ChallengeEngine:
         )
 
         db.session.add(new_challenge)
-        db.session.commit()
+        db.session.flush()  # Assign the id; committed with the evaluation
+        leaderboards.update_challenge_on_commit(new_challenge, db.session)
 
         return new_challenge
 
@@ -263,89 +459,85 @@ class ChallengeEngine:
         )
 
         db.session.add(funded_challenge)
-        db.session.commit()
+        db.session.flush()  # Assign the id; committed with the evaluation
+        leaderboards.update_challenge_on_commit(funded_challenge, db.session)
 
         return funded_challenge
 
     def _calculate_daily_pnl_percentage(self, challenge: UserChallenge) -> Decimal:
-        """Calculate today's PnL percentage based on closed trades"""
-        today = date.today()
+        """Calculate today's realized PnL percentage from the running aggregates"""
+        if challenge.initial_balance == 0:
+            return Decimal('0')
 
-        # Get today's closed trades
-        daily_pnl = db.session.query(
-            func.coalesce(func.sum(Trade.pnl), 0)
-        ).filter(
-            Trade.challenge_id == challenge.id,
-            Trade.status == 'closed',
-            func.date(Trade.closed_at) == today
-        ).scalar()
+        daily_pnl = challenge.current_balance - self._day_start_balance(challenge)
+        return daily_pnl / challenge.initial_balance
 
-        if daily_pnl is None or challenge.initial_balance == 0:
-            return Decimal('0')
+    def get_trade_stats(self, challenge_id: int) -> dict:
+        """
+        Trade counts, PnL averages and most traded symbols for a challenge.
+        One query grouped by symbol with conditional aggregates, folded into
+        totals here; cached until a trade of the challenge opens or closes.
+        """
+        from services.cache_service import CacheService
+
+        cache_key = _trade_stats_key(challenge_id)
+        cached = CacheService.get(cache_key)
+        if cached is not None:
+            return cached
+
+        is_closed = Trade.status == 'closed'
+        is_win = is_closed & (Trade.pnl > 0)
+        is_loss = is_closed & (Trade.pnl < 0)
+        rows = db.session.query(
+            Trade.symbol,
+            func.count(Trade.id),
+            func.sum(case((Trade.status == 'open', 1), else_=0)),
+            func.sum(case((is_closed, 1), else_=0)),
+            func.sum(case((is_win, 1), else_=0)),
+            func.sum(case((is_loss, 1), else_=0)),
+            func.sum(case((is_closed, Trade.pnl), else_=0)),
+            func.sum(case((is_win, Trade.pnl), else_=0)),
+            func.sum(case((is_loss, Trade.pnl), else_=0))
+        ).filter(
+            Trade.challenge_id == challenge_id
+        ).group_by(Trade.symbol).all()
+
+        totals = [0] * 8
+        for row in rows:
+            for i, value in enumerate(row[1:]):
+                totals[i] += value or 0
+        total, open_count, closed, winning, losing, total_pnl, win_pnl, loss_pnl = totals
+
+        popular = sorted(rows, key=lambda row: row[1], reverse=True)[:5]
+        stats = {
+            'total': int(total),
+            'open': int(open_count),
+            'closed': int(closed),
+            'winning': int(winning),
+            'losing': int(losing),
+            'total_pnl': float(total_pnl),
+            'average_win': float(win_pnl) / winning if winning else 0.0,
+            'average_loss': float(loss_pnl) / losing if losing else 0.0,
+            'popular_symbols': [{'symbol': row[0], 'count': row[1]} for row in popular]
+        }
 
-        return Decimal(str(daily_pnl)) / challenge.initial_balance
+        CacheService.set(cache_key, stats, CacheService.TTL['challenge_data'])
+        return stats
 
     def get_challenge_stats(self, challenge: UserChallenge) -> dict:
         """Get comprehensive statistics for a challenge"""
         phase = challenge.phase or 'evaluation'
         rules = self.get_phase_rules(phase)
 
-        # Total trades
-        total_trades = Trade.query.filter_by(challenge_id=challenge.id).count()
-        open_trades = Trade.query.filter_by(challenge_id=challenge.id, status='open').count()
-        closed_trades = Trade.query.filter_by(challenge_id=challenge.id, status='closed').count()
-
-        # Winning/Losing trades
-        winning_trades = Trade.query.filter(
-            Trade.challenge_id == challenge.id,
-            Trade.status == 'closed',
-            Trade.pnl > 0
-        ).count()
-
-        losing_trades = Trade.query.filter(
-            Trade.challenge_id == challenge.id,
-            Trade.status == 'closed',
-            Trade.pnl < 0
-        ).count()
+        trade_stats = self.get_trade_stats(challenge.id)
+        closed_trades = trade_stats['closed']
+        winning_trades = trade_stats['winning']
+        avg_win = trade_stats['average_win']
+        avg_loss = trade_stats['average_loss']
 
         # Win rate
         win_rate = (winning_trades / closed_trades * 100) if closed_trades > 0 else 0
 
-        # Total PnL
-        total_pnl = db.session.query(
-            func.coalesce(func.sum(Trade.pnl), 0)
-        ).filter(
-            Trade.challenge_id == challenge.id,
-            Trade.status == 'closed'
-        ).scalar()
-
-        # Average win/loss
-        avg_win = db.session.query(
-            func.coalesce(func.avg(Trade.pnl), 0)
-        ).filter(
-            Trade.challenge_id == challenge.id,
-            Trade.status == 'closed',
-            Trade.pnl > 0
-        ).scalar()
-
-        avg_loss = db.session.query(
-            func.coalesce(func.avg(Trade.pnl), 0)
-        ).filter(
-            Trade.challenge_id == challenge.id,
-            Trade.status == 'closed',
-            Trade.pnl < 0
-        ).scalar()
-
-        # Most traded symbols
-        popular_symbols = db.session.query(
-            Trade.symbol,
-            func.count(Trade.id).label('count')
-        ).filter(
-            Trade.challenge_id == challenge.id
-        ).group_by(Trade.symbol).order_by(
-            func.count(Trade.id).desc()
-        ).limit(5).all()
-
         # Calculate remaining margins based on phase rules
         initial = float(challenge.initial_balance)
         current = float(challenge.current_balance)
@@ -363,27 +555,25 @@ class ChallengeEngine:
 
         return {
             'trades': {
-                'total': total_trades,
-                'open': open_trades,
+                'total': trade_stats['total'],
+                'open': trade_stats['open'],
                 'closed': closed_trades,
                 'winning': winning_trades,
-                'losing': losing_trades,
+                'losing': trade_stats['losing'],
                 'win_rate': round(win_rate, 2)
             },
             'pnl': {
-                'total': float(total_pnl or 0),
-                'average_win': float(avg_win or 0),
-                'average_loss': float(avg_loss or 0),
-                'profit_factor': round(abs(float(avg_win or 0) / float(avg_loss or 1)), 2) if avg_loss else 0
+                'total': trade_stats['total_pnl'],
+                'average_win': avg_win,
+                'average_loss': avg_loss,
+                'profit_factor': round(abs(avg_win / avg_loss), 2) if avg_loss else 0
             },
             'risk': {
                 'remaining_daily_loss': round(remaining_daily_loss, 2),
                 'remaining_total_loss': round(remaining_total_loss, 2),
                 'needed_for_target': round(needed_for_target, 2) if needed_for_target else None
             },
-            'popular_symbols': [
-                {'symbol': s[0], 'count': s[1]} for s in popular_symbols
-            ],
+            'popular_symbols': trade_stats['popular_symbols'],
             'balance': {
                 'initial': initial,
                 'current': current,
@@ -448,195 +638,5 @@ class ChallengeEngine:
 
     def get_extended_stats(self, challenge: UserChallenge) -> dict:
         """Get extended statistics for dashboard charts and analytics"""
-        from datetime import timedelta
-        from collections import defaultdict
-
-        # Get all closed trades
-        closed_trades = Trade.query.filter_by(
-            challenge_id=challenge.id,
-            status='closed'
-        ).order_by(Trade.closed_at.asc()).all()
-
-        # ========== Balance History ==========
-        balance_history = []
-        running_balance = float(challenge.initial_balance)
-
-        # Group trades by date
-        trades_by_date = defaultdict(list)
-        for trade in closed_trades:
-            if trade.closed_at:
-                trade_date = trade.closed_at.strftime('%Y-%m-%d')
-                trades_by_date[trade_date].append(trade)
-
-        # Build balance history
-        current_date = challenge.start_date or datetime.utcnow()
-        end_date = datetime.utcnow()
-
-        while current_date <= end_date:
-            date_str = current_date.strftime('%Y-%m-%d')
-            day_pnl = sum(float(t.pnl or 0) for t in trades_by_date.get(date_str, []))
-            running_balance += day_pnl
-            balance_history.append({
-                'date': current_date.strftime('%b %d'),
-                'balance': round(running_balance, 2)
-            })
-            current_date += timedelta(days=1)
-
-        # ========== Drawdown History ==========
-        drawdown_history = []
-        peak_balance = float(challenge.initial_balance)
-        running_balance = float(challenge.initial_balance)
-
-        for entry in balance_history:
-            balance = entry['balance']
-            if balance > peak_balance:
-                peak_balance = balance
-            drawdown = ((peak_balance - balance) / peak_balance * 100) if peak_balance > 0 else 0
-            drawdown_history.append({
-                'date': entry['date'],
-                'drawdown': -round(drawdown, 2)
-            })
-
-        # ========== Daily P&L ==========
-        daily_pnl = []
-        for date_str, trades in sorted(trades_by_date.items())[-30:]:
-            day_pnl = sum(float(t.pnl or 0) for t in trades)
-            daily_pnl.append({
-                'date': datetime.strptime(date_str, '%Y-%m-%d').strftime('%b %d'),
-                'pnl': round(day_pnl, 2)
-            })
-
-        # ========== Weekly P&L ==========
-        weekly_pnl = defaultdict(float)
-        for trade in closed_trades:
-            if trade.closed_at:
-                week_start = trade.closed_at - timedelta(days=trade.closed_at.weekday())
-                week_key = week_start.strftime('%b %d')
-                weekly_pnl[week_key] += float(trade.pnl or 0)
-
-        weekly_pnl_list = [{'week': k, 'pnl': round(v, 2)} for k, v in list(weekly_pnl.items())[-12:]]
-
-        # ========== Monthly P&L ==========
-        monthly_pnl = defaultdict(float)
-        for trade in closed_trades:
-            if trade.closed_at:
-                month_key = trade.closed_at.strftime('%b %Y')
-                monthly_pnl[month_key] += float(trade.pnl or 0)
-
-        monthly_pnl_list = [{'month': k, 'pnl': round(v, 2)} for k, v in list(monthly_pnl.items())[-6:]]
-
-        # ========== Win/Loss Streaks ==========
-        current_streak = 0
-        max_win_streak = 0
-        max_loss_streak = 0
-        temp_win_streak = 0
-        temp_loss_streak = 0
-        recent_trades = []
-
-        for trade in closed_trades:
-            is_win = (trade.pnl or 0) > 0
-            recent_trades.append({'result': 'win' if is_win else 'loss'})
-
-            if is_win:
-                temp_win_streak += 1
-                temp_loss_streak = 0
-                max_win_streak = max(max_win_streak, temp_win_streak)
-            else:
-                temp_loss_streak += 1
-                temp_win_streak = 0
-                max_loss_streak = max(max_loss_streak, temp_loss_streak)
-
-        # Current streak from last trades
-        if closed_trades:
-            last_trade = closed_trades[-1]
-            is_last_win = (last_trade.pnl or 0) > 0
-            current_streak = temp_win_streak if is_last_win else -temp_loss_streak
-
-        # ========== Trade Duration Stats ==========
-        durations = []
-        for trade in closed_trades:
-            if trade.opened_at and trade.closed_at:
-                duration = (trade.closed_at - trade.opened_at).total_seconds() / 60  # in minutes
-                durations.append(duration)
-
-        avg_duration = sum(durations) / len(durations) if durations else 0
-        shortest_duration = min(durations) if durations else 0
-        longest_duration = max(durations) if durations else 0
-
-        # Duration distribution
-        duration_ranges = [
-            ('<1m', lambda d: d < 1),
-            ('1-5m', lambda d: 1 <= d < 5),
-            ('5-15m', lambda d: 5 <= d < 15),
-            ('15m-1h', lambda d: 15 <= d < 60),
-            ('1-4h', lambda d: 60 <= d < 240),
-            ('4h-1d', lambda d: 240 <= d < 1440),
-            ('>1d', lambda d: d >= 1440)
-        ]
-
-        duration_distribution = []
-        for range_name, condition in duration_ranges:
-            count = sum(1 for d in durations if condition(d))
-            duration_distribution.append({'range': range_name, 'count': count})
-
-        # ========== Asset Exposure ==========
-        symbol_counts = defaultdict(int)
-        for trade in closed_trades:
-            symbol_counts[trade.symbol] += 1
-
-        total_trades = sum(symbol_counts.values())
-        exposure = []
-        for symbol, count in sorted(symbol_counts.items(), key=lambda x: -x[1])[:6]:
-            exposure.append({
-                'name': symbol,
-                'value': round((count / total_trades) * 100, 1) if total_trades > 0 else 0
-            })
-
-        # ========== Calculate ROI and Sharpe Ratio ==========
-        initial = float(challenge.initial_balance)
-        current = float(challenge.current_balance)
-        roi_percentage = ((current - initial) / initial) * 100 if initial > 0 else 0
-
-        # Simple Sharpe Ratio approximation (using daily returns)
-        daily_returns = [entry['pnl'] / initial * 100 for entry in daily_pnl if initial > 0]
-        if len(daily_returns) > 1:
-            import statistics
-            avg_return = statistics.mean(daily_returns)
-            std_return = statistics.stdev(daily_returns)
-            sharpe_ratio = (avg_return / std_return) * (252 ** 0.5) if std_return > 0 else 0  # Annualized
-        else:
-            sharpe_ratio = 0
-
-        # Max drawdown
-        max_drawdown = max(abs(d['drawdown']) for d in drawdown_history) if drawdown_history else 0
-
-        # Best/Worst trade
-        pnl_values = [float(t.pnl or 0) for t in closed_trades]
-        best_trade = max(pnl_values) if pnl_values else 0
-        worst_trade = min(pnl_values) if pnl_values else 0
-
-        return {
-            'balance_history': balance_history[-60:],  # Last 60 days
-            'drawdown_history': drawdown_history[-60:],
-            'daily_pnl': daily_pnl,
-            'weekly_pnl': weekly_pnl_list,
-            'monthly_pnl': monthly_pnl_list,
-            'streaks': {
-                'current': current_streak,
-                'max_win': max_win_streak,
-                'max_loss': max_loss_streak,
-                'recent_trades': recent_trades[-20:]
-            },
-            'duration_stats': {
-                'average': round(avg_duration, 1),
-                'shortest': round(shortest_duration, 1),
-                'longest': round(longest_duration, 1),
-                'distribution': duration_distribution
-            },
-            'exposure': exposure,
-            'roi_percentage': round(roi_percentage, 2),
-            'sharpe_ratio': round(sharpe_ratio, 2),
-            'max_drawdown': round(max_drawdown, 2),
-            'best_trade': round(best_trade, 2),
-            'worst_trade': round(worst_trade, 2)
-        }
+        from services.trade_analytics import get_extended_stats
+        return get_extended_stats(challenge)
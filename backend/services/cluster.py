@@ -0,0 +1,343 @@
+"""
+Cluster - Price producer election and tick distribution across SocketIO nodes
+Exactly one node holds a Redis lease and runs the price producers; its price
+store writes are published on a tick channel that every other node applies
+to its own store, so each node fans prices out to its own clients. Nodes
+heartbeat their connection counts and watched symbols so the producer polls
+what clients anywhere are watching. Without Redis the node is its own producer.
+"""
+
+import json
+import os
+import socket
+import time
+import uuid
+import threading
+import logging
+from collections import deque
+from typing import Callable, Dict, List, Optional, Any
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Redis keys
+LEADER_KEY = 'tradesense_price_producer'
+NODES_KEY = 'tradesense_nodes'                  # ZSET node id -> last heartbeat
+NODE_INFO_KEY = 'tradesense_node:{}'            # HASH of a node's counters
+NODE_WATCH_KEY = 'tradesense_node_watch:{}'     # HASH symbol -> local watchers
+TICK_CHANNEL = 'tradesense_ticks'
+
+# Seconds the producer lease lasts without renewal
+LEADER_LEASE = 10
+
+# Seconds between heartbeats (lease renewal, node info, watchlist merge)
+HEARTBEAT_INTERVAL = 3
+
+# Seconds without a heartbeat before a node is considered gone
+NODE_TTL = 15
+
+# Renew the lease only while we still hold it
+_RENEW_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+# Release the lease only if we hold it
+_RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+def _decode(value):
+    return value.decode() if isinstance(value, bytes) else value
+
+
+class ClusterNode:
+    """
+    One SocketIO node's membership in the cluster.
+
+    Usage:
+        cluster_node.start(redis_client, on_elected=start_producers,
+                           on_demoted=stop_producers, connections=count_fn)
+        cluster_node.is_leader
+    """
+
+    def __init__(self):
+        self.node_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.is_leader = False
+        self._redis = None
+        self._running = False
+        self._on_elected: Optional[Callable] = None
+        self._on_demoted: Optional[Callable] = None
+        self._connections: Optional[Callable[[], int]] = None
+        self._latencies = deque(maxlen=1000)    # producer write -> local apply, seconds
+        self._stats = {'ticks_published': 0, 'ticks_applied': 0, 'elections': 0, 'demotions': 0}
+
+    # ==================== ELECTION ====================
+
+    def _promote(self) -> None:
+        self.is_leader = True
+        self._stats['elections'] += 1
+        logger.info(f"Cluster: {self.node_id} is the price producer")
+        if self._on_elected:
+            try:
+                self._on_elected()
+            except Exception as e:
+                logger.error(f"Cluster: Producer start failed: {e}")
+
+    def _demote(self) -> None:
+        self.is_leader = False
+        self._stats['demotions'] += 1
+        logger.warning(f"Cluster: {self.node_id} lost the price producer lease")
+        if self._on_demoted:
+            try:
+                self._on_demoted()
+            except Exception as e:
+                logger.error(f"Cluster: Producer stop failed: {e}")
+
+    def elect(self) -> bool:
+        """Take or renew the producer lease; returns whether this node holds it"""
+        if self._redis is None:
+            if not self.is_leader:
+                self._promote()
+            return True
+
+        lease_ms = LEADER_LEASE * 1000
+        try:
+            if self.is_leader:
+                held = bool(self._redis.eval(_RENEW_SCRIPT, 1, LEADER_KEY, self.node_id, lease_ms))
+            else:
+                held = bool(self._redis.set(LEADER_KEY, self.node_id, nx=True, px=lease_ms))
+        except Exception as e:
+            # Unreachable Redis: stop producing before another node's lease starts
+            logger.warning(f"Cluster: Election failed: {e}")
+            held = False
+
+        if held and not self.is_leader:
+            self._promote()
+        elif not held and self.is_leader:
+            self._demote()
+        return held
+
+    # ==================== TICKS ====================
+
+    def on_prices(self, records: Dict[str, Any]) -> None:
+        """Price store listener: the producer publishes its writes to the other nodes"""
+        if not self.is_leader or self._redis is None:
+            return
+        payload = json.dumps({
+            'node': self.node_id,
+            'sent': time.time(),
+            'records': {symbol: json.loads(record.to_json()) for symbol, record in records.items()}
+        })
+        try:
+            self._redis.publish(TICK_CHANNEL, payload)
+            self._stats['ticks_published'] += len(records)
+        except Exception as e:
+            logger.debug(f"Cluster: Tick publish failed: {e}")
+
+    def apply_ticks(self, raw) -> int:
+        """Write a producer's published ticks into the local price store"""
+        from services.market.price_store import price_store, PriceRecord
+
+        message = json.loads(raw)
+        if message.get('node') == self.node_id or self.is_leader:
+            return 0
+
+        records = {}
+        for symbol, fields in message.get('records', {}).items():
+            try:
+                records[symbol] = PriceRecord(*fields)
+            except (TypeError, ValueError):
+                continue
+        if records:
+            # The producer already mirrored them; only local listeners need to run
+            price_store.put_records(records, mirror=False)
+            self._latencies.append(time.time() - message.get('sent', time.time()))
+            self._stats['ticks_applied'] += len(records)
+        return len(records)
+
+    def _listen_ticks(self) -> None:
+        while self._running:
+            try:
+                pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(TICK_CHANNEL)
+                for item in pubsub.listen():
+                    if not self._running:
+                        break
+                    if item.get('type') == 'message':
+                        try:
+                            self.apply_ticks(item['data'])
+                        except (ValueError, TypeError) as e:
+                            logger.debug(f"Cluster: Bad tick message: {e}")
+            except Exception as e:
+                logger.warning(f"Cluster: Tick subscriber error: {e}")
+                time.sleep(1)
+
+    # ==================== MEMBERSHIP ====================
+
+    def heartbeat(self, now: Optional[float] = None) -> None:
+        """Publish this node's counters and watchlist; the producer merges everyone's"""
+        from services.market.watchlist import price_watchlist
+
+        if self._redis is None:
+            return
+        now = now or time.time()
+        info_key = NODE_INFO_KEY.format(self.node_id)
+        watch_key = NODE_WATCH_KEY.format(self.node_id)
+        watched = price_watchlist.local_counts()
+
+        pipe = self._redis.pipeline()
+        pipe.zadd(NODES_KEY, {self.node_id: now})
+        pipe.zremrangebyscore(NODES_KEY, 0, now - NODE_TTL)
+        pipe.hset(info_key, mapping={
+            'connections': self._connections() if self._connections else 0,
+            'leader': int(self.is_leader),
+            'ticks_applied': self._stats['ticks_applied'],
+            'latency_p50_ms': self._latency_ms(50),
+            'latency_p99_ms': self._latency_ms(99),
+            'heartbeat': now
+        })
+        pipe.expire(info_key, NODE_TTL)
+        pipe.delete(watch_key)
+        if watched:
+            pipe.hset(watch_key, mapping=watched)
+            pipe.expire(watch_key, NODE_TTL)
+        pipe.execute()
+
+        if self.is_leader:
+            price_watchlist.set_remote(self._remote_watchlists(now))
+
+    def _live_nodes(self, now: float) -> List[str]:
+        return [_decode(node) for node in self._redis.zrangebyscore(NODES_KEY, now - NODE_TTL, '+inf')]
+
+    def _remote_watchlists(self, now: float) -> Dict[str, int]:
+        """Sum the watched-symbol counts of every other live node"""
+        others = [node for node in self._live_nodes(now) if node != self.node_id]
+        if not others:
+            return {}
+        pipe = self._redis.pipeline()
+        for node in others:
+            pipe.hgetall(NODE_WATCH_KEY.format(node))
+        merged: Dict[str, int] = {}
+        for watched in pipe.execute():
+            for symbol, count in watched.items():
+                symbol = _decode(symbol)
+                merged[symbol] = merged.get(symbol, 0) + int(count)
+        return merged
+
+    def get_nodes(self) -> List[Dict[str, Any]]:
+        """Counters of every live node (this one only, without Redis)"""
+        if self._redis is None:
+            return [{
+                'node': self.node_id,
+                'connections': self._connections() if self._connections else 0,
+                'leader': self.is_leader,
+                'ticks_applied': self._stats['ticks_applied'],
+                'latency_p50_ms': 0,
+                'latency_p99_ms': 0
+            }]
+
+        nodes = self._live_nodes(time.time())
+        pipe = self._redis.pipeline()
+        for node in nodes:
+            pipe.hgetall(NODE_INFO_KEY.format(node))
+        result = []
+        for node, info in zip(nodes, pipe.execute()):
+            info = {_decode(k): _decode(v) for k, v in info.items()}
+            result.append({
+                'node': node,
+                'connections': int(info.get('connections', 0)),
+                'leader': info.get('leader') == '1',
+                'ticks_applied': int(info.get('ticks_applied', 0)),
+                'latency_p50_ms': float(info.get('latency_p50_ms', 0)),
+                'latency_p99_ms': float(info.get('latency_p99_ms', 0))
+            })
+        return result
+
+    def _latency_ms(self, percentile: float) -> float:
+        if not self._latencies:
+            return 0.0
+        return round(float(np.percentile(np.fromiter(self._latencies, float), percentile)) * 1000, 2)
+
+    # ==================== LIFECYCLE ====================
+
+    def _heartbeat_loop(self) -> None:
+        try:
+            import eventlet
+            sleep_func = eventlet.sleep
+        except ImportError:
+            sleep_func = time.sleep
+
+        while self._running:
+            self.elect()
+            try:
+                self.heartbeat()
+            except Exception as e:
+                logger.warning(f"Cluster: Heartbeat failed: {e}")
+            sleep_func(HEARTBEAT_INTERVAL)
+
+    def start(self, redis_client=None, on_elected: Optional[Callable] = None,
+              on_demoted: Optional[Callable] = None, connections: Optional[Callable[[], int]] = None) -> None:
+        """Join the cluster; the producer callbacks run when this node wins or loses the lease"""
+        from services.market.price_store import price_store
+
+        if self._running:
+            return
+        self._redis = redis_client
+        self._on_elected = on_elected
+        self._on_demoted = on_demoted
+        self._connections = connections
+        self._running = True
+
+        if redis_client is None:
+            # Single node: always the producer, nothing to distribute
+            self.elect()
+            logger.info(f"Cluster: Standalone node {self.node_id}")
+            return
+
+        price_store.add_listener(self.on_prices)
+        # Use eventlet.spawn_n for green thread compatibility
+        try:
+            import eventlet
+            eventlet.spawn_n(self._listen_ticks)
+            eventlet.spawn_n(self._heartbeat_loop)
+        except ImportError:
+            threading.Thread(target=self._listen_ticks, daemon=True).start()
+            threading.Thread(target=self._heartbeat_loop, daemon=True).start()
+        logger.info(f"Cluster: Node {self.node_id} joined")
+
+    def stop(self) -> None:
+        """Leave the cluster, handing the producer lease to the next node"""
+        from services.market.price_store import price_store
+
+        self._running = False
+        price_store.remove_listener(self.on_prices)
+        if self.is_leader:
+            self._demote()
+        if self._redis is not None:
+            try:
+                self._redis.eval(_RELEASE_SCRIPT, 1, LEADER_KEY, self.node_id)
+                self._redis.zrem(NODES_KEY, self.node_id)
+            except Exception as e:
+                logger.debug(f"Cluster: Leave failed: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'node_id': self.node_id,
+            'leader': self.is_leader,
+            'transport': 'redis' if self._redis is not None else 'local',
+            'latency_p50_ms': self._latency_ms(50),
+            'latency_p99_ms': self._latency_ms(99),
+            **self._stats
+        }
+
+
+# Global cluster node instance
+cluster_node = ClusterNode()
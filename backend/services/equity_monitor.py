@@ -0,0 +1,469 @@
+"""
+Equity Monitor - Mark-to-market drawdown checks on open positions
+Open trades are held as NumPy arrays grouped by symbol. Each price tick
+revalues only that symbol's positions, folds the change into per-challenge
+unrealized PnL and checks the daily/total loss limits of the challenges it
+touched, so a trader cannot run past a limit just by keeping losers open.
+"""
+
+import time
+import queue
+import threading
+import logging
+from typing import Dict, List, Optional, Tuple, Any
+
+import numpy as np
+
+from services.sltp_engine import book_key
+
+logger = logging.getLogger(__name__)
+
+# Seconds between snapshot rebuilds from the database
+REBUILD_INTERVAL = 5
+
+# Warn once a loss reaches this fraction of its limit
+WARNING_RATIO = 0.8
+
+# Seconds between repeated warnings of the same type for one challenge
+WARNING_COOLDOWN = 300
+
+# Seconds before a breach deferred for lack of a fresh price is retried
+BREACH_RETRY_DELAY = 5
+
+
+def _fresh_price(symbol: str) -> Optional[float]:
+    """Live or recently fetched price of symbol, fetching one if the store has none"""
+    from services.yfinance_service import get_current_price
+    return get_current_price(symbol, allow_fallback=False)
+
+
+def _breach(challenge_id: int, failure_type: str, limit: float) -> Tuple[int, str, str]:
+    label = 'total' if failure_type == 'max_total_loss' else 'daily'
+    return (challenge_id, failure_type,
+            f'Maximum {label} loss of {int(round(limit * 100))}% exceeded (floating equity)')
+
+
+class _SymbolPositions:
+    """Open positions on one symbol"""
+
+    __slots__ = ('entry', 'qty', 'local', 'owners', 'contrib')
+
+    def __init__(self, entry: np.ndarray, qty: np.ndarray, local: np.ndarray, owners: np.ndarray):
+        self.entry = entry      # entry price per position
+        self.qty = qty          # signed quantity (+buy / -sell)
+        self.local = local      # index into owners per position
+        self.owners = owners    # challenge row per distinct owner
+        self.contrib = np.zeros(len(owners))  # unrealized PnL per owner at the last tick
+
+
+class _Snapshot:
+    """Per-challenge balances and limits plus open positions, as of one rebuild"""
+
+    def __init__(self, size: int):
+        self.challenge_ids = np.zeros(size, dtype=np.int64)
+        self.user_ids = np.zeros(size, dtype=np.int64)
+        self.balance = np.zeros(size)
+        self.day_start = np.zeros(size)
+        self.initial = np.ones(size)
+        self.max_loss = np.zeros(size)
+        self.daily_loss = np.zeros(size)
+        self.unrealized = np.zeros(size)
+        self.active = np.ones(size, dtype=bool)
+        self.symbols: Dict[str, _SymbolPositions] = {}
+
+
+class EquityMonitor:
+    """
+    Real-time floating-equity drawdown monitor.
+
+    Usage:
+        equity_monitor.start(app)       # build snapshot, listen to ticks
+        equity_monitor.invalidate()     # after opening/closing trades
+    """
+
+    def __init__(self):
+        self._snapshot = _Snapshot(0)
+        self._lock = threading.Lock()
+        self._breaches: 'queue.Queue[Tuple[int, str, str]]' = queue.Queue()
+        self._deferred: Dict[int, Tuple[float, Tuple[int, str, str]]] = {}
+        self._warned: Dict[Tuple[int, str], float] = {}
+        self._dirty = True
+        self._last_rebuild = 0.0
+        self._app = None
+        self._running = False
+        self._stats = {'ticks': 0, 'rebuilds': 0, 'warnings': 0, 'breaches': 0, 'deferred_breaches': 0,
+                       'cleared_breaches': 0}
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    def invalidate(self) -> None:
+        """Request a snapshot rebuild (positions or balances changed)"""
+        self._dirty = True
+
+    # ==================== SNAPSHOT ====================
+
+    def build(self, challenges, trades, day_starts: Dict[int, Any], rules: Dict[int, dict],
+              prices: Optional[Dict[str, float]] = None) -> None:
+        """
+        Replace the snapshot.
+
+        Args:
+            challenges: UserChallenge-like rows (id, user_id, initial/current balance)
+            trades: (challenge_id, symbol, trade_type, quantity, entry_price) rows
+            day_starts: {challenge_id: day-start balance}
+            rules: {challenge_id: {'max_loss': .., 'daily_loss': ..}}
+            prices: Optional {symbol: price} to value positions before the first tick
+        """
+        snapshot = _Snapshot(len(challenges))
+        rows = {}
+        for i, challenge in enumerate(challenges):
+            rows[challenge.id] = i
+            snapshot.challenge_ids[i] = challenge.id
+            snapshot.user_ids[i] = challenge.user_id
+            snapshot.balance[i] = float(challenge.current_balance)
+            snapshot.day_start[i] = float(day_starts.get(challenge.id, challenge.current_balance))
+            snapshot.initial[i] = float(challenge.initial_balance) or 1.0
+            snapshot.max_loss[i] = rules[challenge.id]['max_loss']
+            snapshot.daily_loss[i] = rules[challenge.id]['daily_loss']
+
+        grouped: Dict[str, List[tuple]] = {}
+        for challenge_id, symbol, trade_type, quantity, entry_price in trades:
+            row = rows.get(challenge_id)
+            if row is None:
+                continue
+            qty = float(quantity) if trade_type == 'buy' else -float(quantity)
+            grouped.setdefault(book_key(symbol), []).append((row, float(entry_price), qty))
+
+        for key, positions in grouped.items():
+            owner_rows = np.array([p[0] for p in positions], dtype=np.int64)
+            owners, local = np.unique(owner_rows, return_inverse=True)
+            snapshot.symbols[key] = _SymbolPositions(
+                entry=np.array([p[1] for p in positions]),
+                qty=np.array([p[2] for p in positions]),
+                local=local,
+                owners=owners
+            )
+
+        with self._lock:
+            self._snapshot = snapshot
+
+        for key, price in (prices or {}).items():
+            self.on_tick(key, price)
+
+    def rebuild(self) -> int:
+        """Rebuild the snapshot from open trades (requires an app context)"""
+        from models import db, Trade, UserChallenge
+        from services.challenge_engine import ChallengeEngine
+        from services.yfinance_service import get_usable_record
+
+        self._dirty = False
+        self._last_rebuild = time.time()
+
+        trades = db.session.query(
+            Trade.challenge_id, Trade.symbol, Trade.trade_type, Trade.quantity, Trade.entry_price
+        ).filter(Trade.status == 'open').all()
+
+        challenge_ids = {trade[0] for trade in trades}
+        challenges = UserChallenge.query.filter(
+            UserChallenge.id.in_(challenge_ids),
+            UserChallenge.status.in_(['active', 'funded'])
+        ).all() if challenge_ids else []
+
+        engine = ChallengeEngine()
+        phase_rules = {}
+        rules = {}
+        for challenge in challenges:
+            phase = challenge.phase or 'evaluation'
+            if phase not in phase_rules:
+                phase_rules[phase] = engine.get_phase_rules(phase)
+            rules[challenge.id] = phase_rules[phase]
+
+        # Only live or recent prices seed the valuation; stale ones could
+        # report a breach that is not there (ticks value the rest)
+        prices = {}
+        for _, symbol, _, _, _ in trades:
+            record = get_usable_record(symbol.upper())
+            if record is not None and record.last:
+                prices[book_key(symbol)] = float(record.last)
+
+        self.build(challenges, trades, engine.day_start_balances(challenges), rules, prices)
+        self._stats['rebuilds'] += 1
+        return len(challenges)
+
+    # ==================== TICKS ====================
+
+    def on_tick(self, symbol: str, price: float) -> List[Tuple[int, str, str]]:
+        """
+        Revalue one symbol's positions and check the challenges holding it.
+        Returns the (challenge_id, failure_type, message) breaches found.
+        """
+        snapshot = self._snapshot
+        positions = snapshot.symbols.get(book_key(symbol))
+        if positions is None or not price:
+            return []
+
+        with self._lock:
+            self._stats['ticks'] += 1
+            contrib = np.bincount(positions.local, weights=(price - positions.entry) * positions.qty,
+                                  minlength=len(positions.owners))
+            snapshot.unrealized[positions.owners] += contrib - positions.contrib
+            positions.contrib = contrib
+
+            rows = positions.owners[snapshot.active[positions.owners]]
+            if not len(rows):
+                return []
+            equity = snapshot.balance[rows] + snapshot.unrealized[rows]
+            initial = snapshot.initial[rows]
+            total_loss = (initial - equity) / initial
+            daily_loss = (snapshot.day_start[rows] - equity) / initial
+
+            breach_total = total_loss >= snapshot.max_loss[rows]
+            breach_daily = ~breach_total & (daily_loss >= snapshot.daily_loss[rows])
+            breached = breach_total | breach_daily
+            snapshot.active[rows[breached]] = False
+
+            warn_total = ~breached & (total_loss >= snapshot.max_loss[rows] * WARNING_RATIO)
+            warn_daily = ~breached & (daily_loss >= snapshot.daily_loss[rows] * WARNING_RATIO)
+
+        breaches = []
+        for i in np.flatnonzero(breached):
+            row = rows[i]
+            challenge_id = int(snapshot.challenge_ids[row])
+            if breach_total[i]:
+                breach = _breach(challenge_id, 'max_total_loss', snapshot.max_loss[row])
+            else:
+                breach = _breach(challenge_id, 'max_daily_loss', snapshot.daily_loss[row])
+            breaches.append(breach)
+            self._breaches.put(breach)
+        self._stats['breaches'] += len(breaches)
+
+        for mask, losses, limits, warning_type in (
+            (warn_total, total_loss, snapshot.max_loss, 'total_loss'),
+            (warn_daily, daily_loss, snapshot.daily_loss, 'daily_loss')
+        ):
+            for i in np.flatnonzero(mask):
+                self._warn(snapshot, rows[i], warning_type, losses[i], limits[rows[i]])
+
+        return breaches
+
+    def _warn(self, snapshot: _Snapshot, row: int, warning_type: str, loss: float, limit: float) -> None:
+        challenge_id = int(snapshot.challenge_ids[row])
+        now = time.time()
+        if now - self._warned.get((challenge_id, warning_type), 0) < WARNING_COOLDOWN:
+            return
+        if len(self._warned) > 10000:
+            self._warned = {k: t for k, t in self._warned.items() if now - t < WARNING_COOLDOWN}
+        self._warned[(challenge_id, warning_type)] = now
+        self._stats['warnings'] += 1
+
+        from services.websocket_service import notify_challenge_warning
+        label = 'daily' if warning_type == 'daily_loss' else 'total'
+        try:
+            notify_challenge_warning(
+                int(snapshot.user_ids[row]),
+                warning_type,
+                f'Floating {label} loss is at {loss * 100:.2f}% of a {limit * 100:.0f}% limit',
+                round(float(loss) * 100, 2),
+                round(float(limit) * 100, 2)
+            )
+        except Exception as e:
+            logger.debug(f"Equity Monitor: Warning notification failed: {e}")
+
+    def on_prices(self, records: Dict[str, Any]) -> None:
+        """Price store listener: feed every written record through on_tick"""
+        for symbol, record in records.items():
+            self.on_tick(symbol, record.last)
+
+    # ==================== BREACHES ====================
+
+    def process_breaches(self, breaches: List[Tuple[int, str, str]]) -> int:
+        """
+        Re-check breached challenges at fresh prices, then close their open
+        trades at those prices and fail them through the standard failure
+        path, in one transaction. A challenge back inside its limits is left
+        alone; one with a position that has no fresh price is left open and
+        retried after BREACH_RETRY_DELAY. Requires an app context.
+        """
+        from models import db, Trade, UserChallenge
+        from services.challenge_engine import ChallengeEngine
+        from services.sltp_engine import settle_trades, sltp_engine
+        from services.websocket_service import notify_challenge_status
+
+        reasons = {challenge_id: (failure_type, message) for challenge_id, failure_type, message in breaches}
+        try:
+            open_trades = db.session.query(
+                Trade.id, Trade.challenge_id, Trade.symbol, Trade.trade_type, Trade.quantity, Trade.entry_price
+            ).filter(
+                Trade.challenge_id.in_(list(reasons.keys())),
+                Trade.status == 'open'
+            ).all()
+            prices = {symbol: _fresh_price(symbol) for symbol in {row.symbol for row in open_trades}}
+            unpriced = {row.challenge_id for row in open_trades if prices[row.symbol] is None}
+            for challenge_id in unpriced:
+                self._defer((challenge_id,) + reasons.pop(challenge_id))
+
+            challenges = {
+                challenge.id: challenge for challenge in UserChallenge.query.filter(
+                    UserChallenge.id.in_(list(reasons.keys())),
+                    UserChallenge.status.in_(['active', 'funded'])
+                ).all()
+            } if reasons else {}
+            confirmed = self._confirm_breaches(challenges, open_trades, prices)
+            closes = {row.id: prices[row.symbol] for row in open_trades if row.challenge_id in confirmed}
+
+            closed, _ = settle_trades(closes)
+
+            engine = ChallengeEngine()
+            failed = []
+            for challenge_id, (_, failure_type, message) in confirmed.items():
+                challenge = challenges[challenge_id]
+                result = engine.fail_challenge(challenge, failure_type, message)
+                if result.get('changed'):
+                    failed.append((challenge, message))
+            db.session.commit()
+        except Exception as e:
+            logger.error(f"Equity Monitor: Failed to process {len(reasons)} breach(es): {e}")
+            db.session.rollback()
+            self.invalidate()
+            return 0
+
+        for trade, _, _ in closed:
+            sltp_engine.remove(trade.id)
+        for challenge, message in failed:
+            logger.info(f"Equity Monitor: Challenge #{challenge.id} failed - {message}")
+            try:
+                notify_challenge_status(challenge.user_id, {
+                    'challenge_id': challenge.id,
+                    'status': challenge.status,
+                    'reason': message
+                })
+            except Exception as e:
+                logger.debug(f"Equity Monitor: Status notification failed: {e}")
+
+        self.invalidate()
+        return len(failed)
+
+    def _confirm_breaches(self, challenges: Dict[int, Any], open_trades,
+                          prices: Dict[str, Optional[float]]) -> Dict[int, Tuple[int, str, str]]:
+        """Breaches of the challenges whose equity at the fresh prices is still past a limit"""
+        from services.challenge_engine import ChallengeEngine
+
+        engine = ChallengeEngine()
+        day_starts = engine.day_start_balances(challenges.values())
+        unrealized: Dict[int, float] = {challenge_id: 0.0 for challenge_id in challenges}
+        for row in open_trades:
+            if row.challenge_id in unrealized:
+                qty = float(row.quantity) if row.trade_type == 'buy' else -float(row.quantity)
+                unrealized[row.challenge_id] += (prices[row.symbol] - float(row.entry_price)) * qty
+
+        confirmed = {}
+        for challenge_id, challenge in challenges.items():
+            rules = engine.get_phase_rules(challenge.phase or 'evaluation')
+            initial = float(challenge.initial_balance) or 1.0
+            equity = float(challenge.current_balance) + unrealized[challenge_id]
+            day_start = float(day_starts.get(challenge_id, challenge.current_balance))
+            if (initial - equity) / initial >= rules['max_loss']:
+                confirmed[challenge_id] = _breach(challenge_id, 'max_total_loss', rules['max_loss'])
+            elif (day_start - equity) / initial >= rules['daily_loss']:
+                confirmed[challenge_id] = _breach(challenge_id, 'max_daily_loss', rules['daily_loss'])
+            else:
+                logger.info(f"Equity Monitor: Challenge #{challenge_id} is within its limits at fresh prices")
+                self._stats['cleared_breaches'] += 1
+        return confirmed
+
+    def _defer(self, breach: Tuple[int, str, str]) -> None:
+        logger.warning(f"Equity Monitor: No fresh price for challenge #{breach[0]}, retrying breach")
+        self._deferred[breach[0]] = (time.time() + BREACH_RETRY_DELAY, breach)
+        self._stats['deferred_breaches'] += 1
+
+    def _drain(self) -> List[Tuple[int, str, str]]:
+        now = time.time()
+        breaches = [breach for due, breach in self._deferred.values() if due <= now]
+        for breach in breaches:
+            del self._deferred[breach[0]]
+        while True:
+            try:
+                breaches.append(self._breaches.get_nowait())
+            except queue.Empty:
+                return breaches
+
+    def _monitor_loop(self) -> None:
+        while self._running:
+            try:
+                first = self._breaches.get(timeout=0.25)
+                breaches = [first] + self._drain()
+            except queue.Empty:
+                breaches = self._drain()
+
+            try:
+                with self._app.app_context():
+                    if breaches:
+                        self.process_breaches(breaches)
+                    if self._dirty or time.time() - self._last_rebuild >= REBUILD_INTERVAL:
+                        self.rebuild()
+            except Exception as e:
+                logger.error(f"Equity Monitor: Loop error: {e}")
+
+    # ==================== LIFECYCLE ====================
+
+    def start(self, app) -> None:
+        """Build the snapshot, subscribe to price writes and start the monitor loop"""
+        from services.market.price_store import price_store
+
+        if self._running:
+            return
+        self._app = app
+
+        with app.app_context():
+            try:
+                count = self.rebuild()
+                logger.info(f"Equity Monitor: Tracking {count} challenge(s) with open positions")
+            except Exception as e:
+                logger.warning(f"Equity Monitor: Initial snapshot failed: {e}")
+
+        self._running = True
+        price_store.add_listener(self.on_prices)
+
+        # Use eventlet.spawn_n for green thread compatibility
+        try:
+            import eventlet
+            eventlet.spawn_n(self._monitor_loop)
+        except ImportError:
+            threading.Thread(target=self._monitor_loop, daemon=True).start()
+
+    def stop(self) -> None:
+        from services.market.price_store import price_store
+
+        self._running = False
+        price_store.remove_listener(self.on_prices)
+
+    def get_equity(self, challenge_id: int) -> Optional[Dict[str, float]]:
+        """Get the floating equity of a challenge with open positions"""
+        snapshot = self._snapshot
+        rows = np.flatnonzero(snapshot.challenge_ids == challenge_id)
+        if not len(rows):
+            return None
+        row = rows[0]
+        return {
+            'balance': round(float(snapshot.balance[row]), 2),
+            'unrealized_pnl': round(float(snapshot.unrealized[row]), 2),
+            'equity': round(float(snapshot.balance[row] + snapshot.unrealized[row]), 2)
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        snapshot = self._snapshot
+        return {
+            'running': self._running,
+            'challenges': len(snapshot.challenge_ids),
+            'symbols': len(snapshot.symbols),
+            'positions': sum(len(p.entry) for p in snapshot.symbols.values()),
+            'pending_breaches': self._breaches.qsize(),
+            'retrying_breaches': len(self._deferred),
+            **self._stats
+        }
+
+
+# Global equity monitor instance
+equity_monitor = EquityMonitor()
@@ -0,0 +1,455 @@
+"""
+Leaderboard Service - Incrementally maintained rankings in sorted sets
+Trading profit (all time, last 30 days, last 7 days by challenge start) and
+points (lifetime, this month, this week) are kept as Redis ZSETs, or as
+in-process sorted lists when Redis is unavailable. Trade closes, challenge
+status changes and points awards update the scores, so top-N and rank
+reads are logarithmic; rebuild() reconciles the sets with the database.
+"""
+
+import time
+import threading
+import logging
+from bisect import bisect_left, insort
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from typing import Dict, Iterable, List, Optional, Tuple, Any
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'tradesense_lb:'
+
+# Challenge statuses that rank on the trading leaderboard
+RANKED_STATUSES = ('active', 'passed')
+
+# Rolling windows of the trading leaderboard (days since challenge start)
+PROFIT_WINDOWS = {'month': 30, 'week': 7}
+
+# Seconds a Redis build stays trusted before a read triggers a rebuild
+# (the hourly reconciliation task refreshes it well before then)
+BUILT_TTL = 2 * 3600
+
+# Seconds between rebuilds of the in-process fallback, whose sets only see
+# the updates made by this worker
+MEMORY_REBUILD_INTERVAL = 300
+
+# Seconds the calendar points boards outlive their period
+POINTS_PERIOD_TTL = {'month': 32 * 86400, 'week': 8 * 86400}
+
+# Default number of rows returned
+DEFAULT_LIMIT = 20
+
+# Session.info keys of the challenges to re-rank once the session commits
+_PENDING_KEY = 'leaderboard_pending'
+_COMMITTING_KEY = 'leaderboard_committing'
+
+# Challenge fields update_challenge reads
+_CHALLENGE_FIELDS = ('id', 'status', 'initial_balance', 'current_balance', 'start_date')
+
+
+def _profit_pct(initial, current) -> float:
+    if not initial:
+        return 0.0
+    return float((current - initial) / initial * 100)
+
+
+def _points_period_keys(at: datetime) -> Dict[str, str]:
+    """Calendar month and week (from Monday) keys of the points boards"""
+    week_start = (at - timedelta(days=at.weekday())).date()
+    return {
+        'month': f"points:month:{at.strftime('%Y-%m')}",
+        'week': f"points:week:{week_start.isoformat()}",
+    }
+
+
+class _SortedSet:
+    """Members ordered by descending score, kept in a bisected list"""
+
+    __slots__ = ('scores', 'entries')
+
+    def __init__(self):
+        self.scores: Dict[str, float] = {}
+        self.entries: List[Tuple[float, str]] = []   # (-score, member), ascending
+
+    def add(self, member: str, score: float) -> None:
+        self.remove(member)
+        self.scores[member] = score
+        insort(self.entries, (-score, member))
+
+    def remove(self, member: str) -> None:
+        old = self.scores.pop(member, None)
+        if old is not None:
+            del self.entries[bisect_left(self.entries, (-old, member))]
+
+    def top(self, n: int) -> List[Tuple[str, float]]:
+        return [(member, -score) for score, member in self.entries[:n]]
+
+    def count_above(self, score: float) -> int:
+        return bisect_left(self.entries, (-score,))
+
+    def at_most(self, score: float) -> List[str]:
+        return [member for _, member in self.entries[bisect_left(self.entries, (-score,)):]]
+
+
+class _MemoryBoards:
+    """In-process stand-in for the Redis sorted sets"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sets: Dict[str, _SortedSet] = {}
+        self.built_at = 0.0
+
+    def is_built(self) -> bool:
+        return time.time() - self.built_at < MEMORY_REBUILD_INTERVAL
+
+    def replace(self, boards: Dict[str, Dict[str, float]]) -> None:
+        sets = {}
+        for key, mapping in boards.items():
+            board = sets[key] = _SortedSet()
+            for member, score in mapping.items():
+                board.add(member, score)
+        with self._lock:
+            self._sets = sets
+            self.built_at = time.time()
+
+    def add(self, key: str, mapping: Dict[str, float]) -> None:
+        with self._lock:
+            board = self._sets.setdefault(key, _SortedSet())
+            for member, score in mapping.items():
+                board.add(member, score)
+
+    def incr(self, key: str, member: str, amount: float, ttl: int) -> None:
+        with self._lock:
+            board = self._sets.setdefault(key, _SortedSet())
+            board.add(member, board.scores.get(member, 0) + amount)
+
+    def remove(self, keys: Iterable[str], member: str) -> None:
+        with self._lock:
+            for key in keys:
+                if key in self._sets:
+                    self._sets[key].remove(member)
+
+    def top(self, key: str, n: int) -> List[Tuple[str, float]]:
+        board = self._sets.get(key)
+        return board.top(n) if board else []
+
+    def count_above(self, key: str, score: float) -> int:
+        board = self._sets.get(key)
+        return board.count_above(score) if board else 0
+
+    def at_most(self, key: str, score: float) -> List[str]:
+        board = self._sets.get(key)
+        return board.at_most(score) if board else []
+
+
+class _RedisBoards:
+    """Sorted sets in Redis, shared by every worker"""
+
+    BUILT_KEY = KEY_PREFIX + 'built'
+
+    def __init__(self, client):
+        self._redis = client
+
+    def is_built(self) -> bool:
+        return bool(self._redis.exists(self.BUILT_KEY))
+
+    def replace(self, boards: Dict[str, Dict[str, float]]) -> None:
+        # Write each board to a temporary key and swap it in, so readers
+        # never see a half-built set
+        pipe = self._redis.pipeline(transaction=False)
+        for key, mapping in boards.items():
+            full_key = KEY_PREFIX + key
+            if not mapping:
+                pipe.delete(full_key)
+                continue
+            temp_key = f"{full_key}:rebuild"
+            pipe.delete(temp_key)
+            items = list(mapping.items())
+            for start in range(0, len(items), 1000):
+                pipe.zadd(temp_key, dict(items[start:start + 1000]))
+            pipe.rename(temp_key, full_key)
+            for period, ttl in POINTS_PERIOD_TTL.items():
+                if key.startswith(f"points:{period}:"):
+                    pipe.expire(full_key, ttl)
+        pipe.set(self.BUILT_KEY, int(time.time()), ex=BUILT_TTL)
+        pipe.execute()
+
+    def add(self, key: str, mapping: Dict[str, float]) -> None:
+        self._redis.zadd(KEY_PREFIX + key, mapping)
+
+    def incr(self, key: str, member: str, amount: float, ttl: int) -> None:
+        pipe = self._redis.pipeline(transaction=False)
+        pipe.zincrby(KEY_PREFIX + key, amount, member)
+        pipe.expire(KEY_PREFIX + key, ttl)
+        pipe.execute()
+
+    def remove(self, keys: Iterable[str], member: str) -> None:
+        pipe = self._redis.pipeline(transaction=False)
+        for key in keys:
+            pipe.zrem(KEY_PREFIX + key, member)
+        pipe.execute()
+
+    def top(self, key: str, n: int) -> List[Tuple[str, float]]:
+        rows = self._redis.zrevrange(KEY_PREFIX + key, 0, n - 1, withscores=True)
+        return [(member.decode() if isinstance(member, bytes) else member, score) for member, score in rows]
+
+    def count_above(self, key: str, score: float) -> int:
+        return self._redis.zcount(KEY_PREFIX + key, f"({score}", '+inf')
+
+    def at_most(self, key: str, score: float) -> List[str]:
+        members = self._redis.zrangebyscore(KEY_PREFIX + key, '-inf', score)
+        return [member.decode() if isinstance(member, bytes) else member for member in members]
+
+
+class LeaderboardService:
+    """
+    Trading and points leaderboards.
+
+    Usage:
+        leaderboards.update_challenge(challenge)      # after a committed balance/status change
+        leaderboards.update_challenge_on_commit(challenge, db.session)
+        leaderboards.record_points(user_id, 25, balance.lifetime_earned)
+        leaderboards.get_trading_leaderboard('week', limit=10)
+        leaderboards.get_trading_rank(user_id)
+    """
+
+    def __init__(self):
+        self._memory = _MemoryBoards()
+        self._build_lock = threading.Lock()
+
+    def _boards(self):
+        from services.cache_service import get_redis_client
+
+        client = get_redis_client()
+        return _RedisBoards(client) if client is not None else self._memory
+
+    def _ready(self):
+        """Boards for this request, built from the database if they are missing"""
+        boards = self._boards()
+        try:
+            if not boards.is_built():
+                with self._build_lock:
+                    if not boards.is_built():
+                        self.rebuild(boards)
+        except Exception as e:
+            logger.warning(f"Leaderboard build failed: {e}")
+        return boards
+
+    # ==================== UPDATES ====================
+
+    def update_challenge(self, challenge) -> None:
+        """Re-rank a challenge after its balance or status changed"""
+        if challenge.id is None:
+            return
+        member = str(challenge.id)
+        try:
+            boards = self._boards()
+            if challenge.status not in RANKED_STATUSES:
+                keys = ['profit:all']
+                for period in PROFIT_WINDOWS:
+                    keys += [f"profit:{period}", f"profit:{period}:start"]
+                boards.remove(keys, member)
+                return
+
+            score = _profit_pct(challenge.initial_balance, challenge.current_balance)
+            start = challenge.start_date or datetime.utcnow()
+            boards.add('profit:all', {member: score})
+            for period, days in PROFIT_WINDOWS.items():
+                if start >= datetime.utcnow() - timedelta(days=days):
+                    boards.add(f"profit:{period}", {member: score})
+                    boards.add(f"profit:{period}:start", {member: start.timestamp()})
+        except Exception as e:
+            logger.warning(f"Leaderboard update for challenge {challenge.id} failed: {e}")
+
+    def update_challenge_on_commit(self, challenge, session) -> None:
+        """Re-rank a challenge once session commits its change (dropped on rollback)"""
+        session.info.setdefault(_PENDING_KEY, {})[id(challenge)] = challenge
+
+    def record_points(self, user_id: int, points: int, lifetime_earned: int,
+                      at: Optional[datetime] = None) -> None:
+        """Apply a points transaction (call after it is committed)"""
+        member = str(user_id)
+        try:
+            boards = self._boards()
+            boards.add('points:all', {member: lifetime_earned})
+            if points > 0:
+                keys = _points_period_keys(at or datetime.utcnow())
+                for period, key in keys.items():
+                    boards.incr(key, member, points, ttl=POINTS_PERIOD_TTL[period])
+        except Exception as e:
+            logger.warning(f"Leaderboard points update for user {user_id} failed: {e}")
+
+    # ==================== RECONCILIATION ====================
+
+    def rebuild(self, boards=None) -> Dict[str, int]:
+        """Recompute every board from the database and swap it in"""
+        from models import db, UserChallenge, PointsBalance, PointsTransaction
+
+        boards = boards or self._boards()
+        now = datetime.utcnow()
+
+        profit: Dict[str, Dict[str, float]] = {'profit:all': {}}
+        for period in PROFIT_WINDOWS:
+            profit[f"profit:{period}"] = {}
+            profit[f"profit:{period}:start"] = {}
+        rows = db.session.query(
+            UserChallenge.id, UserChallenge.initial_balance, UserChallenge.current_balance, UserChallenge.start_date
+        ).filter(UserChallenge.status.in_(RANKED_STATUSES)).all()
+        for challenge_id, initial, current, start in rows:
+            member = str(challenge_id)
+            score = _profit_pct(initial, current)
+            start = start or now
+            profit['profit:all'][member] = score
+            for period, days in PROFIT_WINDOWS.items():
+                if start >= now - timedelta(days=days):
+                    profit[f"profit:{period}"][member] = score
+                    profit[f"profit:{period}:start"][member] = start.timestamp()
+
+        points = {'points:all': {
+            str(user_id): lifetime or 0
+            for user_id, lifetime in db.session.query(PointsBalance.user_id, PointsBalance.lifetime_earned)
+        }}
+        keys = _points_period_keys(now)
+        month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        week_start = (now - timedelta(days=now.weekday())).replace(hour=0, minute=0, second=0, microsecond=0)
+        for period, since in (('month', month_start), ('week', week_start)):
+            points[keys[period]] = {
+                str(user_id): int(total or 0)
+                for user_id, total in db.session.query(
+                    PointsTransaction.user_id, db.func.sum(PointsTransaction.points)
+                ).filter(
+                    PointsTransaction.created_at >= since,
+                    PointsTransaction.points > 0
+                ).group_by(PointsTransaction.user_id)
+            }
+
+        boards.replace({**profit, **points})
+        counts = {key: len(mapping) for key, mapping in {**profit, **points}.items()}
+        logger.info(f"Leaderboards rebuilt: {counts}")
+        return counts
+
+    # ==================== READS ====================
+
+    def _prune_window(self, boards, period: str) -> None:
+        """Drop challenges that started before a rolling window"""
+        cutoff = (datetime.utcnow() - timedelta(days=PROFIT_WINDOWS[period])).timestamp()
+        for member in boards.at_most(f"profit:{period}:start", cutoff):
+            boards.remove([f"profit:{period}", f"profit:{period}:start"], member)
+
+    def get_trading_leaderboard(self, period: str = 'all', limit: int = 10) -> List[Dict[str, Any]]:
+        """Top challenges by profit percentage"""
+        from models import db, User, UserChallenge
+
+        boards = self._ready()
+        if period not in PROFIT_WINDOWS:
+            period = 'all'
+        else:
+            self._prune_window(boards, period)
+
+        top = boards.top(f"profit:{period}", limit)
+        if not top:
+            return []
+
+        ids = [int(member) for member, _ in top]
+        rows = {
+            row.challenge_id: row for row in db.session.query(
+                UserChallenge.id.label('challenge_id'),
+                User.id,
+                User.username,
+                User.avatar,
+                UserChallenge.initial_balance,
+                UserChallenge.current_balance,
+                UserChallenge.plan_type,
+                UserChallenge.status,
+                UserChallenge.start_date
+            ).join(User, User.id == UserChallenge.user_id).filter(UserChallenge.id.in_(ids))
+        }
+
+        leaderboard = []
+        for challenge_id in ids:
+            row = rows.get(challenge_id)
+            if row is None:
+                continue
+            leaderboard.append({
+                'rank': len(leaderboard) + 1,
+                'user_id': row.id,
+                'username': row.username,
+                'avatar': row.avatar,
+                'initial_balance': float(row.initial_balance),
+                'current_balance': float(row.current_balance),
+                'profit_percentage': round(_profit_pct(row.initial_balance, row.current_balance), 2),
+                'plan_type': row.plan_type,
+                'status': row.status,
+                'start_date': row.start_date.isoformat() if row.start_date else None
+            })
+        return leaderboard
+
+    def get_challenge_rank(self, challenge) -> int:
+        """1 + the number of ranked challenges with a higher profit percentage"""
+        boards = self._ready()
+        score = _profit_pct(challenge.initial_balance, challenge.current_balance)
+        return boards.count_above('profit:all', score) + 1
+
+    def get_points_leaderboard(self, period: str = 'all', limit: int = DEFAULT_LIMIT) -> List[Dict[str, Any]]:
+        """Top users by points earned (lifetime, calendar month or week)"""
+        from models import db, User, PointsBalance
+
+        boards = self._ready()
+        key = _points_period_keys(datetime.utcnow()).get(period, 'points:all')
+        top = boards.top(key, limit)
+        if not top:
+            return []
+
+        ids = [int(member) for member, _ in top]
+        users = {
+            user_id: (username, level) for user_id, username, level in db.session.query(
+                User.id, User.username, PointsBalance.level
+            ).outerjoin(PointsBalance, PointsBalance.user_id == User.id).filter(User.id.in_(ids))
+        }
+
+        leaderboard = []
+        for user_id, points in zip(ids, (score for _, score in top)):
+            if user_id not in users:
+                continue
+            username, level = users[user_id]
+            entry = {
+                'rank': len(leaderboard) + 1,
+                'user_id': user_id,
+                'username': username,
+                'points': int(points)
+            }
+            if key == 'points:all':
+                entry['level'] = level
+            leaderboard.append(entry)
+        return leaderboard
+
+
+@event.listens_for(Session, 'before_commit')
+def _capture_pending(session) -> None:
+    # Read the values being committed now: after the commit they are expired
+    # and the session can no longer load them
+    pending = session.info.pop(_PENDING_KEY, None)
+    if pending:
+        session.info[_COMMITTING_KEY] = [
+            SimpleNamespace(**{field: getattr(challenge, field) for field in _CHALLENGE_FIELDS})
+            for challenge in pending.values()
+        ]
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_pending(session) -> None:
+    for challenge in session.info.pop(_COMMITTING_KEY, ()):
+        leaderboards.update_challenge(challenge)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _drop_pending(session) -> None:
+    session.info.pop(_PENDING_KEY, None)
+    session.info.pop(_COMMITTING_KEY, None)
+
+
+# Global leaderboard service instance
+leaderboards = LeaderboardService()
@@ -0,0 +1,448 @@
+"""
+Candle Store - Persistent per-symbol, per-interval OHLCV columns
+Each series is a directory of append-only column files (time, open, high,
+low, close, volume) read through NumPy memmaps, so a range read is a binary
+search on the time column and zero-copy slices of the others. Series fill
+incrementally: missing history and stale tails come from the upstream
+source, and the forming bar follows our own tick stream in between. Ticks
+are buffered and written by a flush loop, one locked write per series.
+"""
+
+import os
+import re
+import calendar
+import json
+import time
+import threading
+import logging
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple, Any
+
+import numpy as np
+
+from services.sltp_engine import book_key
+
+try:
+    import fcntl
+except ImportError:     # Windows: single-process development only
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ROOT = os.getenv(
+    'CANDLE_STORE_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'instance', 'candles')
+)
+
+COLUMNS = (('time', np.int64), ('open', np.float64), ('high', np.float64),
+           ('low', np.float64), ('close', np.float64), ('volume', np.int64))
+
+# Bar length in seconds per upstream interval
+INTERVAL_SECONDS = {
+    '1m': 60, '2m': 120, '5m': 300, '15m': 900, '30m': 1800, '60m': 3600,
+    '90m': 5400, '1h': 3600, '1d': 86400, '5d': 432000, '1wk': 604800, '1mo': 2629800,
+}
+
+# Calendar seconds covered by an upstream period ('1d'/'5d' are sessions,
+# so they reach back far enough to include a weekend and a holiday)
+PERIOD_SECONDS = {
+    '1d': 4 * 86400, '5d': 9 * 86400, '1mo': 31 * 86400, '3mo': 92 * 86400,
+    '6mo': 183 * 86400, '1y': 366 * 86400, '2y': 731 * 86400, '5y': 1827 * 86400,
+    '10y': 3653 * 86400,
+}
+
+# Periods counted in trading sessions rather than calendar time
+PERIOD_SESSIONS = {'1d': 1, '5d': 5}
+
+# Longest time a series tail is trusted before it is synced upstream again
+MAX_SYNC_AGE = 3600
+
+# Memmapped series kept open per process
+MAX_OPEN_SERIES = 256
+
+# Seconds between writes of the buffered ticks
+FLUSH_INTERVAL = 1.0
+
+# Fetcher signature: (symbol, interval, period=None, start=None) -> column arrays or None
+Fetcher = Callable[..., Optional[Dict[str, np.ndarray]]]
+
+
+def period_start(period: str, now: float) -> float:
+    """Earliest time an upstream period reaches back to"""
+    if period == 'max':
+        return 0
+    if period == 'ytd':
+        return calendar.timegm((time.gmtime(now).tm_year, 1, 1, 0, 0, 0))
+    return now - PERIOD_SECONDS.get(period, PERIOD_SECONDS['1mo'])
+
+
+def _safe_name(symbol: str) -> str:
+    return re.sub(r'[^A-Za-z0-9._^-]', '_', book_key(symbol))
+
+
+class CandleSeries:
+    """One symbol/interval: column files, their memmaps and sync metadata"""
+
+    def __init__(self, path: str, interval: str):
+        self.path = path
+        self.interval = interval
+        self.step = INTERVAL_SECONDS.get(interval, 86400)
+        self._maps: Dict[str, np.ndarray] = {}
+        self._state: Tuple[int, tuple] = (-1, ())
+        self.meta = self._read_meta()
+
+    # ==================== FILES ====================
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, f"{name}.bin")
+
+    def _read_meta(self) -> Dict[str, float]:
+        try:
+            with open(os.path.join(self.path, 'meta.json')) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_meta(self) -> None:
+        target = os.path.join(self.path, 'meta.json')
+        with open(target + '.tmp', 'w') as f:
+            json.dump(self.meta, f)
+        os.replace(target + '.tmp', target)
+
+    def _disk_state(self) -> Tuple[int, tuple]:
+        """
+        Complete rows on disk (a torn append leaves columns of unequal length)
+        and the file identities, which change when a series is rewritten
+        """
+        rows, identity = [], []
+        for name, dtype in COLUMNS:
+            try:
+                stat = os.stat(self._file(name))
+            except OSError:
+                return 0, ()
+            rows.append(stat.st_size // np.dtype(dtype).itemsize)
+            identity.append(stat.st_ino)
+        return min(rows), tuple(identity)
+
+    @contextmanager
+    def locked(self):
+        """Exclusive write access across processes sharing the directory"""
+        os.makedirs(self.path, exist_ok=True)
+        with open(os.path.join(self.path, '.lock'), 'a') as lock:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                self.meta = self._read_meta()
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    # ==================== READS ====================
+
+    def columns(self) -> Dict[str, np.ndarray]:
+        """Memmapped columns, remapped when the files grew or were rewritten"""
+        state = self._disk_state()
+        if state != self._state:
+            rows = state[0]
+            self._maps = {
+                name: (np.memmap(self._file(name), dtype=dtype, mode='r', shape=(rows,))
+                       if rows else np.empty(0, dtype=dtype))
+                for name, dtype in COLUMNS
+            }
+            self._state = state
+        return self._maps
+
+    def __len__(self) -> int:
+        return len(self.columns()['time'])
+
+    def last_bar(self) -> Optional[Dict[str, Any]]:
+        """The newest bar as plain values"""
+        columns = self.columns()
+        if not len(columns['time']):
+            return None
+        return {name: column[-1].item() for name, column in columns.items()}
+
+    def slice(self, start: float = 0, end: Optional[float] = None) -> Dict[str, np.ndarray]:
+        """Zero-copy views of the bars with start <= time < end"""
+        columns = self.columns()
+        times = columns['time']
+        lo = int(np.searchsorted(times, start, side='left'))
+        hi = len(times) if end is None else int(np.searchsorted(times, end, side='left'))
+        return {name: column[lo:hi] for name, column in columns.items()}
+
+    def last_sessions(self, sessions: int) -> Dict[str, np.ndarray]:
+        """Bars of the newest N trading days (UTC days) of the series"""
+        columns = self.columns()
+        times = columns['time']
+        if not len(times):
+            return columns
+        if self.step >= 86400:
+            lo = max(len(times) - sessions, 0)
+        else:
+            # Only the tail can hold the last sessions; search a bounded window
+            window = times[max(len(times) - (sessions + 1) * 86400 // self.step, 0):]
+            boundaries = np.flatnonzero(np.diff(window // 86400)) + 1
+            first = boundaries[-sessions] if len(boundaries) >= sessions else 0
+            lo = len(times) - len(window) + int(first)
+        return {name: column[lo:] for name, column in columns.items()}
+
+    # ==================== WRITES (call under locked()) ====================
+    # Files are never shrunk in place: another process may have them mapped,
+    # and reading a mapped page past the end of a file is a SIGBUS.
+
+    def write_at(self, row: int, bars: Dict[str, np.ndarray]) -> None:
+        """Write bars from a row onwards, overwriting and then extending the columns"""
+        for name, dtype in COLUMNS:
+            path = self._file(name)
+            with open(path, 'r+b' if os.path.exists(path) else 'wb') as f:
+                f.seek(row * np.dtype(dtype).itemsize)
+                f.write(np.ascontiguousarray(bars[name], dtype=dtype).tobytes())
+
+    def rewrite(self, bars: Dict[str, np.ndarray]) -> None:
+        """Replace every column file (readers keep their old mapping until they remap)"""
+        os.makedirs(self.path, exist_ok=True)
+        for name, dtype in COLUMNS:
+            target = self._file(name)
+            with open(target + '.tmp', 'wb') as f:
+                f.write(np.ascontiguousarray(bars[name], dtype=dtype).tobytes())
+            os.replace(target + '.tmp', target)
+
+    def merge(self, bars: Dict[str, np.ndarray]) -> int:
+        """Add bars newer than the stored ones, replacing the stored bars they overlap"""
+        times = bars['time']
+        if not len(times):
+            return 0
+        stored = self.columns()
+        rows = len(stored['time'])
+        keep = int(np.searchsorted(stored['time'], times[0], side='left'))
+        if keep + len(times) >= rows:
+            self.write_at(keep, bars)
+        else:
+            # Fewer bars than we had after that point (e.g. ones built from ticks)
+            self.rewrite({name: np.concatenate([stored[name][:keep], bars[name]]) for name, _ in COLUMNS})
+        return len(times)
+
+    def apply_ticks(self, ticks: List[Tuple[float, float]]) -> None:
+        """
+        Fold (price, ts) ticks into the forming bar, opening new bars as they
+        pass its end. A tick past the end at the last close opens nothing: the
+        poller keeps reporting the last price of closed markets, and upstream
+        has no bar there (the next tail sync brings any real ones).
+        """
+        bar = self.last_bar()
+        if bar is None:
+            return
+        row = len(self) - 1
+        bars = [bar]
+        for price, ts in ticks:
+            bar = bars[-1]
+            if ts < bar['time']:
+                continue
+            bars_ahead = int((ts - bar['time']) // self.step)
+            price = round(price, 4)
+            if bars_ahead == 0:
+                bar.update(high=max(bar['high'], price), low=min(bar['low'], price), close=price)
+            elif price != bar['close']:
+                bars.append({'time': bar['time'] + bars_ahead * self.step, 'open': price,
+                             'high': price, 'low': price, 'close': price, 'volume': 0})
+        self.write_at(row, {name: np.asarray([bar[name] for bar in bars]) for name, _ in COLUMNS})
+
+
+class CandleStore:
+    """
+    Local OHLCV history in front of the upstream source.
+
+    Usage:
+        candle_store.start(fetcher=fetch_candles)       # or configure() without ticks
+        columns = candle_store.get_range('AAPL', '1mo', '1d')
+        candle_store.to_rows(columns)
+    """
+
+    def __init__(self, root: str = DEFAULT_ROOT, interval: float = FLUSH_INTERVAL):
+        self.root = root
+        self.interval = interval
+        self._fetcher: Optional[Fetcher] = None
+        self._lock = threading.Lock()
+        self._series: 'OrderedDict[Tuple[str, str], CandleSeries]' = OrderedDict()
+        self._pending: Dict[str, List[Tuple[float, float]]] = {}
+        self._running = False
+        self._stats = {'hits': 0, 'tail_syncs': 0, 'full_fetches': 0, 'fetch_errors': 0,
+                       'ticks': 0, 'flushes': 0}
+
+    def configure(self, fetcher: Optional[Fetcher] = None, root: Optional[str] = None) -> None:
+        if fetcher is not None:
+            self._fetcher = fetcher
+        if root is not None and root != self.root:
+            self.root = root
+            with self._lock:
+                self._series.clear()
+
+    def series(self, symbol: str, interval: str) -> CandleSeries:
+        key = (book_key(symbol), interval)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = CandleSeries(os.path.join(self.root, interval, _safe_name(symbol)), interval)
+                self._series[key] = series
+                while len(self._series) > MAX_OPEN_SERIES:
+                    self._series.popitem(last=False)
+            self._series.move_to_end(key)
+            return series
+
+    # ==================== SYNC ====================
+
+    def _sync_age(self, series: CandleSeries) -> float:
+        return min(max(series.step, 60), MAX_SYNC_AGE)
+
+    def sync(self, symbol: str, period: str, interval: str, now: Optional[float] = None) -> CandleSeries:
+        """Make sure the series covers the period and its tail is recent"""
+        now = now or time.time()
+        series = self.series(symbol, interval)
+        span_start = period_start(period, now)
+
+        meta = series.meta
+        covered = meta.get('covered_from') is not None and meta['covered_from'] <= span_start
+        fresh = now - meta.get('synced_at', 0) < self._sync_age(series)
+        if covered and fresh:
+            self._stats['hits'] += 1
+            return series
+        if self._fetcher is None:
+            return series
+
+        with series.locked():
+            meta = series.meta      # another process may have synced meanwhile
+            covered = meta.get('covered_from') is not None and meta['covered_from'] <= span_start
+            if covered and now - meta.get('synced_at', 0) < self._sync_age(series):
+                return series
+
+            bars = None
+            if covered and meta.get('upstream_until'):
+                bars = self._fetch(symbol, interval, start=meta['upstream_until'])
+                if bars is not None:
+                    series.merge(bars)
+                    self._stats['tail_syncs'] += 1
+            if bars is None:
+                bars = self._fetch(symbol, interval, period=period)
+                if bars is None:
+                    return series
+                series.rewrite(bars)
+                meta['covered_from'] = span_start
+                self._stats['full_fetches'] += 1
+
+            if len(bars['time']):
+                meta['upstream_until'] = int(bars['time'][-1])
+            meta['synced_at'] = now
+            series._write_meta()
+        return series
+
+    def _fetch(self, symbol: str, interval: str, period: Optional[str] = None,
+               start: Optional[float] = None) -> Optional[Dict[str, np.ndarray]]:
+        try:
+            return self._fetcher(symbol, interval, period=period, start=start)
+        except Exception as e:
+            self._stats['fetch_errors'] += 1
+            logger.warning(f"Candle Store: Fetch {symbol} {interval} failed: {e}")
+            return None
+
+    # ==================== READS ====================
+
+    def get_range(self, symbol: str, period: str = '1mo', interval: str = '1d') -> Dict[str, np.ndarray]:
+        """Column views of a period's bars, syncing from upstream only when needed"""
+        series = self.sync(symbol, period, interval)
+        if period in PERIOD_SESSIONS:
+            return series.last_sessions(PERIOD_SESSIONS[period])
+        return series.slice(period_start(period, time.time()))
+
+    @staticmethod
+    def to_columns(columns: Dict[str, np.ndarray]) -> Dict[str, List]:
+        """JSON-ready arrays straight from the column slices"""
+        return {name: column.tolist() for name, column in columns.items()}
+
+    @staticmethod
+    def to_rows(columns: Dict[str, np.ndarray]) -> List[Dict[str, Any]]:
+        """One {'time', 'open', ...} dict per bar"""
+        names = [name for name, _ in COLUMNS]
+        return [dict(zip(names, row)) for row in zip(*(columns[name].tolist() for name in names))]
+
+    # ==================== TICKS ====================
+
+    def on_prices(self, records: Dict[str, Any]) -> None:
+        """Price store listener: buffer ticks for the next flush (no file I/O here)"""
+        with self._lock:
+            for symbol, record in records.items():
+                self._pending.setdefault(book_key(symbol), []).append((record.last, record.ts))
+
+    def flush(self) -> int:
+        """Move the forming intraday/daily bar of open series by the buffered ticks"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            open_series = [(key, series) for key, series in self._series.items()
+                           if series.step <= 86400 and key[0] in pending]
+        written = 0
+        for (key, _), series in open_series:
+            if not series.meta.get('synced_at'):
+                continue
+            ticks = pending[key]
+            try:
+                with series.locked():
+                    series.apply_ticks(ticks)
+                self._stats['ticks'] += len(ticks)
+                written += 1
+            except OSError as e:
+                logger.debug(f"Candle Store: Ticks for {key} not stored: {e}")
+        self._stats['flushes'] += 1
+        return written
+
+    # ==================== LIFECYCLE ====================
+
+    def _flush_loop(self) -> None:
+        try:
+            import eventlet
+            sleep_func = eventlet.sleep
+        except ImportError:
+            sleep_func = time.sleep
+
+        while self._running:
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Candle Store: Flush error: {e}")
+            sleep_func(self.interval)
+
+    def start(self, fetcher: Optional[Fetcher] = None) -> None:
+        """Follow the tick stream between upstream syncs"""
+        from services.market.price_store import price_store
+
+        self.configure(fetcher=fetcher)
+        if self._running:
+            return
+        self._running = True
+        price_store.add_listener(self.on_prices)
+
+        # Use eventlet.spawn_n for green thread compatibility
+        try:
+            import eventlet
+            eventlet.spawn_n(self._flush_loop)
+        except ImportError:
+            threading.Thread(target=self._flush_loop, daemon=True).start()
+        logger.info(f"Candle Store: Started at {self.root} (flush interval: {self.interval}s)")
+
+    def stop(self) -> None:
+        from services.market.price_store import price_store
+
+        self._running = False
+        price_store.remove_listener(self.on_prices)
+        self.flush()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'root': self.root,
+            'open_series': len(self._series),
+            **self._stats
+        }
+
+
+# Global candle store instance
+candle_store = CandleStore()
@@ -0,0 +1,243 @@
+"""
+Price Ingestion Engine - Concurrent fan-out polling of upstream price sources
+Each source is polled on its own cadence with its own deadline, so a slow
+source never delays the others. Results are written to the price store.
+"""
+
+import time
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional, Any
+
+logger = logging.getLogger(__name__)
+
+
+class PriceSource:
+    """
+    A single upstream price source.
+
+    Args:
+        name: Identifier used in stats and on merged price records
+        fetch: Callable returning {symbol: {'price': ..., 'change_percent': ...}}
+        interval: Seconds between polls
+        timeout: Deadline in seconds for one poll
+        enabled: Optional callable; the source is skipped while it returns False
+    """
+
+    def __init__(
+        self,
+        name: str,
+        fetch: Callable[[], Dict[str, Dict[str, Any]]],
+        interval: float = 3,
+        timeout: float = 10,
+        enabled: Optional[Callable[[], bool]] = None
+    ):
+        self.name = name
+        self.fetch = fetch
+        self.interval = interval
+        self.timeout = timeout
+        self.enabled = enabled
+
+        # Scheduling state
+        self.next_run = 0.0
+        self.in_flight_since: Optional[float] = None
+        self.deadline_missed = False
+
+        # Statistics
+        self.last_run: Optional[float] = None
+        self.last_success: Optional[float] = None
+        self.last_latency_ms: Optional[float] = None
+        self.avg_latency_ms: Optional[float] = None
+        self.symbol_count = 0
+        self.runs = 0
+        self.errors = 0
+        self.timeouts = 0
+
+    def is_enabled(self) -> bool:
+        """Check whether the source should be polled"""
+        if self.enabled is None:
+            return True
+        try:
+            return bool(self.enabled())
+        except Exception:
+            return False
+
+    def get_stats(self, now: Optional[float] = None) -> Dict[str, Any]:
+        """Get latency and staleness statistics for this source"""
+        now = now or time.time()
+        return {
+            'enabled': self.is_enabled(),
+            'interval': self.interval,
+            'timeout': self.timeout,
+            'in_flight': self.in_flight_since is not None,
+            'last_run': self.last_run,
+            'last_success': self.last_success,
+            'staleness_seconds': round(now - self.last_success, 2) if self.last_success else None,
+            'last_latency_ms': self.last_latency_ms,
+            'avg_latency_ms': self.avg_latency_ms,
+            'symbols': self.symbol_count,
+            'runs': self.runs,
+            'errors': self.errors,
+            'timeouts': self.timeouts
+        }
+
+
+class PriceIngestionEngine:
+    """
+    Polls registered sources in parallel on a bounded worker pool.
+
+    A single scheduler loop dispatches each source when its interval has
+    elapsed and it has no poll in flight. Each completed poll is handed to
+    the sink as one batch with its source name and fetch time.
+
+    Usage:
+        engine = PriceIngestionEngine(price_store.update_many)
+        engine.register(PriceSource('crypto', _fetch_crypto_prices, interval=3))
+        engine.start()
+    """
+
+    def __init__(
+        self,
+        sink: Callable[[str, Dict[str, Dict[str, Any]], float], Any],
+        max_workers: int = 4,
+        tick: float = 0.25
+    ):
+        self._sink = sink
+        self._sources: Dict[str, PriceSource] = {}
+        self._sources_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='price-ingest')
+        self._tick = tick
+        self._running = False
+        self._listeners = []
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    def register(self, source: PriceSource) -> None:
+        """Register a price source (replaces any source with the same name)"""
+        with self._sources_lock:
+            self._sources[source.name] = source
+
+    def add_listener(self, callback: Callable[[str, Dict[str, Dict[str, Any]]], None]) -> None:
+        """Register a callback invoked with (source_name, prices) after each write"""
+        self._listeners.append(callback)
+
+    def get_sources(self) -> Dict[str, PriceSource]:
+        with self._sources_lock:
+            return dict(self._sources)
+
+    def run_once(self, wait: bool = True) -> None:
+        """Poll every enabled source now, concurrently"""
+        now = time.time()
+        futures = []
+        for source in self.get_sources().values():
+            if source.is_enabled() and source.in_flight_since is None:
+                futures.append((now + source.timeout, self._dispatch(source, now)))
+
+        if not wait:
+            return
+
+        for deadline, future in futures:
+            try:
+                future.result(timeout=max(0.0, deadline - time.time()))
+            except Exception:
+                # Slow sources keep running and merge when they finish
+                pass
+
+    def start(self) -> None:
+        """Start the scheduler loop"""
+        if self._running:
+            return
+        self._running = True
+
+        # Use eventlet.spawn_n for green thread compatibility
+        try:
+            import eventlet
+            eventlet.spawn_n(self._scheduler_loop)
+            logger.info("Price ingestion engine started with eventlet.spawn_n")
+        except ImportError:
+            thread = threading.Thread(target=self._scheduler_loop, daemon=True)
+            thread.start()
+            logger.info("Price ingestion engine started with threading")
+
+    def stop(self) -> None:
+        """Stop the scheduler loop (in-flight polls finish in the background)"""
+        self._running = False
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Get per-source latency and staleness statistics"""
+        now = time.time()
+        return {name: source.get_stats(now) for name, source in self.get_sources().items()}
+
+    def _scheduler_loop(self) -> None:
+        try:
+            import eventlet
+            sleep_func = eventlet.sleep
+        except ImportError:
+            sleep_func = time.sleep
+
+        while self._running:
+            now = time.time()
+            for source in self.get_sources().values():
+                try:
+                    self._check_source(source, now)
+                except Exception as e:
+                    logger.error(f"Price ingestion scheduler error for {source.name}: {e}")
+            sleep_func(self._tick)
+
+    def _check_source(self, source: PriceSource, now: float) -> None:
+        if source.in_flight_since is not None:
+            # A poll past its deadline is counted once; its result is still
+            # merged if it eventually arrives, but the source is not
+            # re-dispatched until it returns so concurrency stays bounded.
+            if now - source.in_flight_since > source.timeout and not source.deadline_missed:
+                source.deadline_missed = True
+                source.timeouts += 1
+                logger.warning(f"Price source '{source.name}' exceeded {source.timeout}s deadline")
+            return
+
+        if now >= source.next_run and source.is_enabled():
+            self._dispatch(source, now)
+
+    def _dispatch(self, source: PriceSource, now: float):
+        source.in_flight_since = now
+        source.deadline_missed = False
+        source.last_run = now
+        source.next_run = now + source.interval
+        return self._executor.submit(self._poll, source)
+
+    def _poll(self, source: PriceSource) -> None:
+        started = time.time()
+        try:
+            prices = source.fetch() or {}
+        except Exception as e:
+            source.errors += 1
+            logger.warning(f"Price source '{source.name}' error: {e}")
+            prices = {}
+        finally:
+            finished = time.time()
+            source.in_flight_since = None
+            source.runs += 1
+
+        latency_ms = round((finished - started) * 1000, 1)
+        source.last_latency_ms = latency_ms
+        if source.avg_latency_ms is None:
+            source.avg_latency_ms = latency_ms
+        else:
+            source.avg_latency_ms = round(source.avg_latency_ms * 0.8 + latency_ms * 0.2, 1)
+
+        if prices:
+            source.last_success = finished
+            source.symbol_count = len(prices)
+            self._merge(source.name, prices, finished)
+
+    def _merge(self, source_name: str, prices: Dict[str, Dict[str, Any]], fetched_at: float) -> None:
+        self._sink(source_name, prices, fetched_at)
+
+        for callback in self._listeners:
+            try:
+                callback(source_name, prices)
+            except Exception as e:
+                logger.error(f"Price ingestion listener error: {e}")
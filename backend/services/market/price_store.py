@@ -0,0 +1,270 @@
+"""
+Price Store - Single in-process source of truth for the latest tick per symbol
+Replaces the separate live price dict, yfinance TTL cache and CacheService
+price keys. Writes go through one writer lock; reads are lock-free lookups
+on an immutable snapshot. An optional Redis hash mirrors every write so all
+workers converge on the same tick.
+"""
+
+import json
+import time
+import threading
+import logging
+from typing import Dict, Optional, Any
+
+logger = logging.getLogger(__name__)
+
+# Redis hash holding the mirrored records (field = symbol)
+REDIS_MIRROR_KEY = 'tradesense_prices'
+
+
+class PriceRecord:
+    """Compact, immutable latest-tick record for one symbol"""
+
+    __slots__ = ('last', 'bid', 'ask', 'change_percent', 'volume', 'ts', 'source')
+
+    def __init__(self, last: float, bid: Optional[float] = None, ask: Optional[float] = None,
+                 change_percent: float = 0, volume: int = 0, ts: Optional[float] = None,
+                 source: str = 'unknown'):
+        self.last = last
+        self.bid = bid
+        self.ask = ask
+        self.change_percent = change_percent
+        self.volume = volume
+        self.ts = ts or time.time()
+        self.source = source
+
+    @property
+    def age(self) -> float:
+        """Seconds since the tick was fetched"""
+        return time.time() - self.ts
+
+    @property
+    def change(self) -> float:
+        """Absolute change implied by change_percent"""
+        if not self.last or not self.change_percent:
+            return 0
+        return round(self.last - self.last / (1 + self.change_percent / 100), 4)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Dict in the shape the live price readers already expect"""
+        return {
+            'price': self.last,
+            'bid': self.bid,
+            'ask': self.ask,
+            'change_percent': self.change_percent,
+            'volume': self.volume,
+            'timestamp': self.ts,
+            'source': self.source
+        }
+
+    def to_json(self) -> str:
+        return json.dumps([self.last, self.bid, self.ask, self.change_percent, self.volume, self.ts, self.source])
+
+    @classmethod
+    def from_json(cls, raw) -> 'PriceRecord':
+        last, bid, ask, change_percent, volume, ts, source = json.loads(raw)
+        return cls(last, bid, ask, change_percent, volume, ts, source)
+
+    @classmethod
+    def from_quote(cls, quote: Dict[str, Any], source: str, ts: Optional[float] = None) -> 'PriceRecord':
+        """Build a record from a fetcher quote dict ({'price', 'change_percent', ...})"""
+        return cls(
+            last=float(quote['price']),
+            bid=quote.get('bid'),
+            ask=quote.get('ask'),
+            change_percent=quote.get('change_percent') or 0,
+            volume=quote.get('volume') or 0,
+            ts=ts,
+            source=source
+        )
+
+
+class PriceStore:
+    """
+    Latest tick per symbol.
+
+    Writers build a new snapshot dict under the writer lock and swap it in;
+    readers take the current snapshot reference without locking, so a
+    read never blocks on a write and always sees a whole batch.
+
+    Usage:
+        price_store.update_many('crypto', {'BTC-USD': {'price': 95000.0}})
+        record = price_store.get('BTCUSD')
+    """
+
+    def __init__(self):
+        self._snapshot: Dict[str, PriceRecord] = {}
+        self._write_lock = threading.Lock()
+        self._redis = None
+        self._mirror_sync_running = False
+        self._listeners = []
+
+    # ==================== READS ====================
+
+    def get(self, symbol: str, max_age: Optional[float] = None) -> Optional[PriceRecord]:
+        """
+        Get the latest record for a symbol, trying BTC-USD/BTCUSD variants.
+
+        Args:
+            symbol: Symbol in any supported format
+            max_age: Ignore records older than this many seconds
+        """
+        snapshot = self._snapshot
+        record = snapshot.get(symbol) or snapshot.get(symbol.upper())
+        if record is None:
+            upper = symbol.upper()
+            if '-' in upper:
+                record = snapshot.get(upper.replace('-', ''))
+            elif upper.endswith('USD'):
+                record = snapshot.get(upper[:-3] + '-USD')
+
+        if record is not None and max_age is not None and record.age > max_age:
+            return None
+        return record
+
+    def get_price(self, symbol: str, max_age: Optional[float] = None) -> Optional[float]:
+        """Get the latest price for a symbol"""
+        record = self.get(symbol, max_age)
+        return record.last if record else None
+
+    def snapshot(self) -> Dict[str, PriceRecord]:
+        """Get the current snapshot (do not mutate)"""
+        return self._snapshot
+
+    def symbols(self) -> list:
+        return list(self._snapshot.keys())
+
+    def __len__(self) -> int:
+        return len(self._snapshot)
+
+    # ==================== WRITES ====================
+
+    def update(self, symbol: str, price: float, source: str, **fields) -> PriceRecord:
+        """Write a single tick"""
+        record = PriceRecord(last=float(price), source=source, **fields)
+        self.put_records({symbol: record})
+        return record
+
+    def update_many(self, source: str, quotes: Dict[str, Dict[str, Any]], ts: Optional[float] = None) -> Dict[str, PriceRecord]:
+        """Write a batch of fetcher quotes from one source"""
+        records = {}
+        for symbol, quote in quotes.items():
+            if not quote or not quote.get('price'):
+                continue
+            try:
+                records[symbol] = PriceRecord.from_quote(quote, source, ts)
+            except (TypeError, ValueError):
+                continue
+        if records:
+            self.put_records(records)
+        return records
+
+    def put_records(self, records: Dict[str, PriceRecord], mirror: bool = True) -> None:
+        """Swap in a new snapshot containing the given records"""
+        with self._write_lock:
+            snapshot = dict(self._snapshot)
+            snapshot.update(records)
+            self._snapshot = snapshot
+
+        if mirror and self._redis is not None:
+            self._write_mirror(records)
+
+        for callback in self._listeners:
+            try:
+                callback(records)
+            except Exception as e:
+                logger.error(f"Price store listener error: {e}")
+
+    def add_listener(self, callback) -> None:
+        """Register a callback invoked with {symbol: PriceRecord} after each write"""
+        if callback not in self._listeners:
+            self._listeners.append(callback)
+
+    def remove_listener(self, callback) -> None:
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def clear(self) -> None:
+        with self._write_lock:
+            self._snapshot = {}
+
+    # ==================== REDIS MIRROR ====================
+
+    def attach_redis(self, client) -> None:
+        """Mirror writes to (and sync from) a Redis hash shared by all workers"""
+        self._redis = client
+
+    def _write_mirror(self, records: Dict[str, PriceRecord]) -> None:
+        try:
+            self._redis.hset(REDIS_MIRROR_KEY, mapping={
+                symbol: record.to_json() for symbol, record in records.items()
+            })
+        except Exception as e:
+            logger.debug(f"Price store mirror write failed: {e}")
+
+    def sync_from_mirror(self) -> int:
+        """Adopt any mirrored records newer than the local ones"""
+        if self._redis is None:
+            return 0
+        try:
+            raw = self._redis.hgetall(REDIS_MIRROR_KEY)
+        except Exception as e:
+            logger.debug(f"Price store mirror read failed: {e}")
+            return 0
+
+        snapshot = self._snapshot
+        newer = {}
+        for key, value in raw.items():
+            symbol = key.decode() if isinstance(key, bytes) else key
+            try:
+                record = PriceRecord.from_json(value)
+            except (ValueError, TypeError):
+                continue
+            current = snapshot.get(symbol)
+            if current is None or record.ts > current.ts:
+                newer[symbol] = record
+
+        if newer:
+            self.put_records(newer, mirror=False)
+        return len(newer)
+
+    def start_mirror_sync(self, interval: float = 1.0) -> None:
+        """Periodically pull newer ticks written by other workers"""
+        if self._redis is None or self._mirror_sync_running:
+            return
+        self._mirror_sync_running = True
+
+        def _loop():
+            try:
+                import eventlet
+                sleep_func = eventlet.sleep
+            except ImportError:
+                sleep_func = time.sleep
+            while self._mirror_sync_running:
+                self.sync_from_mirror()
+                sleep_func(interval)
+
+        try:
+            import eventlet
+            eventlet.spawn_n(_loop)
+        except ImportError:
+            threading.Thread(target=_loop, daemon=True).start()
+
+    def stop_mirror_sync(self) -> None:
+        self._mirror_sync_running = False
+
+    def get_stats(self) -> Dict[str, Any]:
+        snapshot = self._snapshot
+        sources: Dict[str, int] = {}
+        for record in snapshot.values():
+            sources[record.source] = sources.get(record.source, 0) + 1
+        return {
+            'symbols': len(snapshot),
+            'by_source': sources,
+            'redis_mirror': self._redis is not None
+        }
+
+
+# Global price store instance
+price_store = PriceStore()
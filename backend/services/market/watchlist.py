@@ -0,0 +1,215 @@
+"""
+Price Watchlist - Reference-counted set of symbols clients are watching
+Each connection's subscriptions are tracked so a symbol leaves the poll set
+as soon as its last subscriber unsubscribes or disconnects. Every symbol is
+polled on its own interval, set by asset class and shortened as more
+clients watch it, so upstream API load follows active interest. On the
+price producer node, other nodes' watched symbols are merged in as remote
+counts so it polls for clients connected anywhere in the cluster. Pinned
+symbols (popular ones, open positions, pending orders) are polled at their
+base interval whether or not anyone watches them.
+"""
+
+import math
+import time
+import threading
+from typing import Dict, List, Optional, Set, Any
+
+# Seconds between polls of a symbol watched by one client
+BASE_INTERVALS = {
+    'crypto': 2,
+    'forex': 5,
+    'index': 10,
+    'stock': 10,
+    'moroccan': 60,   # Casablanca quotes are scraped and move slowly
+}
+
+# Most a symbol's interval shrinks with demand (interval / speedup)
+MAX_DEMAND_SPEEDUP = 3.0
+
+
+def asset_class(symbol: str) -> str:
+    """Classify a symbol by its Yahoo Finance form"""
+    from services.yfinance_service import normalize_symbol
+
+    yahoo = normalize_symbol(symbol)
+    if yahoo.endswith('-USD'):
+        return 'crypto'
+    if yahoo.endswith('=X'):
+        return 'forex'
+    if yahoo.endswith('.CS'):
+        return 'moroccan'
+    if yahoo.endswith('=F') or yahoo.startswith('^'):
+        return 'index'
+    return 'stock'
+
+
+def poll_interval(asset: str, watchers: int) -> float:
+    """Seconds between polls for an asset class watched by N clients"""
+    base = BASE_INTERVALS.get(asset, BASE_INTERVALS['stock'])
+    speedup = min(1.0 + math.log2(max(watchers, 1)), MAX_DEMAND_SPEEDUP)
+    return base / speedup
+
+
+class PriceWatchlist:
+    """
+    Symbols with at least one subscribed connection.
+
+    Usage:
+        price_watchlist.subscribe(sid, ['BTC-USD'])
+        for symbol in price_watchlist.due():
+            ...fetch...
+        price_watchlist.mark_polled(symbols)
+        price_watchlist.drop(sid)          # on disconnect
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_sid: Dict[str, Set[str]] = {}
+        self._watchers: Dict[str, int] = {}      # symbol -> subscribed connections
+        self._remote: Dict[str, int] = {}        # symbol -> watchers on other nodes
+        self._pinned: Set[str] = set()           # polled without watchers
+        self._asset: Dict[str, str] = {}
+        self._last_poll: Dict[str, float] = {}
+
+    def subscribe(self, sid: str, symbols: List[str]) -> List[str]:
+        """Add a connection's symbols; returns the ones newly watched"""
+        added = []
+        with self._lock:
+            mine = self._by_sid.setdefault(sid, set())
+            for symbol in symbols:
+                symbol = symbol.upper()
+                if symbol in mine:
+                    continue
+                mine.add(symbol)
+                self._watchers[symbol] = self._watchers.get(symbol, 0) + 1
+                if self._watchers[symbol] == 1:
+                    added.append(symbol)
+        for symbol in added:
+            if symbol not in self._asset:
+                self._asset[symbol] = asset_class(symbol)
+        return added
+
+    def unsubscribe(self, sid: str, symbols: List[str]) -> List[str]:
+        """Remove a connection's symbols; returns the ones nobody watches any more"""
+        with self._lock:
+            mine = self._by_sid.get(sid)
+            if not mine:
+                return []
+            removed = []
+            for symbol in symbols:
+                symbol = symbol.upper()
+                if symbol in mine:
+                    mine.discard(symbol)
+                    if self._release(symbol):
+                        removed.append(symbol)
+            if not mine:
+                del self._by_sid[sid]
+            return removed
+
+    def drop(self, sid: str) -> List[str]:
+        """Remove every subscription of a disconnected connection"""
+        with self._lock:
+            mine = self._by_sid.pop(sid, set())
+            return [symbol for symbol in mine if self._release(symbol)]
+
+    def _release(self, symbol: str) -> bool:
+        count = self._watchers.get(symbol, 0) - 1
+        if count > 0:
+            self._watchers[symbol] = count
+            return False
+        self._watchers.pop(symbol, None)
+        if symbol not in self._remote and symbol not in self._pinned:
+            self._last_poll.pop(symbol, None)
+        return True
+
+    def local_counts(self) -> Dict[str, int]:
+        """Watchers per symbol on this node only"""
+        return dict(self._watchers)
+
+    def set_remote(self, counts: Dict[str, int]) -> None:
+        """Replace the watcher counts reported by the other nodes"""
+        counts = {symbol.upper(): count for symbol, count in counts.items() if count > 0}
+        for symbol in counts:
+            if symbol not in self._asset:
+                self._asset[symbol] = asset_class(symbol)
+        with self._lock:
+            for symbol in self._remote:
+                if symbol not in counts and symbol not in self._watchers and symbol not in self._pinned:
+                    self._last_poll.pop(symbol, None)
+            self._remote = counts
+
+    def set_pinned(self, symbols) -> None:
+        """Replace the symbols polled regardless of watchers"""
+        pinned = {symbol.upper() for symbol in symbols}
+        for symbol in pinned:
+            if symbol not in self._asset:
+                self._asset[symbol] = asset_class(symbol)
+        with self._lock:
+            for symbol in self._pinned - pinned:
+                if symbol not in self._watchers and symbol not in self._remote:
+                    self._last_poll.pop(symbol, None)
+            self._pinned = pinned
+
+    def _all_watchers(self) -> Dict[str, int]:
+        if not self._remote and not self._pinned:
+            return self._watchers
+        merged = dict(self._remote)
+        for symbol, count in self._watchers.items():
+            merged[symbol] = merged.get(symbol, 0) + count
+        for symbol in self._pinned:
+            merged.setdefault(symbol, 0)
+        return merged
+
+    def watchers(self, symbol: str) -> int:
+        symbol = symbol.upper()
+        return self._watchers.get(symbol, 0) + self._remote.get(symbol, 0)
+
+    def symbols(self) -> List[str]:
+        return list(self._all_watchers().keys())
+
+    def __contains__(self, symbol: str) -> bool:
+        symbol = symbol.upper()
+        return symbol in self._watchers or symbol in self._remote
+
+    def __len__(self) -> int:
+        return len(self._all_watchers())
+
+    def interval(self, symbol: str) -> float:
+        symbol = symbol.upper()
+        return poll_interval(self._asset.get(symbol, 'stock'), self.watchers(symbol))
+
+    def due(self, now: Optional[float] = None) -> Dict[str, List[str]]:
+        """Watched symbols whose poll interval has elapsed, grouped by asset class"""
+        now = now or time.time()
+        grouped: Dict[str, List[str]] = {}
+        with self._lock:
+            for symbol, count in self._all_watchers().items():
+                asset = self._asset.get(symbol, 'stock')
+                if now - self._last_poll.get(symbol, 0) >= poll_interval(asset, count):
+                    grouped.setdefault(asset, []).append(symbol)
+        return grouped
+
+    def mark_polled(self, symbols: List[str], now: Optional[float] = None) -> None:
+        now = now or time.time()
+        with self._lock:
+            for symbol in symbols:
+                if symbol in self._watchers or symbol in self._remote or symbol in self._pinned:
+                    self._last_poll[symbol] = now
+
+    def get_stats(self) -> Dict[str, Any]:
+        by_asset: Dict[str, int] = {}
+        for symbol in self._watchers:
+            asset = self._asset.get(symbol, 'stock')
+            by_asset[asset] = by_asset.get(asset, 0) + 1
+        return {
+            'symbols': len(self._watchers),
+            'remote_symbols': len(self._remote),
+            'pinned_symbols': len(self._pinned),
+            'connections': len(self._by_sid),
+            'by_asset': by_asset
+        }
+
+
+# Global watchlist instance
+price_watchlist = PriceWatchlist()
@@ -4,13 +4,16 @@ Collects and stores application and system metrics
 """
 
 import os
+import math
 import time
 import logging
 from datetime import datetime, timedelta
-from collections import defaultdict
+from collections import defaultdict, deque
 from threading import Lock
 from functools import wraps
 
+import numpy as np
+
 try:
     import psutil
     PSUTIL_AVAILABLE = True
@@ -20,8 +23,48 @@ except ImportError:
 logger = logging.getLogger(__name__)
 
 
+# Log-linear latency buckets (HDR style): each power of two of microseconds
+# is split into SUB_BUCKETS linear buckets, so a recorded value is off by at
+# most 1/SUB_BUCKETS of itself. 28 powers of two cover 1us to ~134s.
+SUB_BUCKETS = 16
+LATENCY_BUCKETS = 28 * SUB_BUCKETS
+
+
+def _latency_bucket(duration):
+    """Histogram bucket for a duration in seconds"""
+    us = duration * 1_000_000
+    if us < 1:
+        return 0
+    mantissa, exponent = math.frexp(us)
+    return min(exponent * SUB_BUCKETS + int((mantissa - 0.5) * 2 * SUB_BUCKETS), LATENCY_BUCKETS - 1)
+
+
+def _bucket_value(bucket):
+    """Representative duration in seconds (bucket midpoint) for a histogram bucket"""
+    exponent, sub = divmod(bucket, SUB_BUCKETS)
+    return (0.5 + (sub + 0.5) / (2 * SUB_BUCKETS)) * 2 ** exponent / 1_000_000
+
+
+def _percentiles(histogram, quantiles):
+    """Durations (seconds) at the given quantiles of a bucket-count histogram"""
+    counts = np.asarray(histogram)
+    total = counts.sum()
+    if not total:
+        return [0 for _ in quantiles]
+    cumulative = np.cumsum(counts)
+    ranks = np.ceil(np.asarray(quantiles) * total)
+    return [_bucket_value(int(b)) for b in np.searchsorted(cumulative, ranks)]
+
+
 class MetricsCollector:
-    """Collects and stores application metrics"""
+    """
+    Collects and stores application metrics.
+
+    Requests are aggregated on record into fixed-size ring buffers: one
+    slot per second (count, errors, total time) and one latency histogram
+    per minute, each reused once its window has passed. Recording is O(1)
+    and window reads sum slots instead of scanning raw samples.
+    """
 
     def __init__(self, max_history_minutes=60):
         self.max_history = max_history_minutes
@@ -29,29 +72,39 @@ class MetricsCollector:
 
         # Request metrics
         self.request_count = 0
-        self.request_times = []  # (timestamp, duration, endpoint, status)
         self.error_count = 0
-        self.errors = []  # (timestamp, endpoint, error_type, message)
+        self.errors = deque(maxlen=1000)  # (timestamp, endpoint, error_type, message)
+
+        # Per-second ring buffer
+        self._seconds = max_history_minutes * 60
+        self._second_stamp = [-1] * self._seconds
+        self._second_count = [0] * self._seconds
+        self._second_errors = [0] * self._seconds
+        self._second_time = [0.0] * self._seconds
 
-        # Endpoint-specific metrics
+        # Per-minute latency histogram ring buffer
+        self._minute_stamp = [-1] * max_history_minutes
+        self._minute_hist = [[0] * LATENCY_BUCKETS for _ in range(max_history_minutes)]
+
+        # Endpoint-specific metrics (cumulative, with a latency histogram each)
         self.endpoint_stats = defaultdict(lambda: {
             'count': 0,
             'total_time': 0,
             'errors': 0,
-            'avg_time': 0
+            'histogram': [0] * LATENCY_BUCKETS
         })
 
         # Database metrics
         self.db_query_count = 0
-        self.db_query_times = []
+        self.db_query_times = deque(maxlen=1000)
 
         # Cache metrics
         self.cache_hits = 0
         self.cache_misses = 0
 
-        # Business metrics
-        self.active_users = set()
-        self.user_actions = []  # (timestamp, user_id, action)
+        # Business metrics: user_id -> last activity (epoch seconds)
+        self.active_users = {}
+        self._users_pruned_at = time.time()
 
         # Custom counters
         self.counters = defaultdict(int)
@@ -61,30 +114,41 @@ class MetricsCollector:
 
     def record_request(self, endpoint, duration, status_code):
         """Record a request metric"""
+        now = time.time()
+        second = int(now)
+        minute = second // 60
+        bucket = _latency_bucket(duration)
+        is_error = status_code >= 400
+
         with self._lock:
             self.request_count += 1
-            timestamp = datetime.utcnow()
 
-            self.request_times.append({
-                'timestamp': timestamp,
-                'duration': duration,
-                'endpoint': endpoint,
-                'status': status_code
-            })
+            slot = second % self._seconds
+            if self._second_stamp[slot] != second:
+                self._second_stamp[slot] = second
+                self._second_count[slot] = 0
+                self._second_errors[slot] = 0
+                self._second_time[slot] = 0.0
+            self._second_count[slot] += 1
+            self._second_time[slot] += duration
+
+            row = minute % self.max_history
+            if self._minute_stamp[row] != minute:
+                self._minute_stamp[row] = minute
+                self._minute_hist[row] = [0] * LATENCY_BUCKETS
+            self._minute_hist[row][bucket] += 1
 
             # Update endpoint stats
             stats = self.endpoint_stats[endpoint]
             stats['count'] += 1
             stats['total_time'] += duration
-            stats['avg_time'] = stats['total_time'] / stats['count']
+            stats['histogram'][bucket] += 1
 
-            if status_code >= 400:
+            if is_error:
+                self._second_errors[slot] += 1
                 stats['errors'] += 1
                 self.error_count += 1
 
-            # Cleanup old data
-            self._cleanup_old_data()
-
     def record_error(self, endpoint, error_type, message):
         """Record an error"""
         with self._lock:
@@ -117,28 +181,21 @@ class MetricsCollector:
 
     def record_user_activity(self, user_id, action):
         """Record user activity"""
+        now = time.time()
         with self._lock:
-            self.active_users.add(user_id)
-            self.user_actions.append({
-                'timestamp': datetime.utcnow(),
-                'user_id': user_id,
-                'action': action
-            })
+            self.active_users[user_id] = now
+
+            # Forget users idle for longer than the history, at most once a minute
+            if now - self._users_pruned_at > 60:
+                cutoff = now - self.max_history * 60
+                self.active_users = {uid: seen for uid, seen in self.active_users.items() if seen > cutoff}
+                self._users_pruned_at = now
 
     def increment_counter(self, name, value=1):
         """Increment a custom counter"""
         with self._lock:
             self.counters[name] += value
 
-    def _cleanup_old_data(self):
-        """Remove data older than max_history minutes"""
-        cutoff = datetime.utcnow() - timedelta(minutes=self.max_history)
-
-        self.request_times = [r for r in self.request_times if r['timestamp'] > cutoff]
-        self.errors = [e for e in self.errors if e['timestamp'] > cutoff]
-        self.db_query_times = [q for q in self.db_query_times if q['timestamp'] > cutoff]
-        self.user_actions = [a for a in self.user_actions if a['timestamp'] > cutoff]
-
     def get_system_metrics(self):
         """Get current system metrics"""
         metrics = {
@@ -187,59 +244,83 @@ class MetricsCollector:
 
     def get_request_metrics(self, minutes=5):
         """Get request metrics for the last N minutes"""
-        with self._lock:
-            cutoff = datetime.utcnow() - timedelta(minutes=minutes)
-            recent_requests = [r for r in self.request_times if r['timestamp'] > cutoff]
-
-            if not recent_requests:
-                return {
-                    'requests_per_minute': 0,
-                    'avg_response_time': 0,
-                    'error_rate': 0,
-                    'total_requests': 0
-                }
-
-            total = len(recent_requests)
-            errors = sum(1 for r in recent_requests if r['status'] >= 400)
-            avg_time = sum(r['duration'] for r in recent_requests) / total
+        minutes = max(1, min(minutes, self.max_history))
+        now = int(time.time())
 
+        with self._lock:
+            stamps = np.array(self._second_stamp)
+            in_window = stamps > now - minutes * 60
+            total = int(np.array(self._second_count)[in_window].sum())
+            errors = int(np.array(self._second_errors)[in_window].sum())
+            total_time = float(np.array(self._second_time)[in_window].sum())
+
+            current_minute = now // 60
+            histogram = np.zeros(LATENCY_BUCKETS, dtype=np.int64)
+            for row, minute in enumerate(self._minute_stamp):
+                if current_minute - minute < minutes:
+                    histogram += self._minute_hist[row]
+
+        if not total:
             return {
-                'requests_per_minute': round(total / minutes, 2),
-                'avg_response_time': round(avg_time * 1000, 2),  # Convert to ms
-                'error_rate': round((errors / total) * 100, 2) if total > 0 else 0,
-                'total_requests': total
+                'requests_per_minute': 0,
+                'avg_response_time': 0,
+                'p50_response_time': 0,
+                'p95_response_time': 0,
+                'p99_response_time': 0,
+                'error_rate': 0,
+                'total_requests': 0
             }
 
+        p50, p95, p99 = _percentiles(histogram, (0.5, 0.95, 0.99))
+        return {
+            'requests_per_minute': round(total / minutes, 2),
+            'avg_response_time': round(total_time / total * 1000, 2),  # Convert to ms
+            'p50_response_time': round(p50 * 1000, 2),
+            'p95_response_time': round(p95 * 1000, 2),
+            'p99_response_time': round(p99 * 1000, 2),
+            'error_rate': round((errors / total) * 100, 2),
+            'total_requests': total
+        }
+
     def get_endpoint_metrics(self, limit=20):
         """Get metrics for each endpoint"""
         with self._lock:
-            endpoints = []
-            for endpoint, stats in sorted(
+            top = sorted(
                 self.endpoint_stats.items(),
                 key=lambda x: x[1]['count'],
                 reverse=True
-            )[:limit]:
-                endpoints.append({
-                    'endpoint': endpoint,
-                    'requests': stats['count'],
-                    'avg_time_ms': round(stats['avg_time'] * 1000, 2),
-                    'errors': stats['errors'],
-                    'error_rate': round((stats['errors'] / stats['count']) * 100, 2) if stats['count'] > 0 else 0
-                })
-            return endpoints
+            )[:limit]
+            top = [(endpoint, dict(stats, histogram=list(stats['histogram']))) for endpoint, stats in top]
+
+        endpoints = []
+        for endpoint, stats in top:
+            p50, p95, p99 = _percentiles(stats['histogram'], (0.5, 0.95, 0.99))
+            endpoints.append({
+                'endpoint': endpoint,
+                'requests': stats['count'],
+                'avg_time_ms': round(stats['total_time'] / stats['count'] * 1000, 2) if stats['count'] > 0 else 0,
+                'p50_ms': round(p50 * 1000, 2),
+                'p95_ms': round(p95 * 1000, 2),
+                'p99_ms': round(p99 * 1000, 2),
+                'errors': stats['errors'],
+                'error_rate': round((stats['errors'] / stats['count']) * 100, 2) if stats['count'] > 0 else 0
+            })
+        return endpoints
 
     def get_error_summary(self, limit=50):
         """Get recent errors"""
+        cutoff = datetime.utcnow() - timedelta(minutes=self.max_history)
         with self._lock:
-            return [
-                {
-                    'timestamp': e['timestamp'].isoformat(),
-                    'endpoint': e['endpoint'],
-                    'error_type': e['error_type'],
-                    'message': e['message']
-                }
-                for e in sorted(self.errors, key=lambda x: x['timestamp'], reverse=True)[:limit]
-            ]
+            recent = list(self.errors)[-limit:]
+        return [
+            {
+                'timestamp': e['timestamp'].isoformat(),
+                'endpoint': e['endpoint'],
+                'error_type': e['error_type'],
+                'message': e['message']
+            }
+            for e in reversed(recent) if e['timestamp'] > cutoff
+        ]
 
     def get_cache_metrics(self):
         """Get cache hit/miss metrics"""
@@ -262,13 +343,9 @@ class MetricsCollector:
 
     def get_active_users_count(self, minutes=15):
         """Get count of recently active users"""
+        cutoff = time.time() - minutes * 60
         with self._lock:
-            cutoff = datetime.utcnow() - timedelta(minutes=minutes)
-            recent_users = set(
-                a['user_id'] for a in self.user_actions
-                if a['timestamp'] > cutoff
-            )
-            return len(recent_users)
+            return sum(1 for seen in self.active_users.values() if seen > cutoff)
 
     def get_full_report(self):
         """Get comprehensive metrics report"""
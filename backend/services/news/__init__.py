@@ -1,4 +1,5 @@
 # News Services
 from .news_service import NewsService, get_news_service
+from .article_store import ArticleStore
 
-__all__ = ['NewsService', 'get_news_service']
+__all__ = ['NewsService', 'get_news_service', 'ArticleStore']
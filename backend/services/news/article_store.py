@@ -0,0 +1,121 @@
+"""
+Article Store - Indexed in-memory store of ingested news articles
+Articles are kept newest first and indexed by market and by symbol tag, so
+news reads are lookups rather than fetches. Their titles are kept in a
+TitleIndex so later fetches can drop stories already stored. The store
+holds at most MAX_ARTICLES articles no older than MAX_AGE_HOURS.
+"""
+
+import re
+import bisect
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from .dedup import TitleIndex
+
+# Articles kept in the store
+MAX_ARTICLES = 2000
+
+# Hours an article stays in the store after publication
+MAX_AGE_HOURS = 72
+
+_TOKEN = re.compile(r'[\w.=-]+')
+
+
+def symbol_tags(article: Dict) -> Set[str]:
+    """Uppercase tokens of the title and summary plus the source's related symbols"""
+    text = f"{article.get('title', '')} {article.get('summary', '')}".upper()
+    tags = set(_TOKEN.findall(text))
+    tags.update(symbol.strip().upper() for symbol in article.get('related', []) if symbol.strip())
+    return tags
+
+
+class ArticleStore:
+    """
+    Thread-safe article store.
+
+    Usage:
+        store.add(articles)
+        store.latest(market='crypto', limit=20)
+        store.by_symbol('AAPL', limit=10)
+    """
+
+    def __init__(self, max_articles: int = MAX_ARTICLES, max_age_hours: int = MAX_AGE_HOURS):
+        self.max_articles = max_articles
+        self.max_age_hours = max_age_hours
+        self._lock = threading.Lock()
+        self._articles: Dict[str, Dict] = {}
+        self._order: List[Tuple[str, str]] = []      # (published_at, id), oldest first
+        self._by_market: Dict[str, Set[str]] = {}
+        self._by_symbol: Dict[str, Set[str]] = {}
+        self._tags: Dict[str, Set[str]] = {}
+        self.titles = TitleIndex()
+
+    def __len__(self) -> int:
+        return len(self._articles)
+
+    def __contains__(self, article_id: str) -> bool:
+        return article_id in self._articles
+
+    # ==================== WRITES ====================
+
+    def add(self, articles: Iterable[Dict]) -> int:
+        """Insert articles not already stored; returns the number added"""
+        added = 0
+        with self._lock:
+            for article in articles:
+                article_id = article['id']
+                if article_id in self._articles:
+                    continue
+                self._articles[article_id] = article
+                bisect.insort(self._order, (article.get('published_at', ''), article_id))
+                self._by_market.setdefault(article.get('market', 'us'), set()).add(article_id)
+                self.titles.add(article_id, article.get('title', ''))
+                tags = symbol_tags(article)
+                self._tags[article_id] = tags
+                for tag in tags:
+                    self._by_symbol.setdefault(tag, set()).add(article_id)
+                added += 1
+            self._evict()
+        return added
+
+    def _evict(self) -> None:
+        cutoff = (datetime.utcnow() - timedelta(hours=self.max_age_hours)).isoformat()
+        drop = max(len(self._order) - self.max_articles, bisect.bisect_left(self._order, (cutoff, '')))
+        if drop <= 0:
+            return
+        for _, article_id in self._order[:drop]:
+            article = self._articles.pop(article_id)
+            self.titles.remove(article_id)
+            market_ids = self._by_market.get(article.get('market', 'us'))
+            if market_ids is not None:
+                market_ids.discard(article_id)
+            for tag in self._tags.pop(article_id, ()):
+                symbol_ids = self._by_symbol.get(tag)
+                if symbol_ids is not None:
+                    symbol_ids.discard(article_id)
+                    if not symbol_ids:
+                        del self._by_symbol[tag]
+        del self._order[:drop]
+
+    # ==================== READS ====================
+
+    def latest(self, market: str = 'all', limit: Optional[int] = None) -> List[Dict]:
+        """Newest articles first, optionally of one market"""
+        with self._lock:
+            market_ids = None if market == 'all' else self._by_market.get(market, set())
+            result = []
+            for _, article_id in reversed(self._order):
+                if market_ids is None or article_id in market_ids:
+                    result.append(self._articles[article_id])
+                    if limit is not None and len(result) >= limit:
+                        break
+            return result
+
+    def by_symbol(self, symbol: str, limit: Optional[int] = None) -> List[Dict]:
+        """Newest articles first that mention or relate to symbol"""
+        with self._lock:
+            articles = [self._articles[i] for i in self._by_symbol.get(symbol.upper(), ())]
+        articles.sort(key=lambda a: a.get('published_at', ''), reverse=True)
+        return articles[:limit] if limit is not None else articles
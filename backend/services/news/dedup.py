@@ -0,0 +1,98 @@
+"""
+Title Index - Near-duplicate detection for news titles
+Two titles are duplicates when they share more than DUPLICATE_SIMILARITY of
+the words of the longer one. Each title is tokenized once and indexed by a
+short prefix of its words (prefix filtering): any title similar enough must
+share a word with that prefix, so a lookup only verifies the few titles
+posted under it instead of comparing against every title seen.
+"""
+
+import re
+import math
+import zlib
+import threading
+from fractions import Fraction
+from typing import Dict, FrozenSet, List, Optional, Set
+
+# Share of the longer title's words two duplicate titles have in common (exclusive)
+DUPLICATE_SIMILARITY = Fraction(7, 10)
+
+_WORD = re.compile(r'\w+')
+
+
+def title_tokens(title: str) -> FrozenSet[str]:
+    return frozenset(_WORD.findall(title.lower()))
+
+
+def _rank(token: str) -> int:
+    """Fixed global word order shared by every indexed prefix"""
+    return zlib.crc32(token.encode('utf-8'))
+
+
+class TitleIndex:
+    """
+    Streaming near-duplicate index over titles, keyed by article id.
+
+    Usage:
+        if index.find(title) is None:
+            index.add(article_id, title)
+        index.remove(article_id)            # when the article is dropped
+    """
+
+    def __init__(self, similarity: Fraction = DUPLICATE_SIMILARITY):
+        self.similarity = similarity
+        self._lock = threading.Lock()
+        self._tokens: Dict[str, FrozenSet[str]] = {}
+        self._prefixes: Dict[str, List[str]] = {}
+        self._postings: Dict[str, Set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._tokens)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._tokens
+
+    def _prefix(self, tokens: FrozenSet[str]) -> List[str]:
+        # A duplicate shares at least min_overlap of these tokens, so it
+        # shares one with the first len - min_overlap + 1 of them in any order
+        min_overlap = math.floor(self.similarity * len(tokens)) + 1
+        return sorted(tokens, key=_rank)[:len(tokens) - min_overlap + 1]
+
+    def _similar(self, a: FrozenSet[str], b: FrozenSet[str]) -> bool:
+        return len(a & b) > self.similarity * max(len(a), len(b))
+
+    def find(self, title: str) -> Optional[str]:
+        """Key of an indexed title similar to title, if any"""
+        tokens = title_tokens(title)
+        if not tokens:
+            return None
+        with self._lock:
+            checked = set()
+            for token in self._prefix(tokens):
+                for key in self._postings.get(token, ()):
+                    if key not in checked:
+                        checked.add(key)
+                        if self._similar(tokens, self._tokens[key]):
+                            return key
+        return None
+
+    def add(self, key: str, title: str) -> None:
+        with self._lock:
+            if key in self._tokens:
+                return
+            tokens = title_tokens(title)
+            prefix = self._prefix(tokens) if tokens else []
+            self._tokens[key] = tokens
+            self._prefixes[key] = prefix
+            for token in prefix:
+                self._postings.setdefault(token, set()).add(key)
+
+    def remove(self, key: str) -> None:
+        with self._lock:
+            if self._tokens.pop(key, None) is None:
+                return
+            for token in self._prefixes.pop(key):
+                keys = self._postings[token]
+                keys.discard(key)
+                if not keys:
+                    del self._postings[token]
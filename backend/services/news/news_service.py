@@ -5,16 +5,26 @@ Data Sources:
 1. Finnhub API (free tier - general, forex, crypto news)
 2. Moroccan news scrapers (medias24, boursenews, etc.)
 3. RSS feeds (fallback)
+
+Sources are fetched concurrently by a background ingestion loop using
+conditional requests (ETag / If-Modified-Since); new articles go into an
+indexed ArticleStore, and the get_* methods only read from it.
 """
 import requests
 from bs4 import BeautifulSoup
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from functools import partial
 import logging
-import re
+import threading
+import time
 import os
-from typing import Dict, List, Optional, Any
+from typing import Callable, Dict, List, Optional, Any
 import hashlib
 
+from .article_store import ArticleStore
+from .dedup import TitleIndex
+
 logger = logging.getLogger(__name__)
 
 
@@ -62,19 +72,41 @@ class NewsService:
         'baisse', 'chute', 'perte', 'crise', 'risque', 'recul', 'inquietude'
     ]
 
-    def __init__(self, cache_service=None):
-        self.cache = cache_service
+    # Seconds between ingestion passes
+    REFRESH_INTERVAL = 120
+
+    # Markets queried under another name
+    MARKET_ALIASES = {'general': 'us'}
+
+    def __init__(self):
         self.finnhub_key = os.environ.get('FINNHUB_API_KEY', '')
         self.session = requests.Session()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
         })
-        self.cache_ttl = 300  # 5 minutes
+        self.store = ArticleStore()
+
+        # Ingestion sources: name -> fetch callable (None when unchanged upstream)
+        self.sources: Dict[str, Callable[[], Optional[List[Dict]]]] = {
+            f'finnhub_{category}': partial(self._fetch_finnhub, category)
+            for category in ('general', 'crypto', 'forex')
+        }
+        self.sources.update({
+            source_key: partial(self._scrape_moroccan_source, source_key, source_info)
+            for source_key, source_info in self.MOROCCAN_SOURCES.items()
+        })
+
+        # Conditional request validators per source: {'etag', 'last_modified'}
+        self._validators: Dict[str, Dict[str, str]] = {}
+        self._executor = ThreadPoolExecutor(max_workers=len(self.sources), thread_name_prefix='news-ingest')
+        self._running = False
+        self._last_refresh: Optional[float] = None
+        self._stats = {'refreshes': 0, 'fetched': 0, 'not_modified': 0, 'errors': 0, 'added': 0}
 
     def get_news(self, market: str = "all", category: str = None,
                  limit: int = 20, sentiment: str = None) -> List[Dict]:
         """
-        Get aggregated news from all sources.
+        Get aggregated news from all sources (reads the ingested articles).
 
         Args:
             market: 'all', 'us', 'crypto', 'forex', 'moroccan'
@@ -82,26 +114,20 @@ class NewsService:
             limit: Maximum number of articles
             sentiment: Filter by 'positive', 'negative', 'neutral'
         """
-        cache_key = f"news_{market}_{category}_{limit}"
+        market = self.MARKET_ALIASES.get(market, market)
+        filtered = (category is not None) or (sentiment and sentiment != 'all')
 
-        # Check cache
-        if self.cache:
-            cached = self.cache.get(cache_key)
-            if cached:
-                news = cached
-            else:
-                news = self._fetch_all_news(market, category)
-                self.cache.set(cache_key, news, ex=self.cache_ttl)
-        else:
-            news = self._fetch_all_news(market, category)
+        news = self.store.latest(market, None if filtered else limit)
+        if not news and not len(self.store):
+            news = self._get_sample_news(market)
+
+        if category is not None:
+            news = [n for n in news if n.get('category') == category]
 
         # Filter by sentiment if specified
         if sentiment and sentiment != 'all':
             news = [n for n in news if n.get('sentiment', 'neutral') == sentiment]
 
-        # Sort by date (newest first)
-        news.sort(key=lambda x: x.get('published_at', ''), reverse=True)
-
         return news[:limit]
 
     def get_breaking_news(self, limit: int = 5) -> List[Dict]:
@@ -121,64 +147,98 @@ class NewsService:
         return breaking[:limit]
 
     def get_news_by_symbol(self, symbol: str, limit: int = 10) -> List[Dict]:
-        """Get news related to a specific stock symbol."""
-        all_news = self.get_news(market='all', limit=100)
-
-        # Filter by symbol mention in title or summary
-        symbol_upper = symbol.upper()
-        related = []
-        for article in all_news:
-            title = article.get('title', '').upper()
-            summary = article.get('summary', '').upper()
-            related_symbols = article.get('related', [])
+        """Get news mentioning or related to a specific symbol."""
+        return self.store.by_symbol(symbol, limit)
+
+    # ==================== INGESTION ====================
+
+    def _conditional_get(self, source: str, url: str, **kwargs) -> Optional[requests.Response]:
+        """GET url with the source's ETag / Last-Modified; None when upstream is unchanged"""
+        validators = self._validators.get(source, {})
+        headers = {}
+        if validators.get('etag'):
+            headers['If-None-Match'] = validators['etag']
+        if validators.get('last_modified'):
+            headers['If-Modified-Since'] = validators['last_modified']
+
+        response = self.session.get(url, headers=headers, timeout=10, **kwargs)
+        if response.status_code == 304:
+            return None
+        if response.status_code == 200:
+            self._validators[source] = {
+                'etag': response.headers.get('ETag', ''),
+                'last_modified': response.headers.get('Last-Modified', '')
+            }
+        return response
 
-            if symbol_upper in title or symbol_upper in summary or symbol_upper in related_symbols:
-                related.append(article)
+    def _fetch_source(self, name: str) -> Optional[List[Dict]]:
+        try:
+            articles = self.sources[name]()
+        except Exception as e:
+            logger.warning(f"News source {name} failed: {e}")
+            # Refetch in full next time rather than trust validators of a failed parse
+            self._validators.pop(name, None)
+            self._stats['errors'] += 1
+            return None
+        if articles is None:
+            self._stats['not_modified'] += 1
+        else:
+            self._stats['fetched'] += 1
+        return articles
 
-        return related[:limit]
+    def refresh(self) -> int:
+        """Fetch every source concurrently and store new articles; returns the number added"""
+        fresh = []
+        for articles in self._executor.map(self._fetch_source, list(self.sources)):
+            fresh.extend(a for a in articles or () if a['id'] not in self.store)
 
-    def _fetch_all_news(self, market: str, category: str = None) -> List[Dict]:
-        """Fetch news from all configured sources."""
-        news = []
+        # New articles are checked against the stored titles, across fetches
+        added = self.store.add(self._deduplicate(fresh, self.store.titles))
 
-        # Finnhub for international news
-        if market in ['all', 'us', 'general']:
-            try:
-                finnhub_news = self._fetch_finnhub('general')
-                news.extend(finnhub_news)
-            except Exception as e:
-                logger.warning(f"Finnhub general news failed: {e}")
+        self._last_refresh = time.time()
+        self._stats['refreshes'] += 1
+        self._stats['added'] += added
+        if added:
+            logger.info(f"News Service: Stored {added} new article(s), {len(self.store)} total")
+        return added
 
-        if market in ['all', 'crypto']:
-            try:
-                crypto_news = self._fetch_finnhub('crypto')
-                news.extend(crypto_news)
-            except Exception as e:
-                logger.warning(f"Finnhub crypto news failed: {e}")
+    def _ingestion_loop(self) -> None:
+        try:
+            import eventlet
+            sleep_func = eventlet.sleep
+        except ImportError:
+            sleep_func = time.sleep
 
-        if market in ['all', 'forex']:
+        while self._running:
             try:
-                forex_news = self._fetch_finnhub('forex')
-                news.extend(forex_news)
+                self.refresh()
             except Exception as e:
-                logger.warning(f"Finnhub forex news failed: {e}")
+                logger.error(f"News Service: Ingestion error: {e}")
+            sleep_func(self.REFRESH_INTERVAL)
 
-        # Moroccan news
-        if market in ['all', 'moroccan']:
-            try:
-                moroccan_news = self._fetch_moroccan_news()
-                news.extend(moroccan_news)
-            except Exception as e:
-                logger.warning(f"Moroccan news failed: {e}")
+    def start(self) -> None:
+        """Start background ingestion"""
+        if self._running:
+            return
+        self._running = True
 
-        # Deduplicate
-        news = self._deduplicate(news)
+        # Use eventlet.spawn_n for green thread compatibility
+        try:
+            import eventlet
+            eventlet.spawn_n(self._ingestion_loop)
+        except ImportError:
+            threading.Thread(target=self._ingestion_loop, daemon=True).start()
 
-        # If no news fetched, return sample news data
-        if not news:
-            news = self._get_sample_news(market)
+    def stop(self) -> None:
+        self._running = False
 
-        return news
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'running': self._running,
+            'articles': len(self.store),
+            'last_refresh': self._last_refresh,
+            **self._stats
+        }
 
     def _get_sample_news(self, market: str = 'all') -> List[Dict]:
         """Generate sample news when real sources are unavailable."""
@@ -325,27 +385,25 @@ class NewsService:
 
         return sample_news
 
-    def _fetch_finnhub(self, category: str) -> List[Dict]:
+    def _fetch_finnhub(self, category: str) -> Optional[List[Dict]]:
         """Fetch news from Finnhub API."""
         if not self.finnhub_key:
             logger.debug("No Finnhub API key configured")
             return []
 
-        try:
-            url = f"{self.FINNHUB_BASE}/news"
-            params = {
-                'category': category,
-                'token': self.finnhub_key
-            }
-            response = self.session.get(url, params=params, timeout=10)
-
-            if response.status_code == 200:
-                articles = response.json()
-                return [self._normalize_finnhub(a, category) for a in articles[:30]]
-        except Exception as e:
-            logger.error(f"Finnhub API error: {e}")
+        url = f"{self.FINNHUB_BASE}/news"
+        params = {
+            'category': category,
+            'token': self.finnhub_key
+        }
+        response = self._conditional_get(f'finnhub_{category}', url, params=params)
+        if response is None:
+            return None
+        if response.status_code != 200:
+            return []
 
-        return []
+        articles = response.json()
+        return [self._normalize_finnhub(a, category) for a in articles[:30]]
 
     def _normalize_finnhub(self, article: Dict, category: str) -> Dict:
         """Normalize Finnhub article to standard format."""
@@ -366,44 +424,26 @@ class NewsService:
             'related': article.get('related', '').split(',') if article.get('related') else []
         }
 
-    def _fetch_moroccan_news(self) -> List[Dict]:
-        """Fetch news from Moroccan sources via scraping."""
-        news = []
-
-        for source_key, source_info in self.MOROCCAN_SOURCES.items():
-            try:
-                source_news = self._scrape_moroccan_source(source_key, source_info)
-                news.extend(source_news)
-            except Exception as e:
-                logger.debug(f"Failed to scrape {source_key}: {e}")
-
-        return news
-
-    def _scrape_moroccan_source(self, source_key: str, source_info: Dict) -> List[Dict]:
+    def _scrape_moroccan_source(self, source_key: str, source_info: Dict) -> Optional[List[Dict]]:
         """Scrape a single Moroccan news source."""
-        articles = []
-
-        try:
-            response = self.session.get(source_info['url'], timeout=10)
-            if response.status_code != 200:
-                return articles
-
-            soup = BeautifulSoup(response.text, 'html.parser')
-
-            # Different parsing for each source
-            if source_key == 'medias24':
-                articles = self._parse_medias24(soup, source_info)
-            elif source_key == 'boursenews':
-                articles = self._parse_boursenews(soup, source_info)
-            elif source_key == 'lematin':
-                articles = self._parse_lematin(soup, source_info)
-            elif source_key == 'lavieeco':
-                articles = self._parse_lavieeco(soup, source_info)
-
-        except Exception as e:
-            logger.debug(f"Scraping error for {source_key}: {e}")
+        response = self._conditional_get(source_key, source_info['url'])
+        if response is None:
+            return None
+        if response.status_code != 200:
+            return []
 
-        return articles
+        soup = BeautifulSoup(response.text, 'html.parser')
+
+        # Different parsing for each source
+        if source_key == 'medias24':
+            return self._parse_medias24(soup, source_info)
+        elif source_key == 'boursenews':
+            return self._parse_boursenews(soup, source_info)
+        elif source_key == 'lematin':
+            return self._parse_lematin(soup, source_info)
+        elif source_key == 'lavieeco':
+            return self._parse_lavieeco(soup, source_info)
+        return []
 
     def _parse_medias24(self, soup: BeautifulSoup, source_info: Dict) -> List[Dict]:
         """Parse Medias24 articles."""
@@ -571,30 +611,20 @@ class NewsService:
         """Generate unique ID from title."""
         return hashlib.md5(title.encode()).hexdigest()[:12]
 
-    def _deduplicate(self, news: List[Dict]) -> List[Dict]:
-        """Remove duplicate articles based on title similarity."""
-        seen_titles = set()
+    def _deduplicate(self, news: List[Dict], index: Optional[TitleIndex] = None) -> List[Dict]:
+        """
+        Remove articles whose title is similar to an earlier one, or to one
+        already in index (which the kept articles are added to).
+        """
+        index = index if index is not None else TitleIndex()
         unique = []
 
         for article in news:
-            # Create simplified title for comparison
-            title = article.get('title', '').lower()
-            title_words = set(re.findall(r'\w+', title))
-
-            # Check if similar title exists
-            is_duplicate = False
-            for seen in seen_titles:
-                seen_words = set(re.findall(r'\w+', seen))
-                # Consider duplicate if 70% words match
-                if title_words and seen_words:
-                    overlap = len(title_words & seen_words) / max(len(title_words), len(seen_words))
-                    if overlap > 0.7:
-                        is_duplicate = True
-                        break
-
-            if not is_duplicate:
-                seen_titles.add(title)
-                unique.append(article)
+            title = article.get('title', '')
+            if index.find(title) is not None:
+                continue
+            index.add(article['id'], title)
+            unique.append(article)
 
         return unique
 
@@ -638,9 +668,9 @@ class NewsService:
 _news_service = None
 
 
-def get_news_service(cache_service=None) -> NewsService:
+def get_news_service() -> NewsService:
     """Get or create singleton NewsService instance."""
     global _news_service
     if _news_service is None:
-        _news_service = NewsService(cache_service)
+        _news_service = NewsService()
     return _news_service
@@ -0,0 +1,621 @@
+"""
+Advanced Order Engine - Tick-driven execution of trailing stop, OCO and bracket orders
+Active orders are held in memory per symbol. Static trigger levels (OCO legs,
+bracket entries/exits, trailing stop activation) live in sorted level books so
+a tick only touches the levels it crossed; active trailing stops are updated
+only for the ticked symbol. Fills and trailing-level changes are persisted by
+a flush loop in one transaction per interval.
+"""
+
+import time
+import itertools
+import threading
+import logging
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple, Any
+
+from sqlalchemy import bindparam, func
+
+from services.sltp_engine import LevelBook, book_key, settle_trades, evaluate_challenges
+from services.challenge_engine import invalidate_trade_stats
+
+logger = logging.getLogger(__name__)
+
+# Seconds between persisting fills and trailing-level changes
+FLUSH_INTERVAL = 1.0
+
+# Seconds between full index rebuilds from the database (also expires orders)
+RECONCILE_INTERVAL = 60
+
+TRAILING_STOP = 'trailing_stop'
+OCO = 'oco'
+BRACKET = 'bracket'
+
+
+class _LiveOrder:
+    """In-memory state of one active advanced order"""
+
+    __slots__ = ('kind', 'order_id', 'key', 'side', 'state', 'legs',
+                 'trail_type', 'trail_amount', 'trail_percent', 'extreme', 'stop')
+
+    def __init__(self, kind: str, order_id: int, key: str, side: str, state: str):
+        self.kind = kind
+        self.order_id = order_id
+        self.key = key
+        self.side = side
+        self.state = state
+        # [(leg_id, book side, level, name)] in trigger priority order
+        self.legs: List[Tuple[int, str, float, str]] = []
+        self.trail_type = 'amount'
+        self.trail_amount: Optional[float] = None
+        self.trail_percent: Optional[float] = None
+        self.extreme: Optional[float] = None
+        self.stop: Optional[float] = None
+
+    def first_crossed(self, price: float) -> Optional[str]:
+        """Name of the highest-priority leg this price crossed"""
+        for _, side, level, name in self.legs:
+            if (side == 'lower' and price <= level) or (side == 'upper' and price >= level):
+                return name
+        return None
+
+    def trail(self, price: float) -> Tuple[bool, bool]:
+        """
+        Apply a tick to an active trailing stop (same rules as
+        TrailingStopOrder.update_trailing_stop). Returns (moved, triggered).
+        """
+        if self.trail_type == 'percent':
+            distance = price * (self.trail_percent or 0) / 100
+        else:
+            distance = self.trail_amount or 0
+
+        moved = False
+        if self.side == 'sell':
+            if self.extreme is None or price > self.extreme:
+                self.extreme = price
+                self.stop = price - distance
+                moved = True
+            return moved, self.stop is not None and price <= self.stop
+
+        if self.extreme is None or price < self.extreme:
+            self.extreme = price
+            self.stop = price + distance
+            moved = True
+        return moved, self.stop is not None and price >= self.stop
+
+
+def _entry_side(side: str, entry_type: str) -> Optional[str]:
+    if entry_type == 'limit':
+        return 'lower' if side == 'buy' else 'upper'
+    if entry_type == 'stop':
+        return 'upper' if side == 'buy' else 'lower'
+    return None
+
+
+class AdvancedOrderEngine:
+    """
+    Executes trailing stop, OCO and bracket orders on live ticks.
+
+    Usage:
+        order_engine.start(app)                     # load active orders, listen to ticks
+        order_engine.add_order('oco', order)        # after creating/updating an order
+        order_engine.remove_order('oco', order.id)  # after cancelling an order
+    """
+
+    def __init__(self):
+        self._books: Dict[str, LevelBook] = {}
+        self._legs: Dict[int, Tuple[_LiveOrder, str]] = {}
+        self._orders: Dict[Tuple[str, int], _LiveOrder] = {}
+        self._trailing: Dict[str, Dict[int, _LiveOrder]] = {}
+        self._market_entries: Dict[str, Dict[int, _LiveOrder]] = {}
+        self._leg_ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+        # Pending writes: fills are (kind, order_id, action, price, extra)
+        self._fills: List[Tuple[str, int, str, float, Any]] = []
+        self._dirty: Dict[int, _LiveOrder] = {}
+
+        self._app = None
+        self._running = False
+        self._last_reconcile = 0.0
+        self._stats = {'ticks': 0, 'fills': 0, 'trail_updates': 0, 'flushes': 0, 'failed_flushes': 0}
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    def __len__(self) -> int:
+        return len(self._orders)
+
+    # ==================== INDEX ====================
+
+    def _add_leg(self, order: _LiveOrder, side: str, level, name: str) -> None:
+        if level is None:
+            return
+        leg_id = next(self._leg_ids)
+        level = float(level)
+        order.legs.append((leg_id, side, level, name))
+        self._legs[leg_id] = (order, name)
+        self._books.setdefault(order.key, LevelBook()).insert(side, level, leg_id)
+
+    def _clear_legs(self, order: _LiveOrder) -> None:
+        book = self._books.get(order.key)
+        for leg_id, side, level, _ in order.legs:
+            self._legs.pop(leg_id, None)
+            if book is not None:
+                book.discard(side, level, leg_id)
+        order.legs = []
+        if book is not None and not len(book):
+            del self._books[order.key]
+
+    def _detach(self, order: _LiveOrder) -> None:
+        self._clear_legs(order)
+        self._orders.pop((order.kind, order.order_id), None)
+        if order.kind == TRAILING_STOP:
+            self._trailing.get(order.key, {}).pop(order.order_id, None)
+        elif order.kind == BRACKET:
+            self._market_entries.get(order.key, {}).pop(order.order_id, None)
+
+    def _activate_trailing(self, order: _LiveOrder) -> None:
+        order.state = 'active'
+        self._trailing.setdefault(order.key, {})[order.order_id] = order
+
+    def _build(self, kind: str, model) -> Optional[_LiveOrder]:
+        """Build the in-memory state of an order model, or None if it cannot trigger"""
+        from models import OrderStatus
+
+        pending, active = OrderStatus.PENDING.value, OrderStatus.ACTIVE.value
+        key = book_key(model.symbol)
+
+        if kind == TRAILING_STOP:
+            if model.status not in (pending, active):
+                return None
+            order = _LiveOrder(kind, model.id, key, model.side, model.status)
+            order.trail_type = model.trail_type or 'amount'
+            order.trail_amount = float(model.trail_amount) if model.trail_amount is not None else None
+            order.trail_percent = float(model.trail_percent) if model.trail_percent is not None else None
+            extreme = model.highest_price if model.side == 'sell' else model.lowest_price
+            order.extreme = float(extreme) if extreme is not None else None
+            order.stop = float(model.current_stop_price) if model.current_stop_price is not None else None
+            if model.status == active:
+                self._activate_trailing(order)
+            elif model.activation_price is not None:
+                self._add_leg(order, 'upper' if model.side == 'sell' else 'lower', model.activation_price, 'activate')
+            else:
+                return None
+            return order
+
+        if kind == OCO:
+            if model.status != active:
+                return None
+            order = _LiveOrder(kind, model.id, key, None, model.status)
+            if model.order1_status == pending and model.order1_type == 'limit':
+                self._add_leg(order, 'upper' if model.order1_side == 'sell' else 'lower', model.order1_price, 'order1')
+            if model.order2_status == pending and model.order2_type == 'stop':
+                self._add_leg(order, 'lower' if model.order2_side == 'sell' else 'upper', model.order2_price, 'order2')
+            return order if order.legs else None
+
+        if kind == BRACKET:
+            order = _LiveOrder(kind, model.id, key, model.side, model.status)
+            if model.status == pending and model.entry_status == pending:
+                if model.entry_type == 'market':
+                    self._market_entries.setdefault(key, {})[model.id] = order
+                else:
+                    side = _entry_side(model.side, model.entry_type)
+                    if side is None:
+                        return None
+                    self._add_leg(order, side, model.entry_price, 'entry')
+                return order
+            if model.status == active:
+                self._add_exit_legs(order, model.take_profit_price, model.stop_loss_price)
+                return order
+        return None
+
+    def _add_exit_legs(self, order: _LiveOrder, take_profit, stop_loss) -> None:
+        if order.side == 'buy':
+            self._add_leg(order, 'upper', take_profit, 'take_profit')
+            self._add_leg(order, 'lower', stop_loss, 'stop_loss')
+        else:
+            self._add_leg(order, 'lower', take_profit, 'take_profit')
+            self._add_leg(order, 'upper', stop_loss, 'stop_loss')
+
+    def add_order(self, kind: str, model) -> bool:
+        """Index (or re-index) an order model. Returns False if it is not executable."""
+        with self._lock:
+            existing = self._orders.get((kind, model.id))
+            if existing is not None:
+                self._detach(existing)
+                if kind == TRAILING_STOP:
+                    self._dirty.pop(model.id, None)
+            order = self._build(kind, model)
+            if order is None:
+                return False
+            self._orders[(kind, model.id)] = order
+        return True
+
+    def remove_order(self, kind: str, order_id: int) -> None:
+        """Drop an order from the index (no-op if it is not indexed)"""
+        with self._lock:
+            order = self._orders.get((kind, order_id))
+            if order is not None:
+                self._detach(order)
+            if kind == TRAILING_STOP:
+                self._dirty.pop(order_id, None)
+
+    def rebuild(self, trailing_stops=(), oco_orders=(), bracket_orders=()) -> None:
+        """Replace the whole index with the given active order models"""
+        with self._lock:
+            self._books = {}
+            self._legs = {}
+            self._orders = {}
+            self._trailing = {}
+            self._market_entries = {}
+            for kind, models in ((TRAILING_STOP, trailing_stops), (OCO, oco_orders), (BRACKET, bracket_orders)):
+                for model in models:
+                    order = self._build(kind, model)
+                    if order is not None:
+                        self._orders[(kind, model.id)] = order
+
+    # ==================== TICKS ====================
+
+    def on_tick(self, symbol: str, price: float) -> int:
+        """Apply one price update to the orders on its symbol. Returns the fill count."""
+        key = book_key(symbol)
+        if not price or (key not in self._books and key not in self._trailing
+                         and key not in self._market_entries):
+            return 0
+
+        fills = 0
+        with self._lock:
+            self._stats['ticks'] += 1
+
+            # Bracket market entries fill on the first tick
+            for order in list(self._market_entries.pop(key, {}).values()):
+                fills += self._fill_entry(order, price)
+
+            book = self._books.get(key)
+            if book is not None:
+                for leg_id in book.crossed(price):
+                    leg = self._legs.get(leg_id)
+                    if leg is None:
+                        # Already consumed by another leg of the same order
+                        continue
+                    fills += self._on_leg(leg[0], price)
+
+            trailing = self._trailing.get(key)
+            if trailing:
+                for order in list(trailing.values()):
+                    moved, triggered = order.trail(price)
+                    if triggered:
+                        self._detach(order)
+                        self._dirty.pop(order.order_id, None)
+                        self._fills.append((TRAILING_STOP, order.order_id, 'trigger', price, (order.extreme, order.stop)))
+                        fills += 1
+                    elif moved:
+                        self._dirty[order.order_id] = order
+
+        self._stats['fills'] += fills
+        return fills
+
+    def _on_leg(self, order: _LiveOrder, price: float) -> int:
+        name = order.first_crossed(price)
+        if name is None:
+            return 0
+
+        if name == 'activate':
+            self._clear_legs(order)
+            self._activate_trailing(order)
+            self._dirty[order.order_id] = order
+            return 0
+
+        if name == 'entry':
+            return self._fill_entry(order, price)
+
+        # OCO leg or bracket exit: the order is done
+        self._detach(order)
+        if order.kind == OCO:
+            self._fills.append((OCO, order.order_id, 'execute', price, 1 if name == 'order1' else 2))
+        else:
+            self._fills.append((BRACKET, order.order_id, 'exit', price, name))
+        return 1
+
+    def _fill_entry(self, order: _LiveOrder, price: float) -> int:
+        self._clear_legs(order)
+        self._fills.append((BRACKET, order.order_id, 'entry', price, None))
+        order.state = 'active'
+        # Exit legs are indexed once the fill is persisted (see _persist)
+        return 1
+
+    def on_prices(self, records: Dict[str, Any]) -> None:
+        """Price store listener: feed every written record through on_tick"""
+        for symbol, record in records.items():
+            self.on_tick(symbol, record.last)
+
+    # ==================== PERSISTENCE ====================
+
+    def flush(self) -> int:
+        """
+        Persist pending fills and trailing-level changes in one transaction.
+        Requires an app context. Returns the number of orders written.
+        """
+        from models import db
+
+        with self._lock:
+            fills, self._fills = self._fills, []
+            dirty, self._dirty = self._dirty, {}
+        if not fills and not dirty:
+            return 0
+
+        try:
+            written, opened, closed, challenges = self._persist(fills, dirty)
+            db.session.commit()
+        except Exception as e:
+            logger.error(f"Order Engine: Flush of {len(fills)} fill(s) failed: {e}")
+            db.session.rollback()
+            self._stats['failed_flushes'] += 1
+            with self._lock:
+                # Trailing levels are retried; lost fills are re-detected after
+                # the next reconcile because the orders are still active in the DB
+                for order_id, order in dirty.items():
+                    self._dirty.setdefault(order_id, order)
+            return 0
+
+        self._stats['flushes'] += 1
+
+        with self._lock:
+            for order, model in opened:
+                self._add_exit_legs(order, model.take_profit_price, model.stop_loss_price)
+        for _, model in opened:
+            invalidate_trade_stats(model.challenge_id)
+
+        if closed:
+            from services.sltp_engine import sltp_engine
+            for trade, price, pnl in closed:
+                sltp_engine.remove(trade.id)
+                logger.info(f"Order Engine: Closed {trade.symbol} trade #{trade.id} (price: {price}, PnL: {pnl})")
+            evaluate_challenges(challenges.values())
+
+        return written
+
+    def _persist(self, fills, dirty):
+        from models import (
+            db, Trade, UserChallenge, TrailingStopOrder, OCOOrder, BracketOrder, OrderStatus
+        )
+
+        pending, active = OrderStatus.PENDING.value, OrderStatus.ACTIVE.value
+        now = datetime.utcnow()
+        by_kind: Dict[str, List[tuple]] = {TRAILING_STOP: [], OCO: [], BRACKET: []}
+        for fill in fills:
+            by_kind[fill[0]].append(fill)
+
+        closes: Dict[int, float] = {}
+        owners: Dict[int, Tuple[int, str]] = {}
+        opened = []
+        written = 0
+
+        def load(model_cls, items, statuses):
+            ids = list({item[1] for item in items})
+            if not ids:
+                return {}
+            rows = model_cls.query.filter(
+                model_cls.id.in_(ids),
+                model_cls.status.in_(statuses)
+            ).with_for_update().all()
+            return {row.id: row for row in rows}
+
+        # Trailing stop triggers
+        models = load(TrailingStopOrder, by_kind[TRAILING_STOP], [pending, active])
+        for _, order_id, _, price, (extreme, stop) in by_kind[TRAILING_STOP]:
+            model = models.get(order_id)
+            if model is None:
+                continue
+            if model.side == 'sell':
+                model.highest_price = Decimal(str(extreme))
+            else:
+                model.lowest_price = Decimal(str(extreme))
+            model.current_stop_price = Decimal(str(stop))
+            model.status = OrderStatus.TRIGGERED.value
+            model.triggered_at = now
+            model.triggered_price = Decimal(str(price))
+            model.filled_price = Decimal(str(price))
+            model.filled_quantity = model.quantity
+            if model.position_id:
+                closes[model.position_id] = price
+                owners[model.position_id] = (model.challenge_id, model.symbol)
+            written += 1
+
+        # OCO executions
+        models = load(OCOOrder, by_kind[OCO], [active])
+        for _, order_id, _, price, order_num in by_kind[OCO]:
+            model = models.get(order_id)
+            if model is None:
+                continue
+            model.execute_order(order_num, price)
+            if model.position_id:
+                closes[model.position_id] = price
+                owners[model.position_id] = (model.challenge_id, model.symbol)
+            written += 1
+
+        # Bracket entries open a position, exits close it
+        models = load(BracketOrder, by_kind[BRACKET], [pending, active])
+        challenge_ids = {model.challenge_id for model in models.values()}
+        challenges = {
+            c.id: c for c in UserChallenge.query.filter(UserChallenge.id.in_(challenge_ids)).all()
+        } if challenge_ids else {}
+
+        new_positions = []
+        for _, order_id, action, price, exit_type in by_kind[BRACKET]:
+            model = models.get(order_id)
+            if model is None:
+                continue
+            if action == 'entry':
+                if model.entry_status != pending:
+                    continue
+                challenge = challenges.get(model.challenge_id)
+                if challenge is None or challenge.status not in ('active', 'funded'):
+                    model.status = OrderStatus.REJECTED.value
+                    model.entry_status = OrderStatus.REJECTED.value
+                    written += 1
+                    continue
+                model.fill_entry(price)
+                trade = Trade(
+                    challenge_id=model.challenge_id,
+                    symbol=model.symbol,
+                    trade_type=model.side,
+                    quantity=model.quantity,
+                    entry_price=Decimal(str(price)),
+                    status='open'
+                )
+                db.session.add(trade)
+                new_positions.append((model, trade))
+                live = self._orders.get((BRACKET, order_id))
+                if live is not None:
+                    opened.append((live, model))
+            else:
+                if model.status != active:
+                    continue
+                model.fill_exit(exit_type, price)
+                if model.position_id:
+                    closes[model.position_id] = price
+                    owners[model.position_id] = (model.challenge_id, model.symbol)
+            written += 1
+
+        if new_positions:
+            db.session.flush()
+            for model, trade in new_positions:
+                model.position_id = trade.id
+
+        # Trailing-level changes as one executemany UPDATE
+        mappings = []
+        for order_id, order in dirty.items():
+            mappings.append({
+                'b_id': order_id,
+                'b_status': order.state,
+                'b_highest': Decimal(str(order.extreme)) if order.side == 'sell' and order.extreme is not None else None,
+                'b_lowest': Decimal(str(order.extreme)) if order.side != 'sell' and order.extreme is not None else None,
+                'b_stop': Decimal(str(order.stop)) if order.stop is not None else None,
+                'b_updated': now
+            })
+        if mappings:
+            table = TrailingStopOrder.__table__
+            db.session.execute(
+                table.update().where(
+                    table.c.id == bindparam('b_id'),
+                    table.c.status.in_([pending, active])
+                ).values(
+                    status=bindparam('b_status'),
+                    highest_price=func.coalesce(bindparam('b_highest'), table.c.highest_price),
+                    lowest_price=func.coalesce(bindparam('b_lowest'), table.c.lowest_price),
+                    current_stop_price=bindparam('b_stop'),
+                    updated_at=bindparam('b_updated')
+                ),
+                mappings
+            )
+            self._stats['trail_updates'] += len(mappings)
+            written += len(mappings)
+
+        closed, closed_challenges = settle_trades(closes, owners)
+        return written, opened, closed, closed_challenges
+
+    # ==================== LIFECYCLE ====================
+
+    def expire_orders(self) -> int:
+        """Mark pending/active orders past expires_at as expired (requires an app context)"""
+        from models import db, TrailingStopOrder, OCOOrder, BracketOrder, OrderStatus
+
+        now = datetime.utcnow()
+        live = [OrderStatus.PENDING.value, OrderStatus.ACTIVE.value]
+        expired = 0
+        for model_cls in (TrailingStopOrder, OCOOrder, BracketOrder):
+            expired += model_cls.query.filter(
+                model_cls.expires_at.isnot(None),
+                model_cls.expires_at <= now,
+                model_cls.status.in_(live)
+            ).update({'status': OrderStatus.EXPIRED.value}, synchronize_session=False)
+        db.session.commit()
+        return expired
+
+    def load_active_orders(self) -> int:
+        """Rebuild the index from the database (requires an app context)"""
+        from models import TrailingStopOrder, OCOOrder, BracketOrder, OrderStatus
+
+        live = [OrderStatus.PENDING.value, OrderStatus.ACTIVE.value]
+        self.rebuild(
+            TrailingStopOrder.query.filter(TrailingStopOrder.status.in_(live)).all(),
+            OCOOrder.query.filter(OCOOrder.status == OrderStatus.ACTIVE.value).all(),
+            BracketOrder.query.filter(BracketOrder.status.in_(live)).all()
+        )
+        self._last_reconcile = time.time()
+        return len(self._orders)
+
+    def reconcile(self) -> int:
+        """Flush, expire and reload the index from the database (requires an app context)"""
+        self.flush()
+        self.expire_orders()
+        return self.load_active_orders()
+
+    def _flush_loop(self) -> None:
+        try:
+            import eventlet
+            sleep_func = eventlet.sleep
+        except ImportError:
+            sleep_func = time.sleep
+
+        while self._running:
+            sleep_func(FLUSH_INTERVAL)
+            try:
+                with self._app.app_context():
+                    if time.time() - self._last_reconcile >= RECONCILE_INTERVAL:
+                        self.reconcile()
+                    else:
+                        self.flush()
+            except Exception as e:
+                logger.error(f"Order Engine: Flush loop error: {e}")
+
+    def start(self, app) -> None:
+        """Load active orders, subscribe to price writes and start the flush loop"""
+        from services.market.price_store import price_store
+
+        if self._running:
+            return
+        self._app = app
+
+        with app.app_context():
+            try:
+                self.expire_orders()
+                count = self.load_active_orders()
+                logger.info(f"Order Engine: Indexed {count} active order(s)")
+            except Exception as e:
+                logger.warning(f"Order Engine: Initial index load failed: {e}")
+
+        self._running = True
+        price_store.add_listener(self.on_prices)
+
+        # Use eventlet.spawn_n for green thread compatibility
+        try:
+            import eventlet
+            eventlet.spawn_n(self._flush_loop)
+        except ImportError:
+            threading.Thread(target=self._flush_loop, daemon=True).start()
+
+    def stop(self) -> None:
+        from services.market.price_store import price_store
+
+        self._running = False
+        price_store.remove_listener(self.on_prices)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'running': self._running,
+            'orders': len(self._orders),
+            'levels': len(self._legs),
+            'trailing_active': sum(len(orders) for orders in self._trailing.values()),
+            'pending_fills': len(self._fills),
+            'pending_trail_updates': len(self._dirty),
+            **self._stats
+        }
+
+
+# Global advanced order engine instance
+order_engine = AdvancedOrderEngine()
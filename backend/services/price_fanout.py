@@ -0,0 +1,285 @@
+"""
+Price Fan-out - Coalesced, delta-only WebSocket price frames
+Price store writes mark symbols as changed; once per interval every client
+gets a single frame holding only its subscribed symbols whose tick moved
+since the last frame. Clients without subscriptions share one room frame.
+Clients that acknowledge frames get backpressure: while a frame is
+unacknowledged, newer ticks overwrite the pending ones instead of queueing.
+Every node has the ticks in its own price store, so frames go only to the
+node's own clients and bypass the SocketIO message queue.
+"""
+
+import time
+import threading
+import logging
+from typing import Dict, List, Optional, Set, Any
+
+from services.sltp_engine import book_key
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Seconds between frames
+FLUSH_INTERVAL = 1.0
+
+# Seconds an unacknowledged frame blocks newer ones before it is presumed lost
+ACK_TIMEOUT = 5.0
+
+# Room of clients without explicit subscriptions (they get every changed symbol)
+ALL_PRICES_ROOM = 'prices_all'
+
+# Frame encodings: 'json' keeps the prices_batch shape, 'compact' sends rows
+# in COMPACT_FIELDS order, 'msgpack' sends the compact frame as msgpack bytes
+ENCODINGS = ('json', 'compact', 'msgpack')
+COMPACT_FIELDS = ['symbol', 'price', 'change', 'change_percent']
+
+
+class _Subscriber:
+    """One connection's subscriptions and delivery state"""
+
+    __slots__ = ('sid', 'symbols', 'encoding', 'ack', 'awaiting_since', 'pending')
+
+    def __init__(self, sid: str, encoding: str = 'json', ack: bool = False):
+        self.sid = sid
+        self.symbols: Dict[str, str] = {}   # book key -> symbol as subscribed
+        self.encoding = encoding
+        self.ack = ack
+        self.awaiting_since = 0.0
+        self.pending: Dict[str, Any] = {}   # book key -> latest record not yet sent
+
+
+def encode_frame(entries: Dict[str, Any], encoding: str, ts: float):
+    """
+    Encode {symbol: PriceRecord} as (event, payload).
+
+    json:    ('prices_batch', {'prices': {symbol: {...}}, 'timestamp': ts})
+    compact: ('prices_delta', {'t': ts, 'f': COMPACT_FIELDS, 'd': [[symbol, price, change, change_percent]]})
+    msgpack: ('prices_delta', <msgpack bytes of the compact frame>)
+    """
+    if encoding == 'json':
+        return 'prices_batch', {
+            'prices': {
+                symbol: {'price': record.last, 'change': record.change, 'change_percent': record.change_percent}
+                for symbol, record in entries.items()
+            },
+            'timestamp': ts
+        }
+
+    frame = {
+        't': ts,
+        'f': COMPACT_FIELDS,
+        'd': [[symbol, record.last, record.change, record.change_percent] for symbol, record in entries.items()]
+    }
+    if encoding == 'msgpack' and MSGPACK_AVAILABLE:
+        return 'prices_delta', msgpack.packb(frame)
+    return 'prices_delta', frame
+
+
+class PriceFanout:
+    """
+    Room-scoped, delta-encoded price broadcaster.
+
+    Usage:
+        price_fanout.start(socketio)
+        price_fanout.subscribe(sid, ['BTC-USD'], encoding='compact', ack=True)
+    """
+
+    def __init__(self, interval: float = FLUSH_INTERVAL):
+        self.interval = interval
+        self._socketio = None
+        self._lock = threading.Lock()
+        self._subscribers: Dict[str, _Subscriber] = {}
+        self._by_key: Dict[str, Set[str]] = {}        # book key -> sids
+        self._changed: Dict[str, Any] = {}            # symbol -> record since last flush
+        self._last_sent: Dict[str, tuple] = {}        # book key -> (price, change_percent)
+        self._running = False
+        self._stats = {'frames': 0, 'room_frames': 0, 'dropped_ticks': 0, 'ack_timeouts': 0}
+
+    # ==================== SUBSCRIPTIONS ====================
+
+    def subscribe(self, sid: str, symbols: List[str], encoding: Optional[str] = None,
+                  ack: Optional[bool] = None) -> List[str]:
+        """Add symbols to a connection's frame; returns its full symbol list"""
+        from services.market.price_store import price_store
+
+        with self._lock:
+            subscriber = self._subscribers.get(sid)
+            if subscriber is None:
+                subscriber = self._subscribers[sid] = _Subscriber(sid)
+            if encoding in ENCODINGS:
+                subscriber.encoding = encoding
+            if ack is not None:
+                subscriber.ack = bool(ack)
+            for symbol in symbols:
+                key = book_key(symbol)
+                subscriber.symbols[key] = symbol.upper()
+                self._by_key.setdefault(key, set()).add(sid)
+                # Start from the current tick rather than waiting for it to move
+                record = price_store.get(symbol)
+                if record is not None:
+                    subscriber.pending[key] = record
+            return list(subscriber.symbols.values())
+
+    def unsubscribe(self, sid: str, symbols: List[str]) -> List[str]:
+        """Remove symbols from a connection's frame; returns the symbols left"""
+        with self._lock:
+            subscriber = self._subscribers.get(sid)
+            if subscriber is None:
+                return []
+            for symbol in symbols:
+                key = book_key(symbol)
+                subscriber.symbols.pop(key, None)
+                self._discard(key, sid)
+            return list(subscriber.symbols.values())
+
+    def remove(self, sid: str) -> None:
+        """Forget a disconnected client"""
+        with self._lock:
+            subscriber = self._subscribers.pop(sid, None)
+            if subscriber is not None:
+                for key in subscriber.symbols:
+                    self._discard(key, sid)
+
+    def _discard(self, key: str, sid: str) -> None:
+        sids = self._by_key.get(key)
+        if sids is not None:
+            sids.discard(sid)
+            if not sids:
+                del self._by_key[key]
+
+    def acknowledge(self, sid: str) -> None:
+        """Client received its last frame; the next one may be sent"""
+        subscriber = self._subscribers.get(sid)
+        if subscriber is not None:
+            subscriber.awaiting_since = 0.0
+
+    # ==================== TICKS ====================
+
+    def on_prices(self, records: Dict[str, Any]) -> None:
+        """Price store listener: remember the latest record per changed symbol"""
+        with self._lock:
+            self._changed.update(records)
+
+    def collect(self) -> Dict[str, Any]:
+        """Take the symbols whose tick moved since they were last sent"""
+        with self._lock:
+            changed, self._changed = self._changed, {}
+
+        deltas = {}
+        for symbol, record in changed.items():
+            key = book_key(symbol)
+            tick = (record.last, record.change_percent)
+            if self._last_sent.get(key) != tick:
+                self._last_sent[key] = tick
+                deltas[symbol] = record
+        return deltas
+
+    def flush(self) -> int:
+        """Send one frame per client (and one to the shared room); returns frames sent"""
+        deltas = self.collect()
+        if self._socketio is None:
+            return 0
+
+        now = time.time()
+        if deltas:
+            event, payload = encode_frame(deltas, 'json', now)
+            self._socketio.emit(event, payload, room=ALL_PRICES_ROOM, ignore_queue=True)
+            self._stats['room_frames'] += 1
+
+        frames = []
+        with self._lock:
+            for symbol, record in deltas.items():
+                key = book_key(symbol)
+                for sid in self._by_key.get(key, ()):
+                    subscriber = self._subscribers[sid]
+                    if key in subscriber.pending:
+                        self._stats['dropped_ticks'] += 1
+                    subscriber.pending[key] = record
+
+            for subscriber in self._subscribers.values():
+                if not subscriber.pending:
+                    continue
+                if subscriber.awaiting_since:
+                    if now - subscriber.awaiting_since < ACK_TIMEOUT:
+                        continue
+                    self._stats['ack_timeouts'] += 1
+                entries = {subscriber.symbols[key]: record for key, record in subscriber.pending.items()
+                           if key in subscriber.symbols}
+                subscriber.pending = {}
+                if entries:
+                    if subscriber.ack:
+                        subscriber.awaiting_since = now
+                    frames.append((subscriber, entries))
+
+        for subscriber, entries in frames:
+            event, payload = encode_frame(entries, subscriber.encoding, now)
+            try:
+                if subscriber.ack:
+                    sid = subscriber.sid
+                    self._socketio.emit(event, payload, to=sid, ignore_queue=True,
+                                       callback=lambda *_, sid=sid: self.acknowledge(sid))
+                else:
+                    self._socketio.emit(event, payload, to=subscriber.sid, ignore_queue=True)
+            except Exception as e:
+                logger.debug(f"Price Fan-out: Emit to {subscriber.sid} failed: {e}")
+
+        self._stats['frames'] += len(frames)
+        return len(frames)
+
+    # ==================== LIFECYCLE ====================
+
+    def _flush_loop(self) -> None:
+        try:
+            import eventlet
+            sleep_func = eventlet.sleep
+        except ImportError:
+            sleep_func = time.sleep
+
+        while self._running:
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Price Fan-out: Flush error: {e}")
+            sleep_func(self.interval)
+
+    def start(self, socketio) -> None:
+        """Subscribe to price store writes and start sending frames"""
+        from services.market.price_store import price_store
+
+        if self._running:
+            return
+        self._socketio = socketio
+        self._running = True
+        price_store.add_listener(self.on_prices)
+
+        # Use eventlet.spawn_n for green thread compatibility
+        try:
+            import eventlet
+            eventlet.spawn_n(self._flush_loop)
+        except ImportError:
+            threading.Thread(target=self._flush_loop, daemon=True).start()
+        logger.info(f"Price Fan-out: Started (interval: {self.interval}s)")
+
+    def stop(self) -> None:
+        from services.market.price_store import price_store
+
+        self._running = False
+        price_store.remove_listener(self.on_prices)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'running': self._running,
+            'subscribers': len(self._subscribers),
+            'symbols': len(self._by_key),
+            'msgpack': MSGPACK_AVAILABLE,
+            **self._stats
+        }
+
+
+# Global price fan-out instance
+price_fanout = PriceFanout()
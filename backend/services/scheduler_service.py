@@ -7,6 +7,7 @@ Handles:
 - Trial expiration checking
 - Auto-charging expired trials via PayPal billing agreements
 - Challenge status updates
+- Admin analytics rollups
 """
 
 from apscheduler.schedulers.background import BackgroundScheduler
@@ -88,10 +89,32 @@ def init_scheduler(app):
             misfire_grace_time=30
         )
 
+        # Reconcile leaderboard sorted sets with the database hourly
+        scheduler.add_job(
+            func=reconcile_leaderboards,
+            trigger=IntervalTrigger(hours=1),
+            id='reconcile_leaderboards',
+            name='Reconcile leaderboard rankings',
+            replace_existing=True,
+            misfire_grace_time=3600
+        )
+
+        # Keep the admin analytics rollups current (first run backfills them)
+        scheduler.add_job(
+            func=refresh_analytics_rollups,
+            trigger=IntervalTrigger(minutes=15),
+            id='refresh_analytics_rollups',
+            name='Refresh admin analytics rollups',
+            replace_existing=True,
+            next_run_time=datetime.now(),
+            misfire_grace_time=900
+        )
+
         # Start scheduler if not already running
         if not scheduler.running:
             scheduler.start()
-            print("APScheduler started - Trial auto-charge (hourly) + SL/TP monitor (10s)")
+            print("APScheduler started - Trial auto-charge (hourly) + SL/TP monitor (10s) + leaderboard reconcile (hourly)"
+                  " + analytics rollups (15m)")
     else:
         print("Celery Beat handles scheduled tasks - APScheduler not started")
 
@@ -282,6 +305,32 @@ def run_trial_check_now():
     print("Manual trial check completed")
 
 
+def reconcile_leaderboards():
+    """Rebuild the leaderboard sorted sets from the database (APScheduler fallback of sync_leaderboard)"""
+    if not _app:
+        return
+
+    from services.leaderboard_service import leaderboards
+    with _app.app_context():
+        try:
+            leaderboards.rebuild()
+        except Exception as e:
+            logger.error(f"Leaderboard reconcile failed: {e}")
+
+
+def refresh_analytics_rollups():
+    """Update the admin analytics rollups (APScheduler fallback of update_analytics_rollups)"""
+    if not _app:
+        return
+
+    from services.analytics_rollups import analytics_rollups
+    with _app.app_context():
+        try:
+            analytics_rollups.refresh()
+        except Exception as e:
+            logger.error(f"Analytics rollup refresh failed: {e}")
+
+
 def check_stop_loss_take_profit():
     """
     Monitor open trades and automatically close them when SL/TP is hit.
@@ -290,10 +339,23 @@ def check_stop_loss_take_profit():
     1. Finds all open trades with stop_loss or take_profit set
     2. Fetches current prices for each symbol
     3. Closes trades that hit their SL or TP levels
+
+    When the SL/TP engine is running, trades are triggered on price ticks
+    and this job reconciles the engine's index with the database and checks
+    it against current prices, fetching symbols that have no fresh tick.
     """
     if not _app:
         return
 
+    from services.sltp_engine import sltp_engine
+    if sltp_engine.running:
+        with _app.app_context():
+            try:
+                sltp_engine.reconcile()
+            except Exception as e:
+                logger.error(f"SL/TP Monitor: Reconcile failed: {e}")
+        return
+
     with _app.app_context():
         from models import db, Trade, UserChallenge
         from services.yfinance_service import get_current_price, get_fallback_price
@@ -363,12 +425,10 @@ def check_stop_loss_take_profit():
                         # Update challenge balance
                         challenge = UserChallenge.query.get(trade.challenge_id)
                         if challenge:
-                            challenge.current_balance = challenge.current_balance + Decimal(str(pnl))
-                            if challenge.current_balance > challenge.highest_balance:
-                                challenge.highest_balance = challenge.current_balance
+                            engine.apply_closed_trade(challenge, pnl)
 
-                            # Evaluate challenge rules
-                            engine.evaluate_challenge(challenge)
+                            # Evaluate challenge rules (commits the close with it)
+                            engine.evaluate_challenge(challenge, commit=False)
 
                         db.session.commit()
                         trades_closed += 1
@@ -0,0 +1,144 @@
+"""
+Indicator Engine - Vectorized technical indicators on NumPy arrays
+Every function takes a (symbols x time) matrix (a 1-D series is treated as
+one row) and works along the time axis: SMA and rolling std from cumulative
+sums, EMA and Wilder smoothing by the recursion itself, stepping along time
+with every row updated at once.
+compute_indicators() derives everything the signal service needs in one
+pass, computing each shared series (EMA 12/26, SMA 20) once.
+"""
+
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+def as_matrix(prices) -> np.ndarray:
+    """Prices as a float (symbols x time) matrix"""
+    return np.atleast_2d(np.asarray(prices, dtype=float))
+
+
+def smooth(x: np.ndarray, alpha: float, seed: np.ndarray) -> np.ndarray:
+    """
+    Exponential smoothing y[k] = y[k-1] + alpha * (x[k] - y[k-1]) along the
+    time axis, starting from seed (one value per row).
+
+    Stepping the exact recursion keeps a flat series exactly flat, so signs
+    of differences (MACD vs signal, EMA 12 vs 26) stay exact.
+    """
+    out = np.empty_like(x)
+    previous = seed
+    for k in range(x.shape[1]):
+        previous = previous + alpha * (x[:, k] - previous)
+        out[:, k] = previous
+    return out
+
+
+def sma(prices, period: int) -> np.ndarray:
+    """Simple moving average; one column per full window"""
+    x = as_matrix(prices)
+    if x.shape[1] < period:
+        return np.empty((x.shape[0], 0))
+    sums = np.cumsum(np.pad(x, ((0, 0), (1, 0))), axis=1)
+    return (sums[:, period:] - sums[:, :-period]) / period
+
+
+def ema(prices, period: int) -> np.ndarray:
+    """Exponential moving average seeded with the SMA of the first window"""
+    x = as_matrix(prices)
+    if x.shape[1] < period:
+        return np.empty((x.shape[0], 0))
+    seed = x[:, :period].mean(axis=1)
+    out = np.empty((x.shape[0], x.shape[1] - period + 1))
+    out[:, 0] = seed
+    out[:, 1:] = smooth(x[:, period:], 2 / (period + 1), seed)
+    return out
+
+
+def rolling_std(prices, period: int) -> np.ndarray:
+    """Population standard deviation over each full window"""
+    x = as_matrix(prices)
+    if x.shape[1] < period:
+        return np.empty((x.shape[0], 0))
+    # Centre each row first so the sum of squares keeps its precision
+    centred = x - x.mean(axis=1, keepdims=True)
+    mean = sma(centred, period)
+    mean_sq = sma(centred * centred, period)
+    return np.sqrt(np.maximum(mean_sq - mean * mean, 0.0))
+
+
+def rsi(prices, period: int = 14) -> np.ndarray:
+    """Wilder RSI of the latest bar per row (NaN when there are too few bars)"""
+    x = as_matrix(prices)
+    if x.shape[1] < period + 1:
+        return np.full(x.shape[0], np.nan)
+    changes = np.diff(x, axis=1)
+    gains = np.maximum(changes, 0.0)
+    losses = np.maximum(-changes, 0.0)
+
+    avg_gain = gains[:, :period].mean(axis=1)
+    avg_loss = losses[:, :period].mean(axis=1)
+    if changes.shape[1] > period:
+        avg_gain = smooth(gains[:, period:], 1 / period, avg_gain)[:, -1]
+        avg_loss = smooth(losses[:, period:], 1 / period, avg_loss)[:, -1]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        value = 100 - 100 / (1 + avg_gain / avg_loss)
+    return np.where(avg_loss == 0, 100.0, value)
+
+
+def macd(ema_fast: np.ndarray, ema_slow: np.ndarray, signal: int = 9) -> Tuple[np.ndarray, np.ndarray]:
+    """MACD line (fast - slow, aligned on the slow EMA) and its signal EMA"""
+    offset = ema_fast.shape[1] - ema_slow.shape[1]
+    line = ema_fast[:, offset:] - ema_slow
+    return line, ema(line, signal)
+
+
+def compute_indicators(prices, rsi_period: int = 14, bb_period: int = 20,
+                       fast: int = 12, slow: int = 26, signal: int = 9) -> Dict[str, np.ndarray]:
+    """
+    Latest indicator values for every row of a price matrix.
+
+    Returns arrays of one value per row; values whose series needs more bars
+    than the matrix has are NaN.
+    """
+    x = as_matrix(prices)
+    rows, bars = x.shape
+    missing = np.full(rows, np.nan)
+
+    def last(series: np.ndarray, back: int = 1) -> np.ndarray:
+        return series[:, -back] if series.shape[1] >= back else missing
+
+    ema_fast, ema_slow = ema(x, fast), ema(x, slow)
+    sma_bb = sma(x, bb_period)
+    result = {
+        'price': x[:, -1] if bars else missing,
+        'rsi': rsi(x, rsi_period),
+        'ema_12': last(ema_fast),
+        'ema_26': last(ema_slow),
+        'sma_20': last(sma_bb) if bb_period == 20 else last(sma(x, 20)),
+        'sma_50': last(sma(x, 50)),
+        'sma_200': last(sma(x, 200)),
+        'bb_middle': last(sma_bb),
+        'bb_std': last(rolling_std(x, bb_period)),
+        'macd': missing, 'macd_prev': missing,
+        'macd_signal': missing, 'macd_signal_prev': missing,
+    }
+
+    if bars >= slow + signal:
+        line, signal_line = macd(ema_fast, ema_slow, signal)
+        result.update({
+            'macd': last(line), 'macd_prev': last(line, 2),
+            'macd_signal': last(signal_line), 'macd_signal_prev': last(signal_line, 2),
+        })
+    return result
+
+
+def group_by_length(series: Sequence[Sequence[float]]) -> List[Tuple[List[int], np.ndarray]]:
+    """Stack equal-length price series into matrices: [(row indices, matrix)]"""
+    groups: Dict[int, List[int]] = {}
+    for index, prices in enumerate(series):
+        groups.setdefault(len(prices), []).append(index)
+    return [
+        (indices, np.array([series[i] for i in indices], dtype=float))
+        for length, indices in groups.items() if length
+    ]
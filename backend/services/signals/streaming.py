@@ -0,0 +1,477 @@
+"""
+Streaming Indicators - Per-symbol indicator state updated per tick
+Each tracked symbol keeps EMA, Wilder RSI, MACD, rolling Bollinger (sliding
+Welford variance), SMA and support/resistance pivot state for its closed
+candles. A tick only moves the forming candle's price, and indicator values
+for it are derived from the closed-candle state in O(1); when a tick falls
+in a new candle the forming one is committed. Signal endpoints read the
+state directly, and a composite signal flip is pushed over WebSocket.
+"""
+
+import math
+import time
+import threading
+import logging
+from collections import OrderedDict, deque
+from typing import Callable, Dict, List, Optional, Set, Tuple, Any
+
+from services.sltp_engine import book_key
+
+logger = logging.getLogger(__name__)
+
+NAN = float('nan')
+
+# Candle length in seconds; states are seeded from daily closes
+CANDLE_INTERVAL = 86400
+
+# Seconds without a tick before a state is re-seeded from history
+RESEED_AFTER = CANDLE_INTERVAL
+
+# Symbols whose state is kept per worker
+MAX_STREAMED_SYMBOLS = 500
+
+# Seconds between composite signal checks for symbols that ticked
+SIGNAL_CHECK_INTERVAL = 5.0
+
+# Pushes between full re-sums of the running window aggregates (bounds drift)
+RESUM_EVERY = 1000
+
+
+class StreamingEMA:
+    """EMA seeded with the SMA of its first window"""
+
+    __slots__ = ('period', 'alpha', 'count', 'total', 'value')
+
+    def __init__(self, period: int):
+        self.period = period
+        self.alpha = 2 / (period + 1)
+        self.count = 0
+        self.total = 0.0
+        self.value = NAN
+
+    def update(self, x: float) -> float:
+        self.count += 1
+        if self.count < self.period:
+            self.total += x
+        elif self.count == self.period:
+            self.value = (self.total + x) / self.period
+        else:
+            self.value += (x - self.value) * self.alpha
+        return self.value
+
+    def peek(self, x: float) -> float:
+        """Value if x were the next input"""
+        if self.count + 1 < self.period:
+            return NAN
+        if self.count + 1 == self.period:
+            return (self.total + x) / self.period
+        return self.value + (x - self.value) * self.alpha
+
+
+class StreamingRSI:
+    """Wilder RSI over closes"""
+
+    __slots__ = ('period', 'previous', 'changes', 'gain', 'loss')
+
+    def __init__(self, period: int = 14):
+        self.period = period
+        self.previous: Optional[float] = None
+        self.changes = 0
+        self.gain = 0.0     # sum during warm-up, then the smoothed average
+        self.loss = 0.0
+
+    def _next(self, x: float) -> Tuple[float, float]:
+        change = x - self.previous
+        gain, loss = max(change, 0.0), max(-change, 0.0)
+        if self.changes + 1 < self.period:
+            return self.gain + gain, self.loss + loss
+        if self.changes + 1 == self.period:
+            return (self.gain + gain) / self.period, (self.loss + loss) / self.period
+        return (self.gain * (self.period - 1) + gain) / self.period, (self.loss * (self.period - 1) + loss) / self.period
+
+    def update(self, x: float) -> None:
+        if self.previous is not None:
+            self.gain, self.loss = self._next(x)
+            self.changes += 1
+        self.previous = x
+
+    def peek(self, x: float) -> float:
+        if self.previous is None or self.changes + 1 < self.period:
+            return NAN
+        gain, loss = self._next(x)
+        return 100.0 if loss == 0 else 100 - 100 / (1 + gain / loss)
+
+
+class RollingWindow:
+    """Mean and population variance of the last N values (sliding Welford)"""
+
+    __slots__ = ('period', 'values', 'mean', 'm2', 'pushes')
+
+    def __init__(self, period: int):
+        self.period = period
+        self.values = deque()
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.pushes = 0
+
+    @staticmethod
+    def _add(n: int, mean: float, m2: float, x: float) -> Tuple[int, float, float]:
+        n += 1
+        delta = x - mean
+        mean += delta / n
+        return n, mean, m2 + delta * (x - mean)
+
+    @staticmethod
+    def _remove(n: int, mean: float, m2: float, x: float) -> Tuple[int, float, float]:
+        if n <= 1:
+            return 0, 0.0, 0.0
+        new_mean = (n * mean - x) / (n - 1)
+        return n - 1, new_mean, max(m2 - (x - mean) * (x - new_mean), 0.0)
+
+    def push(self, x: float) -> None:
+        self.values.append(x)
+        _, self.mean, self.m2 = self._add(len(self.values) - 1, self.mean, self.m2, x)
+        if len(self.values) > self.period:
+            old = self.values.popleft()
+            _, self.mean, self.m2 = self._remove(len(self.values) + 1, self.mean, self.m2, old)
+        self.pushes += 1
+        if self.pushes % RESUM_EVERY == 0:
+            n = len(self.values)
+            self.mean = sum(self.values) / n
+            self.m2 = sum((v - self.mean) ** 2 for v in self.values)
+
+    def peek(self, x: float) -> Tuple[float, float]:
+        """(mean, std) of the window if x were pushed; NaN until it is full"""
+        n = len(self.values)
+        if n + 1 < self.period:
+            return NAN, NAN
+        n, mean, m2 = self._add(n, self.mean, self.m2, x)
+        if n > self.period:
+            n, mean, m2 = self._remove(n, mean, m2, self.values[0])
+        return mean, math.sqrt(m2 / n)
+
+
+class RollingMean:
+    """Mean of the last N values from a running sum"""
+
+    __slots__ = ('period', 'values', 'total', 'pushes')
+
+    def __init__(self, period: int):
+        self.period = period
+        self.values = deque()
+        self.total = 0.0
+        self.pushes = 0
+
+    def push(self, x: float) -> None:
+        self.values.append(x)
+        self.total += x
+        if len(self.values) > self.period:
+            self.total -= self.values.popleft()
+        self.pushes += 1
+        if self.pushes % RESUM_EVERY == 0:
+            self.total = sum(self.values)
+
+    def peek(self, x: float) -> float:
+        n = len(self.values)
+        if n + 1 < self.period:
+            return NAN
+        total = self.total + x
+        if n + 1 > self.period:
+            total -= self.values[0]
+        return total / self.period
+
+
+class PivotTracker:
+    """
+    Support/resistance over the last N prices (N-1 closes plus the forming one):
+    strict local lows/highs confirmed as closes arrive, and the range from
+    monotonic deques.
+    """
+
+    __slots__ = ('period', 'closes', 'index', 'pivots', 'highs', 'lows')
+
+    def __init__(self, period: int = 20):
+        self.period = period
+        self.closes = deque(maxlen=2)           # last two closes
+        self.index = -1                         # index of the last close
+        self.pivots = deque()                   # (index, value, is_support)
+        self.highs = deque()                    # (index, value), values decreasing
+        self.lows = deque()                     # (index, value), values increasing
+
+    def _window_start(self) -> int:
+        """Index of the oldest close inside the window"""
+        return self.index - (self.period - 2)
+
+    def update(self, x: float) -> None:
+        self.index += 1
+        if len(self.closes) == 2:
+            left, middle = self.closes
+            if middle < left and middle < x:
+                self.pivots.append((self.index - 1, middle, True))
+            if middle > left and middle > x:
+                self.pivots.append((self.index - 1, middle, False))
+        self.closes.append(x)
+
+        while self.highs and self.highs[-1][1] <= x:
+            self.highs.pop()
+        self.highs.append((self.index, x))
+        while self.lows and self.lows[-1][1] >= x:
+            self.lows.pop()
+        self.lows.append((self.index, x))
+
+        start = self._window_start()
+        # A pivot needs its left neighbour inside the window too
+        while self.pivots and self.pivots[0][0] <= start:
+            self.pivots.popleft()
+        while self.highs[0][0] < start:
+            self.highs.popleft()
+        while self.lows[0][0] < start:
+            self.lows.popleft()
+
+    def levels(self, price: float) -> Tuple[List[float], List[float], Optional[float], Optional[float]]:
+        """(supports, resistances, high, low) with price as the newest value"""
+        if self.index + 2 < self.period:
+            return [], [], None, None
+        supports = [value for _, value, is_support in self.pivots if is_support]
+        resistances = [value for _, value, is_support in self.pivots if not is_support]
+        if len(self.closes) == 2:
+            left, middle = self.closes
+            if middle < left and middle < price:
+                supports.append(middle)
+            if middle > left and middle > price:
+                resistances.append(middle)
+        return supports, resistances, max(self.highs[0][1], price), min(self.lows[0][1], price)
+
+
+class SymbolIndicators:
+    """Indicator state of one symbol: closed candles plus the forming candle's price"""
+
+    def __init__(self, symbol: str):
+        self.symbol = symbol
+        self.ema_fast = StreamingEMA(12)
+        self.ema_slow = StreamingEMA(26)
+        self.macd_signal = StreamingEMA(9)
+        self.rsi = StreamingRSI(14)
+        self.bollinger = RollingWindow(20)
+        self.sma_50 = RollingMean(50)
+        self.sma_200 = RollingMean(200)
+        self.pivots = PivotTracker(20)
+        self.bars = 0                       # closed candles
+        self.macd = NAN                     # MACD line of the last closed candle
+        self.price: Optional[float] = None  # forming candle
+        self.candle_start: Optional[float] = None
+        self.updated_at = time.time()
+        self.last_signal: Optional[str] = None
+
+    def seed(self, closes: List[float], now: Optional[float] = None) -> None:
+        """Load history; its last value is taken as the forming candle"""
+        for close in closes[:-1]:
+            self.close(close)
+        if closes:
+            now = now or time.time()
+            self.price = closes[-1]
+            self.candle_start = now - now % CANDLE_INTERVAL
+
+    def close(self, price: float) -> None:
+        """Commit a closed candle"""
+        fast, slow = self.ema_fast.update(price), self.ema_slow.update(price)
+        if not math.isnan(slow):
+            self.macd = fast - slow
+            self.macd_signal.update(self.macd)
+        self.rsi.update(price)
+        self.bollinger.push(price)
+        self.sma_50.push(price)
+        self.sma_200.push(price)
+        self.pivots.update(price)
+        self.bars += 1
+
+    def on_tick(self, price: float, ts: Optional[float] = None) -> None:
+        """Move the forming candle; a tick in a later candle closes it first"""
+        ts = ts or time.time()
+        start = ts - ts % CANDLE_INTERVAL
+        if self.candle_start is not None and start > self.candle_start and self.price is not None:
+            self.close(self.price)
+        if self.candle_start is None or start > self.candle_start:
+            self.candle_start = start
+        self.price = price
+        self.updated_at = time.time()
+
+    def values(self) -> Dict[str, float]:
+        """Latest values in compute_indicators() keys, with the forming candle as the newest bar"""
+        price = self.price
+        fast, slow = self.ema_fast.peek(price), self.ema_slow.peek(price)
+        middle, std = self.bollinger.peek(price)
+        values = {
+            'price': price,
+            'rsi': self.rsi.peek(price),
+            'ema_12': fast,
+            'ema_26': slow,
+            'sma_20': middle,
+            'sma_50': self.sma_50.peek(price),
+            'sma_200': self.sma_200.peek(price),
+            'bb_middle': middle,
+            'bb_std': std,
+            'macd': NAN, 'macd_prev': NAN, 'macd_signal': NAN, 'macd_signal_prev': NAN,
+        }
+        # The batch engine needs slow + signal bars before it reports MACD
+        if self.bars + 1 >= self.ema_slow.period + self.macd_signal.period:
+            line = fast - slow
+            values.update({
+                'macd': line,
+                'macd_prev': self.macd,
+                'macd_signal': self.macd_signal.peek(line),
+                'macd_signal_prev': self.macd_signal.value,
+            })
+        return values
+
+    def levels(self):
+        return self.pivots.levels(self.price)
+
+
+class IndicatorStream:
+    """
+    Streaming indicator states of the symbols signals were asked for.
+
+    Usage:
+        indicator_stream.start(socketio, loader=history_loader)
+        state = indicator_stream.get('BTC-USD')
+        get_technical_service().get_signal_from_state('BTC-USD', state)
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._states: 'OrderedDict[str, SymbolIndicators]' = OrderedDict()
+        self._dirty: Set[str] = set()
+        self._socketio = None
+        self._loader: Optional[Callable[[str], List[float]]] = None
+        self._running = False
+        self._stats = {'seeded': 0, 'ticks': 0, 'flips': 0}
+
+    def get(self, symbol: str, loader: Optional[Callable[[str], List[float]]] = None) -> SymbolIndicators:
+        """
+        State of a symbol, seeded from loader(symbol) (default: the one given
+        to start()) on first use or after going stale. A symbol the loader has
+        no history for is returned empty and not tracked.
+        """
+        from services.market.price_store import price_store
+
+        key = book_key(symbol)
+        with self._lock:
+            state = self._states.get(key)
+            if state is not None and time.time() - state.updated_at < RESEED_AFTER:
+                self._states.move_to_end(key)
+                return state
+
+        loader = loader or self._loader
+        state = SymbolIndicators(symbol.upper())
+        state.seed((loader(symbol) if loader else None) or [])
+        if state.price is None:
+            # No history: left untracked so the next call retries the load
+            return state
+
+        record = price_store.get(symbol)
+        if record is not None:
+            state.on_tick(record.last, record.ts)
+        with self._lock:
+            self._states[key] = state
+            self._states.move_to_end(key)
+            while len(self._states) > MAX_STREAMED_SYMBOLS:
+                self._states.popitem(last=False)
+            self._stats['seeded'] += 1
+        return state
+
+    def on_prices(self, records: Dict[str, Any]) -> None:
+        """Price store listener: move the forming candle of tracked symbols"""
+        for symbol, record in records.items():
+            key = book_key(symbol)
+            state = self._states.get(key)
+            if state is not None and state.price is not None:
+                state.on_tick(record.last, record.ts)
+                self._dirty.add(key)
+                self._stats['ticks'] += 1
+
+    def check_signals(self) -> int:
+        """Push composite signal flips of symbols that ticked; returns flips sent"""
+        from services.signals.technical_signals import get_technical_service
+
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            states = [(key, self._states[key]) for key in dirty if key in self._states]
+
+        service = get_technical_service()
+        flips = 0
+        for key, state in states:
+            result = service.get_signal_from_state(state.symbol, state)
+            signal = result['signal']
+            previous, state.last_signal = state.last_signal, signal
+            if previous is None or previous == signal or self._socketio is None:
+                continue
+            flips += 1
+            try:
+                self._socketio.emit('technical_signal', {
+                    'symbol': state.symbol,
+                    'signal': signal,
+                    'previous_signal': previous,
+                    'score': result['score'],
+                    'price': state.price,
+                    'timestamp': time.time()
+                }, room=signal_room(state.symbol), ignore_queue=True)
+            except Exception as e:
+                logger.debug(f"Indicator Stream: Emit for {state.symbol} failed: {e}")
+        self._stats['flips'] += flips
+        return flips
+
+    def _check_loop(self) -> None:
+        try:
+            import eventlet
+            sleep_func = eventlet.sleep
+        except ImportError:
+            sleep_func = time.sleep
+
+        while self._running:
+            try:
+                self.check_signals()
+            except Exception as e:
+                logger.error(f"Indicator Stream: Signal check error: {e}")
+            sleep_func(SIGNAL_CHECK_INTERVAL)
+
+    def start(self, socketio=None, loader: Optional[Callable[[str], List[float]]] = None) -> None:
+        """Follow price store writes and push signal flips; loader(symbol) returns closes"""
+        from services.market.price_store import price_store
+
+        if self._running:
+            return
+        self._socketio = socketio
+        self._loader = loader
+        self._running = True
+        price_store.add_listener(self.on_prices)
+
+        # Use eventlet.spawn_n for green thread compatibility
+        try:
+            import eventlet
+            eventlet.spawn_n(self._check_loop)
+        except ImportError:
+            threading.Thread(target=self._check_loop, daemon=True).start()
+        logger.info("Indicator Stream: Started")
+
+    def stop(self) -> None:
+        from services.market.price_store import price_store
+
+        self._running = False
+        price_store.remove_listener(self.on_prices)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'running': self._running,
+            'symbols': len(self._states),
+            **self._stats
+        }
+
+
+def signal_room(symbol: str) -> str:
+    """SocketIO room of a symbol's technical signal flips"""
+    return f"signals_{book_key(symbol)}"
+
+
+# Global indicator stream instance
+indicator_stream = IndicatorStream()
@@ -6,7 +6,28 @@ Calculates RSI, MACD, Bollinger Bands, Moving Averages, and composite signals
 import threading
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple
-import math
+
+import numpy as np
+
+from . import indicators
+
+# Results reported while there are too few bars for an indicator
+NEUTRAL_RSI = {'value': 50.0, 'signal': 'neutral', 'zone': 'neutral'}
+NEUTRAL_MACD = {
+    'macd': 0.0,
+    'signal_line': 0.0,
+    'histogram': 0.0,
+    'trend': 'neutral',
+    'crossover': None
+}
+NEUTRAL_BOLLINGER = {
+    'upper': 0.0,
+    'middle': 0.0,
+    'lower': 0.0,
+    'width': 0.0,
+    'position': 'neutral',
+    'percent_b': 50.0
+}
 
 # Singleton instance
 _technical_service = None
@@ -25,8 +46,10 @@ def get_technical_service():
 
 class TechnicalSignalsService:
     """
-    Technical Analysis service that calculates indicators without external dependencies.
-    Uses pure Python implementations for RSI, MACD, Bollinger Bands, and Moving Averages.
+    Technical Analysis service for RSI, MACD, Bollinger Bands, and Moving Averages.
+    Indicator series come from the vectorized engine in indicators.py; this class
+    turns their latest values into signals. analyze_many() scores many symbols
+    with one engine pass per history length.
     """
 
     def __init__(self):
@@ -35,27 +58,11 @@ class TechnicalSignalsService:
 
     def calculate_sma(self, prices: List[float], period: int) -> List[float]:
         """Calculate Simple Moving Average"""
-        if len(prices) < period:
-            return []
-
-        sma = []
-        for i in range(period - 1, len(prices)):
-            window = prices[i - period + 1:i + 1]
-            sma.append(sum(window) / period)
-        return sma
+        return indicators.sma(prices, period)[0].tolist()
 
     def calculate_ema(self, prices: List[float], period: int) -> List[float]:
         """Calculate Exponential Moving Average"""
-        if len(prices) < period:
-            return []
-
-        multiplier = 2 / (period + 1)
-        ema = [sum(prices[:period]) / period]  # Start with SMA
-
-        for i in range(period, len(prices)):
-            ema.append((prices[i] - ema[-1]) * multiplier + ema[-1])
-
-        return ema
+        return indicators.ema(prices, period)[0].tolist()
 
     def calculate_rsi(self, prices: List[float], period: int = 14) -> Dict:
         """
@@ -63,31 +70,12 @@ class TechnicalSignalsService:
         Returns: {'value': float, 'signal': str, 'zone': str}
         """
         if len(prices) < period + 1:
-            return {'value': 50.0, 'signal': 'neutral', 'zone': 'neutral'}
+            return dict(NEUTRAL_RSI)
 
-        # Calculate price changes
-        changes = [prices[i] - prices[i-1] for i in range(1, len(prices))]
-
-        # Separate gains and losses
-        gains = [max(0, c) for c in changes]
-        losses = [abs(min(0, c)) for c in changes]
-
-        # Calculate initial average gain/loss
-        avg_gain = sum(gains[:period]) / period
-        avg_loss = sum(losses[:period]) / period
-
-        # Calculate smoothed averages for remaining periods
-        for i in range(period, len(gains)):
-            avg_gain = (avg_gain * (period - 1) + gains[i]) / period
-            avg_loss = (avg_loss * (period - 1) + losses[i]) / period
-
-        # Calculate RSI
-        if avg_loss == 0:
-            rsi = 100.0
-        else:
-            rs = avg_gain / avg_loss
-            rsi = 100 - (100 / (1 + rs))
+        return self._rsi_result(float(indicators.rsi(prices, period)[0]))
 
+    def _rsi_result(self, rsi: float) -> Dict:
+        """Classify an RSI value"""
         # Determine signal and zone
         if rsi >= 70:
             signal = 'overbought'
@@ -118,60 +106,39 @@ class TechnicalSignalsService:
         Returns: {'macd': float, 'signal': float, 'histogram': float, 'trend': str}
         """
         if len(prices) < slow + signal:
-            return {
-                'macd': 0.0,
-                'signal_line': 0.0,
-                'histogram': 0.0,
-                'trend': 'neutral',
-                'crossover': None
-            }
-
-        # Calculate EMAs
-        ema_fast = self.calculate_ema(prices, fast)
-        ema_slow = self.calculate_ema(prices, slow)
-
-        # MACD line = Fast EMA - Slow EMA
-        # Align arrays (slow EMA starts later)
-        offset = slow - fast
-        macd_line = []
-        for i in range(len(ema_slow)):
-            macd_line.append(ema_fast[i + offset] - ema_slow[i])
-
-        # Signal line = 9-period EMA of MACD
-        if len(macd_line) >= signal:
-            signal_ema = self.calculate_ema(macd_line, signal)
-            signal_line = signal_ema[-1] if signal_ema else 0
-            macd_value = macd_line[-1]
-            histogram = macd_value - signal_line
-
-            # Previous values for crossover detection
-            prev_macd = macd_line[-2] if len(macd_line) > 1 else macd_value
-            prev_signal = signal_ema[-2] if len(signal_ema) > 1 else signal_line
-
-            # Detect crossover
-            crossover = None
-            if prev_macd <= prev_signal and macd_value > signal_line:
-                crossover = 'bullish'
-            elif prev_macd >= prev_signal and macd_value < signal_line:
-                crossover = 'bearish'
-
-            # Determine trend
-            if histogram > 0 and macd_value > 0:
-                trend = 'strong_bullish'
-            elif histogram > 0:
-                trend = 'bullish'
-            elif histogram < 0 and macd_value < 0:
-                trend = 'strong_bearish'
-            elif histogram < 0:
-                trend = 'bearish'
-            else:
-                trend = 'neutral'
+            return dict(NEUTRAL_MACD)
+
+        ema_fast = indicators.ema(prices, fast)
+        ema_slow = indicators.ema(prices, slow)
+        macd_line, signal_ema = indicators.macd(ema_fast, ema_slow, signal)
+        return self._macd_result(
+            float(macd_line[0, -1]), float(signal_ema[0, -1]),
+            float(macd_line[0, -2]), float(signal_ema[0, -2])
+        )
+
+    def _macd_result(self, macd_value: float, signal_line: float,
+                     prev_macd: float, prev_signal: float) -> Dict:
+        """Classify the latest MACD and signal line values"""
+        histogram = macd_value - signal_line
+
+        # Detect crossover
+        crossover = None
+        if prev_macd <= prev_signal and macd_value > signal_line:
+            crossover = 'bullish'
+        elif prev_macd >= prev_signal and macd_value < signal_line:
+            crossover = 'bearish'
+
+        # Determine trend
+        if histogram > 0 and macd_value > 0:
+            trend = 'strong_bullish'
+        elif histogram > 0:
+            trend = 'bullish'
+        elif histogram < 0 and macd_value < 0:
+            trend = 'strong_bearish'
+        elif histogram < 0:
+            trend = 'bearish'
         else:
-            macd_value = macd_line[-1] if macd_line else 0
-            signal_line = 0
-            histogram = 0
             trend = 'neutral'
-            crossover = None
 
         return {
             'macd': round(macd_value, 4),
@@ -189,32 +156,19 @@ class TechnicalSignalsService:
         Returns: {'upper': float, 'middle': float, 'lower': float, 'width': float, 'position': str}
         """
         if len(prices) < period:
-            return {
-                'upper': 0.0,
-                'middle': 0.0,
-                'lower': 0.0,
-                'width': 0.0,
-                'position': 'neutral',
-                'percent_b': 50.0
-            }
+            return dict(NEUTRAL_BOLLINGER)
 
-        # Calculate SMA (middle band)
-        sma = self.calculate_sma(prices, period)
-        middle = sma[-1]
-
-        # Calculate standard deviation
-        window = prices[-period:]
-        variance = sum((p - middle) ** 2 for p in window) / period
-        std = math.sqrt(variance)
+        middle = float(indicators.sma(prices[-period:], period)[0, -1])
+        std = float(indicators.rolling_std(prices[-period:], period)[0, -1])
+        return self._bollinger_result(prices[-1], middle, std, std_dev)
 
+    def _bollinger_result(self, current_price: float, middle: float, std: float, std_dev: float = 2.0) -> Dict:
+        """Classify the price against bands around a middle value"""
         # Calculate bands
         upper = middle + (std_dev * std)
         lower = middle - (std_dev * std)
         width = ((upper - lower) / middle) * 100 if middle > 0 else 0
 
-        # Current price position
-        current_price = prices[-1]
-
         # %B indicator (position within bands)
         if upper != lower:
             percent_b = ((current_price - lower) / (upper - lower)) * 100
@@ -254,40 +208,25 @@ class TechnicalSignalsService:
         Calculate multiple moving averages and crossover signals
         Returns: {'sma_20': float, 'sma_50': float, 'ema_12': float, 'ema_26': float, 'trend': str}
         """
+        values = indicators.compute_indicators(prices)
+        return self._moving_averages_result(
+            prices[-1] if prices else 0,
+            **{key: self._value(values, key) for key in ('sma_20', 'sma_50', 'sma_200', 'ema_12', 'ema_26')}
+        )
+
+    def _moving_averages_result(self, current_price: float, sma_20: Optional[float], sma_50: Optional[float],
+                                sma_200: Optional[float], ema_12: Optional[float], ema_26: Optional[float]) -> Dict:
+        """Classify the price against its moving averages"""
         result = {
-            'sma_20': None,
-            'sma_50': None,
-            'sma_200': None,
-            'ema_12': None,
-            'ema_26': None,
+            'sma_20': round(sma_20, 4) if sma_20 is not None else None,
+            'sma_50': round(sma_50, 4) if sma_50 is not None else None,
+            'sma_200': round(sma_200, 4) if sma_200 is not None else None,
+            'ema_12': round(ema_12, 4) if ema_12 is not None else None,
+            'ema_26': round(ema_26, 4) if ema_26 is not None else None,
             'trend': 'neutral',
             'crossovers': []
         }
 
-        current_price = prices[-1] if prices else 0
-
-        # Calculate SMAs
-        if len(prices) >= 20:
-            sma_20 = self.calculate_sma(prices, 20)
-            result['sma_20'] = round(sma_20[-1], 4) if sma_20 else None
-
-        if len(prices) >= 50:
-            sma_50 = self.calculate_sma(prices, 50)
-            result['sma_50'] = round(sma_50[-1], 4) if sma_50 else None
-
-        if len(prices) >= 200:
-            sma_200 = self.calculate_sma(prices, 200)
-            result['sma_200'] = round(sma_200[-1], 4) if sma_200 else None
-
-        # Calculate EMAs
-        if len(prices) >= 12:
-            ema_12 = self.calculate_ema(prices, 12)
-            result['ema_12'] = round(ema_12[-1], 4) if ema_12 else None
-
-        if len(prices) >= 26:
-            ema_26 = self.calculate_ema(prices, 26)
-            result['ema_26'] = round(ema_26[-1], 4) if ema_26 else None
-
         # Determine trend based on price vs MAs
         bullish_count = 0
         bearish_count = 0
@@ -362,10 +301,15 @@ class TechnicalSignalsService:
             if recent_prices[i] > recent_prices[i-1] and recent_prices[i] > recent_prices[i+1]:
                 resistances.append(recent_prices[i])
 
-        # Add period high/low as major levels
-        period_high = max(recent_prices)
-        period_low = min(recent_prices)
+        return self._levels_result(supports, resistances, max(recent_prices), min(recent_prices), current_price)
 
+    def _levels_result(self, supports: List[float], resistances: List[float],
+                       period_high: float, period_low: float, current_price: float) -> Dict:
+        """Support/resistance levels from pivot lows/highs and the period range"""
+        supports = list(supports)
+        resistances = list(resistances)
+
+        # Add period high/low as major levels
         if period_low not in supports:
             supports.append(period_low)
         if period_high not in resistances:
@@ -391,10 +335,51 @@ class TechnicalSignalsService:
             'period_low': round(period_low, 4)
         }
 
-    def calculate_composite_score(self, prices: List[float]) -> Dict:
+    @staticmethod
+    def _value(values: Dict, key: str, row: Optional[int] = 0) -> Optional[float]:
+        """One row of an engine result (or a scalar when row is None) as a float, None when unavailable"""
+        value = float(values[key] if row is None else values[key][row])
+        return None if np.isnan(value) else value
+
+    def calculate_all(self, prices: List[float]) -> Dict:
+        """RSI, MACD, Bollinger Bands, moving averages and support/resistance from one engine pass"""
+        return self._indicator_results(
+            prices[-1], indicators.compute_indicators(prices), 0, self.calculate_support_resistance(prices)
+        )
+
+    def _indicator_results(self, price: float, values: Dict, row: Optional[int], support_resistance: Dict) -> Dict:
+        """Signal dicts for one row of compute_indicators() output (or a streaming snapshot, row None)"""
+        value = lambda key: self._value(values, key, row)
+
+        rsi = self._rsi_result(value('rsi')) if value('rsi') is not None else dict(NEUTRAL_RSI)
+        if value('macd') is not None:
+            macd = self._macd_result(value('macd'), value('macd_signal'), value('macd_prev'), value('macd_signal_prev'))
+        else:
+            macd = dict(NEUTRAL_MACD)
+        if value('bb_middle') is not None:
+            bollinger = self._bollinger_result(price, value('bb_middle'), value('bb_std'))
+        else:
+            bollinger = dict(NEUTRAL_BOLLINGER)
+        moving_averages = self._moving_averages_result(
+            price, value('sma_20'), value('sma_50'), value('sma_200'), value('ema_12'), value('ema_26')
+        )
+
+        return {
+            'rsi': rsi,
+            'macd': macd,
+            'bollinger': bollinger,
+            'moving_averages': moving_averages,
+            'support_resistance': support_resistance
+        }
+
+    def calculate_composite_score(self, prices: List[float], values: Optional[Dict[str, np.ndarray]] = None,
+                                  row: int = 0) -> Dict:
         """
         Calculate composite technical score combining all indicators
         Returns: {'score': -100 to +100, 'signal': str, 'indicators': dict}
+
+        values/row: a precomputed compute_indicators() result and the row of
+        these prices in it (computed here when omitted)
         """
         if len(prices) < 26:
             return {
@@ -405,16 +390,21 @@ class TechnicalSignalsService:
                 'reasons': ['Insufficient price data for analysis']
             }
 
+        # Calculate all indicators in one engine pass
+        if values is None:
+            values = indicators.compute_indicators(prices)
+        return self._composite(self._indicator_results(
+            prices[-1], values, row, self.calculate_support_resistance(prices)
+        ))
+
+    def _composite(self, results: Dict) -> Dict:
+        """Score the indicator results into one signal"""
         score = 0
         reasons = []
         max_score = 100
 
-        # Calculate all indicators
-        rsi = self.calculate_rsi(prices)
-        macd = self.calculate_macd(prices)
-        bb = self.calculate_bollinger_bands(prices)
-        ma = self.calculate_moving_averages(prices)
-        sr = self.calculate_support_resistance(prices)
+        rsi, macd, bb = results['rsi'], results['macd'], results['bollinger']
+        ma, sr = results['moving_averages'], results['support_resistance']
 
         # RSI contribution (max +/- 25 points)
         if rsi['zone'] == 'buy':
@@ -511,7 +501,8 @@ class TechnicalSignalsService:
             'timestamp': datetime.now().isoformat()
         }
 
-    def get_signal_for_symbol(self, symbol: str, prices: List[float], current_price: float = None) -> Dict:
+    def get_signal_for_symbol(self, symbol: str, prices: List[float], current_price: float = None,
+                              values: Optional[Dict[str, np.ndarray]] = None, row: int = 0) -> Dict:
         """
         Get complete technical analysis for a symbol
         """
@@ -524,7 +515,35 @@ class TechnicalSignalsService:
             }
 
         current = current_price or prices[-1]
-        analysis = self.calculate_composite_score(prices)
+        return self._signal_result(symbol, current, self.calculate_composite_score(prices, values, row))
+
+    def get_signal_from_state(self, symbol: str, state) -> Dict:
+        """Technical analysis from a streaming SymbolIndicators state (see streaming.py)"""
+        if state.bars + 1 < 26 or state.price is None:
+            return {
+                'symbol': symbol,
+                'error': 'Insufficient price data',
+                'signal': 'hold',
+                'score': 0
+            }
+        return self._signal_result(symbol, state.price, self._composite(self.get_indicators_from_state(state)))
+
+    def get_indicators_from_state(self, state) -> Dict:
+        """Indicator results from a streaming SymbolIndicators state"""
+        supports, resistances, high, low = state.levels()
+        if high is None:
+            support_resistance = {
+                'support': [],
+                'resistance': [],
+                'nearest_support': None,
+                'nearest_resistance': None
+            }
+        else:
+            support_resistance = self._levels_result(supports, resistances, high, low, state.price)
+        return self._indicator_results(state.price, state.values(), None, support_resistance)
+
+    def _signal_result(self, symbol: str, current: float, analysis: Dict) -> Dict:
+        """Entry, stop loss and take profit around a composite analysis"""
 
         # Calculate entry, stop loss, take profit based on signal
         if analysis['signal'] in ['buy', 'strong_buy']:
@@ -567,3 +586,21 @@ class TechnicalSignalsService:
             'reasons': analysis['reasons'],
             'timestamp': analysis['timestamp']
         }
+
+    def analyze_many(self, symbols: List[str], price_lists: List[List[float]]) -> List[Dict]:
+        """
+        Technical analysis for many symbols at once.
+        Histories of equal length are stacked into one matrix and run through
+        the indicator engine together; results keep the input order.
+        """
+        results: List[Optional[Dict]] = [None] * len(symbols)
+        for rows, matrix in indicators.group_by_length(price_lists):
+            values = indicators.compute_indicators(matrix)
+            for row, index in enumerate(rows):
+                prices = price_lists[index]
+                results[index] = self.get_signal_for_symbol(symbols[index], prices, prices[-1], values, row)
+
+        for index, result in enumerate(results):
+            if result is None:
+                results[index] = self.get_signal_for_symbol(symbols[index], price_lists[index])
+        return results
@@ -0,0 +1,449 @@
+"""
+SL/TP Trigger Engine - Event-driven stop loss / take profit execution
+Open trades are indexed per symbol in sorted lists keyed by their SL and TP
+levels. Each price tick only pops the levels it crossed, so trigger latency
+does not grow with the number of open trades. Triggered trades are closed
+in one batched DB transaction on a dedicated closer loop.
+"""
+
+import time
+import queue
+import threading
+import logging
+from bisect import bisect_left, bisect_right, insort
+from typing import Callable, Dict, List, Optional, Tuple, Any
+
+logger = logging.getLogger(__name__)
+
+# Seconds between full index rebuilds from the database (catches trades
+# opened by other workers, copy trading or admin tools)
+RECONCILE_INTERVAL = 60
+
+_INF = float('inf')
+
+
+def book_key(symbol: str) -> str:
+    """Canonical symbol key so BTC-USD, BTCUSD and EURUSD=X all match ticks"""
+    return symbol.upper().replace('=X', '').replace('-', '')
+
+
+class _IndexedTrade:
+    """Trigger levels of one open trade"""
+
+    __slots__ = ('trade_id', 'symbol', 'key', 'trade_type', 'stop_loss', 'take_profit')
+
+    def __init__(self, trade_id: int, symbol: str, trade_type: str,
+                 stop_loss: Optional[float], take_profit: Optional[float]):
+        self.trade_id = trade_id
+        self.symbol = symbol
+        self.key = book_key(symbol)
+        self.trade_type = trade_type
+        self.stop_loss = stop_loss
+        self.take_profit = take_profit
+
+    @property
+    def lower(self) -> Optional[float]:
+        """Level that triggers when price falls to it (buy SL / sell TP)"""
+        return self.stop_loss if self.trade_type == 'buy' else self.take_profit
+
+    @property
+    def upper(self) -> Optional[float]:
+        """Level that triggers when price rises to it (buy TP / sell SL)"""
+        return self.take_profit if self.trade_type == 'buy' else self.stop_loss
+
+    def reason(self, price: float) -> str:
+        """Which level a crossing price hit (stop loss wins a tie, as before)"""
+        if self.stop_loss is not None:
+            if self.trade_type == 'buy' and price <= self.stop_loss:
+                return 'stop_loss'
+            if self.trade_type != 'buy' and price >= self.stop_loss:
+                return 'stop_loss'
+        return 'take_profit'
+
+
+class LevelBook:
+    """
+    Sorted (level, item_id) lists for one symbol.
+
+    `lower` holds levels crossed when price <= level, `upper` holds levels
+    crossed when price >= level. Both stay sorted ascending, so the crossed
+    levels are always a contiguous run at one end. Item ids must be ints.
+    """
+
+    __slots__ = ('lower', 'upper')
+
+    def __init__(self):
+        self.lower: List[Tuple[float, int]] = []
+        self.upper: List[Tuple[float, int]] = []
+
+    def __len__(self) -> int:
+        return len(self.lower) + len(self.upper)
+
+    def insert(self, side: str, level: float, item_id: int) -> None:
+        insort(self.lower if side == 'lower' else self.upper, (level, item_id))
+
+    def discard(self, side: str, level: float, item_id: int) -> None:
+        levels = self.lower if side == 'lower' else self.upper
+        i = bisect_left(levels, (level, item_id))
+        if i < len(levels) and levels[i] == (level, item_id):
+            del levels[i]
+
+    def crossed(self, price: float) -> List[int]:
+        """Item ids whose levels this price crossed (levels are not removed)"""
+        ids = []
+        if self.lower and self.lower[-1][0] >= price:
+            i = bisect_left(self.lower, (price, -_INF))
+            ids.extend(item_id for _, item_id in self.lower[i:])
+        if self.upper and self.upper[0][0] <= price:
+            i = bisect_right(self.upper, (price, _INF))
+            ids.extend(item_id for _, item_id in self.upper[:i])
+        return ids
+
+
+def _index_trade(book: LevelBook, entry: _IndexedTrade) -> None:
+    if entry.lower is not None:
+        book.insert('lower', entry.lower, entry.trade_id)
+    if entry.upper is not None:
+        book.insert('upper', entry.upper, entry.trade_id)
+
+
+def _unindex_trade(book: LevelBook, entry: _IndexedTrade) -> None:
+    if entry.lower is not None:
+        book.discard('lower', entry.lower, entry.trade_id)
+    if entry.upper is not None:
+        book.discard('upper', entry.upper, entry.trade_id)
+
+
+def settle_trades(closes: Dict[int, float],
+                  owners: Optional[Dict[int, Tuple[int, str]]] = None) -> Tuple[list, Dict[int, Any]]:
+    """
+    Close open trades at the given prices and apply their PnL to the
+    challenge balances, without committing.
+
+    Args:
+        closes: {trade_id: exit_price}
+        owners: Optional {trade_id: (challenge_id, symbol)} the closing order
+                belongs to; trades of another challenge or symbol are skipped
+
+    Returns:
+        ([(trade, exit_price, pnl), ...], {challenge_id: challenge})
+    """
+    from models import Trade, UserChallenge
+    from services.challenge_engine import ChallengeEngine
+
+    if not closes:
+        return [], {}
+
+    trades = Trade.query.filter(
+        Trade.id.in_(list(closes.keys())),
+        Trade.status == 'open'
+    ).with_for_update().all()
+    if owners is not None:
+        mismatched = [trade for trade in trades if owners.get(trade.id) is None
+                      or owners[trade.id][0] != trade.challenge_id
+                      or book_key(owners[trade.id][1]) != book_key(trade.symbol)]
+        for trade in mismatched:
+            logger.warning(f"Refusing to close trade #{trade.id}: closing order belongs to another position")
+        trades = [trade for trade in trades if trade not in mismatched]
+
+    challenge_ids = {trade.challenge_id for trade in trades}
+    challenges = {
+        challenge.id: challenge
+        for challenge in UserChallenge.query.filter(UserChallenge.id.in_(challenge_ids)).all()
+    } if challenge_ids else {}
+
+    engine = ChallengeEngine()
+    closed = []
+    for trade in trades:
+        price = closes[trade.id]
+        pnl = trade.close_trade(price)
+        challenge = challenges.get(trade.challenge_id)
+        if challenge:
+            engine.apply_closed_trade(challenge, pnl)
+        closed.append((trade, price, pnl))
+
+    if closed:
+        from services.equity_monitor import equity_monitor
+        equity_monitor.invalidate()
+
+    return closed, challenges
+
+
+def evaluate_challenges(challenges) -> None:
+    """Evaluate challenge rules once per challenge after a batch of closes"""
+    from services.challenge_engine import ChallengeEngine
+
+    try:
+        ChallengeEngine().evaluate_many(challenges)
+    except Exception as e:
+        logger.error(f"Error evaluating challenges after batch close: {e}")
+
+
+class SLTPEngine:
+    """
+    Resident SL/TP trigger index.
+
+    Usage:
+        sltp_engine.start(app)          # index open trades, listen to ticks
+        sltp_engine.add_trade(trade)    # after opening a trade
+        sltp_engine.remove(trade.id)    # after closing a trade
+    """
+
+    def __init__(self):
+        self._books: Dict[str, LevelBook] = {}
+        self._trades: Dict[int, _IndexedTrade] = {}
+        self._lock = threading.Lock()
+        self._pending: 'queue.Queue[Tuple[int, float, str]]' = queue.Queue()
+        self._app = None
+        self._running = False
+        self._last_reconcile = 0.0
+        self._stats = {'ticks': 0, 'triggered': 0, 'closed': 0, 'batches': 0, 'failed_batches': 0}
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    def __len__(self) -> int:
+        return len(self._trades)
+
+    # ==================== INDEX ====================
+
+    def add(self, trade_id: int, symbol: str, trade_type: str,
+            stop_loss=None, take_profit=None) -> bool:
+        """Index (or re-index) one open trade. Returns False if it has no levels."""
+        self.remove(trade_id)
+        if stop_loss is None and take_profit is None:
+            return False
+
+        entry = _IndexedTrade(
+            trade_id,
+            symbol,
+            trade_type,
+            float(stop_loss) if stop_loss is not None else None,
+            float(take_profit) if take_profit is not None else None
+        )
+        with self._lock:
+            self._trades[trade_id] = entry
+            _index_trade(self._books.setdefault(entry.key, LevelBook()), entry)
+        return True
+
+    def add_trade(self, trade) -> bool:
+        """Index an open Trade model instance"""
+        if trade.status != 'open':
+            return False
+        return self.add(trade.id, trade.symbol, trade.trade_type, trade.stop_loss, trade.take_profit)
+
+    def remove(self, trade_id: int) -> None:
+        """Drop a trade from the index (no-op if it is not indexed)"""
+        with self._lock:
+            self._pop(trade_id)
+
+    def _pop(self, trade_id: int) -> Optional[_IndexedTrade]:
+        entry = self._trades.pop(trade_id, None)
+        if entry is None:
+            return None
+        book = self._books.get(entry.key)
+        if book is not None:
+            _unindex_trade(book, entry)
+            if not len(book):
+                del self._books[entry.key]
+        return entry
+
+    def rebuild(self, rows) -> None:
+        """Replace the index with (id, symbol, trade_type, stop_loss, take_profit) rows"""
+        books: Dict[str, LevelBook] = {}
+        trades: Dict[int, _IndexedTrade] = {}
+        for trade_id, symbol, trade_type, stop_loss, take_profit in rows:
+            if stop_loss is None and take_profit is None:
+                continue
+            entry = _IndexedTrade(
+                trade_id,
+                symbol,
+                trade_type,
+                float(stop_loss) if stop_loss is not None else None,
+                float(take_profit) if take_profit is not None else None
+            )
+            trades[trade_id] = entry
+            _index_trade(books.setdefault(entry.key, LevelBook()), entry)
+
+        with self._lock:
+            self._books = books
+            self._trades = trades
+
+    # ==================== TRIGGERS ====================
+
+    def on_tick(self, symbol: str, price: float) -> List[Tuple[int, float, str]]:
+        """
+        Pop every trade whose SL or TP this tick crossed.
+
+        Returns the (trade_id, price, reason) triggers and queues them for
+        the closer loop.
+        """
+        key = book_key(symbol)
+        if key not in self._books or not price:
+            return []
+
+        triggers = []
+        with self._lock:
+            book = self._books.get(key)
+            if book is None:
+                return []
+            for trade_id in book.crossed(price):
+                entry = self._pop(trade_id)
+                if entry is not None:
+                    triggers.append((trade_id, price, entry.reason(price)))
+
+        self._stats['ticks'] += 1
+        for trigger in triggers:
+            self._pending.put(trigger)
+        self._stats['triggered'] += len(triggers)
+        return triggers
+
+    def on_prices(self, records: Dict[str, Any]) -> None:
+        """Price store listener: feed every written record through on_tick"""
+        for symbol, record in records.items():
+            self.on_tick(symbol, record.last)
+
+    def check_prices(self, price_of: Callable[[str], Optional[float]]) -> int:
+        """Evaluate every indexed symbol against price_of(symbol)"""
+        with self._lock:
+            symbols = {entry.key: entry.symbol for entry in self._trades.values()}
+
+        triggered = 0
+        for key, symbol in symbols.items():
+            try:
+                price = price_of(symbol)
+            except Exception as e:
+                logger.warning(f"SL/TP Engine: No price for {symbol}: {e}")
+                continue
+            if price is not None:
+                triggered += len(self.on_tick(key, price))
+        return triggered
+
+    # ==================== EXECUTION ====================
+
+    def close_triggered(self, triggers: List[Tuple[int, float, str]]) -> int:
+        """
+        Close triggered trades in one transaction.
+
+        Trades, challenge balances and highest balances are written in a
+        single commit; challenge rules are then evaluated once per affected
+        challenge. Requires an app context.
+        """
+        from models import db
+
+        if not triggers:
+            return 0
+
+        by_id = {trade_id: (price, reason) for trade_id, price, reason in triggers}
+        try:
+            closed, challenges = settle_trades({trade_id: price for trade_id, (price, _) in by_id.items()})
+            db.session.commit()
+        except Exception as e:
+            logger.error(f"SL/TP Engine: Batch close of {len(by_id)} trade(s) failed: {e}")
+            db.session.rollback()
+            self._stats['failed_batches'] += 1
+            return 0
+
+        self._stats['batches'] += 1
+        self._stats['closed'] += len(closed)
+        for trade, price, pnl in closed:
+            logger.info(f"SL/TP Engine: Closed {trade.symbol} trade #{trade.id} at {by_id[trade.id][1]} (price: {price}, PnL: {pnl})")
+
+        evaluate_challenges(challenges.values())
+        return len(closed)
+
+    def _drain(self, first: Tuple[int, float, str]) -> List[Tuple[int, float, str]]:
+        batch = [first]
+        while True:
+            try:
+                batch.append(self._pending.get_nowait())
+            except queue.Empty:
+                return batch
+
+    def _closer_loop(self) -> None:
+        while self._running:
+            try:
+                first = self._pending.get(timeout=1)
+            except queue.Empty:
+                continue
+
+            batch = self._drain(first)
+            try:
+                with self._app.app_context():
+                    self.close_triggered(batch)
+            except Exception as e:
+                logger.error(f"SL/TP Engine: Closer error: {e}")
+
+    # ==================== LIFECYCLE ====================
+
+    def load_open_trades(self) -> int:
+        """Rebuild the index from open trades with SL or TP (requires an app context)"""
+        from models import db, Trade
+
+        rows = db.session.query(
+            Trade.id, Trade.symbol, Trade.trade_type, Trade.stop_loss, Trade.take_profit
+        ).filter(
+            Trade.status == 'open',
+            db.or_(Trade.stop_loss.isnot(None), Trade.take_profit.isnot(None))
+        ).all()
+        self.rebuild(rows)
+        self._last_reconcile = time.time()
+        return len(self._trades)
+
+    def reconcile(self, force: bool = False) -> int:
+        """
+        Periodic safety net: rebuild the index from the database and check
+        every indexed symbol against its current price. Symbols without a
+        fresh record (nobody watching, no streaming source) are fetched, so
+        their trades trigger even without ticks. Requires an app context.
+        """
+        from services.yfinance_service import get_current_price
+
+        if force or time.time() - self._last_reconcile >= RECONCILE_INTERVAL:
+            self.load_open_trades()
+        return self.check_prices(get_current_price)
+
+    def start(self, app) -> None:
+        """Index open trades, subscribe to price writes and start the closer loop"""
+        from services.market.price_store import price_store
+
+        if self._running:
+            return
+        self._app = app
+
+        with app.app_context():
+            try:
+                count = self.load_open_trades()
+                logger.info(f"SL/TP Engine: Indexed {count} open trade(s)")
+            except Exception as e:
+                logger.warning(f"SL/TP Engine: Initial index load failed: {e}")
+
+        self._running = True
+        price_store.add_listener(self.on_prices)
+
+        # Use eventlet.spawn_n for green thread compatibility
+        try:
+            import eventlet
+            eventlet.spawn_n(self._closer_loop)
+        except ImportError:
+            threading.Thread(target=self._closer_loop, daemon=True).start()
+
+    def stop(self) -> None:
+        from services.market.price_store import price_store
+
+        self._running = False
+        price_store.remove_listener(self.on_prices)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'running': self._running,
+            'indexed_trades': len(self._trades),
+            'symbols': len(self._books),
+            'pending': self._pending.qsize(),
+            **self._stats
+        }
+
+
+# Global SL/TP engine instance
+sltp_engine = SLTPEngine()
@@ -0,0 +1,249 @@
+"""
+Trade Analytics - Columnar dashboard series for a challenge
+Closed trades are held per challenge as NumPy columns (pnl, opened_at,
+closed_at, symbol) loaded with a column-only query. Later reads append just
+the trades closed since the last load, and every chart series is derived
+from the columns with vectorized group-bys instead of Python loops.
+"""
+
+import time
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional, Any
+
+import numpy as np
+
+# Seconds before the columns are reloaded in full (picks up deleted or
+# edited trades that never went through a close)
+COLUMNS_TTL = 900
+
+# Challenges whose columns are kept in memory per worker
+MAX_CACHED_CHALLENGES = 256
+
+# Trade duration buckets in minutes (upper bounds)
+DURATION_BUCKETS = [
+    ('<1m', 1), ('1-5m', 5), ('5-15m', 15), ('15m-1h', 60),
+    ('1-4h', 240), ('4h-1d', 1440), ('>1d', np.inf)
+]
+
+
+class TradeColumns:
+    """Closed trades of one challenge as parallel arrays, ordered by closed_at"""
+
+    __slots__ = ('pnl', 'opened', 'closed', 'symbols', 'watermark', 'watermark_ids',
+                 'loaded_at', 'result', 'result_key')
+
+    def __init__(self):
+        self.pnl = np.zeros(0)
+        self.opened = np.zeros(0, dtype='datetime64[us]')
+        self.closed = np.zeros(0, dtype='datetime64[us]')
+        self.symbols = np.zeros(0, dtype=object)
+        self.watermark: Optional[datetime] = None   # latest closed_at loaded
+        self.watermark_ids: set = set()             # ids loaded at that closed_at
+        self.loaded_at = time.time()
+        self.result = None
+        self.result_key = None
+
+    def __len__(self) -> int:
+        return len(self.pnl)
+
+    def append(self, rows: List[tuple]) -> int:
+        """
+        Append (id, pnl, opened_at, closed_at, symbol) rows not loaded yet.
+        Rows before the watermark were loaded already: a load racing another
+        from the same watermark returns rows the other has appended meanwhile.
+        """
+        if self.watermark is not None:
+            rows = [row for row in rows if row[3] > self.watermark
+                    or (row[3] == self.watermark and row[0] not in self.watermark_ids)]
+        if not rows:
+            return 0
+
+        self.pnl = np.concatenate([self.pnl, np.array([float(row[1] or 0) for row in rows])])
+        self.opened = np.concatenate([self.opened, np.array([row[2] for row in rows], dtype='datetime64[us]')])
+        self.closed = np.concatenate([self.closed, np.array([row[3] for row in rows], dtype='datetime64[us]')])
+        self.symbols = np.concatenate([self.symbols, np.array([row[4] for row in rows], dtype=object)])
+
+        latest = rows[-1][3]
+        if latest != self.watermark:
+            self.watermark = latest
+            self.watermark_ids = set()
+        self.watermark_ids.update(row[0] for row in rows if row[3] == latest)
+        return len(rows)
+
+
+_columns: 'OrderedDict[int, TradeColumns]' = OrderedDict()
+_columns_lock = threading.Lock()
+
+
+def invalidate_trade_columns(challenge_id: int) -> None:
+    """Drop the cached columns of a challenge (after trades are deleted or rewritten)"""
+    with _columns_lock:
+        _columns.pop(challenge_id, None)
+
+
+def load_trade_columns(challenge_id: int) -> TradeColumns:
+    """Get the challenge's columns, appending trades closed since the last call"""
+    from models import db, Trade
+
+    with _columns_lock:
+        columns = _columns.get(challenge_id)
+        if columns is not None and time.time() - columns.loaded_at > COLUMNS_TTL:
+            columns = None
+        if columns is None:
+            columns = TradeColumns()
+            _columns[challenge_id] = columns
+            while len(_columns) > MAX_CACHED_CHALLENGES:
+                _columns.popitem(last=False)
+        else:
+            _columns.move_to_end(challenge_id)
+
+    query = db.session.query(
+        Trade.id, Trade.pnl, Trade.opened_at, Trade.closed_at, Trade.symbol
+    ).filter(
+        Trade.challenge_id == challenge_id,
+        Trade.status == 'closed',
+        Trade.closed_at.isnot(None)
+    )
+    if columns.watermark is not None:
+        query = query.filter(Trade.closed_at >= columns.watermark)
+
+    rows = query.order_by(Trade.closed_at.asc(), Trade.id.asc()).all()
+    with _columns_lock:
+        if columns.append(rows):
+            columns.result = None
+    return columns
+
+
+def _labelled(periods: np.ndarray, pnl: np.ndarray, fmt: str, key: str, last: int) -> List[Dict[str, Any]]:
+    """Sum pnl per period and label the last N periods"""
+    unique, inverse = np.unique(periods, return_inverse=True)
+    sums = np.bincount(inverse, weights=pnl, minlength=len(unique))
+    return [
+        {key: period.astype(datetime).strftime(fmt), 'pnl': round(float(total), 2)}
+        for period, total in zip(unique[-last:], sums[-last:])
+    ]
+
+
+def _runs(wins: np.ndarray):
+    """Run-length encode a boolean series into (values, lengths)"""
+    starts = np.concatenate([[0], np.flatnonzero(np.diff(wins.astype(np.int8))) + 1])
+    lengths = np.diff(np.concatenate([starts, [len(wins)]]))
+    return wins[starts], lengths
+
+
+def compute_extended_stats(columns: TradeColumns, initial: float, current: float,
+                           start_date: Optional[datetime], now: Optional[datetime] = None) -> dict:
+    """Derive every dashboard series from the columns in vectorized passes"""
+    now = now or datetime.utcnow()
+    pnl = columns.pnl
+    days = columns.closed.astype('datetime64[D]')
+
+    # ========== Balance & Drawdown History ==========
+    first_day = np.datetime64(start_date or now, 'D')
+    # Mirror stepping a start timestamp by whole days up to now
+    span = int((np.datetime64(now, 'us') - np.datetime64(start_date or now, 'us')) // np.timedelta64(1, 'D')) + 1
+    span = max(span, 0)
+    offsets = (days - first_day).astype(np.int64)
+    in_range = (offsets >= 0) & (offsets < span)
+    day_totals = np.bincount(offsets[in_range], weights=pnl[in_range], minlength=span)[:span]
+    balances = np.round(initial + np.cumsum(day_totals), 2)
+    peaks = np.maximum.accumulate(np.concatenate([[initial], balances]))[1:]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        drawdowns = np.where(peaks > 0, (peaks - balances) / peaks * 100, 0.0)
+    history_days = first_day + np.arange(span)
+    labels = [day.astype(datetime).strftime('%b %d') for day in history_days[-60:]]
+    balance_history = [
+        {'date': label, 'balance': float(balance)} for label, balance in zip(labels, balances[-60:])
+    ]
+    drawdown_history = [
+        {'date': label, 'drawdown': -round(float(drawdown), 2)} for label, drawdown in zip(labels, drawdowns[-60:])
+    ]
+
+    # ========== Daily / Weekly / Monthly P&L ==========
+    daily_pnl = _labelled(days, pnl, '%b %d', 'date', 30)
+    weekday = (days.astype(np.int64) + 3) % 7  # 1970-01-01 was a Thursday
+    weekly_pnl = _labelled(days - weekday.astype('timedelta64[D]'), pnl, '%b %d', 'week', 12)
+    monthly_pnl = _labelled(columns.closed.astype('datetime64[M]'), pnl, '%b %Y', 'month', 6)
+
+    # ========== Win/Loss Streaks ==========
+    wins = pnl > 0
+    current_streak = max_win_streak = max_loss_streak = 0
+    if len(wins):
+        values, lengths = _runs(wins)
+        max_win_streak = int(lengths[values].max(initial=0))
+        max_loss_streak = int(lengths[~values].max(initial=0))
+        current_streak = int(lengths[-1]) if values[-1] else -int(lengths[-1])
+    recent_trades = [{'result': 'win' if win else 'loss'} for win in wins[-20:]]
+
+    # ========== Trade Duration Stats ==========
+    has_open = ~np.isnat(columns.opened)
+    durations = (columns.closed[has_open] - columns.opened[has_open]) / np.timedelta64(1, 'm')
+    bounds = [-np.inf] + [bound for _, bound in DURATION_BUCKETS]
+    counts, _ = np.histogram(durations, bins=bounds)
+    duration_distribution = [
+        {'range': name, 'count': int(count)} for (name, _), count in zip(DURATION_BUCKETS, counts)
+    ]
+
+    # ========== Asset Exposure ==========
+    exposure = []
+    if len(columns.symbols):
+        symbols, symbol_counts = np.unique(columns.symbols.astype(str), return_counts=True)
+        for i in np.argsort(-symbol_counts, kind='stable')[:6]:
+            exposure.append({
+                'name': str(symbols[i]),
+                'value': round(float(symbol_counts[i]) / len(pnl) * 100, 1)
+            })
+
+    # ========== ROI and Sharpe Ratio ==========
+    roi_percentage = ((current - initial) / initial) * 100 if initial > 0 else 0
+
+    # Simple Sharpe Ratio approximation (using daily returns)
+    sharpe_ratio = 0
+    if initial > 0 and len(daily_pnl) > 1:
+        daily_returns = np.array([entry['pnl'] for entry in daily_pnl]) / initial * 100
+        std_return = daily_returns.std(ddof=1)
+        if std_return > 0:
+            sharpe_ratio = daily_returns.mean() / std_return * (252 ** 0.5)  # Annualized
+
+    return {
+        'balance_history': balance_history,  # Last 60 days
+        'drawdown_history': drawdown_history,
+        'daily_pnl': daily_pnl,
+        'weekly_pnl': weekly_pnl,
+        'monthly_pnl': monthly_pnl,
+        'streaks': {
+            'current': current_streak,
+            'max_win': max_win_streak,
+            'max_loss': max_loss_streak,
+            'recent_trades': recent_trades
+        },
+        'duration_stats': {
+            'average': round(float(durations.mean()), 1) if len(durations) else 0,
+            'shortest': round(float(durations.min()), 1) if len(durations) else 0,
+            'longest': round(float(durations.max()), 1) if len(durations) else 0,
+            'distribution': duration_distribution
+        },
+        'exposure': exposure,
+        'roi_percentage': round(roi_percentage, 2),
+        'sharpe_ratio': round(float(sharpe_ratio), 2),
+        'max_drawdown': round(float(np.abs(np.round(drawdowns, 2)).max(initial=0)), 2),
+        'best_trade': round(float(pnl.max()), 2) if len(pnl) else 0,
+        'worst_trade': round(float(pnl.min()), 2) if len(pnl) else 0
+    }
+
+
+def get_extended_stats(challenge) -> dict:
+    """Extended dashboard stats for a challenge, reused until a trade closes or the day or balance changes"""
+    columns = load_trade_columns(challenge.id)
+    initial = float(challenge.initial_balance)
+    current = float(challenge.current_balance)
+    now = datetime.utcnow()
+    result_key = (len(columns), current, now.date(), challenge.start_date)
+
+    with _columns_lock:
+        if columns.result is None or columns.result_key != result_key:
+            columns.result = compute_extended_stats(columns, initial, current, challenge.start_date, now)
+            columns.result_key = result_key
+        return columns.result
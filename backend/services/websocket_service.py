@@ -9,22 +9,37 @@ from flask import request
 import threading
 import time
 
+from services.price_fanout import price_fanout, ALL_PRICES_ROOM
+from services.market.watchlist import price_watchlist
+from services.signals.streaming import indicator_stream, signal_room
+
 # Initialize SocketIO (will be configured in app.py)
 socketio = SocketIO()
 
 # Store connected users and their rooms
 connected_users = {}
 
-# Watchlist for price updates (symbols that users are watching)
-price_watchlist = set()
+# Connections open on this node (reported in cluster heartbeats)
+connected_sids = set()
 
 
 def init_socketio(app):
-    """Initialize SocketIO with the Flask app"""
+    """
+    Initialize SocketIO with the Flask app.
+
+    With a message queue every node relays emits to clients connected to the
+    others, so notify_user and room broadcasts reach users on any node.
+    """
+    message_queue = app.config.get('SOCKETIO_MESSAGE_QUEUE')
+    if message_queue is None and app.config.get('CACHE_BACKEND') == 'redis':
+        message_queue = app.config.get('REDIS_URL')
+
     socketio.init_app(
         app,
         cors_allowed_origins="*",
         async_mode='threading',
+        message_queue=message_queue or None,
+        channel='tradesense_socketio',
         logger=False,
         engineio_logger=False
     )
@@ -35,6 +50,9 @@ def init_socketio(app):
 def handle_connect():
     """Handle client connection"""
     print(f"Client connected: {request.sid}")
+    connected_sids.add(request.sid)
+    # Until a client subscribes to symbols it gets every changed price
+    join_room(ALL_PRICES_ROOM)
     emit('connected', {'message': 'Connected to TradeSense WebSocket'})
 
 
@@ -43,6 +61,10 @@ def handle_disconnect():
     """Handle client disconnection"""
     sid = request.sid
     print(f"Client disconnected: {sid}")
+    connected_sids.discard(sid)
+    price_fanout.remove(sid)
+    price_watchlist.drop(sid)
+    price_watchlist.drop(signal_watcher(sid))
 
     # Remove from connected users
     if sid in connected_users:
@@ -80,14 +102,20 @@ def handle_authenticate(data):
 
 @socketio.on('subscribe_prices')
 def handle_subscribe_prices(data):
-    """Subscribe to price updates for specific symbols"""
+    """
+    Subscribe to price updates for specific symbols.
+    Optional 'encoding' ('json', 'compact', 'msgpack') selects the frame
+    format and 'ack': true enables per-frame acknowledgement backpressure.
+    """
     symbols = data.get('symbols', [])
 
-    for symbol in symbols:
-        # Add to global watchlist
-        price_watchlist.add(symbol.upper())
-        # Join symbol-specific room
-        join_room(f"price_{symbol.upper()}")
+    # Reference-counted: polled only while some connection watches them
+    price_watchlist.subscribe(request.sid, symbols)
+
+    # Subscribed symbols arrive in one coalesced frame per interval
+    price_fanout.subscribe(request.sid, symbols, data.get('encoding'), data.get('ack'))
+    if symbols:
+        leave_room(ALL_PRICES_ROOM)
 
     emit('subscribed', {'symbols': symbols, 'message': 'Subscribed to price updates'})
     print(f"Client {request.sid} subscribed to: {symbols}")
@@ -98,12 +126,44 @@ def handle_unsubscribe_prices(data):
     """Unsubscribe from price updates"""
     symbols = data.get('symbols', [])
 
-    for symbol in symbols:
-        leave_room(f"price_{symbol.upper()}")
+    price_watchlist.unsubscribe(request.sid, symbols)
+    if not price_fanout.unsubscribe(request.sid, symbols):
+        join_room(ALL_PRICES_ROOM)
 
     emit('unsubscribed', {'symbols': symbols})
 
 
+@socketio.on('subscribe_signals')
+def handle_subscribe_signals(data):
+    """Receive 'technical_signal' events when a symbol's composite signal flips"""
+    symbols = data.get('symbols', [])
+
+    # Flips are only detected for symbols that keep ticking
+    price_watchlist.subscribe(signal_watcher(request.sid), symbols)
+    for symbol in symbols:
+        indicator_stream.get(symbol)
+        join_room(signal_room(symbol))
+
+    emit('signals_subscribed', {'symbols': symbols})
+
+
+@socketio.on('unsubscribe_signals')
+def handle_unsubscribe_signals(data):
+    """Stop receiving technical signal flips"""
+    symbols = data.get('symbols', [])
+
+    price_watchlist.unsubscribe(signal_watcher(request.sid), symbols)
+    for symbol in symbols:
+        leave_room(signal_room(symbol))
+
+    emit('signals_unsubscribed', {'symbols': symbols})
+
+
+def signal_watcher(sid):
+    """Watchlist id of a connection's signal subscriptions, kept apart from its price ones"""
+    return f"{sid}:signals"
+
+
 def broadcast_price_update(symbol, price_data):
     """Broadcast price update to all subscribers of a symbol"""
     socketio.emit('price_update', {
@@ -157,7 +217,11 @@ def notify_challenge_warning(user_id, warning_type, message, current_value, limi
 
 # Price update background task
 class PriceUpdater:
-    """Background service to fetch and broadcast prices"""
+    """
+    Background service to fetch the prices connected clients are watching,
+    plus popular symbols and those of open trades and pending orders (the
+    SL/TP, order and equity engines run on these ticks)
+    """
 
     # Popular symbols to pre-cache on startup
     POPULAR_SYMBOLS = [
@@ -169,16 +233,22 @@ class PriceUpdater:
         'ADA-USD', 'DOT-USD', 'LINK-USD'
     ]
 
+    # Seconds between reloads of the open position / pending order symbols
+    POSITION_SYMBOLS_REFRESH = 30
+
     def __init__(self, interval=10):
         self.interval = interval
         self.running = False
         self.thread = None
         self.prices_cached = False
+        self.app = None
+        self._positions_loaded = 0.0
 
-    def start(self):
+    def start(self, app=None):
         """Start the price updater"""
         if not self.running:
             self.running = True
+            self.app = app
             # Pre-cache prices before starting the loop
             self._precache_prices()
             self.thread = threading.Thread(target=self._run, daemon=True)
@@ -203,33 +273,62 @@ class PriceUpdater:
         except Exception as e:
             print(f"Pre-cache error: {e}")
 
-    def _run(self):
-        """Main loop for fetching and broadcasting prices"""
+    def position_symbols(self):
+        """Symbols of open trades and pending advanced orders (requires an app context)"""
+        from models import db, Trade, TrailingStopOrder, OCOOrder, BracketOrder, OrderStatus
+
+        live = [OrderStatus.PENDING.value, OrderStatus.ACTIVE.value]
+        queries = [
+            db.session.query(Trade.symbol).filter(Trade.status == 'open'),
+            db.session.query(TrailingStopOrder.symbol).filter(TrailingStopOrder.status.in_(live)),
+            db.session.query(OCOOrder.symbol).filter(OCOOrder.status == OrderStatus.ACTIVE.value),
+            db.session.query(BracketOrder.symbol).filter(BracketOrder.status.in_(live)),
+        ]
+        return {symbol for query in queries for (symbol,) in query.distinct()}
+
+    def _refresh_pinned(self):
+        if self.app is None or time.time() - self._positions_loaded < self.POSITION_SYMBOLS_REFRESH:
+            return
+        self._positions_loaded = time.time()
+        with self.app.app_context():
+            price_watchlist.set_pinned(set(self.POPULAR_SYMBOLS) | self.position_symbols())
+
+    def poll_once(self):
+        """Fetch the watched and pinned symbols whose poll interval has elapsed"""
         from services.yfinance_service import get_multiple_prices
         from services.market_scraper import get_moroccan_stocks
+        from services.market.price_store import price_store
 
-        while self.running:
-            try:
-                # Combine popular symbols with user watchlist
-                symbols_to_fetch = list(set(self.POPULAR_SYMBOLS) | price_watchlist)
+        try:
+            self._refresh_pinned()
+        except Exception as e:
+            print(f"Price updater: position symbols refresh failed: {e}")
 
-                if symbols_to_fetch:
-                    # Fetch US/Crypto prices
-                    prices = get_multiple_prices(symbols_to_fetch)
+        due = price_watchlist.due()
+        polled = []
 
-                    # Fetch Moroccan prices
-                    moroccan_prices = get_moroccan_stocks()
-                    if moroccan_prices:
-                        prices.update(moroccan_prices)
+        moroccan = due.pop('moroccan', [])
+        if moroccan:
+            # One scrape returns the whole Casablanca board
+            moroccan_prices = get_moroccan_stocks()
+            if moroccan_prices:
+                price_store.update_many('moroccan_scraper', moroccan_prices)
+            polled.extend(moroccan)
 
-                    if prices:
-                        # Broadcast batch update
-                        broadcast_prices_batch(prices)
+        symbols_to_fetch = [symbol for symbols in due.values() for symbol in symbols]
+        if symbols_to_fetch:
+            # Written to the price store, from which price_fanout sends the changed ones
+            get_multiple_prices(symbols_to_fetch)
+            polled.extend(symbols_to_fetch)
 
-                        # Also broadcast individual updates for subscribed rooms
-                        for symbol, data in prices.items():
-                            broadcast_price_update(symbol, data)
+        price_watchlist.mark_polled(polled)
+        return polled
 
+    def _run(self):
+        """Main loop: poll what clients watch and what open positions need"""
+        while self.running:
+            try:
+                self.poll_once()
             except Exception as e:
                 print(f"Price updater error: {e}")
 
@@ -5,13 +5,15 @@ Falls back to Finnhub API when yfinance fails
 """
 
 import yfinance as yf
+import numpy as np
 import requests
 import os
 from functools import lru_cache
-from datetime import datetime, timedelta
 import threading
+import time
 import logging
 import urllib3
+from datetime import datetime, timezone
 
 # Suppress SSL warnings for verify=False requests
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
@@ -37,11 +39,22 @@ except ImportError:
 from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
 _executor = ThreadPoolExecutor(max_workers=5)
 
-# Cache for prices (simple in-memory cache)
-_price_cache = {}
-_cache_lock = threading.Lock()
+from services.market.price_ingestion import PriceIngestionEngine, PriceSource
+from services.market.price_store import price_store
+from services.market.candle_store import candle_store, COLUMNS as CANDLE_COLUMNS
+
+# All prices live in the shared price store (latest tick per symbol).
+# Records written by on-demand fetches are reused for CACHE_DURATION;
+# records from the background ingestion sources are served until their
+# source has missed LIVE_MISSED_POLLS polls.
 CACHE_DURATION = 10  # seconds - balance between real-time and API load
+LIVE_MISSED_POLLS = 3
 PRICE_FETCH_TIMEOUT = 3  # seconds - reduced timeout to prevent blocking
+BATCH_QUOTE_TIMEOUT = 8  # seconds - one bulk request covers many symbols
+
+# Symbols the last bulk request could not price, so they are not re-requested every tick
+_batch_misses = {}
+_batch_misses_lock = threading.Lock()
 
 # Finnhub symbol mapping (convert our symbols to Finnhub format)
 FINNHUB_SYMBOLS = {
@@ -108,9 +121,7 @@ def _fetch_price_from_finnhub(symbol: str) -> float | None:
     return None
 
 
-# Dynamic prices - fetched from free APIs every 15 seconds
-_live_prices = {}
-_live_prices_lock = threading.Lock()
+# Dynamic prices - fetched from free APIs by the ingestion engine below
 _price_updater_running = False
 
 def _fetch_crypto_prices_kraken():
@@ -401,89 +412,44 @@ def _fetch_moroccan_prices():
 
     return prices
 
-def _update_live_prices():
-    """Update all live prices from various sources"""
-    global _live_prices
-
-    new_prices = {}
-    logger.info("Fetching live prices...")
-
-    # Fetch crypto prices from CoinGecko (main source - fast and reliable)
-    try:
-        crypto = _fetch_crypto_prices()
-        new_prices.update(crypto)
-        if crypto:
-            logger.info(f"CoinGecko: {len(crypto)} crypto prices")
-    except Exception as e:
-        logger.error(f"Crypto fetch error: {e}")
-
-    # Update the global prices dict immediately after crypto
-    with _live_prices_lock:
-        _live_prices.update(new_prices)
-        total_prices = len(_live_prices)
-
-    if new_prices:
-        btc = new_prices.get('BTC-USD', {}).get('price', 'N/A')
-        logger.info(f"Live prices updated: {len(new_prices)} symbols, BTC=${btc}")
+# Per-source polling cadence and deadline (seconds). Each source runs on its
+# own schedule so a slow Casablanca scrape never delays crypto ticks.
+PRICE_SOURCE_SCHEDULE = {
+    'crypto': {'interval': 3, 'timeout': 8},
+    'moroccan': {'interval': 10, 'timeout': 20},
+    'finnhub_forex': {'interval': 10, 'timeout': 10},
+    'finnhub_stocks': {'interval': 15, 'timeout': 10},
+}
 
-    # Fetch Moroccan stocks from Casablanca Bourse (PRIORITY - fast and reliable)
-    try:
-        logger.info("Fetching Moroccan stock prices...")
-        moroccan = _fetch_moroccan_prices()
-        if moroccan:
-            with _live_prices_lock:
-                _live_prices.update(moroccan)
-            logger.info(f"Moroccan: {len(moroccan)} stock prices added")
-        else:
-            logger.warning("Moroccan fetch returned empty/None")
-    except Exception as e:
-        logger.warning(f"Moroccan fetch error: {e}")
+_ingestion_engine = PriceIngestionEngine(price_store.update_many, max_workers=4)
+_ingestion_engine.register(PriceSource('crypto', _fetch_crypto_prices, **PRICE_SOURCE_SCHEDULE['crypto']))
+_ingestion_engine.register(PriceSource('moroccan', _fetch_moroccan_prices, **PRICE_SOURCE_SCHEDULE['moroccan']))
+_ingestion_engine.register(PriceSource(
+    'finnhub_forex', _fetch_forex_prices_finnhub,
+    enabled=lambda: bool(get_finnhub_api_key()), **PRICE_SOURCE_SCHEDULE['finnhub_forex']
+))
+_ingestion_engine.register(PriceSource(
+    'finnhub_stocks', _fetch_stock_prices_finnhub,
+    enabled=lambda: bool(get_finnhub_api_key()), **PRICE_SOURCE_SCHEDULE['finnhub_stocks']
+))
 
-    # Fetch forex prices from Finnhub
-    try:
-        if get_finnhub_api_key():
-            forex = _fetch_forex_prices_finnhub()
-            if forex:
-                with _live_prices_lock:
-                    _live_prices.update(forex)
-                logger.info(f"Finnhub: {len(forex)} forex prices added")
-    except Exception as e:
-        logger.debug(f"Finnhub forex error: {e}")
 
-    # Try to fetch stock prices in background (optional, may timeout)
-    try:
-        if get_finnhub_api_key():
-            stocks = _fetch_stock_prices_finnhub()
-            if stocks:
-                with _live_prices_lock:
-                    _live_prices.update(stocks)
-                logger.info(f"Finnhub: {len(stocks)} stock prices added")
-    except Exception as e:
-        logger.debug(f"Finnhub stock error: {e}")
+def _update_live_prices():
+    """Update all live prices once, fetching every source concurrently"""
+    logger.info("Fetching live prices...")
+    _ingestion_engine.run_once()
 
-def _price_updater_thread():
-    """Background thread to update prices every 3 seconds"""
-    global _price_updater_running
+    btc = price_store.get_price('BTC-USD') or 'N/A'
+    logger.info(f"Live prices updated: {len(price_store)} symbols, BTC=${btc}")
 
-    # Use eventlet.sleep for green thread compatibility
-    try:
-        import eventlet
-        sleep_func = eventlet.sleep
-    except ImportError:
-        import time
-        sleep_func = time.sleep
 
-    # Wait 3 seconds for first iteration (initial fetch already done in start_price_updater)
-    sleep_func(3)
-
-    while _price_updater_running:
-        try:
-            _update_live_prices()
-        except Exception as e:
-            logger.error(f"Price updater error: {e}")
+def get_ingestion_stats() -> dict:
+    """Get per-source latency and staleness for the live price engine"""
+    return {
+        'running': _ingestion_engine.running,
+        'sources': _ingestion_engine.get_stats()
+    }
 
-        # Wait 3 seconds before next update
-        sleep_func(3)
 
 def start_price_updater():
     """Start the background price updater"""
@@ -500,49 +466,48 @@ def start_price_updater():
         except Exception as e:
             logger.warning(f"Initial price fetch failed: {e}")
 
-        # Use eventlet.spawn_n for fire-and-forget green thread
-        try:
-            import eventlet
-            eventlet.spawn_n(_price_updater_thread)
-            logger.info("Price updater started with eventlet.spawn_n (3s interval)")
-        except ImportError:
-            # Fallback to threading if eventlet not available
-            thread = threading.Thread(target=_price_updater_thread, daemon=True)
-            thread.start()
-            logger.info("Price updater started with threading (3s interval)")
+        _ingestion_engine.start()
+        price_store.start_mirror_sync()
+
 
 def stop_price_updater():
     """Stop the background price updater"""
     global _price_updater_running
     _price_updater_running = False
+    _ingestion_engine.stop()
+    price_store.stop_mirror_sync()
 
-def get_fallback_price(symbol: str) -> float | None:
-    """Get live price for a symbol from the price updater"""
-    with _live_prices_lock:
-        data = _live_prices.get(symbol) or _live_prices.get(symbol.upper())
-        # Try alternate format (BTC-USD vs BTCUSD)
-        if not data and '-' in symbol:
-            alt = symbol.replace('-', '')
-            data = _live_prices.get(alt) or _live_prices.get(alt.upper())
-        if not data and '-' not in symbol and symbol.endswith('USD'):
-            alt = symbol[:-3] + '-USD'
-            data = _live_prices.get(alt) or _live_prices.get(alt.upper())
-        if data:
-            return data.get('price') if isinstance(data, dict) else data
+def _max_record_age(source: str) -> float:
+    """Seconds a record from a source is served before it is refetched"""
+    schedule = PRICE_SOURCE_SCHEDULE.get(source)
+    if schedule is None:
+        return CACHE_DURATION
+    return schedule['interval'] * LIVE_MISSED_POLLS + schedule['timeout']
+
+
+def get_usable_record(symbol: str):
+    """
+    Get a store record that is still fresh: a live record whose source has
+    not stalled, or an on-demand fetch within CACHE_DURATION
+    """
+    record = price_store.get(symbol)
+    if record and record.age < _max_record_age(record.source):
+        return record
     return None
 
+
+def get_fallback_price(symbol: str) -> float | None:
+    """Get the latest stored price for a symbol, regardless of age"""
+    return price_store.get_price(symbol)
+
 def get_live_price_data(symbol: str) -> dict | None:
-    """Get full price data (price + change) for a symbol"""
-    with _live_prices_lock:
-        data = _live_prices.get(symbol) or _live_prices.get(symbol.upper())
-        # Try alternate format (BTC-USD vs BTCUSD)
-        if not data and '-' in symbol:
-            alt = symbol.replace('-', '')
-            data = _live_prices.get(alt) or _live_prices.get(alt.upper())
-        if not data and '-' not in symbol and symbol.endswith('USD'):
-            alt = symbol[:-3] + '-USD'
-            data = _live_prices.get(alt) or _live_prices.get(alt.upper())
-        return data
+    """
+    Get full price data for a symbol.
+    Includes 'timestamp' (epoch seconds of the fetch) and 'source' so
+    callers can judge freshness.
+    """
+    record = price_store.get(symbol)
+    return record.to_dict() if record else None
 
 # Note: Call start_price_updater() from app.py after Flask is initialized
 # Don't auto-start here to avoid blocking during eventlet monkey patching
@@ -666,37 +631,20 @@ def _fetch_price_from_yfinance(symbol: str) -> float | None:
     return None
 
 
-def get_current_price(symbol: str) -> float | None:
+def get_current_price(symbol: str, allow_fallback: bool = True) -> float | None:
     """
     Get current price for a symbol
     Uses caching to avoid excessive API calls
-    Falls back to static prices if yfinance fails
+    Falls back to the last stored price (any age) if yfinance and Finnhub
+    fail, unless allow_fallback is False
     """
     original_symbol = symbol.upper()
     normalized = normalize_symbol(original_symbol)
 
-    # Check cache (use original symbol as key)
-    with _cache_lock:
-        if original_symbol in _price_cache:
-            cached_data = _price_cache[original_symbol]
-            if datetime.now() - cached_data['timestamp'] < timedelta(seconds=CACHE_DURATION):
-                logger.debug(f"Cache hit for {original_symbol}")
-                return cached_data['price']
-
-    # For crypto, try live prices FIRST (from Binance background updater)
-    crypto_symbols = ['BTCUSD', 'ETHUSD', 'SOLUSD', 'XRPUSD', 'ADAUSD', 'DOGEUSD', 'BNBUSD',
-                      'BTC-USD', 'ETH-USD', 'SOL-USD', 'XRP-USD', 'ADA-USD', 'DOGE-USD', 'BNB-USD']
-    if original_symbol in crypto_symbols or normalized in crypto_symbols:
-        live_price = get_fallback_price(original_symbol) or get_fallback_price(normalized)
-        if live_price:
-            logger.info(f"Using Binance live price for {original_symbol}: {live_price}")
-            # Update cache
-            with _cache_lock:
-                _price_cache[original_symbol] = {
-                    'price': float(live_price),
-                    'timestamp': datetime.now()
-                }
-            return float(live_price)
+    # Live ticks and recent fetches come straight from the price store
+    record = get_usable_record(original_symbol) or get_usable_record(normalized)
+    if record:
+        return float(record.last)
 
     # Fetch price with timeout using ThreadPoolExecutor
     price = None
@@ -711,25 +659,23 @@ def get_current_price(symbol: str) -> float | None:
         logger.error(f"Price fetch error for {normalized}: {e}")
         price = None
 
+    source = 'yfinance'
+
     # Try Finnhub if yfinance failed
     if price is None:
         logger.info(f"Trying Finnhub for {original_symbol}...")
         price = _fetch_price_from_finnhub(original_symbol)
+        source = 'finnhub'
 
-    # Use dynamic fallback price if both yfinance and Finnhub failed
-    if price is None:
+    # Use the last stored price (any age) if both yfinance and Finnhub failed
+    if price is None and allow_fallback:
         fallback = get_fallback_price(original_symbol) or get_fallback_price(normalized)
         if fallback:
             logger.warning(f"Using fallback price for {original_symbol}: {fallback}")
-            price = fallback
+            return float(fallback)
 
     if price is not None:
-        # Update cache
-        with _cache_lock:
-            _price_cache[original_symbol] = {
-                'price': float(price),
-                'timestamp': datetime.now()
-            }
+        price_store.update(original_symbol, price, source=source)
         return float(price)
 
     return None
@@ -846,58 +792,170 @@ def get_historical_data(symbol: str, period: str = '1mo', interval: str = '1d')
     period: 1d, 5d, 1mo, 3mo, 6mo, 1y, 2y, 5y, max
     interval: 1m, 2m, 5m, 15m, 30m, 60m, 90m, 1h, 1d, 5d, 1wk, 1mo
     """
-    original_symbol = symbol.upper()
-    symbol = normalize_symbol(original_symbol)
+    return candle_store.to_rows(get_historical_columns(symbol, period, interval))
+
 
+def get_historical_columns(symbol: str, period: str = '1mo', interval: str = '1d') -> dict:
+    """
+    Historical bars as column views from the local candle store; Yahoo is
+    only asked for history the store lacks and for stale tails
+    """
+    symbol = symbol.upper()
     try:
-        ticker = yf.Ticker(symbol)
+        return candle_store.get_range(symbol, period, interval)
+    except Exception as e:
+        print(f"Error fetching history for {symbol}: {e}")
+        return {name: np.empty(0, dtype=dtype) for name, dtype in CANDLE_COLUMNS}
+
+
+def _fetch_candles(symbol: str, interval: str, period: str = None, start: float = None) -> dict:
+    """Yahoo bars for a period, or from a timestamp onwards, as candle store columns"""
+    ticker = yf.Ticker(normalize_symbol(symbol.upper()))
+    if start is not None:
+        hist = ticker.history(start=datetime.fromtimestamp(start, tz=timezone.utc), interval=interval)
+    else:
         hist = ticker.history(period=period, interval=interval)
 
-        if hist.empty:
-            return []
+    if hist is None or hist.empty:
+        return {name: np.empty(0, dtype=dtype) for name, dtype in CANDLE_COLUMNS}
+
+    times = hist.index.as_unit('s').asi8
+    # Yahoo can repeat the live bar; keep the latest copy of each timestamp
+    keep = np.append(times[1:] != times[:-1], True)
+    return {
+        'time': times[keep],
+        'open': hist['Open'].to_numpy(dtype=float)[keep].round(4),
+        'high': hist['High'].to_numpy(dtype=float)[keep].round(4),
+        'low': hist['Low'].to_numpy(dtype=float)[keep].round(4),
+        'close': hist['Close'].to_numpy(dtype=float)[keep].round(4),
+        'volume': hist['Volume'].fillna(0).to_numpy()[keep].astype(np.int64)
+    }
+
+
+candle_store.configure(fetcher=_fetch_candles)
 
-        data = []
-        for index, row in hist.iterrows():
-            data.append({
-                'time': int(index.timestamp()),
-                'open': round(row['Open'], 4),
-                'high': round(row['High'], 4),
-                'low': round(row['Low'], 4),
-                'close': round(row['Close'], 4),
-                'volume': int(row['Volume'])
-            })
 
-        return data
+def _fetch_quotes_batch(yahoo_symbols: list) -> dict:
+    """
+    Fetch price, change and volume for many Yahoo symbols in one bulk request.
+    Returns {yahoo_symbol: {'price', 'change', 'change_percent', 'volume'}}.
+    """
+    quotes = {}
+    if not yahoo_symbols:
+        return quotes
 
+    try:
+        hist = yf.download(
+            tickers=yahoo_symbols,
+            period='5d',
+            interval='1d',
+            group_by='ticker',
+            auto_adjust=False,
+            threads=True,
+            progress=False
+        )
     except Exception as e:
-        print(f"Error fetching history for {symbol}: {e}")
-        return []
+        logger.warning(f"Batch quote download failed: {e}")
+        return quotes
+
+    if hist is None or hist.empty:
+        return quotes
+
+    # Single-ticker downloads come back with flat columns
+    multi = getattr(hist.columns, 'nlevels', 1) > 1
+    closes = hist.xs('Close', axis=1, level=1) if multi else hist[['Close']].set_axis(yahoo_symbols[:1], axis=1)
+    volumes = hist.xs('Volume', axis=1, level=1) if multi else hist[['Volume']].set_axis(yahoo_symbols[:1], axis=1)
+
+    for yahoo_symbol in yahoo_symbols:
+        if yahoo_symbol not in closes.columns:
+            continue
+        # Crypto trades on days the stock columns are NaN, so drop per column
+        series = closes[yahoo_symbol].dropna()
+        if series.empty:
+            continue
+        price = float(series.iloc[-1])
+        prev_close = float(series.iloc[-2]) if len(series) > 1 else price
+        change = price - prev_close
+        change_percent = (change / prev_close) * 100 if prev_close else 0
+
+        volume_series = volumes[yahoo_symbol].dropna()
+        volume = int(volume_series.iloc[-1]) if not volume_series.empty else 0
+
+        quotes[yahoo_symbol] = {
+            'price': price,
+            'change': round(change, 4),
+            'change_percent': round(change_percent, 2),
+            'volume': volume
+        }
+
+    logger.debug(f"Batch quotes: {len(quotes)}/{len(yahoo_symbols)} symbols")
+    return quotes
+
+
+def _quote_from_record(record) -> dict:
+    """Build a quote dict from a price store record"""
+    return {
+        'price': record.last,
+        'change': record.change,
+        'change_percent': record.change_percent,
+        'volume': record.volume
+    }
 
 
 def get_multiple_prices(symbols: list) -> dict:
     """
-    Get prices for multiple symbols at once
-    More efficient than calling get_current_price multiple times
+    Get prices for multiple symbols at once.
+    Serves symbols from the price store first (live ticks and recent batch
+    quotes) and fetches whatever is left in one bulk Yahoo request.
     """
     results = {}
+    missing = []
+    now = time.time()
+
+    # 1. Price store (no network)
+    with _batch_misses_lock:
+        for symbol in symbols:
+            record = get_usable_record(symbol)
+            if record:
+                results[symbol] = _quote_from_record(record)
+            elif now - _batch_misses.get(symbol.upper(), 0) < CACHE_DURATION:
+                # Failed recently - don't re-request every tick
+                results[symbol] = {'price': get_fallback_price(symbol), 'error': 'Price unavailable'}
+            else:
+                missing.append(symbol)
 
-    for symbol in symbols:
-        try:
-            price = get_current_price(symbol)
-            info = get_stock_info(symbol)
-
-            results[symbol] = {
-                'price': price,
-                'change': info.get('change', 0),
-                'change_percent': info.get('change_percent', 0),
-                'volume': info.get('volume', 0)
-            }
-        except Exception as e:
-            print(f"Error fetching {symbol}: {e}")
-            results[symbol] = {
-                'price': None,
-                'error': str(e)
-            }
+    if not missing:
+        return results
+
+    # 2. One bulk request for everything else
+    by_yahoo_symbol = {}
+    for symbol in missing:
+        by_yahoo_symbol.setdefault(normalize_symbol(symbol), []).append(symbol)
+
+    quotes = {}
+    try:
+        future = _executor.submit(_fetch_quotes_batch, list(by_yahoo_symbol.keys()))
+        quotes = future.result(timeout=BATCH_QUOTE_TIMEOUT)
+    except FuturesTimeoutError:
+        logger.warning(f"Batch quote timeout for {len(by_yahoo_symbol)} symbols after {BATCH_QUOTE_TIMEOUT}s")
+    except Exception as e:
+        logger.error(f"Batch quote error: {e}")
+
+    fetched = {}
+    with _batch_misses_lock:
+        for yahoo_symbol, originals in by_yahoo_symbol.items():
+            quote = quotes.get(yahoo_symbol)
+            for symbol in originals:
+                if quote:
+                    results[symbol] = dict(quote)
+                    fetched[symbol.upper()] = quote
+                    _batch_misses.pop(symbol.upper(), None)
+                else:
+                    _batch_misses[symbol.upper()] = now
+                    results[symbol] = {'price': get_fallback_price(symbol), 'error': 'Price unavailable'}
+
+    if fetched:
+        price_store.update_many('yfinance_batch', fetched, ts=now)
 
     return results
 
@@ -81,7 +81,6 @@ def sync_market_data():
     Scheduled to run every 5 minutes during market hours.
     """
     try:
-        from services.cache_service import CacheService
         from services.yfinance_service import get_multiple_prices
 
         # Key symbols to keep cached
@@ -90,13 +89,9 @@ def sync_market_data():
             'NVDA', 'META', 'AMZN', 'JPM'
         ]
 
+        # Fetched quotes land in the shared price store (and its Redis mirror)
         prices = get_multiple_prices(symbols)
 
-        # Update cache
-        for symbol, price_data in prices.items():
-            cache_key = CacheService.market_key(symbol)
-            CacheService.set(cache_key, price_data, timeout=CacheService.TTL['market_prices'])
-
         logger.info(f"Synced market data for {len(prices)} symbols")
         return {'status': 'success', 'synced': len(prices)}
 
@@ -113,81 +108,34 @@ def check_challenge_statuses():
     """
     try:
         from app import create_app
-        from models import db, UserChallenge, Trade, ChallengeModel
+        from models import UserChallenge
+        from services.challenge_engine import ChallengeEngine
 
         app = create_app()
         with app.app_context():
             # Get active challenges
             active_challenges = UserChallenge.query.filter(
-                UserChallenge.status.in_(['active', 'evaluation', 'verification'])
+                UserChallenge.status.in_(['active', 'funded'])
             ).all()
 
-            updated_count = 0
-            for challenge in active_challenges:
-                try:
-                    model = ChallengeModel.query.get(challenge.model_id)
-                    if not model:
-                        continue
-
-                    # Calculate current metrics
-                    trades = Trade.query.filter_by(
-                        challenge_id=challenge.id,
-                        status='closed'
-                    ).all()
-
-                    total_pnl = sum(t.profit_loss or 0 for t in trades)
-                    current_balance = challenge.initial_balance + total_pnl
-
-                    # Check for violations
-                    max_loss = challenge.initial_balance * (model.max_overall_loss / 100)
-                    if current_balance < (challenge.initial_balance - max_loss):
-                        challenge.status = 'failed'
-                        challenge.failed_at = datetime.utcnow()
-                        challenge.failure_reason = 'max_overall_loss_exceeded'
-                        updated_count += 1
+            # One aggregate query and one commit for the whole batch
+            results = ChallengeEngine().evaluate_many(active_challenges)
 
-                        from tasks.notification_tasks import send_challenge_alert
-                        send_challenge_alert.delay(challenge.user_id, {
-                            'challenge_id': challenge.id,
-                            'status': 'failed',
-                            'reason': 'Maximum overall loss exceeded'
-                        })
-                        continue
-
-                    # Check for profit target reached
-                    profit_target = None
-                    if challenge.status == 'evaluation':
-                        profit_target = model.phase1_profit_target
-                    elif challenge.status == 'verification':
-                        profit_target = model.phase2_profit_target
-
-                    if profit_target:
-                        target_profit = challenge.initial_balance * (profit_target / 100)
-                        if total_pnl >= target_profit:
-                            # Progress to next phase
-                            if challenge.status == 'evaluation' and model.phases > 1:
-                                challenge.status = 'verification'
-                                challenge.phase = 2
-                            else:
-                                challenge.status = 'funded'
-                                challenge.funded_at = datetime.utcnow()
-
-                            updated_count += 1
-
-                            from tasks.notification_tasks import send_challenge_alert
-                            send_challenge_alert.delay(challenge.user_id, {
-                                'challenge_id': challenge.id,
-                                'status': challenge.status,
-                                'phase': challenge.phase
-                            })
-
-                    # Update balance
-                    challenge.current_balance = current_balance
-
-                except Exception as e:
-                    logger.error(f"Error checking challenge {challenge.id}: {e}")
+            challenges = {challenge.id: challenge for challenge in active_challenges}
+            updated_count = 0
+            for challenge_id, result in results.items():
+                if not result.get('changed'):
+                    continue
+                updated_count += 1
+
+                from tasks.notification_tasks import send_challenge_alert
+                send_challenge_alert.delay(challenges[challenge_id].user_id, {
+                    'challenge_id': challenge_id,
+                    'status': result.get('status'),
+                    'phase': result.get('next_phase') or result.get('phase'),
+                    'reason': result.get('message')
+                })
 
-            db.session.commit()
             logger.info(f"Checked {len(active_challenges)} challenges, updated {updated_count}")
             return {'status': 'success', 'checked': len(active_challenges), 'updated': updated_count}
 
@@ -322,58 +270,46 @@ def backup_database():
 @shared_task
 def sync_leaderboard():
     """
-    Sync and update leaderboard rankings.
+    Reconcile the leaderboard sorted sets with the database.
+    Trade closes and points awards keep them current; this pass picks up
+    challenges created or edited outside those paths and rolls the windows.
     """
     try:
         from app import create_app
-        from models import db, User, UserChallenge, Trade
-        from services.cache_service import CacheService
+        from services.leaderboard_service import leaderboards
 
         app = create_app()
         with app.app_context():
-            # Get all funded users with their stats
-            funded_challenges = UserChallenge.query.filter_by(status='funded').all()
+            counts = leaderboards.rebuild()
 
-            leaderboard = []
-            for challenge in funded_challenges:
-                user = User.query.get(challenge.user_id)
-                if not user:
-                    continue
+            logger.info(f"Reconciled leaderboards: {counts}")
+            return {'status': 'success', 'boards': counts}
 
-                trades = Trade.query.filter_by(
-                    challenge_id=challenge.id,
-                    status='closed'
-                ).all()
-
-                total_pnl = sum(t.profit_loss or 0 for t in trades)
-                total_trades = len(trades)
-                winning_trades = len([t for t in trades if (t.profit_loss or 0) > 0])
-                win_rate = (winning_trades / total_trades * 100) if total_trades > 0 else 0
-
-                leaderboard.append({
-                    'user_id': user.id,
-                    'username': user.username,
-                    'total_pnl': total_pnl,
-                    'win_rate': win_rate,
-                    'total_trades': total_trades,
-                    'challenge_id': challenge.id
-                })
+    except Exception as e:
+        logger.error(f"Failed to sync leaderboard: {e}")
+        return {'status': 'error', 'error': str(e)}
 
-            # Sort by total PnL
-            leaderboard.sort(key=lambda x: x['total_pnl'], reverse=True)
 
-            # Add ranking
-            for i, entry in enumerate(leaderboard):
-                entry['rank'] = i + 1
+@shared_task
+def update_analytics_rollups(backfill: bool = False):
+    """
+    Refresh the admin analytics rollups: the last few days and the cohort
+    activity of this and last month, or everything when backfill is set or
+    the rollups are still empty.
+    """
+    try:
+        from app import create_app
+        from services.analytics_rollups import analytics_rollups
 
-            # Cache the leaderboard
-            CacheService.set('leaderboard:global', leaderboard, timeout=300)
+        app = create_app()
+        with app.app_context():
+            counts = analytics_rollups.backfill() if backfill else analytics_rollups.refresh()
 
-            logger.info(f"Synced leaderboard with {len(leaderboard)} traders")
-            return {'status': 'success', 'traders': len(leaderboard)}
+            logger.info(f"Updated analytics rollups: {counts}")
+            return {'status': 'success', **counts}
 
     except Exception as e:
-        logger.error(f"Failed to sync leaderboard: {e}")
+        logger.error(f"Failed to update analytics rollups: {e}")
         return {'status': 'error', 'error': str(e)}
 
 
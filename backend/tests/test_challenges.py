@@ -44,3 +44,241 @@ class TestChallengeAddons:
         if auth_headers:
             response = client.get('/api/challenges/my-addons', headers=auth_headers)
             assert response.status_code == 200
+
+
+class TestChallengeEngine:
+    """Test incremental challenge evaluation"""
+
+    def _make_challenge(self, username):
+        from decimal import Decimal
+        from models import db, User, UserChallenge
+
+        user = User(username=username, email=f'{username}@test.com', password_hash='x')
+        db.session.add(user)
+        db.session.flush()
+        challenge = UserChallenge(
+            user_id=user.id, plan_type='starter', phase='evaluation', status='active',
+            initial_balance=Decimal('5000'), current_balance=Decimal('5000'), highest_balance=Decimal('5000')
+        )
+        db.session.add(challenge)
+        db.session.commit()
+        return challenge
+
+    def test_daily_loss_uses_running_aggregates(self, app):
+        """Test closes update trading days and trip the daily loss rule"""
+        from services.challenge_engine import ChallengeEngine
+
+        engine = ChallengeEngine()
+        challenge = self._make_challenge('engine_daily_loss')
+
+        assert engine.evaluate_challenge(challenge)['changed'] is False
+
+        engine.apply_closed_trade(challenge, -100)
+        engine.apply_closed_trade(challenge, -160)
+        assert challenge.trading_days == 1
+
+        result = engine.evaluate_challenge(challenge)
+        assert result['failure_reason'] == 'max_daily_loss'
+        assert challenge.status == 'failed'
+
+    def test_evaluate_many(self, app):
+        """Test bulk evaluation returns a result per challenge"""
+        from services.challenge_engine import ChallengeEngine
+
+        passing = self._make_challenge('engine_bulk_pass')
+        ongoing = self._make_challenge('engine_bulk_ongoing')
+        ChallengeEngine().apply_closed_trade(passing, 600)
+
+        results = ChallengeEngine().evaluate_many([passing, ongoing])
+        assert results[passing.id]['next_phase'] == 'verification'
+        assert results[ongoing.id]['changed'] is False
+        assert passing.status == 'passed'
+
+    def test_evaluate_many_isolates_failures(self, app, monkeypatch):
+        """Test one challenge failing to evaluate does not roll back the batch"""
+        from models import db, UserChallenge
+        from services.challenge_engine import ChallengeEngine
+
+        broken = self._make_challenge('engine_bulk_broken')
+        passing = self._make_challenge('engine_bulk_survivor')
+        engine = ChallengeEngine()
+        engine.apply_closed_trade(passing, 600)
+        db.session.commit()
+
+        evaluate = engine.evaluate_challenge
+
+        def flaky(challenge, commit=True):
+            if challenge.id == broken.id:
+                challenge.status = 'failed'
+                db.session.flush()
+                raise RuntimeError('boom')
+            return evaluate(challenge, commit=commit)
+
+        monkeypatch.setattr(engine, 'evaluate_challenge', flaky)
+        results = engine.evaluate_many([broken, passing])
+
+        assert list(results) == [passing.id]
+        db.session.expire_all()
+        assert db.session.get(UserChallenge, passing.id).status == 'passed'
+        assert db.session.get(UserChallenge, broken.id).status == 'active'
+
+    def test_day_state_follows_edits_from_other_workers(self, app):
+        """Test a namespace bump broadcast by another worker re-derives day-start balances"""
+        import time
+        from datetime import date
+        from decimal import Decimal
+        from models import db
+        from services.cache_service import CacheService, invalidation_bus
+        from services.challenge_engine import (
+            ChallengeEngine, DAY_STATE_NAMESPACE, _day_state, invalidate_challenge_state
+        )
+
+        engine = ChallengeEngine()
+        challenge = self._make_challenge('engine_day_state_shared')
+        assert engine.day_start_balances([challenge])[challenge.id] == Decimal('5000')
+
+        # Another worker edits the balance; only its version bump reaches this one
+        challenge.current_balance = Decimal('6000')
+        db.session.commit()
+        assert engine.day_start_balances([challenge])[challenge.id] == Decimal('5000')
+        version = CacheService.namespace_version(DAY_STATE_NAMESPACE)
+        invalidation_bus.apply({'versions': {DAY_STATE_NAMESPACE: version + 1}})
+        assert engine.day_start_balances([challenge])[challenge.id] == Decimal('6000')
+
+        challenge.current_balance = Decimal('7000')
+        invalidate_challenge_state(challenge.id)
+        # A worker re-derives the old balance before the edit commits...
+        _day_state[challenge.id] = (date.today(), Decimal('6000'), time.time(),
+                                    CacheService.namespace_version(DAY_STATE_NAMESPACE))
+        db.session.commit()
+        # ...and it is dropped again once the edit does
+        assert engine.day_start_balances([challenge])[challenge.id] == Decimal('7000')
+
+    def test_challenge_stats_single_query(self, app):
+        """Test trade stats are aggregated in one pass and refreshed on close"""
+        from decimal import Decimal
+        from models import db, Trade
+        from services.challenge_engine import ChallengeEngine
+
+        challenge = self._make_challenge('engine_stats')
+        for symbol, pnl, status in (('AAPL', 100, 'closed'), ('AAPL', -50, 'closed'),
+                                    ('AAPL', 300, 'closed'), ('TSLA', None, 'open')):
+            db.session.add(Trade(
+                challenge_id=challenge.id, symbol=symbol, trade_type='buy', quantity=Decimal('1'),
+                entry_price=Decimal('100'), pnl=Decimal(str(pnl)) if pnl is not None else None, status=status
+            ))
+        db.session.commit()
+
+        engine = ChallengeEngine()
+        stats = engine.get_challenge_stats(challenge)
+        assert stats['trades'] == {
+            'total': 4, 'open': 1, 'closed': 3, 'winning': 2, 'losing': 1, 'win_rate': 66.67
+        }
+        assert stats['pnl']['total'] == 350
+        assert stats['pnl']['average_win'] == 200
+        assert stats['pnl']['average_loss'] == -50
+        assert stats['pnl']['profit_factor'] == 4
+        assert stats['popular_symbols'][0] == {'symbol': 'AAPL', 'count': 3}
+
+        trade = Trade.query.filter_by(challenge_id=challenge.id, status='open').first()
+        trade.pnl = Decimal('-150')
+        trade.status = 'closed'
+        engine.apply_closed_trade(challenge, -150)
+        db.session.commit()
+
+        stats = engine.get_challenge_stats(challenge)
+        assert stats['trades']['open'] == 0
+        assert stats['trades']['losing'] == 2
+        assert stats['pnl']['average_loss'] == -100
+
+    def test_trade_stats_dropped_on_commit(self, app):
+        """Test a close drops the cached trade stats only once it commits"""
+        from models import db
+        from services.cache_service import CacheService
+        from services.challenge_engine import ChallengeEngine, _trade_stats_key
+
+        engine = ChallengeEngine()
+        challenge = self._make_challenge('engine_stats_commit')
+        engine.get_challenge_stats(challenge)
+        key = _trade_stats_key(challenge.id)
+        assert CacheService.get(key) is not None
+
+        engine.apply_closed_trade(challenge, 50)
+        assert CacheService.get(key) is not None
+        db.session.rollback()
+        assert CacheService.get(key) is not None
+
+        engine.apply_closed_trade(challenge, 50)
+        db.session.commit()
+        assert CacheService.get(key) is None
+
+    def test_leaderboard_updates_on_close(self, app):
+        """Test committed trade closes and failures re-rank challenges without a rebuild"""
+        from models import db
+        from services.challenge_engine import ChallengeEngine
+        from services.leaderboard_service import leaderboards
+
+        engine = ChallengeEngine()
+        leader = self._make_challenge('board_leader')
+        runner_up = self._make_challenge('board_runner_up')
+        leaderboards.rebuild()
+
+        engine.apply_closed_trade(runner_up, 9000)
+        db.session.rollback()
+        assert leaderboards.get_trading_leaderboard('all', limit=1)[0]['profit_percentage'] < 180
+
+        engine.apply_closed_trade(runner_up, 3000)
+        engine.apply_closed_trade(leader, 4000)
+        db.session.commit()
+        top = leaderboards.get_trading_leaderboard('week', limit=2)
+        assert [row['username'] for row in top] == ['board_leader', 'board_runner_up']
+        assert top[0]['profit_percentage'] == 80
+        assert leaderboards.get_challenge_rank(runner_up) == 2
+
+        engine.fail_challenge(leader, 'manual', 'Failed by test')
+        db.session.commit()
+        assert leaderboards.get_trading_leaderboard('all', limit=1)[0]['username'] == 'board_runner_up'
+        assert leaderboards.get_challenge_rank(runner_up) == 1
+
+    def test_extended_stats_incremental(self, app):
+        """Test extended stats are computed from columns and pick up new closes"""
+        from datetime import datetime, timedelta
+        from decimal import Decimal
+        from models import db, Trade
+        from services.challenge_engine import ChallengeEngine
+
+        challenge = self._make_challenge('engine_extended')
+        now = datetime.utcnow()
+        challenge.start_date = now - timedelta(days=2)
+
+        def close(symbol, pnl, days_ago, minutes):
+            closed_at = now - timedelta(days=days_ago)
+            db.session.add(Trade(
+                challenge_id=challenge.id, symbol=symbol, trade_type='buy', quantity=Decimal('1'),
+                entry_price=Decimal('100'), pnl=Decimal(str(pnl)), status='closed',
+                opened_at=closed_at - timedelta(minutes=minutes), closed_at=closed_at
+            ))
+            db.session.commit()
+
+        close('AAPL', 100, 2, 3)
+        close('AAPL', -300, 1, 30)
+        close('TSLA', -50, 1, 2000)
+
+        engine = ChallengeEngine()
+        stats = engine.get_extended_stats(challenge)
+        assert [entry['balance'] for entry in stats['balance_history']] == [5100, 4750, 4750]
+        assert stats['max_drawdown'] == round(350 / 5100 * 100, 2)
+        assert [entry['pnl'] for entry in stats['daily_pnl']] == [100, -350]
+        assert stats['streaks'] == {
+            'current': -2, 'max_win': 1, 'max_loss': 2,
+            'recent_trades': [{'result': 'win'}, {'result': 'loss'}, {'result': 'loss'}]
+        }
+        assert [bucket['count'] for bucket in stats['duration_stats']['distribution']] == [0, 1, 0, 1, 0, 0, 1]
+        assert stats['exposure'][0] == {'name': 'AAPL', 'value': 66.7}
+        assert stats['worst_trade'] == -300
+
+        close('TSLA', 250, 0, 10)
+        stats = engine.get_extended_stats(challenge)
+        assert [entry['balance'] for entry in stats['balance_history']] == [5100, 4750, 5000]
+        assert stats['streaks']['current'] == 1
+        assert stats['best_trade'] == 250
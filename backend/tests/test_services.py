@@ -19,6 +19,122 @@ class TestCacheService:
         except ImportError as e:
             pytest.skip(f"Cache service not available: {e}")
 
+    def test_invalidation_from_other_workers(self):
+        """Test invalidation messages from other workers drop L1 entries"""
+        import json
+        from services.cache_service import LRUCache, CacheInvalidationBus
+
+        l1 = LRUCache()
+        bus = CacheInvalidationBus(l1)
+        for key in ('user:1:profile', 'user:2:profile', 'market:BTC'):
+            l1.set(key, 'value')
+
+        bus._on_message(json.dumps({'origin': bus.worker_id, 'keys': ['market:BTC']}))
+        assert l1.get('market:BTC') == 'value'
+
+        bus._on_message(json.dumps({'origin': 'other', 'keys': ['market:BTC'], 'patterns': ['user:1:*'],
+                                    'versions': {'leaderboard': 3}}))
+        assert l1.get('market:BTC') is None
+        assert l1.get('user:1:profile') is None
+        assert l1.get('user:2:profile') == 'value'
+        assert bus.versions['leaderboard'] == 3
+
+    def test_batch_and_versioned_keys(self, app):
+        """Test get_many/set_many and namespace versioning"""
+        from services.cache_service import CacheService
+
+        with app.app_context():
+            CacheService.set_many({'test:a': 1, 'test:b': 2}, timeout=60)
+            assert CacheService.get_many(['test:a', 'test:b', 'test:c'], use_l1=False) == {'test:a': 1, 'test:b': 2}
+
+            key = CacheService.versioned_key('test_ns', 'item')
+            CacheService.set(key, 'old')
+            CacheService.bump_namespace('test_ns')
+            assert CacheService.versioned_key('test_ns', 'item') != key
+            assert CacheService.get(CacheService.versioned_key('test_ns', 'item')) is None
+
+    def test_tag_invalidation(self, app):
+        """Test entries are invalidated through the tags derived from their keys"""
+        from services.cache_service import CacheService, invalidate_user_cache
+
+        assert CacheService.tags_for_key('user:42:profile') == ['user:42']
+        assert CacheService.tags_for_key('market:BTC-USD') == ['market:BTC-USD']
+        assert CacheService.tags_for_key('signals:BTC') == []
+
+        with app.app_context():
+            CacheService.set('user:42:profile', {'name': 'a'})
+            CacheService.set_many({'user:42:stats': 1, 'user:43:stats': 2})
+            CacheService.set('leaderboard:top', [42], tags=['user:42'])
+
+            assert invalidate_user_cache(42) is None
+            assert CacheService.get('user:42:profile') is None
+            assert CacheService.get('user:42:stats') is None
+            assert CacheService.get('leaderboard:top') is None
+            assert CacheService.get('user:43:stats') == 2
+
+    def test_decorated_entries_are_tagged(self, app, monkeypatch):
+        """Test decorator entries are cleared by their tag and tag sets stay capped"""
+        from services import cache_service
+        from services.cache_service import CacheService, cache_user_data, invalidate_user_cache
+
+        calls = []
+
+        @cache_user_data
+        def profile(user_id):
+            calls.append(user_id)
+            return {'id': user_id}
+
+        with app.app_context():
+            profile(7)
+            profile(7)
+            assert calls == [7]
+            invalidate_user_cache(7)
+            profile(7)
+            assert calls == [7, 7]
+
+            monkeypatch.setattr(cache_service, 'TAG_MAX_MEMBERS', 10)
+            for i in range(30):
+                CacheService.set(f"tagcap:{i}", i, tags=['user:8'])
+                if i % 2:
+                    CacheService.delete(f"tagcap:{i}")
+            assert len(cache_service._local_tags['user:8']) <= 10
+            assert CacheService.get('tagcap:28') == 28
+            assert invalidate_user_cache(8) is None
+            assert CacheService.get('tagcap:28') is None
+
+    def test_cached_response_single_flight(self, app):
+        """Test stable keys, coalesced misses and stale-while-revalidate"""
+        import time
+        import threading
+        from services.cache_service import cached_response
+
+        calls = []
+
+        @cached_response(timeout=1, key_prefix='test', beta=0)
+        def slow_double(x, options=None):
+            calls.append(x)
+            time.sleep(0.1)
+            return x * 2
+
+        assert slow_double.cache_key(3, options={'a': 1, 'b': 2}) == \
+            slow_double.cache_key(3, options={'b': 2, 'a': 1})
+
+        with app.app_context():
+            results = []
+            threads = [threading.Thread(target=lambda: results.append(slow_double(3))) for _ in range(5)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            assert results == [6] * 5
+            assert calls == [3]
+
+            # Expired: the stale value is served while one refresh runs
+            time.sleep(1.1)
+            assert slow_double(3) == 6
+            time.sleep(0.3)
+            assert calls == [3, 3]
+
 
 class TestMetricsService:
     """Test metrics service"""
@@ -42,6 +158,25 @@ class TestMetricsService:
         assert 'cpu_percent' in system_metrics
         assert 'memory_percent' in system_metrics
 
+    def test_request_metrics_windows(self):
+        """Test requests aggregate into windows and latency percentiles"""
+        from services.metrics_service import MetricsCollector
+
+        collector = MetricsCollector()
+        for i in range(100):
+            collector.record_request('api.trades', (i + 1) / 1000, 500 if i < 5 else 200)
+
+        stats = collector.get_request_metrics(5)
+        assert stats['total_requests'] == 100
+        assert stats['error_rate'] == 5
+        assert stats['avg_response_time'] == 50.5
+        assert abs(stats['p50_response_time'] - 50) <= 50 * 0.07
+        assert abs(stats['p99_response_time'] - 99) <= 99 * 0.07
+
+        endpoint = collector.get_endpoint_metrics()[0]
+        assert endpoint['requests'] == 100
+        assert endpoint['errors'] == 5
+
 
 class TestEmailService:
     """Test email service"""
@@ -65,3 +200,1147 @@ class TestStripeService:
             assert StripeService is not None
         except ImportError as e:
             pytest.skip(f"Stripe service not available: {e}")
+
+
+class TestPriceIngestionEngine:
+    """Test concurrent price ingestion engine"""
+
+    def test_run_once_merges_all_sources(self):
+        """Test every source is merged with its source name and timestamp"""
+        from services.market.price_ingestion import PriceIngestionEngine, PriceSource
+
+        from services.market.price_store import PriceStore
+
+        store = PriceStore()
+        engine = PriceIngestionEngine(store.update_many)
+        engine.register(PriceSource('a', lambda: {'AAA': {'price': 1.0, 'change_percent': 0}}))
+        engine.register(PriceSource('b', lambda: {'BBB': {'price': 2.0, 'change_percent': 0}}))
+        engine.run_once()
+
+        assert store.get('AAA').source == 'a'
+        assert store.get('BBB').last == 2.0
+        assert store.get('BBB').ts > 0
+
+        stats = engine.get_stats()
+        assert stats['a']['runs'] == 1
+        assert stats['b']['staleness_seconds'] is not None
+
+    def test_failing_source_does_not_block_others(self):
+        """Test a raising source is counted as an error without affecting others"""
+        from services.market.price_ingestion import PriceIngestionEngine, PriceSource
+
+        def broken():
+            raise RuntimeError('upstream down')
+
+        from services.market.price_store import PriceStore
+
+        store = PriceStore()
+        engine = PriceIngestionEngine(store.update_many)
+        engine.register(PriceSource('broken', broken))
+        engine.register(PriceSource('ok', lambda: {'OK': {'price': 3.0}}))
+        engine.run_once()
+
+        assert store.get('OK') is not None
+        assert engine.get_stats()['broken']['errors'] == 1
+
+
+class TestPriceStore:
+    """Test unified price store"""
+
+    def test_symbol_variants_resolve_to_same_record(self):
+        """Test BTC-USD and BTCUSD read the same tick"""
+        from services.market.price_store import PriceStore
+
+        store = PriceStore()
+        store.update_many('crypto', {'BTC-USD': {'price': 95000.0, 'change_percent': 1.5}})
+
+        assert store.get_price('BTCUSD') == 95000.0
+        assert store.get('btc-usd').source == 'crypto'
+        assert store.get('BTC-USD').to_dict()['change_percent'] == 1.5
+
+    def test_max_age_filters_stale_records(self):
+        """Test stale records are ignored when max_age is given"""
+        import time
+        from services.market.price_store import PriceStore
+
+        store = PriceStore()
+        store.update('AAPL', 230.0, source='yfinance', ts=time.time() - 60)
+
+        assert store.get('AAPL') is not None
+        assert store.get('AAPL', max_age=10) is None
+
+    def test_record_json_round_trip(self):
+        """Test records survive the Redis mirror encoding"""
+        from services.market.price_store import PriceRecord
+
+        record = PriceRecord(1.1, bid=1.09, ask=1.11, source='finnhub_forex')
+        restored = PriceRecord.from_json(record.to_json())
+        assert restored.bid == 1.09
+        assert restored.source == 'finnhub_forex'
+        assert restored.ts == record.ts
+
+    def test_trade_price_ignores_stale_records(self, app, monkeypatch):
+        """Test trades never open at an hours-old stored tick, live or fetched, even when upstream fails"""
+        import time
+        from routes import trades
+        from services import yfinance_service
+        from services.market.price_store import price_store
+
+        upstream = {'price': 231.5}
+        monkeypatch.setattr(yfinance_service, '_fetch_price_from_yfinance', lambda symbol: upstream['price'])
+        monkeypatch.setattr(yfinance_service, '_fetch_price_from_finnhub', lambda symbol: None)
+        monkeypatch.setattr(trades, '_fetch_crypto_price_direct', lambda symbol: None)
+
+        price_store.update('ZZTEST', 180.0, source='yfinance', ts=time.time() - 3 * 3600)
+        assert trades._resolve_price('ZZTEST') == (231.5, 'yfinance')
+
+        # A live source that stopped updating is as stale as an old fetch
+        price_store.update('ZZTEST', 190.0, source='finnhub_stocks', ts=time.time() - 3 * 3600)
+        upstream['price'] = 233.0
+        assert trades._resolve_price('ZZTEST') == (233.0, 'yfinance')
+
+        # With upstream down the stale tick is not used as a fallback
+        price_store.update('ZZTEST', 190.0, source='finnhub_stocks', ts=time.time() - 3 * 3600)
+        upstream['price'] = None
+        assert trades._resolve_price('ZZTEST') == (None, None)
+        assert yfinance_service.get_current_price('ZZTEST') == 190.0
+
+        price_store.update('ZZTEST', 232.0, source='finnhub_stocks')
+        assert trades._resolve_price('ZZTEST') == (232.0, 'finnhub_stocks')
+
+
+class TestBatchQuotes:
+    """Test bulk Yahoo quotes with yf.download mocked"""
+
+    FIELDS = ['Open', 'High', 'Low', 'Close', 'Adj Close', 'Volume']
+
+    def _frame(self, columns: dict):
+        """Build a download result from {ticker: (closes, volumes)}"""
+        import pandas as pd
+
+        index = pd.date_range('2026-10-09', periods=5, freq='D')
+        data = {}
+        for ticker, (closes, volumes) in columns.items():
+            for field in self.FIELDS:
+                data[(ticker, field)] = volumes if field == 'Volume' else closes
+        return pd.DataFrame(data, index=index, columns=pd.MultiIndex.from_tuples(list(data)))
+
+    def test_multi_ticker_quotes_skip_nan_rows(self, monkeypatch):
+        """Test stock rows left NaN on crypto-only days are dropped per column"""
+        from services import yfinance_service
+
+        nan = float('nan')
+        hist = self._frame({
+            'ZZSTOCK': ([100.0, 101.0, nan, nan, 103.0], [1000, 1100, nan, nan, 1300]),
+            'ZZCOIN-USD': ([10.0, 11.0, 12.0, 13.0, 14.0], [5, 6, 7, 8, nan]),
+            'ZZDEAD': ([nan] * 5, [nan] * 5)
+        })
+        monkeypatch.setattr(yfinance_service.yf, 'download', lambda **kwargs: hist)
+
+        quotes = yfinance_service._fetch_quotes_batch(['ZZSTOCK', 'ZZCOIN-USD', 'ZZDEAD', 'ZZABSENT'])
+        assert quotes['ZZSTOCK'] == {'price': 103.0, 'change': 2.0, 'change_percent': 1.98, 'volume': 1300}
+        assert quotes['ZZCOIN-USD'] == {'price': 14.0, 'change': 1.0, 'change_percent': 7.69, 'volume': 8}
+        assert 'ZZDEAD' not in quotes and 'ZZABSENT' not in quotes
+
+    def test_single_ticker_flat_columns(self, monkeypatch):
+        """Test a one-symbol download with flat columns is keyed by that symbol"""
+        from services import yfinance_service
+
+        hist = self._frame({'ZZSOLO': ([50.0, 51.0, 52.0, 53.0, 55.0], [1, 2, 3, 4, 9])})
+        hist.columns = hist.columns.droplevel(0)
+        monkeypatch.setattr(yfinance_service.yf, 'download', lambda **kwargs: hist)
+
+        assert yfinance_service._fetch_quotes_batch(['ZZSOLO']) == {
+            'ZZSOLO': {'price': 55.0, 'change': 2.0, 'change_percent': 3.77, 'volume': 9}
+        }
+
+    def test_misses_are_not_refetched(self, monkeypatch):
+        """Test one bulk request per refresh: quotes land in the store, misses are suppressed"""
+        import time
+        from services import yfinance_service
+        from services.market.price_store import price_store
+
+        nan = float('nan')
+        hist = self._frame({
+            'ZZBATCH': ([20.0, 20.0, 20.0, 20.0, 21.0], [1, 1, 1, 1, 1]),
+            'ZZGONE': ([nan] * 5, [nan] * 5)
+        })
+        requested = []
+
+        def download(tickers, **kwargs):
+            requested.append(sorted(tickers))
+            return hist
+
+        monkeypatch.setattr(yfinance_service.yf, 'download', download)
+        monkeypatch.setattr(yfinance_service, '_batch_misses', {})
+
+        results = yfinance_service.get_multiple_prices(['ZZBATCH', 'ZZGONE'])
+        assert requested == [['ZZBATCH', 'ZZGONE']]
+        assert results['ZZBATCH']['price'] == 21.0
+        assert results['ZZGONE'] == {'price': None, 'error': 'Price unavailable'}
+        assert price_store.get('ZZBATCH').source == 'yfinance_batch'
+
+        # The quote is served from the store and the miss is not re-requested
+        results = yfinance_service.get_multiple_prices(['ZZBATCH', 'ZZGONE'])
+        assert requested == [['ZZBATCH', 'ZZGONE']]
+        assert results['ZZBATCH']['change'] == 1.0
+        assert 'error' in results['ZZGONE']
+
+        # Once the suppression window passes the miss is retried alone
+        yfinance_service._batch_misses['ZZGONE'] = time.time() - yfinance_service.CACHE_DURATION
+        yfinance_service.get_multiple_prices(['ZZBATCH', 'ZZGONE'])
+        assert requested[-1] == ['ZZGONE']
+
+
+class TestSLTPEngine:
+    """Test event-driven SL/TP trigger index"""
+
+    def test_tick_pops_only_crossed_levels(self):
+        """Test a tick triggers only the trades whose levels it crossed"""
+        from services.sltp_engine import SLTPEngine
+
+        engine = SLTPEngine()
+        engine.add(1, 'BTC-USD', 'buy', stop_loss=90000, take_profit=100000)
+        engine.add(2, 'BTC-USD', 'buy', stop_loss=94000, take_profit=99000)
+        engine.add(3, 'BTC-USD', 'sell', stop_loss=97000, take_profit=93000)
+        engine.add(4, 'ETH-USD', 'buy', stop_loss=3000)
+
+        assert engine.on_tick('BTCUSD', 95000) == []
+
+        triggers = engine.on_tick('BTC-USD', 93000)
+        assert sorted((t[0], t[2]) for t in triggers) == [(2, 'stop_loss'), (3, 'take_profit')]
+
+        triggers = engine.on_tick('BTC-USD', 101000)
+        assert [(t[0], t[2]) for t in triggers] == [(1, 'take_profit')]
+        assert len(engine) == 1
+
+    def test_remove_and_rebuild(self):
+        """Test closed trades leave the index and rebuild replaces it"""
+        from services.sltp_engine import SLTPEngine
+
+        engine = SLTPEngine()
+        engine.add(1, 'AAPL', 'buy', stop_loss=200, take_profit=250)
+        engine.remove(1)
+        assert engine.on_tick('AAPL', 150) == []
+        assert not engine.add(2, 'AAPL', 'buy')
+
+        engine.rebuild([(5, 'EURUSD=X', 'sell', 1.2, None), (6, 'AAPL', 'buy', None, None)])
+        assert len(engine) == 1
+        assert [t[0] for t in engine.on_tick('EURUSD', 1.25)] == [5]
+
+    def test_check_prices_fetches_every_indexed_symbol(self):
+        """Test the periodic check prices symbols that never tick, by their original symbol"""
+        from services.sltp_engine import SLTPEngine
+
+        engine = SLTPEngine()
+        engine.add(1, 'GC=F', 'buy', stop_loss=2000)
+        engine.add(2, 'EURUSD=X', 'sell', take_profit=1.05)
+        engine.add(3, 'MSFT', 'buy', take_profit=500)
+
+        prices = {'GC=F': 1990.0, 'EURUSD=X': 1.08}
+        requested = []
+
+        def price_of(symbol):
+            requested.append(symbol)
+            return prices.get(symbol)
+
+        assert engine.check_prices(price_of) == 1
+        assert sorted(requested) == ['EURUSD=X', 'GC=F', 'MSFT']
+        assert len(engine) == 2
+
+
+class TestAdvancedOrderEngine:
+    """Test tick-driven trailing stop / OCO / bracket execution"""
+
+    def test_trailing_stop_activates_trails_and_triggers(self):
+        """Test a sell trailing stop follows the high and fires on the pullback"""
+        from decimal import Decimal
+        from models import TrailingStopOrder
+        from services.order_engine import AdvancedOrderEngine
+
+        engine = AdvancedOrderEngine()
+        engine.add_order('trailing_stop', TrailingStopOrder(
+            id=1, symbol='BTC-USD', side='sell', quantity=Decimal('1'), trail_type='amount',
+            trail_amount=Decimal('500'), activation_price=Decimal('100000'), status='pending'
+        ))
+
+        assert engine.on_tick('BTCUSD', 99000) == 0
+        assert engine.on_tick('BTCUSD', 100000) == 0
+        assert engine.on_tick('BTCUSD', 101000) == 0
+        assert engine.get_stats()['pending_trail_updates'] == 1
+        assert engine.on_tick('BTCUSD', 100600) == 0
+        assert engine.on_tick('BTCUSD', 100500) == 1
+        assert len(engine) == 0
+
+    def test_oco_and_bracket_levels(self):
+        """Test OCO legs cancel each other and bracket entries fill once"""
+        from decimal import Decimal
+        from models import OCOOrder, BracketOrder
+        from services.order_engine import AdvancedOrderEngine
+
+        engine = AdvancedOrderEngine()
+        engine.add_order('oco', OCOOrder(
+            id=1, symbol='AAPL', quantity=Decimal('1'), status='active',
+            order1_side='sell', order1_type='limit', order1_price=Decimal('250'), order1_status='pending',
+            order2_side='sell', order2_type='stop', order2_price=Decimal('200'), order2_status='pending'
+        ))
+        engine.add_order('bracket', BracketOrder(
+            id=2, symbol='AAPL', side='buy', quantity=Decimal('1'), entry_type='limit',
+            entry_price=Decimal('220'), entry_status='pending', status='pending',
+            take_profit_price=Decimal('240'), stop_loss_price=Decimal('210')
+        ))
+
+        assert engine.on_tick('AAPL', 230) == 0
+        assert engine.on_tick('AAPL', 215) == 1
+        assert engine.on_tick('AAPL', 199) == 1
+        assert engine.on_tick('AAPL', 260) == 0
+        assert [fill[:3] for fill in engine._fills] == [('bracket', 2, 'entry'), ('oco', 1, 'execute')]
+
+    def test_orders_only_close_their_own_positions(self, app):
+        """Test a position_id of another challenge or symbol is rejected and never settled"""
+        from models import db, User, UserChallenge, Trade
+        from routes.advanced_orders import get_position
+        from services.sltp_engine import settle_trades
+
+        with app.app_context():
+            challenges = []
+            for name in ('order_owner', 'order_victim'):
+                user = User(username=name, email=f'{name}@example.com', password_hash='x')
+                db.session.add(user)
+                db.session.flush()
+                challenge = UserChallenge(user_id=user.id, initial_balance=1000, current_balance=1000,
+                                          highest_balance=1000)
+                db.session.add(challenge)
+                db.session.flush()
+                challenges.append(challenge)
+            owner, victim = challenges
+            own = Trade(challenge_id=owner.id, symbol='ETH-USD', trade_type='buy', quantity=1, entry_price=3000)
+            theirs = Trade(challenge_id=victim.id, symbol='ETH-USD', trade_type='buy', quantity=1, entry_price=3000)
+            db.session.add_all([own, theirs])
+            db.session.commit()
+
+            assert get_position(own.id, owner, 'ETHUSD') == (own.id, None)
+            assert get_position(theirs.id, owner, 'ETH-USD')[1] is not None
+            assert get_position(own.id, owner, 'BTC-USD')[1] is not None
+            assert get_position('x', owner, 'ETH-USD')[1] is not None
+
+            closed, _ = settle_trades({theirs.id: 10.0, own.id: 3100.0},
+                                      {theirs.id: (owner.id, 'ETH-USD'), own.id: (owner.id, 'ETH-USD')})
+            assert [trade.id for trade, _, _ in closed] == [own.id]
+            db.session.commit()
+            assert db.session.get(Trade, theirs.id).status == 'open'
+            assert db.session.get(UserChallenge, victim.id).current_balance == 1000
+
+
+class TestEquityMonitor:
+    """Tests for the floating-equity drawdown monitor"""
+
+    def _challenge(self, challenge_id, balance=5000):
+        from types import SimpleNamespace
+        return SimpleNamespace(id=challenge_id, user_id=challenge_id, initial_balance=5000, current_balance=balance)
+
+    def test_floating_loss_breaches_limits(self):
+        """Test open losers breach total and daily limits before they are closed"""
+        from services.equity_monitor import EquityMonitor
+
+        monitor = EquityMonitor()
+        rules = {1: {'max_loss': 0.10, 'daily_loss': 0.05}, 2: {'max_loss': 0.10, 'daily_loss': 0.05}}
+        monitor.build(
+            [self._challenge(1), self._challenge(2, balance=4800)],
+            [(1, 'BTC-USD', 'buy', 1, 100000), (2, 'BTC-USD', 'sell', 0.01, 100000)],
+            {1: 5000, 2: 4800},
+            rules
+        )
+
+        assert monitor.on_tick('BTCUSD', 99900) == []
+        assert monitor.get_equity(1)['equity'] == 4900
+
+        breaches = monitor.on_tick('BTCUSD', 99700)
+        assert [b[:2] for b in breaches] == [(1, 'max_daily_loss')]
+
+        breaches = monitor.on_tick('BTCUSD', 130000)
+        assert [b[:2] for b in breaches] == [(2, 'max_total_loss')]
+        assert monitor.on_tick('BTCUSD', 140000) == []
+        assert monitor.get_stats()['pending_breaches'] == 2
+
+    def test_symbols_revalue_independently(self):
+        """Test a tick only revalues the positions on its own symbol"""
+        from services.equity_monitor import EquityMonitor
+
+        monitor = EquityMonitor()
+        monitor.build(
+            [self._challenge(1)],
+            [(1, 'BTC-USD', 'buy', 1, 100000), (1, 'AAPL', 'buy', 10, 200)],
+            {1: 5000},
+            {1: {'max_loss': 0.10, 'daily_loss': 0.05}},
+            prices={'BTCUSD': 100100, 'AAPL': 190}
+        )
+
+        assert monitor.get_equity(1)['unrealized_pnl'] == 0
+        monitor.on_tick('AAPL', 210)
+        assert monitor.get_equity(1)['unrealized_pnl'] == 200
+        monitor.on_tick('BTC-USD', 99900)
+        assert monitor.get_equity(1)['unrealized_pnl'] == 0
+
+    def test_breach_waits_for_fresh_price(self, app, monkeypatch):
+        """Test a breach is retried rather than closed at entry or at a stale price"""
+        import time
+        from models import db, User, UserChallenge, Trade
+        from services import equity_monitor as monitor_module
+        from services import yfinance_service
+        from services.equity_monitor import EquityMonitor
+        from services.market.price_store import price_store
+
+        monkeypatch.setattr(yfinance_service, '_fetch_price_from_yfinance', lambda symbol: None)
+        monkeypatch.setattr(yfinance_service, '_fetch_price_from_finnhub', lambda symbol: None)
+        monkeypatch.setattr(monitor_module, 'BREACH_RETRY_DELAY', 0)
+
+        with app.app_context():
+            user = User(username='breach_user', email='breach_user@example.com', password_hash='x')
+            db.session.add(user)
+            db.session.flush()
+            challenge = UserChallenge(user_id=user.id, initial_balance=1000, current_balance=1000,
+                                      highest_balance=1000)
+            db.session.add(challenge)
+            db.session.flush()
+            trade = Trade(challenge_id=challenge.id, symbol='ZZBREACH', trade_type='buy', quantity=10,
+                          entry_price=50)
+            db.session.add(trade)
+            db.session.commit()
+
+            monitor = EquityMonitor()
+            breach = (challenge.id, 'max_total_loss', 'Maximum total loss of 10% exceeded (floating equity)')
+            price_store.update('ZZBREACH', 35.0, source='yfinance', ts=time.time() - 3 * 3600)
+            assert monitor.process_breaches([breach]) == 0
+            assert db.session.get(Trade, trade.id).status == 'open'
+            assert monitor.get_stats()['retrying_breaches'] == 1
+
+            price_store.update('ZZBREACH', 38.0, source='yfinance')
+            assert monitor.process_breaches(monitor._drain()) == 1
+            closed = db.session.get(Trade, trade.id)
+            assert (closed.status, closed.exit_price) == ('closed', 38.0)
+            assert db.session.get(UserChallenge, challenge.id).status == 'failed'
+
+    def test_breach_rechecked_at_fresh_prices(self, app):
+        """Test stale prices neither seed the snapshot nor fail a challenge that is within its limits"""
+        import time
+        from models import db, User, UserChallenge, Trade
+        from services.equity_monitor import EquityMonitor
+        from services.market.price_store import price_store
+
+        with app.app_context():
+            user = User(username='recheck_user', email='recheck_user@example.com', password_hash='x')
+            db.session.add(user)
+            db.session.flush()
+            challenge = UserChallenge(user_id=user.id, initial_balance=1000, current_balance=1000,
+                                      highest_balance=1000)
+            db.session.add(challenge)
+            db.session.flush()
+            trade = Trade(challenge_id=challenge.id, symbol='ZZRECHECK', trade_type='buy', quantity=10,
+                          entry_price=50)
+            db.session.add(trade)
+            db.session.commit()
+
+            monitor = EquityMonitor()
+            price_store.update('ZZRECHECK', 35.0, source='yfinance', ts=time.time() - 3 * 3600)
+            monitor.rebuild()
+            assert monitor.get_equity(challenge.id)['unrealized_pnl'] == 0
+            assert monitor.get_stats()['pending_breaches'] == 0
+
+            price_store.update('ZZRECHECK', 49.0, source='yfinance')
+            breach = (challenge.id, 'max_total_loss', 'Maximum total loss of 10% exceeded (floating equity)')
+            assert monitor.process_breaches([breach]) == 0
+            assert db.session.get(Trade, trade.id).status == 'open'
+            assert db.session.get(UserChallenge, challenge.id).status == 'active'
+            assert monitor.get_stats()['cleared_breaches'] == 1
+
+
+class TestPriceFanout:
+    """Tests for the coalesced WebSocket price fan-out"""
+
+    class _Emitter:
+        def __init__(self):
+            self.emits = []
+
+        def emit(self, event, payload, room=None, to=None, callback=None, ignore_queue=False):
+            self.emits.append((event, payload, room or to, callback))
+
+    def _record(self, price, change_percent=0.0):
+        from services.market.price_store import PriceRecord
+        return PriceRecord(last=price, change_percent=change_percent, source='test')
+
+    def test_frames_carry_only_changed_subscribed_symbols(self):
+        """Test unchanged ticks are skipped and each client gets one frame"""
+        from services.price_fanout import PriceFanout, ALL_PRICES_ROOM
+
+        fanout = PriceFanout()
+        fanout._socketio = emitter = self._Emitter()
+        fanout.subscribe('a', ['BTC-USD', 'AAPL'])
+        fanout.subscribe('b', ['ETHUSD'], encoding='compact')
+
+        fanout.on_prices({'BTC-USD': self._record(100), 'AAPL': self._record(200), 'ETH-USD': self._record(10)})
+        assert fanout.flush() == 2
+        room, frame_a, frame_b = emitter.emits
+        assert room[2] == ALL_PRICES_ROOM and len(room[1]['prices']) == 3
+        assert frame_a[:1] == ('prices_batch',) and set(frame_a[1]['prices']) == {'BTC-USD', 'AAPL'}
+        assert frame_b[0] == 'prices_delta' and frame_b[1]['d'] == [['ETHUSD', 10, 0, 0.0]]
+
+        emitter.emits.clear()
+        fanout.on_prices({'BTC-USD': self._record(100), 'AAPL': self._record(201)})
+        assert fanout.flush() == 1
+        assert list(emitter.emits[1][1]['prices']) == ['AAPL']
+
+    def test_unacknowledged_clients_get_latest_tick_only(self):
+        """Test backpressure coalesces ticks while a frame is unacknowledged"""
+        from services.price_fanout import PriceFanout
+
+        fanout = PriceFanout()
+        fanout._socketio = emitter = self._Emitter()
+        fanout.subscribe('slow', ['BTC-USD'], ack=True)
+
+        fanout.on_prices({'BTC-USD': self._record(100)})
+        assert fanout.flush() == 1
+        for price in (101, 102, 103):
+            fanout.on_prices({'BTC-USD': self._record(price)})
+            assert fanout.flush() == 0
+
+        acks = [emit[3] for emit in emitter.emits if emit[3] is not None]
+        assert len(acks) == 1
+        acks[0]()  # client acknowledges the first frame
+        assert fanout.flush() == 1
+        assert emitter.emits[-1][1]['prices']['BTC-USD']['price'] == 103
+        assert fanout.get_stats()['dropped_ticks'] == 2
+
+
+class TestPriceWatchlist:
+    """Tests for the reference-counted price watchlist"""
+
+    def test_symbols_leave_with_last_subscriber(self):
+        """Test refcounts across connections, unsubscribe and disconnect"""
+        from services.market.watchlist import PriceWatchlist
+
+        watchlist = PriceWatchlist()
+        assert watchlist.subscribe('a', ['btc-usd', 'AAPL']) == ['BTC-USD', 'AAPL']
+        assert watchlist.subscribe('b', ['BTC-USD', 'BTC-USD']) == []
+        assert watchlist.watchers('BTC-USD') == 2
+
+        assert watchlist.unsubscribe('a', ['BTC-USD']) == []
+        assert watchlist.drop('a') == ['AAPL']
+        assert watchlist.drop('b') == ['BTC-USD']
+        assert len(watchlist) == 0
+
+    def test_poll_intervals_follow_asset_class_and_demand(self):
+        """Test crypto polls faster than Casablanca stocks and demand speeds polling up"""
+        from services.market.watchlist import PriceWatchlist
+
+        watchlist = PriceWatchlist()
+        watchlist.subscribe('a', ['BTC-USD', 'IAM', 'AAPL'])
+        assert watchlist.interval('BTC-USD') < watchlist.interval('AAPL') < watchlist.interval('IAM')
+
+        single = watchlist.interval('AAPL')
+        for sid in ('b', 'c', 'd'):
+            watchlist.subscribe(sid, ['AAPL'])
+        assert watchlist.interval('AAPL') < single
+
+        now = 1000.0
+        assert sorted(watchlist.due(now)) == ['crypto', 'moroccan', 'stock']
+        watchlist.mark_polled(['BTC-USD', 'IAM', 'AAPL'], now)
+        assert watchlist.due(now + 2) == {'crypto': ['BTC-USD']}
+
+    def test_pinned_symbols_polled_without_watchers(self):
+        """Test symbols of open positions are polled until unpinned, even after their last watcher leaves"""
+        from services.market.watchlist import PriceWatchlist
+
+        watchlist = PriceWatchlist()
+        watchlist.set_pinned(['GC=F'])
+        watchlist.subscribe('a', ['GC=F'])
+        watchlist.drop('a')
+
+        now = 1000.0
+        assert watchlist.due(now) == {'index': ['GC=F']}
+        watchlist.mark_polled(['GC=F'], now)
+        assert watchlist.due(now + 1) == {}
+        assert watchlist.due(now + watchlist.interval('GC=F')) == {'index': ['GC=F']}
+
+        watchlist.set_pinned([])
+        assert watchlist.due(now + 60) == {}
+
+    def test_price_updater_pins_position_symbols(self, app):
+        """Test open trades and pending orders add their symbols to the polled set"""
+        from models import db, User, UserChallenge, Trade, TrailingStopOrder
+        from services.market.watchlist import price_watchlist
+        from services.websocket_service import PriceUpdater
+
+        with app.app_context():
+            user = User(username='poll_user', email='poll_user@example.com', password_hash='x')
+            db.session.add(user)
+            db.session.flush()
+            challenge = UserChallenge(user_id=user.id, initial_balance=1000, current_balance=1000,
+                                      highest_balance=1000)
+            db.session.add(challenge)
+            db.session.flush()
+            trade = Trade(challenge_id=challenge.id, symbol='SI=F', trade_type='buy', quantity=1, entry_price=30)
+            db.session.add(trade)
+            db.session.flush()
+            db.session.add(TrailingStopOrder(user_id=user.id, challenge_id=challenge.id, position_id=trade.id,
+                                             symbol='PLTR', side='sell', quantity=1, trail_amount=1))
+            db.session.commit()
+
+            updater = PriceUpdater()
+            assert {'SI=F', 'PLTR'} <= updater.position_symbols()
+
+            updater.app = app
+            try:
+                updater._refresh_pinned()
+                assert 'SI=F' in price_watchlist.symbols() and 'AAPL' in price_watchlist.symbols()
+            finally:
+                price_watchlist.set_pinned([])
+
+    def test_remote_watchers_are_polled(self):
+        """Test the producer polls symbols watched only on other nodes"""
+        from services.market.watchlist import PriceWatchlist
+
+        watchlist = PriceWatchlist()
+        watchlist.subscribe('a', ['AAPL'])
+        watchlist.set_remote({'BTC-USD': 2, 'AAPL': 1})
+        assert watchlist.watchers('AAPL') == 2
+        assert watchlist.local_counts() == {'AAPL': 1}
+        assert watchlist.due(1000.0) == {'stock': ['AAPL'], 'crypto': ['BTC-USD']}
+
+        watchlist.set_remote({})
+        assert 'BTC-USD' not in watchlist
+
+
+class TestCluster:
+    """Tests for price producer election and tick distribution"""
+
+    def test_standalone_node_is_producer(self):
+        """Test a node without Redis elects itself and starts the producers once"""
+        from services.cluster import ClusterNode
+
+        started = []
+        node = ClusterNode()
+        node.start(None, on_elected=lambda: started.append(True), connections=lambda: 3)
+        try:
+            assert node.is_leader
+            assert node.elect()
+            assert started == [True]
+            assert node.get_nodes()[0]['connections'] == 3
+        finally:
+            node.stop()
+        assert not node.is_leader
+
+    def test_follower_applies_producer_ticks(self):
+        """Test published ticks land in a follower's price store, but not the producer's own"""
+        import json
+        from services.cluster import ClusterNode
+        from services.market.price_store import price_store, PriceRecord
+
+        follower = ClusterNode()
+        record = PriceRecord(123.5, change_percent=1.5, source='crypto')
+        message = json.dumps({
+            'node': 'producer', 'sent': record.ts,
+            'records': {'CLUSTERTEST': json.loads(record.to_json())}
+        })
+
+        assert follower.apply_ticks(message) == 1
+        assert price_store.get_price('CLUSTERTEST') == 123.5
+        assert follower.get_stats()['ticks_applied'] == 1
+
+        follower.node_id = 'producer'
+        assert follower.apply_ticks(message) == 0
+
+
+class TestIndicatorEngine:
+    """Tests for the vectorized technical indicator engine"""
+
+    def _series(self, n, seed):
+        import numpy as np
+        rng = np.random.default_rng(seed)
+        return list(100 * np.cumprod(1 + rng.uniform(-0.03, 0.03, n)))
+
+    def test_matches_recursive_definitions(self):
+        """Test cumsum SMA and EMA/Wilder smoothing match the step-by-step formulas"""
+        from services.signals import indicators
+
+        prices = self._series(300, 1)
+        expected_ema = [sum(prices[:26]) / 26]
+        for price in prices[26:]:
+            expected_ema.append((price - expected_ema[-1]) * 2 / 27 + expected_ema[-1])
+        assert abs(indicators.ema(prices, 26)[0] - expected_ema).max() < 1e-9
+        assert abs(indicators.sma(prices, 50)[0, -1] - sum(prices[-50:]) / 50) < 1e-9
+
+        changes = [b - a for a, b in zip(prices, prices[1:])]
+        gain = sum(max(c, 0) for c in changes[:14]) / 14
+        loss = sum(max(-c, 0) for c in changes[:14]) / 14
+        for change in changes[14:]:
+            gain = (gain * 13 + max(change, 0)) / 14
+            loss = (loss * 13 + max(-change, 0)) / 14
+        assert abs(indicators.rsi(prices)[0] - (100 - 100 / (1 + gain / loss))) < 1e-9
+
+    def test_flat_series_is_neutral(self):
+        """Test a flat series leaves no smoothing residue to flip MACD or EMA signs"""
+        from services.signals import indicators
+        from services.signals.technical_signals import TechnicalSignalsService
+
+        flat = [100.0] * 60
+        assert (indicators.ema(flat, 12) == 100.0).all()
+        macd_line, signal_ema = indicators.macd(indicators.ema(flat, 12), indicators.ema(flat, 26), 9)
+        assert not macd_line.any() and not signal_ema.any()
+
+        service = TechnicalSignalsService()
+        macd = service.calculate_macd(flat)
+        assert (macd['trend'], macd['crossover']) == ('neutral', None)
+        averages = service.calculate_moving_averages(flat)
+        assert averages['ema_12'] == averages['ema_26'] == 100.0
+
+    def test_batch_matches_single_symbol(self):
+        """Test a matrix of symbols scores each row as if analysed alone"""
+        from services.signals.technical_signals import TechnicalSignalsService
+
+        service = TechnicalSignalsService()
+        symbols = ['A', 'B', 'C']
+        histories = [self._series(100, 2), self._series(60, 3), self._series(100, 4)]
+
+        batch = service.analyze_many(symbols, histories)
+        for result, symbol, prices in zip(batch, symbols, histories):
+            single = service.get_signal_for_symbol(symbol, prices)
+            assert result['symbol'] == symbol
+            assert (result['score'], result['indicators']) == (single['score'], single['indicators'])
+
+    def test_streaming_state_matches_batch(self):
+        """Test per-tick streaming state gives the batch indicators and levels"""
+        import math
+        from services.signals.indicators import compute_indicators
+        from services.signals.streaming import SymbolIndicators, CANDLE_INTERVAL
+        from services.signals.technical_signals import TechnicalSignalsService
+
+        service = TechnicalSignalsService()
+        closes = self._series(240, 5)
+        state = SymbolIndicators('A')
+        state.seed(closes[:-1], now=CANDLE_INTERVAL * 100)
+        state.on_tick(closes[-2] * 1.01, CANDLE_INTERVAL * 100 + 60)
+        state.on_tick(closes[-2], CANDLE_INTERVAL * 100 + 120)
+        state.on_tick(closes[-1], CANDLE_INTERVAL * 101 + 60)
+        assert state.bars == len(closes) - 1
+
+        expected = compute_indicators(closes)
+        for key, value in state.values().items():
+            assert math.isclose(value, expected[key][0], rel_tol=1e-9), key
+        supports, resistances, high, low = state.levels()
+        assert service._levels_result(supports, resistances, high, low, state.price) == \
+            service.calculate_support_resistance(closes)
+
+    def test_stream_tracks_only_symbols_with_history(self):
+        """Test a symbol without real history is left unseeded and retried on the next call"""
+        from services.signals.streaming import IndicatorStream
+
+        stream = IndicatorStream()
+        history = []
+        state = stream.get('NOHIST', lambda symbol: history)
+        assert state.bars == 0 and state.price is None
+        assert stream.get_stats()['symbols'] == 0
+
+        history.extend(self._series(60, 3))
+        state = stream.get('NOHIST', lambda symbol: history)
+        assert state.bars == 59 and state.price == history[-1]
+        assert stream.get('NOHIST', lambda symbol: []) is state
+
+
+class TestTradeAnalytics:
+    """Tests for the columnar extended challenge stats"""
+
+    def test_challenge_engine_uses_trade_columns(self, app):
+        """Test ChallengeEngine.get_extended_stats is served from the cached trade columns"""
+        from datetime import datetime, timedelta
+        from models import db, User, UserChallenge, Trade
+        from services import trade_analytics
+        from services.challenge_engine import ChallengeEngine
+
+        with app.app_context():
+            user = User(username='analytics_user', email='analytics_user@example.com', password_hash='x')
+            db.session.add(user)
+            db.session.flush()
+            challenge = UserChallenge(user_id=user.id, initial_balance=1000, current_balance=1050,
+                                      highest_balance=1050, start_date=datetime.utcnow() - timedelta(days=2))
+            db.session.add(challenge)
+            db.session.flush()
+            closed = datetime.utcnow() - timedelta(days=1)
+            db.session.add(Trade(challenge_id=challenge.id, symbol='AAPL', trade_type='buy', quantity=1,
+                                 entry_price=100, pnl=50, status='closed',
+                                 opened_at=closed - timedelta(hours=1), closed_at=closed))
+            db.session.commit()
+
+            stats = ChallengeEngine().get_extended_stats(challenge)
+
+            columns = trade_analytics.load_trade_columns(challenge.id)
+            assert len(columns) == 1
+            assert columns.result is stats
+            assert stats['best_trade'] == 50
+
+    def test_racing_loads_append_rows_once(self):
+        """Test two loads queried from the same watermark do not double-count trades"""
+        from datetime import datetime, timedelta
+        from services.trade_analytics import TradeColumns
+
+        t0 = datetime(2030, 1, 1, 12)
+        first = (1, 10, t0 - timedelta(hours=1), t0, 'AAPL')
+        columns = TradeColumns()
+        columns.append([first])
+
+        # Both loads queried closed_at >= t0 before either appended
+        batch = [first, (2, 5, t0, t0, 'AAPL'), (3, 10, t0, t0 + timedelta(minutes=1), 'MSFT')]
+        assert columns.append(batch) == 2
+        assert columns.append(batch) == 0
+        assert len(columns) == 3
+        assert columns.pnl.tolist() == [10, 5, 10]
+
+
+class TestAuditWriter:
+    """Tests for the write-behind audit log sink"""
+
+    def test_rows_batch_and_spill_when_db_fails(self, app, tmp_path):
+        """Test queued rows land in one batch and failed batches replay from the spill file"""
+        from datetime import datetime
+        from models import AuditLog
+        from services.audit_writer import AuditWriter
+
+        writer = AuditWriter(spill_file=str(tmp_path / 'spill.ndjson'))
+        writer._running = True      # queue without the background loop
+
+        def entry(action):
+            return {'action_type': 'TRADE', 'action': action, 'user_id': None,
+                    'status': 'success', 'created_at': datetime.utcnow()}
+
+        with app.app_context():
+            before = AuditLog.query.count()
+            writer.submit(entry('trade_open'))
+            writer.submit(entry('trade_close'))
+            writer.submit(entry('session_revoke'))     # security-critical: written now
+            assert (writer.get_stats()['pending'], AuditLog.query.count()) == (2, before + 1)
+            assert writer.flush() == 2
+            assert AuditLog.query.count() == before + 3
+
+            insert = writer._insert
+
+            def unavailable(rows):
+                raise RuntimeError('database down')
+
+            writer._insert = unavailable
+            writer.submit(entry('trade_open'))
+            writer.flush()
+            assert writer.has_spill() and AuditLog.query.count() == before + 3
+
+            writer._insert = insert
+            assert writer.replay_spill() == 1
+            assert not writer.has_spill() and AuditLog.query.count() == before + 4
+
+
+class TestStreamingExport:
+    """Tests for the keyset-paged streaming exporter"""
+
+    def test_pages_cover_every_row_once_in_order(self, app):
+        """Test keyset pages over tied sort keys and the CSV / gzipped NDJSON encodings"""
+        import csv
+        import gzip
+        import io
+        import json
+        from datetime import datetime
+        from models import db, AuditLog
+        from utils.export import iter_keyset, stream_export
+
+        with app.app_context():
+            created = datetime(2020, 1, 1)      # every row shares the timestamp: the id breaks ties
+            db.session.execute(AuditLog.__table__.insert(), [
+                {'action_type': 'TEST', 'action': f'export_{i}', 'status': 'success', 'created_at': created}
+                for i in range(7)
+            ])
+            db.session.commit()
+            query = db.session.query(AuditLog.id, AuditLog.created_at, AuditLog.action).filter(
+                AuditLog.action_type == 'TEST')
+
+            pages = list(iter_keyset(query, [AuditLog.created_at, AuditLog.id], page_size=3))
+            ids = [row.id for page in pages for row in page]
+            assert [len(page) for page in pages] == [3, 3, 1]
+            assert ids == sorted(ids, reverse=True) and len(set(ids)) == 7
+
+            fields = [('id', 'ID'), ('action', 'Action')]
+            with app.test_request_context():
+                response = stream_export(iter_keyset(query, [AuditLog.created_at, AuditLog.id], page_size=3),
+                                         fields, lambda row: [row.id, row.action], 'audit_logs')
+                rows = list(csv.reader(io.StringIO(response.get_data(as_text=True))))
+                assert rows[0] == ['ID', 'Action'] and [int(row[0]) for row in rows[1:]] == ids
+
+                response = stream_export(iter_keyset(query, [AuditLog.created_at, AuditLog.id], page_size=3),
+                                         fields, lambda row: [row.id, row.action], 'audit_logs',
+                                         export_format='ndjson', gzip=True)
+                lines = gzip.decompress(response.get_data()).decode().splitlines()
+                assert [json.loads(line)['id'] for line in lines] == ids
+                assert 'audit_logs_' in response.headers['Content-Disposition']
+                assert response.headers['Content-Disposition'].endswith('.ndjson.gz')
+
+
+class TestCandleStore:
+    """Tests for the memmapped OHLCV candle store"""
+
+    def _bars(self, times, close):
+        import numpy as np
+        n = len(times)
+        return {
+            'time': np.asarray(times, dtype=np.int64),
+            'open': np.full(n, close), 'high': np.full(n, close + 1),
+            'low': np.full(n, close - 1), 'close': np.full(n, close),
+            'volume': np.full(n, 10, dtype=np.int64)
+        }
+
+    def test_fills_once_then_syncs_tail(self, tmp_path):
+        """Test the period is fetched once, ticks move the forming bar and stale tails are merged"""
+        import time
+        from services.market.candle_store import CandleStore, MAX_SYNC_AGE
+        from services.market.price_store import PriceRecord
+
+        day = 86400
+        today = int(time.time()) // day * day
+        calls = []
+
+        def fetcher(symbol, interval, period=None, start=None):
+            calls.append((period, start))
+            if start is None:
+                return self._bars(range(today - 20 * day, today + day, day), 100.0)
+            return self._bars([today, today + day], 105.0)
+
+        store = CandleStore(str(tmp_path))
+        store.configure(fetcher=fetcher)
+        rows = store.to_rows(store.get_range('BTC-USD', '1mo', '1d'))
+        assert len(rows) == 21 and rows[-1]['time'] == today and rows[-1]['close'] == 100.0
+        store.get_range('BTC-USD', '1mo', '1d')
+        assert calls == [('1mo', None)]
+
+        store.on_prices({'BTCUSD': PriceRecord(120.0, ts=today + 60)})
+        store.on_prices({'BTCUSD': PriceRecord(90.0, ts=today + 120)})
+        assert store.series('BTC-USD', '1d').last_bar()['close'] == 100.0
+        assert store.flush() == 1
+        last = store.series('BTC-USD', '1d').last_bar()
+        assert (last['open'], last['high'], last['low'], last['close']) == (100.0, 120.0, 90.0, 90.0)
+        store.on_prices({'BTCUSD': PriceRecord(95.0, ts=today + day + 60)})
+        store.on_prices({'BTCUSD': PriceRecord(97.0, ts=today + day + 120)})
+        store.flush()
+        last = store.series('BTC-USD', '1d').last_bar()
+        assert (last['time'], last['open'], last['close']) == (today + day, 95.0, 97.0)
+        assert store.flush() == 0
+
+        # A fresh process reads the same files; a stale tail is merged from upstream
+        store = CandleStore(str(tmp_path))
+        store.configure(fetcher=fetcher)
+        store.sync('BTC-USD', '1mo', '1d', now=time.time() + MAX_SYNC_AGE + 1)
+        columns = store.to_columns(store.series('BTC-USD', '1d').slice(today - day))
+        assert calls[-1] == (None, today)
+        assert columns['time'] == [today - day, today, today + day]
+        assert columns['close'] == [100.0, 105.0, 105.0]
+
+    def test_closed_market_ticks_open_no_bars(self, tmp_path):
+        """Test ticks repeating the last close after the session leave the session intact"""
+        import time
+        from services.market.candle_store import CandleStore
+        from services.market.price_store import PriceRecord
+
+        day = 86400
+        session_open = (int(time.time()) // day - 1) * day + 14 * 3600 + 1800
+        times = [session_open + 300 * i for i in range(78)]
+
+        store = CandleStore(str(tmp_path))
+        store.configure(fetcher=lambda symbol, interval, period=None, start=None: self._bars(times, 100.0))
+        assert len(store.get_range('AAPL', '1d', '5m')['time']) == 78
+
+        overnight = times[-1] + 10 * 3600
+        store.on_prices({'AAPL': PriceRecord(100.0, ts=overnight)})
+        store.flush()
+        session = store.get_range('AAPL', '1d', '5m')
+        assert len(session['time']) == 78 and session['time'][-1] == times[-1]
+
+        store.on_prices({'AAPL': PriceRecord(101.5, ts=overnight + 60)})
+        store.flush()
+        assert store.series('AAPL', '5m').last_bar()['open'] == 101.5
+
+
+class TestAnalyticsRollups:
+    """Tests for the admin analytics rollups"""
+
+    def test_rollups_match_source_rows(self, app):
+        """Test daily facts and cohort activity against inserted users, payments, challenges and trades"""
+        from datetime import date, datetime
+        from models import db, User, UserChallenge, Trade, Payment, DailyRollup
+        from services.analytics_rollups import analytics_rollups
+
+        with app.app_context():
+            jan, feb = datetime(2019, 1, 10, 9), datetime(2019, 2, 3, 15)
+            result = db.session.execute(User.__table__.insert().returning(User.__table__.c.id), [
+                {'username': f'rollup_{i}', 'email': f'rollup_{i}@example.com', 'password_hash': 'x',
+                 'created_at': created}
+                for i, created in enumerate([jan, jan, feb])
+            ])
+            user_ids = [row[0] for row in result]
+            db.session.execute(Payment.__table__.insert(), [
+                {'user_id': user_ids[0], 'amount': 100, 'status': 'completed', 'payment_method': 'paypal',
+                 'plan_type': 'pro', 'created_at': jan, 'completed_at': jan},
+                {'user_id': user_ids[1], 'amount': 50.5, 'status': 'completed', 'payment_method': 'paypal',
+                 'plan_type': 'starter', 'created_at': jan, 'completed_at': None},
+                {'user_id': user_ids[2], 'amount': 75, 'status': 'pending', 'payment_method': 'paypal',
+                 'plan_type': 'pro', 'created_at': jan, 'completed_at': None},
+                {'user_id': user_ids[2], 'amount': 20, 'status': 'completed', 'payment_method': 'paypal',
+                 'plan_type': 'pro', 'created_at': jan, 'completed_at': feb},
+            ])
+            challenge_ids = [row[0] for row in db.session.execute(
+                UserChallenge.__table__.insert().returning(UserChallenge.__table__.c.id), [
+                    {'user_id': user_id, 'initial_balance': 1000, 'current_balance': 1000,
+                     'highest_balance': 1000, 'status': status, 'start_date': jan, 'end_date': end}
+                    for user_id, status, end in [(user_ids[0], 'passed', feb), (user_ids[1], 'active', None)]
+                ])]
+            db.session.execute(Trade.__table__.insert(), [
+                {'challenge_id': challenge_ids[0], 'symbol': 'AAPL', 'trade_type': 'buy', 'quantity': 1,
+                 'entry_price': 100, 'status': 'closed', 'opened_at': jan, 'closed_at': feb},
+                {'challenge_id': challenge_ids[0], 'symbol': 'AAPL', 'trade_type': 'buy', 'quantity': 1,
+                 'entry_price': 100, 'status': 'open', 'opened_at': feb, 'closed_at': None},
+                {'challenge_id': challenge_ids[1], 'symbol': 'MSFT', 'trade_type': 'sell', 'quantity': 1,
+                 'entry_price': 100, 'status': 'open', 'opened_at': feb, 'closed_at': None},
+            ])
+            db.session.commit()
+
+            analytics_rollups.backfill(start_day=date(2019, 1, 1), today=date(2019, 2, 28))
+            days = {d['date']: d for d in analytics_rollups.get_daily(date(2019, 1, 1), date(2019, 2, 28))}
+
+            assert len(days) == 59
+            assert days['2019-01-10']['signups'] == 2 and days['2019-02-03']['signups'] == 1
+            assert days['2019-01-10']['payments'] == 2 and days['2019-01-10']['revenue'] == 150.5
+            assert days['2019-02-03']['payments'] == 1 and days['2019-02-03']['revenue'] == 20
+            assert days['2019-01-10']['challenges_started'] == 2
+            assert days['2019-02-03']['challenges_passed'] == 1
+            assert days['2019-01-10']['trades_opened'] == 1 and days['2019-02-03']['trades_opened'] == 2
+            assert days['2019-02-03']['trades_closed'] == 1
+            assert sum(d['signups'] for d in days.values()) == 3
+            assert DailyRollup.query.filter(DailyRollup.day.between(date(2019, 1, 1), date(2019, 2, 28))).count() == 59
+
+            cohorts = analytics_rollups.get_cohorts(date(2019, 1, 1), date(2019, 2, 1))
+            assert cohorts[date(2019, 1, 1)] == {'users': 2, 'active': {date(2019, 1, 1): 1, date(2019, 2, 1): 2}}
+            assert cohorts[date(2019, 2, 1)] == {'users': 1, 'active': {}}
+
+            # Refreshing again replaces the rows rather than adding to them
+            analytics_rollups.refresh_days(date(2019, 1, 10), date(2019, 1, 10))
+            assert analytics_rollups.get_daily(date(2019, 1, 10), date(2019, 1, 10))[0]['signups'] == 2
+
+            # Reads never refresh: days the scheduler has not rolled up read as zeros
+            assert analytics_rollups.get_daily(date(2018, 12, 1), date(2018, 12, 1))[0]['signups'] == 0
+            assert DailyRollup.query.filter(DailyRollup.day == date(2018, 12, 1)).count() == 0
+
+
+class TestNewsIngestion:
+    """Tests for background news ingestion and the article store"""
+
+    def _article(self, title, market='us', published_at='2030-01-01T00:00:00', related=()):
+        import hashlib
+        return {'id': hashlib.md5(title.encode()).hexdigest()[:12], 'title': title, 'summary': '',
+                'market': market, 'category': 'general', 'published_at': published_at,
+                'sentiment': 'neutral', 'related': list(related)}
+
+    def test_refresh_uses_conditional_requests_and_indexes_articles(self):
+        """Test 304 responses skip parsing, duplicates are dropped and reads come from the store"""
+        from services.news import NewsService
+
+        class Response:
+            def __init__(self, status_code, payload=None, headers=None):
+                self.status_code, self._payload, self.headers = status_code, payload, headers or {}
+
+            def json(self):
+                return self._payload
+
+        sent_headers = []
+
+        def get(url, headers=None, **kwargs):
+            sent_headers.append(headers)
+            if headers.get('If-None-Match') == '"v1"':
+                return Response(304)
+            return Response(200, [
+                {'headline': 'Apple beats earnings estimates', 'summary': '', 'datetime': 1900000000,
+                 'related': 'AAPL'},
+                {'headline': 'Apple beats earnings estimates again', 'summary': '', 'datetime': 1900000001},
+                {'headline': 'Bitcoin rally extends', 'summary': 'BTC gains', 'datetime': 1900000002},
+            ], {'ETag': '"v1"'})
+
+        service = NewsService()
+        service.finnhub_key = 'test'
+        service.session.get = get
+        service.sources = {'finnhub_general': service.sources['finnhub_general']}
+
+        assert service.refresh() == 2
+        assert service.refresh() == 0
+        assert sent_headers == [{}, {'If-None-Match': '"v1"'}]
+        assert service.get_stats()['not_modified'] == 1
+
+        assert [a['title'] for a in service.get_news(limit=10)] == [
+            'Bitcoin rally extends', 'Apple beats earnings estimates']
+        assert [a['title'] for a in service.get_news_by_symbol('aapl')] == ['Apple beats earnings estimates']
+        assert [a['title'] for a in service.get_news_by_symbol('BTC')] == ['Bitcoin rally extends']
+        assert service.get_news(market='crypto') == []
+
+    def test_store_evicts_oldest_beyond_capacity(self):
+        """Test the store keeps the newest articles and drops their index entries"""
+        from services.news import ArticleStore
+
+        store = ArticleStore(max_articles=2)
+        store.add([self._article(f'Story {i} about MSFT', published_at=f'2030-01-0{i}T00:00:00')
+                   for i in range(1, 4)])
+        assert len(store) == 2
+        assert [a['title'] for a in store.latest()] == ['Story 3 about MSFT', 'Story 2 about MSFT']
+        assert len(store.by_symbol('MSFT')) == 2
+
+    def test_title_index_matches_pairwise_dedup(self):
+        """Test the prefix-filtered index keeps exactly what pairwise comparison keeps"""
+        import random
+        import re
+        from services.news import NewsService
+
+        def pairwise(titles):
+            seen, kept = [], []
+            for title in titles:
+                words = set(re.findall(r'\w+', title.lower()))
+                if not any(words and other and len(words & other) / max(len(words), len(other)) > 0.7
+                           for other in seen):
+                    seen.append(words)
+                    kept.append(title)
+            return kept
+
+        rng = random.Random(7)
+        vocabulary = [f'w{i}' for i in range(40)]
+        titles = []
+        for _ in range(400):
+            if titles and rng.random() < 0.5:
+                words = rng.choice(titles).split()
+                words[rng.randrange(len(words))] = rng.choice(vocabulary)
+                if rng.random() < 0.5:
+                    words.append(rng.choice(vocabulary))
+            else:
+                words = rng.sample(vocabulary, rng.randint(1, 14))
+            titles.append(' '.join(words))
+
+        service = NewsService()
+        articles = [self._article(title) | {'id': str(i)} for i, title in enumerate(titles)]
+        assert [a['title'] for a in service._deduplicate(articles)] == pairwise(titles)
+
+    def test_duplicates_recognized_across_fetches(self):
+        """Test a story stored by one fetch drops its rewordings in later fetches until evicted"""
+        from services.news import NewsService
+
+        service = NewsService()
+        first = self._article('Fed holds interest rates steady amid inflation worries')
+        service.store.add(service._deduplicate([first], service.store.titles))
+
+        reworded = self._article('Fed holds interest rates steady amid inflation worries - Reuters')
+        other = self._article('Oil prices slide on demand concerns')
+        kept = service._deduplicate([reworded, other], service.store.titles)
+        assert kept == [other]
+        service.store.add(kept)
+
+        service.store.max_articles = 0
+        service.store.add([])
+        assert len(service.store.titles) == 0
+        assert service._deduplicate([reworded], service.store.titles) == [reworded]